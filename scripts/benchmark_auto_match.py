@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark the batch bank auto-match engine against the legacy per-transaction scan.
+
+Generates synthetic transactions, open invoices and expenses (clustered
+amounts, so many candidates share a tolerance window), then times:
+
+  legacy  – for every transaction: re-read all invoices + expenses, scan
+            linearly, first hit within 1 % wins (timed on a sample and
+            extrapolated, since the full run is quadratic)
+  engine  – services.bank_auto_match: one candidate load, sorted index,
+            exclusive assignment
+
+Simulated Cosmos latency is charged per round trip so the query-count
+difference shows up in wall time too.
+
+    python scripts/benchmark_auto_match.py
+    python scripts/benchmark_auto_match.py --transactions 10000 --invoices 12000 --latency-ms 15
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import random
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+load_dotenv(ROOT / ".env")
+
+from smart_invoice_pro.services.bank_auto_match import match_transactions  # noqa: E402
+
+
+def _dataset(args):
+    rng = random.Random(args.seed)
+    start = date(2026, 1, 1)
+    # A few hundred price points so tolerance windows are crowded.
+    price_points = [round(rng.uniform(50, 50_000), 2) for _ in range(args.price_points)]
+
+    def _day():
+        return (start + timedelta(days=rng.randrange(365))).isoformat()
+
+    invoices = [
+        {"id": f"inv-{i}", "balance_due": rng.choice(price_points), "due_date": _day()}
+        for i in range(args.invoices)
+    ]
+    expenses = [
+        {"id": f"exp-{i}", "amount": rng.choice(price_points), "date": _day()}
+        for i in range(args.expenses)
+    ]
+    txns = []
+    for i in range(args.transactions):
+        amount = rng.choice(price_points) * rng.uniform(0.995, 1.005)
+        txns.append({"id": f"txn-{i}", "amount": round(amount if i % 3 else -amount, 2), "date": _day()})
+    return txns, invoices, expenses
+
+
+def _legacy_match(txn, invoices, expenses):
+    """The pre-engine algorithm, minus the Cosmos calls."""
+    amt = abs(txn["amount"])
+    if amt == 0:
+        return None
+    for inv in invoices:
+        due = float(inv.get("balance_due", 0))
+        if due > 0 and abs(due - amt) / max(due, amt) <= 0.01:
+            return "invoice", inv["id"]
+    for exp in expenses:
+        exp_amt = float(exp.get("amount", 0))
+        if exp_amt > 0 and abs(exp_amt - amt) / max(exp_amt, amt) <= 0.01:
+            return "expense", exp["id"]
+    return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--transactions", type=int, default=10_000)
+    parser.add_argument("--invoices", type=int, default=10_000)
+    parser.add_argument("--expenses", type=int, default=3_000)
+    parser.add_argument("--price-points", type=int, default=400)
+    parser.add_argument("--latency-ms", type=float, default=10.0, help="simulated Cosmos round trip")
+    parser.add_argument("--legacy-sample", type=int, default=200,
+                        help="transactions timed for the legacy scan (result is extrapolated)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    txns, invoices, expenses = _dataset(args)
+    latency = args.latency_ms / 1000.0
+    print(f"{len(txns)} transactions, {len(invoices)} open invoices, {len(expenses)} expenses, "
+          f"{args.latency_ms:.0f} ms per round trip")
+
+    sample = txns[:max(1, min(args.legacy_sample, len(txns)))]
+    started = time.perf_counter()
+    legacy_hits = sum(1 for txn in sample if _legacy_match(txn, invoices, expenses))
+    legacy_cpu = (time.perf_counter() - started) * len(txns) / len(sample)
+    legacy_hit_rate = legacy_hits / len(sample)
+    # 2 reads per transaction + 1 replace per match
+    legacy_trips = 2 * len(txns) + int(legacy_hit_rate * len(txns))
+    legacy_wall = legacy_cpu + legacy_trips * latency
+
+    started = time.perf_counter()
+    matches = match_transactions(txns, invoices, expenses)
+    engine_cpu = time.perf_counter() - started
+    # 3 reads (invoices, expenses, existing matches) + batched replaces of 100
+    engine_trips = 3 + math.ceil(len(matches) / 100)
+    engine_wall = engine_cpu + engine_trips * latency
+
+    claimed = [m.candidate_id for m in matches.values()]
+    assert len(claimed) == len(set(claimed)), "a candidate was claimed twice"
+
+    print(f"{'':<8}{'matched':>10}{'round trips':>14}{'cpu s':>10}{'wall s':>10}")
+    print(f"{'legacy':<8}{int(legacy_hit_rate * len(txns)):>10}{legacy_trips:>14}"
+          f"{legacy_cpu:>10.2f}{legacy_wall:>10.2f}   (extrapolated from {len(sample)})")
+    print(f"{'engine':<8}{len(matches):>10}{engine_trips:>14}{engine_cpu:>10.2f}{engine_wall:>10.2f}")
+    if engine_wall:
+        print(f"speed-up x{legacy_wall / engine_wall:,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark the streaming bank statement import against the legacy list-based one.
+
+Generates a synthetic multi-year CSV statement, then runs:
+
+  legacy     – decode the whole file, parse every row into a list, build
+               every row document, create_item one row at a time
+  streaming  – import_workflow_service._run_import_job: lazy decode and
+               parse, bounded concurrent batched writes, preview-only result
+
+Cosmos is replaced by an in-process stub that charges a simulated round-trip
+latency per request; Python heap peaks are measured with tracemalloc.
+
+    python scripts/benchmark_bank_import.py
+    python scripts/benchmark_bank_import.py --rows 100000 --latency-ms 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+from dotenv import load_dotenv
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+load_dotenv(ROOT / ".env")
+
+from smart_invoice_pro.services.bank_import import import_workflow_service as svc  # noqa: E402
+
+
+class _StubRows:
+    """Discards writes after sleeping for one simulated round trip."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.requests = 0
+
+    def create_item(self, body):
+        self.requests += 1
+        time.sleep(self.latency)
+
+    def execute_item_batch(self, batch_operations, partition_key):
+        self.requests += 1
+        time.sleep(self.latency)
+
+
+def _statement(rows: int, seed: int) -> bytes:
+    rng = random.Random(seed)
+    start = date(2021, 4, 1)
+    lines = ["Date,Narration,Debit,Credit,Balance"]
+    balance = 250_000.0
+    for n in range(rows):
+        day = (start + timedelta(days=n * 1460 // max(1, rows))).strftime("%d/%m/%Y")
+        amount = round(rng.uniform(10, 25_000), 2)
+        if rng.random() < 0.6:
+            balance -= amount
+            lines.append(f"{day},UPI/{rng.randrange(10**11)}/MERCHANT {n % 997},{amount},,{balance:.2f}")
+        else:
+            balance += amount
+            lines.append(f"{day},NEFT CR-CUSTOMER {n % 389}-INV {n},,{amount},{balance:.2f}")
+    return ("\n".join(lines) + "\n").encode()
+
+
+def _legacy(file_bytes, stub):
+    rows = svc._parse_csv(file_bytes.decode("utf-8", errors="replace"))
+    docs = []
+    for candidate in rows:
+        candidate["parser"] = "csv"
+        doc = svc._build_row_doc(tenant_id="t", user_id="u", batch_id="b", bank_account_id="ba",
+                                 filename="stmt.csv", candidate=candidate)
+        stub.create_item(body=doc)
+        docs.append(doc)
+    return len(docs)
+
+
+def _streaming(file_bytes, stub):
+    batch_doc = {"id": "b", "tenant_id": "t", "user_id": "u", "bank_account_id": "ba",
+                 "filename": "stmt.csv", "warnings": []}
+    with patch.object(svc, "bank_import_rows_container", stub), \
+         patch.object(svc, "_replace_job"), patch.object(svc, "_replace_batch"), \
+         patch.object(svc, "log_audit_event"), patch.object(svc, "record_domain_event"):
+        batch_doc, _, _ = svc._run_import_job(
+            batch_doc=batch_doc, job_doc={"id": "j"},
+            file_profile=svc.detect_file_profile("stmt.csv"), file_bytes=file_bytes,
+        )
+    return batch_doc["row_count"]
+
+
+def _measure(label, fn, file_bytes, latency):
+    stub = _StubRows(latency)
+    tracemalloc.start()
+    started = time.perf_counter()
+    count = fn(file_bytes, stub)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<10}{count:>10}{stub.requests:>12}{elapsed:>10.2f}{peak / 2**20:>14.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="simulated Cosmos round trip")
+    parser.add_argument("--skip-legacy", action="store_true", help="only run the streaming pipeline")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    file_bytes = _statement(args.rows, args.seed)
+    latency = args.latency_ms / 1000.0
+    print(f"{args.rows} rows, {len(file_bytes) / 2**20:.1f} MB CSV, {args.latency_ms:.1f} ms per round trip")
+    print(f"{'':<10}{'rows':>10}{'requests':>12}{'wall s':>10}{'peak heap MB':>14}")
+    if not args.skip_legacy:
+        _measure("legacy", _legacy, file_bytes, latency)
+    _measure("streaming", _streaming, file_bytes, latency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for document PDF rendering (build_invoice_pdf).
+
+Reports three numbers worth tracking release over release:
+
+  * single-render latency — cold (template compiled per render, the old
+    behaviour) and warm (compiled template reused),
+  * throughput — renders/sec across a process pool,
+  * peak RSS of the benchmark process and of the pool workers.
+
+    python scripts/benchmark_pdf_render.py
+    python scripts/benchmark_pdf_render.py --logo uploads/org_logos/acme.png --items 40
+    python scripts/benchmark_pdf_render.py --processes 8 --documents 2000 --history pdf-bench.jsonl
+
+With --history each run is appended as one JSON line so results can be
+compared over time.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+from dotenv import load_dotenv
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+load_dotenv(ROOT / ".env")
+
+from smart_invoice_pro.api import invoice_generation  # noqa: E402
+from smart_invoice_pro.utils.pdf_templates import reset_template_cache  # noqa: E402
+
+
+def sample_invoice(n: int, items: int) -> dict:
+    return {
+        "invoice_number": f"INV-{n:05d}",
+        "customer_id": "cust-bench",
+        "customer_name": "Benchmark Traders Pvt Ltd",
+        "issue_date": "2026-04-01",
+        "due_date": "2026-04-30",
+        "payment_terms": "Net 30",
+        "status": "Issued",
+        "is_gst_applicable": True,
+        "subtotal": 1000.0 * items,
+        "total_tax": 180.0 * items,
+        "total_amount": 1180.0 * items,
+        "balance_due": 1180.0 * items,
+        "terms_conditions": "Payment due within 30 days.",
+        "items": [
+            {"name": f"Line item {i}", "quantity": 2, "rate": 500, "tax": 18, "amount": 1000}
+            for i in range(items)
+        ],
+    }
+
+
+def _branding(args) -> dict:
+    branding = dict(invoice_generation._DEFAULT_BRANDING)
+    if args.logo:
+        branding["logo_url"] = "/uploads/benchmark-logo"
+    return branding
+
+
+def _logo_resolver(logo: str | None):
+    path = str(Path(logo).resolve()) if logo else None
+    return lambda url: path if url else None
+
+
+def _peak_rss_mb(who=resource.RUSAGE_SELF) -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _worker_init(logo: str | None) -> None:
+    invoice_generation._resolve_logo_path = _logo_resolver(logo)
+
+
+def _latency(args, branding: dict, cold: bool) -> list[float]:
+    samples = []
+    for n in range(args.iterations):
+        if cold:
+            reset_template_cache()
+        started = time.perf_counter()
+        invoice_generation.build_invoice_pdf(sample_invoice(n, args.items), branding=branding)
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return samples
+
+
+def _throughput(args, branding: dict) -> float:
+    tasks = [
+        (n, sample_invoice(n, args.items), branding, "invoice", "FULL_GST")
+        for n in range(args.documents)
+    ]
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=args.processes, mp_context=ctx,
+                             initializer=_worker_init, initargs=(args.logo,)) as pool:
+        # Warm every worker (imports + template compile) before timing.
+        list(pool.map(invoice_generation.render_pdf_task, tasks[:args.processes]))
+        started = time.perf_counter()
+        for _ in pool.map(invoice_generation.render_pdf_task, tasks, chunksize=4):
+            pass
+        elapsed = time.perf_counter() - started
+    return args.documents / elapsed
+
+
+def _report(label: str, samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    median = statistics.median(samples)
+    print(f"{label:<28} median {median:7.2f} ms   p95 {p95:7.2f} ms   min {ordered[0]:7.2f} ms")
+    return {"median_ms": round(median, 3), "p95_ms": round(p95, 3), "min_ms": round(ordered[0], 3)}
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50, help="renders per latency sample set")
+    parser.add_argument("--items", type=int, default=10, help="line items per invoice")
+    parser.add_argument("--logo", help="logo image file to brand the documents with")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--documents", type=int, default=500, help="documents for the throughput run")
+    parser.add_argument("--skip-pool", action="store_true", help="only measure single-render latency")
+    parser.add_argument("--history", help="append results as a JSON line to this file")
+    args = parser.parse_args()
+
+    branding = _branding(args)
+    print(f"build_invoice_pdf, {args.items} items, logo={'yes' if args.logo else 'no'}, "
+          f"{args.iterations} iterations")
+
+    with patch.object(invoice_generation, "_resolve_logo_path", _logo_resolver(args.logo)):
+        invoice_generation.build_invoice_pdf(sample_invoice(0, args.items), branding=branding)
+        result = {
+            "cold": _report("cold (compile per render)", _latency(args, branding, cold=True)),
+            "warm": _report("warm (compiled template)", _latency(args, branding, cold=False)),
+        }
+
+    if not args.skip_pool:
+        rate = _throughput(args, branding)
+        result["throughput"] = {"processes": args.processes, "documents": args.documents,
+                                "renders_per_sec": round(rate, 1)}
+        print(f"{'process pool':<28} {rate:7.1f} renders/sec with {args.processes} processes")
+
+    result["peak_rss_mb"] = {
+        "main": round(_peak_rss_mb(), 1),
+        "workers": round(_peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+    }
+    print(f"{'peak RSS':<28} main {result['peak_rss_mb']['main']:.1f} MB   "
+          f"largest worker {result['peak_rss_mb']['workers']:.1f} MB")
+
+    if args.history:
+        record = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "items": args.items,
+            "logo": bool(args.logo),
+            **result,
+        }
+        with open(args.history, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(record) + "\n")
+        print(f"appended results to {args.history}")
+
+
+if __name__ == "__main__":
+    main()
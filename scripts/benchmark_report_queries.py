@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Compare serial vs parallel execution of the balance-sheet report queries.
+
+By default each container is simulated with a fixed per-query latency, which
+is enough to show the wall-time effect of running independent reads
+concurrently. Pass --tenant-id to run the same queries against the Cosmos
+account configured in .env instead.
+
+    python scripts/benchmark_report_queries.py --latency-ms 40 --iterations 20
+    python scripts/benchmark_report_queries.py --tenant-id <tenant> --iterations 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+load_dotenv(ROOT / ".env")
+
+from smart_invoice_pro.utils.report_queries import (  # noqa: E402
+    ReportQuery,
+    run_report_queries,
+    run_serially,
+)
+
+
+class SimulatedContainer:
+    """Returns ``rows`` empty documents after sleeping ``latency`` seconds."""
+
+    def __init__(self, latency: float, rows: int):
+        self.latency = latency
+        self.rows = rows
+
+    def query_items(self, query, parameters=None, **kwargs):
+        time.sleep(self.latency)
+        return [{} for _ in range(self.rows)]
+
+
+def _containers(args) -> dict:
+    names = ("bank_accounts", "invoices", "products", "bills", "expenses")
+    if not args.tenant_id:
+        return {name: SimulatedContainer(args.latency_ms / 1000.0, args.rows) for name in names}
+
+    from azure.cosmos import CosmosClient
+
+    client = CosmosClient(os.environ["COSMOS_URI"], credential=os.environ["COSMOS_KEY"])
+    database = client.get_database_client(os.getenv("COSMOS_DB_NAME", "smartinvoicedb"))
+    return {name: database.get_container_client(name) for name in names}
+
+
+def legacy_queries(c: dict, tenant_id: str, as_of: str) -> dict:
+    """The seven SELECT * reads the balance sheet used to issue one by one."""
+    tenant = "c.tenant_id = @tenant_id"
+    params = {"@tenant_id": tenant_id, "@as_of": as_of, "@open": ["Pending", "Partially Paid"]}
+    return {
+        "bank": ReportQuery(c["bank_accounts"], (), tenant, params),
+        "ar": ReportQuery(c["invoices"], (), f"{tenant} AND c.issue_date <= @as_of "
+                          "AND ARRAY_CONTAINS(@open, c.status)", params),
+        "products": ReportQuery(c["products"], (), tenant, params),
+        "ap": ReportQuery(c["bills"], (), f"{tenant} AND c.bill_date <= @as_of "
+                          "AND ARRAY_CONTAINS(@open, c.status)", params),
+        "invoices": ReportQuery(c["invoices"], (), f"{tenant} AND c.issue_date <= @as_of", params),
+        "expenses": ReportQuery(c["expenses"], (), f"{tenant} AND c.expense_date <= @as_of", params),
+        "bills": ReportQuery(c["bills"], (), f"{tenant} AND c.bill_date <= @as_of", params),
+    }
+
+
+def batched_queries(c: dict, tenant_id: str, as_of: str) -> dict:
+    """The five projected reads reports_api.get_balance_sheet now issues."""
+    tenant = "c.tenant_id = @tenant_id"
+    params = {"@tenant_id": tenant_id, "@as_of": as_of}
+    return {
+        "bank": ReportQuery(c["bank_accounts"], ("balance",), tenant, params),
+        "invoices": ReportQuery(c["invoices"], ("status", "amount_paid", "balance_due"),
+                                f"{tenant} AND c.issue_date <= @as_of", params),
+        "products": ReportQuery(c["products"], ("availableQty", "purchase_price", "price"), tenant, params),
+        "bills": ReportQuery(c["bills"], ("status", "amount_paid", "balance_due"),
+                             f"{tenant} AND c.bill_date <= @as_of", params),
+        "expenses": ReportQuery(c["expenses"], ("amount",), f"{tenant} AND c.expense_date <= @as_of", params),
+    }
+
+
+def _time(fn, queries, iterations: int) -> list[float]:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn(queries)
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return samples
+
+
+def _report(label: str, samples: list[float]) -> float:
+    median = statistics.median(samples)
+    print(f"{label:<32} median {median:8.1f} ms   min {min(samples):8.1f} ms   max {max(samples):8.1f} ms")
+    return median
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=40.0, help="simulated per-query latency")
+    parser.add_argument("--rows", type=int, default=200, help="simulated rows per query")
+    parser.add_argument("--tenant-id", help="benchmark against Cosmos for this tenant")
+    args = parser.parse_args()
+
+    containers = _containers(args)
+    tenant_id = args.tenant_id or "benchmark-tenant"
+    as_of = date.today().isoformat()
+
+    print(f"balance sheet, {args.iterations} iterations, "
+          f"{'live Cosmos' if args.tenant_id else f'{args.latency_ms:g} ms simulated latency'}")
+    serial = _report("serial, 7 x SELECT *", _time(run_serially, legacy_queries(containers, tenant_id, as_of),
+                                                   args.iterations))
+    parallel = _report("parallel, 5 x projected", _time(run_report_queries,
+                                                        batched_queries(containers, tenant_id, as_of),
+                                                        args.iterations))
+    print(f"speed-up: {serial / parallel:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
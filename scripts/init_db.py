@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Provision the Cosmos database and every container the application uses.
+
+The app no longer creates containers at import time (see
+smart_invoice_pro/utils/cosmos_client.py); run this once per environment and
+again after deploying a release that adds a container. Safe to re-run.
+
+    python scripts/init_db.py
+    python scripts/init_db.py --dry-run
+    python scripts/init_db.py --only job_queue --only bank_txn_fingerprints
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+load_dotenv(ROOT / ".env")
+
+from smart_invoice_pro.utils import cosmos_client  # noqa: E402
+import smart_invoice_pro.app  # noqa: E402,F401  (importing the app registers module-level containers)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", action="append", metavar="CONTAINER", help="provision just this container (repeatable)")
+    parser.add_argument("--dry-run", action="store_true", help="list the containers and partition keys, create nothing")
+    args = parser.parse_args()
+
+    containers = cosmos_client.registered_containers()
+    unknown = sorted(set(args.only or []) - set(containers))
+    if unknown:
+        parser.error(f"unknown container(s): {', '.join(unknown)}")
+
+    print(f"database {cosmos_client.database_name!r}: {len(containers)} container(s)")
+    if args.dry_run:
+        for name, partition_key in sorted(containers.items()):
+            if not args.only or name in args.only:
+                print(f"  {name:<28}{partition_key}")
+        return
+
+    results = cosmos_client.provision_containers(args.only)
+    for name, outcome in results.items():
+        print(f"  {name:<28}{containers[name]:<16}{outcome}")
+    if any(outcome != "ok" for outcome in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Dedicated worker for the durable job queue (smart_invoice_pro.utils.job_queue).
+
+Claims queued jobs of every kind in JOB_KIND_MODULES (bank imports,
+outbound email, scheduled-job shards, reminder schedule rebuilds) with
+heartbeated leases and runs them until interrupted. Run one or more of these
+next to the web tier and set JOB_WORKER_THREADS=0 on the web processes so
+they only enqueue.
+
+    python scripts/run_job_worker.py
+    python scripts/run_job_worker.py --threads 4 --kind bank_import
+    python scripts/run_job_worker.py --kind email_send
+    python scripts/run_job_worker.py --once          # drain what is due, then exit
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+load_dotenv(ROOT / ".env")
+
+from smart_invoice_pro.utils.job_queue import JobWorker, drain_job_queue, load_job_kinds  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, default=2, help="jobs run concurrently by this worker")
+    kinds = load_job_kinds()
+    parser.add_argument("--kind", action="append", dest="kinds", choices=kinds,
+                        help="only run this job kind (repeatable; default: all)")
+    parser.add_argument("--once", action="store_true", help="drain due jobs and exit")
+    parser.add_argument("--limit", type=int, default=100, help="jobs to run with --once")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if args.once:
+        print(json.dumps(drain_job_queue(args.kinds, limit=args.limit)))
+        return
+    logging.info("job worker: %d thread(s), kinds=%s", args.threads, args.kinds or kinds)
+    JobWorker(args.threads, args.kinds).run_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -20,9 +20,12 @@ from smart_invoice_pro.utils.cosmos_client import (
 )
 from smart_invoice_pro.utils.audit_logger import get_audit_write_stats, log_audit_event
 from smart_invoice_pro.utils.activity_enrichment import enrich_admin_audit_entries
-from smart_invoice_pro.utils.audit_export import audit_rows_to_csv
+from smart_invoice_pro.utils.audit_export import audit_csv_columns
+from smart_invoice_pro.utils.csv_stream import stream_query_csv
 from smart_invoice_pro.utils.audit_query import parse_audit_filters, parse_pagination
 from smart_invoice_pro.utils.audit_retention import archive_expired_audit_logs, retention_days
+from smart_invoice_pro.utils.permission_cache import invalidate_user_permissions, permission_cache_stats
+from smart_invoice_pro.utils.shared_cache import cache_stats
 from smart_invoice_pro.utils.tenant_service import create_tenant_doc, VALID_TENANT_PLANS
 
 admin_blueprint = Blueprint("admin", __name__)
@@ -282,6 +285,7 @@ def update_user_status(user_id):
     user["status"] = new_status
     user["updated_at"] = datetime.utcnow().isoformat()
     users_container.replace_item(item=user["id"], body=user)
+    invalidate_user_permissions(user_id)
 
     _log_platform_audit("user", "update_status", user_id, before, user)
     return jsonify(_sanitize_user(user)), 200
@@ -445,16 +449,16 @@ def list_audit_logs_admin():
 @admin_blueprint.route("/admin/audit-logs/export", methods=["GET"])
 @super_admin_required
 def export_audit_logs_admin():
-    """CSV export of cross-tenant audit logs."""
-    from flask import make_response
-
-    _, items = _fetch_admin_audit_rows(page=0, limit=10_000)
-    logs = enrich_admin_audit_entries([_clean_audit_entry(x) for x in items])
-    csv_data = audit_rows_to_csv(logs, include_tenant=True)
-    response = make_response(csv_data)
-    response.headers["Content-Type"] = "text/csv; charset=utf-8"
-    response.headers["Content-Disposition"] = "attachment; filename=platform-audit-export.csv"
-    return response
+    """Streamed CSV export of cross-tenant audit logs."""
+    scoped_tenant = (request.args.get("tenant_id") or "").strip() or None
+    conditions, params = parse_audit_filters(tenant_id=scoped_tenant)
+    query = f"SELECT * FROM c WHERE {' AND '.join(conditions)} ORDER BY c.created_at DESC"
+    return stream_query_csv(
+        audit_logs_container, query, params,
+        columns=audit_csv_columns(include_tenant=True),
+        filename="platform-audit-export.csv",
+        transform=lambda page: enrich_admin_audit_entries([_clean_audit_entry(x) for x in page]),
+    )
 
 
 @admin_blueprint.route("/admin/audit-stats", methods=["GET"])
@@ -467,6 +471,16 @@ def audit_stats_admin():
     }), 200
 
 
+@admin_blueprint.route("/admin/cache-stats", methods=["GET"])
+@super_admin_required
+def cache_stats_admin():
+    """Hit/miss metrics for this worker's response and permission caches."""
+    return jsonify({
+        "response_cache": cache_stats(),
+        "permission_cache": permission_cache_stats(),
+    }), 200
+
+
 @admin_blueprint.route("/admin/audit-retention/run", methods=["POST"])
 @super_admin_required
 def run_audit_retention_admin():
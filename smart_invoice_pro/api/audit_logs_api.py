@@ -1,16 +1,15 @@
-from flask import Blueprint, jsonify, make_response, request
+from flask import Blueprint, jsonify, request
 from flasgger import swag_from
 from smart_invoice_pro.utils.cosmos_client import audit_logs_container, domain_events_container
 from smart_invoice_pro.utils.permission_checker import require_permission
 from smart_invoice_pro.utils.activity_enrichment import enrich_audit_entries, enrich_audit_entry
 from smart_invoice_pro.utils.domain_event_adapter import domain_event_to_activity
 from smart_invoice_pro.utils.audit_query import parse_audit_filters, parse_pagination
-from smart_invoice_pro.utils.audit_export import audit_rows_to_csv
+from smart_invoice_pro.utils.audit_export import audit_csv_columns
+from smart_invoice_pro.utils.csv_stream import stream_query_csv
 
 audit_logs_blueprint = Blueprint("audit_logs", __name__)
 
-EXPORT_MAX_ROWS = 10_000
-
 
 def _clean_entry(entry):
     safe = {k: v for k, v in entry.items() if not k.startswith("_")}
@@ -76,18 +75,15 @@ def _list_activity_logs():
 
 
 def _export_activity_logs():
-    """CSV export for current tenant with active filters."""
-    _, items = _fetch_audit_rows(
-        tenant_id=request.tenant_id,
-        page=0,
-        limit=EXPORT_MAX_ROWS,
+    """Streamed CSV export for current tenant with active filters."""
+    conditions, params = parse_audit_filters(tenant_id=request.tenant_id)
+    query = f"SELECT * FROM c WHERE {' AND '.join(conditions)} ORDER BY c.created_at DESC"
+    return stream_query_csv(
+        audit_logs_container, query, params,
+        columns=audit_csv_columns(),
+        filename="activity-export.csv",
+        transform=lambda page: enrich_audit_entries([_clean_entry(entry) for entry in page]),
     )
-    clean_items = enrich_audit_entries([_clean_entry(entry) for entry in items])
-    csv_data = audit_rows_to_csv(clean_items)
-    response = make_response(csv_data)
-    response.headers["Content-Type"] = "text/csv; charset=utf-8"
-    response.headers["Content-Disposition"] = "attachment; filename=activity-export.csv"
-    return response
 
 
 # ── GET /api/audit-logs ───────────────────────────────────────────────────────
@@ -24,6 +24,8 @@ from smart_invoice_pro.utils.cosmos_client import settings_container
 from datetime import datetime
 
 from smart_invoice_pro.utils.permission_checker import require_permission
+from smart_invoice_pro.utils.tenant_settings import invalidate_tenant_settings
+from smart_invoice_pro.utils.reminder_schedule import queue_tenant_rebuild
 
 automation_blueprint = Blueprint('automation', __name__)
 
@@ -125,6 +127,9 @@ def save_automation_settings():
 
         doc['updated_at'] = datetime.utcnow().isoformat()
         settings_container.upsert_item(body=doc)
+        invalidate_tenant_settings(request.tenant_id)
+        # Reminder dates are precomputed per invoice; re-plan them for the new rules
+        queue_tenant_rebuild(request.tenant_id)
 
         safe = {k: v for k, v in doc.items() if not k.startswith('_')}
         return jsonify({'message': 'Automation settings saved.', 'settings': safe}), 200
@@ -9,6 +9,11 @@ from smart_invoice_pro.services.bank_import.import_workflow_service import (
     mark_batch_approved,
     update_row,
 )
+from smart_invoice_pro.services import ai_match_job
+from smart_invoice_pro.services.bank_import.fingerprint_index import (
+    assign_fingerprints, forget_transaction, record_transactions,
+)
+from smart_invoice_pro.services.bank_auto_match import load_candidates, match_transactions, write_matches
 from smart_invoice_pro.utils.audit_logger import log_audit_event
 from smart_invoice_pro.utils.cosmos_client import get_container
 from smart_invoice_pro.utils.domain_events import record_domain_event
@@ -20,6 +25,7 @@ import csv
 import io
 import re
 from smart_invoice_pro.utils.permission_checker import require_permission
+from smart_invoice_pro.utils.dashboard_rollups import record_rollup_change
 
 bank_reconciliation_blueprint = Blueprint('bank_reconciliation', __name__)
 
@@ -177,57 +183,31 @@ def _parse_qif(text):
 # ─────────────────────────────────────────────────────────────────────────────
 # AUTO-MATCH LOGIC
 # ─────────────────────────────────────────────────────────────────────────────
-def _auto_match(txn, user_id, tenant_id=None):
-    """Try to match a bank transaction to an unpaid invoice or expense."""
-    amt = abs(txn['amount'])
-    if amt == 0:
-        return None, None
-
-    # Match against unpaid invoices (balance_due within 1%)
+def _match_batch(txns, user_id, tenant_id):
+    """
+    Match bank transactions (dicts with id/amount/date) to unpaid invoices or
+    expenses in one pass.  Returns {txn_id: Match}; best-effort, {} on failure.
+    """
+    if not txns:
+        return {}
     try:
-        inv_query = f"SELECT c.id, c.invoice_number, c.balance_due, c.customer_id FROM c WHERE c.user_id = '{user_id}' "
-        if tenant_id:
-            inv_query += f"AND c.tenant_id = '{tenant_id}' "
-        inv_query += "AND c.status IN ('Issued','Overdue') AND c.balance_due > 0"
-        invoices = list(invoices_container.query_items(
-            query=inv_query, enable_cross_partition_query=True
-        ))
-        for inv in invoices:
-            due = float(inv.get('balance_due', 0))
-            if due > 0 and abs(due - amt) / max(due, amt) <= 0.01:
-                return 'invoice', inv['id']
+        invoices, expenses = load_candidates(
+            invoices_container, expenses_container, bank_txns_container,
+            user_id=user_id, tenant_id=tenant_id,
+        )
+        return match_transactions(txns, invoices, expenses)
     except Exception:
-        pass
+        return {}
 
-    # Match against expenses by amount (within 1%)
-    try:
-        exp_query = "SELECT c.id, c.vendor_name, c.amount FROM c WHERE 1=1 "
-        if tenant_id:
-            exp_query += f"AND c.tenant_id = '{tenant_id}' "
-        exps = list(expenses_container.query_items(
-            query=exp_query, enable_cross_partition_query=True
-        ))
-        for exp in exps:
-            exp_amt = float(exp.get('amount', 0))
-            if exp_amt > 0 and abs(exp_amt - amt) / max(exp_amt, amt) <= 0.01:
-                return 'expense', exp['id']
-    except Exception:
-        pass
 
-    return None, None
+def _match_fields(match):
+    if not match:
+        return {'match_status': 'unmatched', 'match_type': None, 'match_id': None}
+    return {'match_status': 'matched', 'match_type': match.kind, 'match_id': match.candidate_id}
 
 
-def _persist_approved_bank_transaction(row_doc, user_id, tenant_id):
+def _persist_approved_bank_transaction(row_doc, user_id, tenant_id, match=None):
     now = datetime.utcnow().isoformat() + 'Z'
-    match_type, match_id = _auto_match(
-        {
-            'amount': row_doc.get('amount', 0),
-            'description': row_doc.get('description', ''),
-            'date': row_doc.get('normalized_date', ''),
-        },
-        user_id,
-        tenant_id,
-    )
     txn_doc = {
         'id': str(uuid.uuid4()),
         'user_id': user_id,
@@ -239,10 +219,10 @@ def _persist_approved_bank_transaction(row_doc, user_id, tenant_id):
         'currency': row_doc.get('currency', 'INR'),
         'import_batch_id': row_doc.get('batch_id'),
         'import_row_id': row_doc.get('id'),
+        'reference': row_doc.get('reference'),
+        'fingerprint': row_doc.get('fingerprint'),
         'source': 'bank_import_review',
-        'match_status': 'matched' if match_id else 'unmatched',
-        'match_type': match_type,
-        'match_id': match_id,
+        **_match_fields(match),
         'created_at': now,
         'updated_at': now,
     }
@@ -468,9 +448,21 @@ def approve_statement_import_batch(batch_id):
     if not batch_doc:
         return jsonify({'error': 'Import batch not found'}), 404
 
-    row_docs = list_rows(tenant_id=tenant_id, batch_id=batch_id)
-    approved_rows = [row for row in row_docs if row.get('review_status') != 'rejected']
-    created_txns = [_persist_approved_bank_transaction(row, user_id, tenant_id) for row in approved_rows]
+    row_docs = assign_fingerprints(list_rows(tenant_id=tenant_id, batch_id=batch_id))
+    approved_rows = [row for row in row_docs if row.get('review_status') not in ('rejected', 'duplicate')]
+    matches = _match_batch(
+        [
+            {'id': row.get('id'), 'amount': row.get('amount', 0), 'date': row.get('normalized_date', '')}
+            for row in approved_rows
+        ],
+        user_id,
+        tenant_id,
+    )
+    created_txns = [
+        _persist_approved_bank_transaction(row, user_id, tenant_id, matches.get(row.get('id')))
+        for row in approved_rows
+    ]
+    record_transactions(tenant_id, created_txns)
     batch_doc = mark_batch_approved(tenant_id=tenant_id, batch_id=batch_id, approved_row_count=len(created_txns))
 
     _audit_banking(
@@ -552,20 +544,23 @@ def upload_statement():
     now = datetime.utcnow().isoformat() + 'Z'
 
     for t in raw_txns:
-        # Auto-match attempt
-        match_type, match_id = _auto_match(t, user_id, tenant_id)
+        t['id'] = str(uuid.uuid4())
+    # Auto-match the whole statement against one candidate load
+    matches = _match_batch(raw_txns, user_id, tenant_id)
 
+    for t in raw_txns:
+        match = matches.get(t['id'])
         doc = {
-            'id': str(uuid.uuid4()),
+            'id': t['id'],
             'user_id': user_id,
             'tenant_id': tenant_id,
             'bank_account_id': bank_account_id,
             'date': t['date'],
             'description': t['description'],
             'amount': t['amount'],
-            'match_status': 'matched' if match_id else 'unmatched',
-            'match_type': match_type,     # 'invoice' | 'expense' | None
-            'match_id': match_id,          # matched record id or None
+            'match_status': 'matched' if match else 'unmatched',
+            'match_type': match.kind if match else None,          # 'invoice' | 'expense' | None
+            'match_id': match.candidate_id if match else None,    # matched record id or None
             'created_at': now,
             'updated_at': now,
         }
@@ -761,6 +756,7 @@ def create_expense_from_txn(txn_id):
             'updated_at': now,
         }
         expenses_container.create_item(body=expense)
+        record_rollup_change('expense', None, expense)
 
         # Mark transaction as matched
         txn['match_status'] = 'matched'
@@ -802,18 +798,18 @@ def run_auto_match():
             enable_cross_partition_query=True
         ))
 
-        matched_count = 0
         now = datetime.utcnow().isoformat() + 'Z'
+        matches = _match_batch(unmatched, user_id, tenant_id)
 
+        newly_matched = []
         for txn in unmatched:
-            match_type, match_id = _auto_match(txn, user_id, tenant_id)
-            if match_id:
-                txn['match_status'] = 'matched'
-                txn['match_type']   = match_type
-                txn['match_id']     = match_id
-                txn['updated_at']   = now
-                bank_txns_container.replace_item(item=txn['id'], body=txn)
-                matched_count += 1
+            match = matches.get(txn.get('id'))
+            if match:
+                txn.update(_match_fields(match))
+                txn['match_score'] = match.score
+                txn['updated_at']  = now
+                newly_matched.append(txn)
+        matched_count = write_matches(bank_txns_container, newly_matched, partition_key=user_id)
 
         _audit_banking(
             "BANK_AUTO_MATCH_RUN",
@@ -852,6 +848,7 @@ def delete_transaction(txn_id):
 
         txn = items[0]
         bank_txns_container.delete_item(item=txn_id, partition_key=user_id)
+        forget_transaction(tenant_id, txn)
         _audit_banking(
             "BANK_TRANSACTION_DELETED",
             "bank_transaction",
@@ -1069,3 +1066,46 @@ def run_ai_match():
         return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# AI AUTO-MATCH JOB  (batched, concurrent, cached — runs in the background)
+# POST /api/reconciliation/ai-match-jobs            → 202 + job document
+# GET  /api/reconciliation/ai-match-jobs/<job_id>   → job status/progress/results
+# Body (optional): { "confidence_threshold": 0.85 }
+# ─────────────────────────────────────────────────────────────────────────────
+@bank_reconciliation_blueprint.route('/reconciliation/ai-match-jobs', methods=['POST'])
+@require_permission('banking', 'edit')
+def create_ai_match_job():
+    user_id, tenant_id, error_response = _require_actor()
+    if error_response:
+        return error_response
+
+    body = request.get_json(silent=True) or {}
+    try:
+        confidence_threshold = float(body.get('confidence_threshold', 0.85))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'confidence_threshold must be a number'}), 400
+    if not 0 <= confidence_threshold <= 1:
+        return jsonify({'error': 'confidence_threshold must be between 0 and 1'}), 400
+
+    try:
+        job = ai_match_job.create_ai_match_job(
+            tenant_id=tenant_id, user_id=user_id, confidence_threshold=confidence_threshold,
+        )
+        return jsonify(job), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bank_reconciliation_blueprint.route('/reconciliation/ai-match-jobs/<job_id>', methods=['GET'])
+@require_permission('banking', 'view')
+def get_ai_match_job(job_id):
+    user_id, tenant_id, error_response = _require_actor()
+    if error_response:
+        return error_response
+
+    job = ai_match_job.get_job(tenant_id=tenant_id, job_id=job_id)
+    if not job or job.get('user_id') != user_id:
+        return jsonify({'error': 'AI match job not found'}), 404
+    return jsonify(job), 200
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from smart_invoice_pro.utils.permission_checker import require_permission
+from smart_invoice_pro.utils.dashboard_rollups import record_rollup_change
 from smart_invoice_pro.utils.cosmos_client import bills_container, stock_container
+from smart_invoice_pro.utils.stock_utils import record_stock_transaction
 from smart_invoice_pro.utils.archive_service import archive_entity, restore_entity
 from smart_invoice_pro.utils.lifecycle_service import apply_lifecycle_action
 from smart_invoice_pro.utils.bulk_archive_contracts import (
@@ -12,6 +14,8 @@ from smart_invoice_pro.utils.bulk_archive_contracts import (
 from smart_invoice_pro.utils.dependency_checker import check_entity_dependencies
 from smart_invoice_pro.utils.domain_events import record_bulk_archive_completed
 from smart_invoice_pro.utils.audit_logger import log_audit, log_audit_event, log_bulk_archive_summary
+from smart_invoice_pro.utils.cursor_pagination import InvalidCursor, cursor_requested, fetch_cursor_page
+from smart_invoice_pro.utils.csv_stream import CsvColumn, stream_query_csv
 import copy
 import uuid
 from flasgger import swag_from
@@ -280,6 +284,7 @@ def create_bill():
 
     try:
         created_item = bills_container.create_item(body=item)
+        record_rollup_change('bill', None, item)
 
         for line_idx, bill_item in enumerate(data.get('items', [])):
             product_id = bill_item.get('product_id')
@@ -295,7 +300,7 @@ def create_bill():
                 'timestamp': now,
                 'tenant_id': request.tenant_id,
             }
-            stock_container.create_item(body=stock_transaction)
+            record_stock_transaction(stock_transaction, container=stock_container)
 
         log_audit(
             "bill", "create", item["id"], None, created_item,
@@ -463,6 +468,23 @@ def get_bills():
         sort_field = sort_map[sort_by]
         order_sql = f" ORDER BY c.{sort_field} {sort_order}"
 
+        if cursor_requested(request.args):
+            try:
+                cursor_page = fetch_cursor_page(
+                    bills_container,
+                    base_query,
+                    parameters,
+                    sort_field=sort_field,
+                    sort_order=sort_order,
+                    tenant_id=request.tenant_id,
+                    endpoint='bills',
+                )
+            except InvalidCursor as exc:
+                return jsonify({"error": str(exc)}), 400
+            return jsonify(cursor_page.as_payload(
+                'data', [_sanitize_bill(_derive_bill_bucket(item)) for item in cursor_page.items],
+            )), 200
+
         if legacy_mode:
             legacy_items = list(bills_container.query_items(
                 query=f"{base_query}{order_sql}",
@@ -528,6 +550,61 @@ def get_bills():
     except Exception as e:
         return jsonify({"error": f"Failed to retrieve bills: {str(e)}"}), 500
 
+_BILL_EXPORT_COLUMNS = [
+    CsvColumn("Bill #", "bill_number"),
+    CsvColumn("Vendor", "vendor_name"),
+    CsvColumn("Bill Date", "bill_date"),
+    CsvColumn("Due Date", "due_date"),
+    CsvColumn("Status", "payment_status"),
+    CsvColumn("Subtotal", "subtotal", 0),
+    CsvColumn("Tax", "tax_amount", 0),
+    CsvColumn("Total", "total_amount", 0),
+    CsvColumn("Amount Paid", "amount_paid", 0),
+    CsvColumn("Balance Due", "balance_due", 0),
+]
+
+
+@bills_blueprint.route('/bills/export', methods=['GET'])
+@require_permission('bills', 'view')
+def export_bills():
+    """Export bills for the current tenant as a streamed CSV file."""
+    lifecycle = (request.args.get('lifecycle') or 'active').strip().lower()
+    vendor_id_filter = (request.args.get('vendor_id') or '').strip()
+    date_range = (request.args.get('range') or request.args.get('date_range') or 'all').strip().lower()
+    date_from = (request.args.get('date_from') or '').strip()
+    date_to = (request.args.get('date_to') or '').strip()
+
+    where = ["c.tenant_id = @tenant_id"]
+    parameters = [{"name": "@tenant_id", "value": request.tenant_id}]
+    if lifecycle == 'archived':
+        where.append("UPPER(c.lifecycle_status) = @archived_status")
+        parameters.append({"name": "@archived_status", "value": "ARCHIVED"})
+    elif lifecycle != 'all':
+        where.append("(NOT IS_DEFINED(c.lifecycle_status) OR UPPER(c.lifecycle_status) != @archived_status)")
+        parameters.append({"name": "@archived_status", "value": "ARCHIVED"})
+    if vendor_id_filter:
+        where.append("c.vendor_id = @vendor_id")
+        parameters.append({"name": "@vendor_id", "value": vendor_id_filter})
+    date_start, date_end = _date_bounds(date_range, date_from, date_to)
+    if date_start:
+        where.append("c.bill_date >= @date_start")
+        parameters.append({"name": "@date_start", "value": date_start.isoformat()})
+    if date_end:
+        where.append("c.bill_date <= @date_end")
+        parameters.append({"name": "@date_end", "value": date_end.isoformat()})
+
+    query = f"SELECT * FROM c WHERE {' AND '.join(where)} ORDER BY c.bill_date DESC"
+    try:
+        return stream_query_csv(
+            bills_container, query, parameters,
+            columns=_BILL_EXPORT_COLUMNS,
+            filename="bills-export.csv",
+            transform=lambda page: [_derive_bill_bucket(item) for item in page],
+        )
+    except Exception as e:
+        return jsonify({"error": f"Failed to export bills: {str(e)}"}), 500
+
+
 @bills_blueprint.route('/bills/<bill_id>', methods=['GET'])
 @require_permission('bills', 'view')
 @swag_from({
@@ -680,6 +757,7 @@ def update_bill(bill_id):
             item=bill['id'],
             body=bill
         )
+        record_rollup_change('bill', before_snapshot, bill)
         log_audit(
             "bill", "update", bill_id, before_snapshot, updated_item,
             user_id=getattr(request, "user_id", None),
@@ -982,6 +1060,7 @@ def record_payment(bill_id):
             item=bill['id'],
             body=bill
         )
+        record_rollup_change('bill', before_snapshot, bill)
         log_audit_event({
             "action": "PAYMENT_RECORDED",
             "entity": "bill",
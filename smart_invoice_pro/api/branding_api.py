@@ -27,6 +27,7 @@ from smart_invoice_pro.utils.demo_guard import forbid_demo_settings_mutation
 from smart_invoice_pro.api.roles_api import require_role
 from smart_invoice_pro.api.organization_profile_api import _get_profile, _safe
 from smart_invoice_pro.utils.audit_logger import log_audit
+from smart_invoice_pro.utils.tenant_settings import invalidate_tenant_settings
 
 branding_blueprint = Blueprint('branding', __name__)
 
@@ -137,6 +138,7 @@ def update_branding():
             existing['type'] = 'organization_profile'
 
         settings_container.upsert_item(existing)
+        invalidate_tenant_settings(request.tenant_id)
         after_snapshot = _extract_branding(existing)
 
         log_audit(
@@ -1,13 +1,9 @@
-import os
 from flask import Blueprint, request, jsonify
 from flasgger import swag_from
-from azure.communication.email import EmailClient
+from smart_invoice_pro.utils.email_service import email_configured, queue_email
 
 contact_blueprint = Blueprint('contact', __name__)
 
-# Replace with your actual connection string or set it as an environment variable
-# export AZURE_EMAIL_CONNECTION_STRING="endpoint=https://<resource>.communication.azure.com/;accesskey=<key>"
-CONNECTION_STRING = os.getenv('AZURE_EMAIL_CONNECTION_STRING') or "endpoint=https://<resource>.communication.azure.com/;accesskey=YOUR_KEY"
 SENDER_ADDRESS = "admin@solidevelectrosoft.com"
 RECIPIENT_ADDRESS = "davinder@solidevelectrosoft.com"
 
@@ -35,7 +31,10 @@ RECIPIENT_ADDRESS = "davinder@solidevelectrosoft.com"
     ],
     'responses': {
         '200': {
-            'description': 'Message sent successfully'
+            'description': 'Message sent successfully (or logged only when email is not configured)'
+        },
+        '202': {
+            'description': 'Message queued for delivery; the body carries its outbox_id'
         },
         '400': {
             'description': 'Invalid input'
@@ -72,11 +71,9 @@ def send_message():
     print(f"---------------------------------------------")
 
     try:
-        if not CONNECTION_STRING or "YOUR_KEY" in CONNECTION_STRING:
-             print("WARNING: Azure Connection String not configured. Email will NOT be sent.")
-             return jsonify({"message": "Message received (Email simulation only - invalid key)!"}), 200
-
-        client = EmailClient.from_connection_string(CONNECTION_STRING)
+        if not email_configured():
+             print("WARNING: Email service not configured. Email will NOT be sent.")
+             return jsonify({"message": "Message received (Email simulation only - email not configured)!"}), 200
 
         email_message = {
             "senderAddress": SENDER_ADDRESS,
@@ -102,11 +99,17 @@ def send_message():
             }
         }
 
-        poller = client.begin_send(email_message)
-        result = poller.result()
-        print(f"Email sent successfully. Message ID: {result['id']}")
-        
-        return jsonify({"message": "Message sent successfully!"}), 200
+        sent = queue_email(None, email_message)
+        if sent['status'] == 'failed':
+            raise RuntimeError(sent['error'])
+        print(f"Email {sent['status']}. Outbox ID: {sent['id']}")
+
+        queued = sent['status'] == 'queued'
+        return jsonify({
+            "message": "Message queued for delivery!" if queued else "Message sent successfully!",
+            "outbox_id": sent['id'],
+            "email_status": sent['status'],
+        }), 202 if queued else 200
 
     except Exception as e:
         print(f"Error sending email: {str(e)}")
@@ -1,30 +1,29 @@
-from flask import Blueprint, jsonify
-from smart_invoice_pro.utils.cosmos_client import get_container, recurring_profiles_container, invoices_container
+from flask import Blueprint, jsonify, request
+from smart_invoice_pro.utils.cosmos_client import get_container
 from smart_invoice_pro.utils.notifications import create_notification
-from smart_invoice_pro.utils.audit_logger import log_audit
-from datetime import datetime, date
+from smart_invoice_pro.utils.dashboard_rollups import rebuild_all_rollups, rebuild_tenant_rollups
+from smart_invoice_pro.utils.stock_balances import rebuild_all_balances, rebuild_tenant_balances, reconcile_product
+from smart_invoice_pro.utils.webhook_dispatcher import drain_webhook_outbox
+from smart_invoice_pro.utils.reminder_schedule import rebuild_all_schedules, rebuild_tenant_schedule
+from smart_invoice_pro.services.recurring_engine import run_recurring_generation
+from datetime import datetime
 from flasgger import swag_from
-from azure.communication.email import EmailClient
+from smart_invoice_pro.utils.email_service import email_configured, queue_email
 import os
-import uuid
-import secrets
 
 cron_blueprint = Blueprint('cron', __name__)
 
-# Azure Communication Services configuration
-CONNECTION_STRING = os.getenv('AZURE_EMAIL_CONNECTION_STRING')
+# Alert email configuration (transport: utils/email_service.py)
 SENDER_ADDRESS = os.getenv('SENDER_EMAIL', "admin@solidevelectrosoft.com")
 ALERT_EMAIL = os.getenv('ALERT_EMAIL', "davinder@solidevelectrosoft.com")
 
 def send_low_stock_email(low_stock_products):
-    """Send email alert for low stock products using Azure Communication Services"""
+    """Queue an email alert for low stock products on the email outbox"""
     try:
-        if not CONNECTION_STRING:
-            print("WARNING: AZURE_EMAIL_CONNECTION_STRING not configured. Email will NOT be sent.")
+        if not email_configured():
+            print("WARNING: Email transport not configured. Email will NOT be sent.")
             return False
         
-        client = EmailClient.from_connection_string(CONNECTION_STRING)
-        
         # Create email content
         subject = f'Low Stock Alert - {len(low_stock_products)} Products Need Restocking'
         
@@ -85,7 +84,7 @@ def send_low_stock_email(low_stock_products):
         </html>
         """
         
-        # Send email using Azure Communication Services
+        # Queue the email on the shared outbox
         email_message = {
             "senderAddress": SENDER_ADDRESS,
             "recipients": {
@@ -97,14 +96,16 @@ def send_low_stock_email(low_stock_products):
             }
         }
         
-        poller = client.begin_send(email_message)
-        result = poller.result()
+        sent = queue_email(None, email_message)
+        if sent['status'] == 'failed':
+            print(f"Low stock alert email rejected: {sent['error']}")
+            return False
         
-        print(f"Low stock alert email sent successfully. Message ID: {result['id']}")
+        print(f"Low stock alert email {sent['status']}. Outbox ID: {sent['id']}")
         return True
         
     except Exception as e:
-        print(f"Error sending email via Azure Communication Services: {str(e)}")
+        print(f"Error sending low stock alert email: {str(e)}")
         return False
 
 @cron_blueprint.route('/cron/check-low-stock', methods=['GET', 'POST'])
@@ -224,154 +225,144 @@ def generate_recurring_invoices():
     """
     Cron job endpoint: generate invoices from all Active recurring profiles whose
     next_run_date is today or in the past.  Call this daily from a scheduler.
-    """
-    from smart_invoice_pro.api.recurring_profiles_api import calculate_next_run_date
-    from smart_invoice_pro.api.invoice_preferences_api import generate_invoice_number
 
-    today_str = date.today().isoformat()
-    now       = datetime.utcnow().isoformat()
+    Runs services.recurring_engine: tenants in parallel, invoice numbers reserved
+    in batches, per-tenant checkpoints. Calling it again for the same day resumes
+    each tenant with the profiles that are still due. Pass ?tenant_id=<id>
+    to run a single tenant.
+    """
+    tenant_id = (request.args.get('tenant_id') or '').strip() or None
+    now = datetime.utcnow().isoformat()
 
     try:
-        query = (
-            "SELECT * FROM c "
-            "WHERE c.status = 'Active' "
-            "AND c.next_run_date <= @today"
-        )
-        params = [{'name': '@today', 'value': today_str}]
-        due_profiles = list(recurring_profiles_container.query_items(
-            query=query,
-            parameters=params,
-            enable_cross_partition_query=True,
-        ))
+        summary = run_recurring_generation(tenant_id=tenant_id)
     except Exception as e:
         return jsonify({'error': f'Failed to query recurring profiles: {str(e)}'}), 500
 
-    generated = []
-    errors     = []
-
-    for profile in due_profiles:
-        tenant_id  = profile.get('tenant_id')
-        profile_id = profile.get('id')
-
-        try:
-            recurrence_rule      = profile.get('recurrence_rule') or {}
-            frequency            = profile.get('frequency', 'Monthly')
-            occurrence_limit     = profile.get('occurrence_limit')
-            occurrences_created  = int(profile.get('occurrences_created', 0))
-            ends_type            = profile.get('ends_type', 'never')
-            end_date_str         = profile.get('end_date')
+    return jsonify({
+        'message':         'Recurring invoice generation completed',
+        'run_id':          summary['run_id'],
+        'tenant_count':    summary['tenant_count'],
+        'resumed_tenants': summary['resumed_tenants'],
+        'generated_count': len(summary['generated']),
+        'error_count':     len(summary['errors']),
+        'generated':       summary['generated'],
+        'errors':          summary['errors'],
+        'timestamp':       now,
+    }), 200
 
-            # Skip if profile has reached occurrence limit
-            if ends_type == 'after_occurrences' and occurrence_limit is not None:
-                if occurrences_created >= int(occurrence_limit):
-                    profile['status']     = 'Completed'
-                    profile['updated_at'] = now
-                    recurring_profiles_container.replace_item(item=profile_id, body=profile)
-                    continue
 
-            # Skip if profile's end date has passed
-            if ends_type == 'on_date' and end_date_str and today_str > end_date_str:
-                profile['status']     = 'Completed'
-                profile['updated_at'] = now
-                recurring_profiles_container.replace_item(item=profile_id, body=profile)
-                continue
+@cron_blueprint.route('/cron/rebuild-dashboard-rollups', methods=['POST'])
+def rebuild_dashboard_rollups():
+    """
+    Cron job endpoint: recompute dashboard_rollups from source documents.
+    Pass ?tenant_id=<id> to rebuild a single tenant; otherwise every tenant
+    is rebuilt. Run once after deploy and periodically (e.g. nightly) to
+    repair any drift from best-effort incremental updates.
+    """
+    tenant_id = (request.args.get('tenant_id') or '').strip()
+    try:
+        if tenant_id:
+            results = [rebuild_tenant_rollups(tenant_id)]
+        else:
+            results = rebuild_all_rollups()
+    except Exception as e:
+        return jsonify({
+            'error': f'Error rebuilding dashboard rollups: {str(e)}',
+            'timestamp': datetime.utcnow().isoformat(),
+        }), 500
 
-            # Build invoice document from the profile template
-            items        = profile.get('items', [])
-            subtotal     = sum(
-                float(i.get('quantity', 0)) * float(i.get('unit_price', i.get('price', 0)))
-                for i in items
-            )
-            cgst_amount  = float(profile.get('cgst_amount', 0.0))
-            sgst_amount  = float(profile.get('sgst_amount', 0.0))
-            igst_amount  = float(profile.get('igst_amount', 0.0))
-            total_tax    = cgst_amount + sgst_amount + igst_amount
-            total_amount = round(subtotal + total_tax, 2)
+    return jsonify({
+        'message':      'Dashboard rollup rebuild completed',
+        'tenant_count': len(results),
+        'results':      results,
+        'timestamp':    datetime.utcnow().isoformat(),
+    }), 200
 
-            invoice_number = generate_invoice_number(tenant_id)
-            invoice_status = 'Issued' if profile.get('auto_send') else 'Draft'
 
-            invoice = {
-                'id':                  str(uuid.uuid4()),
-                'invoice_number':      invoice_number,
-                'customer_id':         profile.get('customer_id'),
-                'customer_name':       profile.get('customer_name', ''),
-                'issue_date':          today_str,
-                'due_date':            today_str,
-                'payment_terms':       profile.get('payment_terms', ''),
-                'subtotal':            round(subtotal, 2),
-                'cgst_amount':         cgst_amount,
-                'sgst_amount':         sgst_amount,
-                'igst_amount':         igst_amount,
-                'total_tax':           total_tax,
-                'total_amount':        total_amount,
-                'amount_paid':         0.0,
-                'balance_due':         total_amount,
-                'invoice_discount':    0.0,
-                'round_off':           0.0,
-                'status':              invoice_status,
-                'lifecycle_status':    'ACTIVE',
-                'payment_mode':        '',
-                'notes':               profile.get('notes', ''),
-                'terms_conditions':    profile.get('terms_conditions', ''),
-                'is_gst_applicable':   bool(profile.get('is_gst_applicable', False)),
-                'gst_treatment':       'regular',
-                'invoice_type':        'recurring',
-                'recurring_profile_id': profile_id,
-                'items':               items,
-                'tenant_id':           tenant_id,
-                'portal_token':        secrets.token_urlsafe(32),
-                'created_at':          now,
-                'updated_at':          now,
-            }
+@cron_blueprint.route('/cron/rebuild-reminder-schedule', methods=['POST'])
+def rebuild_reminder_schedule():
+    """
+    Cron job endpoint: re-plan the reminder_due schedule from open invoices.
+    Pass ?tenant_id=<id> to rebuild a single tenant; otherwise every tenant
+    is rebuilt. Run once after deploy so invoices issued before the schedule
+    existed get their reminders.
+    """
+    tenant_id = (request.args.get('tenant_id') or '').strip()
+    try:
+        if tenant_id:
+            results = [rebuild_tenant_schedule(tenant_id)]
+        else:
+            results = rebuild_all_schedules()
+    except Exception as e:
+        return jsonify({
+            'error': f'Error rebuilding reminder schedule: {str(e)}',
+            'timestamp': datetime.utcnow().isoformat(),
+        }), 500
 
-            invoices_container.create_item(body=invoice)
+    return jsonify({
+        'message':      'Reminder schedule rebuild completed',
+        'tenant_count': len(results),
+        'results':      results,
+        'timestamp':    datetime.utcnow().isoformat(),
+    }), 200
 
-            log_audit(
-                'invoice', 'create', invoice['id'], None, invoice,
-                user_id='cron', tenant_id=tenant_id,
-            )
-            create_notification(
-                tenant_id=tenant_id,
-                notification_type='recurring_invoice_generated',
-                title='Recurring Invoice Generated',
-                message=(
-                    f"Invoice {invoice_number} for {profile.get('customer_name', '')} "
-                    f"(₹{total_amount:,.2f}) was auto-generated from recurring profile "
-                    f"'{profile.get('profile_name', profile_id)}'."
-                ),
-                entity_id=invoice['id'],
-                entity_type='invoice',
-                user_id='cron',
-            )
 
-            # Advance the profile: update last_run_date, next_run_date, occurrences_created
-            new_next_run = calculate_next_run_date(today_str, frequency, recurrence_rule)
-            new_occurrences = occurrences_created + 1
-            profile['last_run_date']        = today_str
-            profile['next_run_date']        = new_next_run
-            profile['occurrences_created']  = new_occurrences
-            profile['updated_at']           = now
+@cron_blueprint.route('/cron/rebuild-stock-balances', methods=['POST'])
+def rebuild_stock_balances():
+    """
+    Cron job endpoint: recompute materialized stock balances from the ledger.
+    ?tenant_id=<id> rebuilds one tenant; adding &product_id=<id> reconciles a
+    single product against its last checkpoint and repairs it on drift.
+    Without parameters every tenant is rebuilt.
+    """
+    tenant_id = (request.args.get('tenant_id') or '').strip()
+    product_id = (request.args.get('product_id') or '').strip()
+    if product_id and not tenant_id:
+        return jsonify({'error': 'tenant_id is required with product_id'}), 400
+    try:
+        if product_id:
+            results = [reconcile_product(tenant_id, product_id)]
+        elif tenant_id:
+            results = [rebuild_tenant_balances(tenant_id)]
+        else:
+            results = rebuild_all_balances()
+    except Exception as e:
+        return jsonify({
+            'error': f'Error rebuilding stock balances: {str(e)}',
+            'timestamp': datetime.utcnow().isoformat(),
+        }), 500
 
-            # Mark Completed if this was the final occurrence
-            if ends_type == 'after_occurrences' and occurrence_limit is not None:
-                if new_occurrences >= int(occurrence_limit):
-                    profile['status'] = 'Completed'
+    return jsonify({
+        'message':   'Stock balance rebuild completed',
+        'results':   results,
+        'timestamp': datetime.utcnow().isoformat(),
+    }), 200
 
-            recurring_profiles_container.replace_item(item=profile_id, body=profile)
-            generated.append({'profile_id': profile_id, 'invoice_id': invoice['id'],
-                               'invoice_number': invoice_number})
 
-        except Exception as e:
-            errors.append({'profile_id': profile_id, 'error': str(e)})
+@cron_blueprint.route('/cron/drain-webhook-outbox', methods=['POST'])
+def drain_webhook_outbox_job():
+    """
+    Cron job endpoint: deliver due webhook outbox rows inline. Safety net for
+    deployments running with WEBHOOK_WORKERS=0 or after long outages; ?limit=
+    caps the rows handled per call (default 100).
+    """
+    try:
+        limit = max(1, min(int(request.args.get('limit', 100)), 1000))
+    except ValueError:
+        limit = 100
+    try:
+        results = drain_webhook_outbox(limit)
+    except Exception as e:
+        return jsonify({
+            'error': f'Error draining webhook outbox: {str(e)}',
+            'timestamp': datetime.utcnow().isoformat(),
+        }), 500
 
     return jsonify({
-        'message':        'Recurring invoice generation completed',
-        'generated_count': len(generated),
-        'error_count':     len(errors),
-        'generated':       generated,
-        'errors':          errors,
-        'timestamp':       now,
+        'message':   'Webhook outbox drained',
+        'results':   results,
+        'timestamp': datetime.utcnow().isoformat(),
     }), 200
 
 
@@ -435,5 +426,47 @@ def get_schedule_info():
                     'External cron service (e.g., cron-job.org)'
                 ]
             },
+            {
+                'name': 'Rebuild Dashboard Rollups',
+                'endpoint': '/api/cron/rebuild-dashboard-rollups',
+                'method': 'POST',
+                'recommended_frequency': 'Daily at 2:00 AM (and once after deploy)',
+                'description': (
+                    'Recomputes the per-tenant, per-day dashboard aggregates from invoices, '
+                    'bills, expenses, customers and products. Optional ?tenant_id= limits the '
+                    'rebuild to one tenant.'
+                ),
+            },
+            {
+                'name': 'Rebuild Reminder Schedule',
+                'endpoint': '/api/cron/rebuild-reminder-schedule',
+                'method': 'POST',
+                'recommended_frequency': 'Once after deploy (and after bulk invoice imports)',
+                'description': (
+                    'Re-plans the reminder_due schedule the daily payment reminder job reads '
+                    'from every open invoice. Optional ?tenant_id= limits the rebuild to one tenant.'
+                ),
+            },
+            {
+                'name': 'Rebuild Stock Balances',
+                'endpoint': '/api/cron/rebuild-stock-balances',
+                'method': 'POST',
+                'recommended_frequency': 'Weekly (and once after deploy)',
+                'description': (
+                    'Recomputes per-product on-hand balances from the stock ledger. Optional '
+                    '?tenant_id= limits the rebuild to one tenant; ?tenant_id=&product_id= '
+                    'reconciles a single product.'
+                ),
+            },
+            {
+                'name': 'Drain Webhook Outbox',
+                'endpoint': '/api/cron/drain-webhook-outbox',
+                'method': 'POST',
+                'recommended_frequency': 'Every 5 minutes',
+                'description': (
+                    'Delivers due webhook retries from the durable outbox. Only required when '
+                    'WEBHOOK_WORKERS=0; otherwise each worker process polls the outbox itself.'
+                ),
+            },
         ]
     })
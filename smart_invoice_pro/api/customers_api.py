@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
 from smart_invoice_pro.utils.permission_checker import require_permission
+from smart_invoice_pro.utils.dashboard_rollups import record_rollup_change
 from smart_invoice_pro.utils.demo_guard import enforce_demo_create_limit
 from smart_invoice_pro.utils.cosmos_client import customers_container
 from smart_invoice_pro.utils.cosmos_client import invoices_container
@@ -19,6 +20,8 @@ from smart_invoice_pro.utils.bulk_archive_contracts import (
 )
 from smart_invoice_pro.utils.domain_events import record_bulk_archive_completed
 from smart_invoice_pro.utils.audit_logger import log_bulk_archive_summary
+from smart_invoice_pro.utils.cursor_pagination import InvalidCursor, cursor_requested, fetch_cursor_page
+from smart_invoice_pro.utils.csv_stream import CsvColumn, stream_query_csv
 from smart_invoice_pro.utils.validation_utils import (
     make_error_response, collect_errors,
     validate_required, validate_email as _validate_email,
@@ -362,6 +365,7 @@ def create_customer():
     item['shipping_address'] = item['shipping_street']  # alias
     
     customers_container.create_item(body=item)
+    record_rollup_change('customer', None, item)
     # Remove password from response for security
     response_item = sanitize_item(item)
     dispatch_webhook_event(
@@ -383,6 +387,50 @@ def create_customer():
               user_id=getattr(request, 'user_id', None), tenant_id=request.tenant_id)
     return jsonify(response_item), 201
 
+
+def _attach_invoice_balances(tenant_id, items, customer_ids=None):
+    """
+    Enrich each customer with per-customer outstanding_amount and overdue_amount.
+    ``customer_ids`` limits the invoice read to one page of customers.
+    """
+    _OPEN_STATUSES = {'issued', 'partially paid', 'overdue', 'sent'}
+    today_str = datetime.utcnow().strftime('%Y-%m-%d')
+    try:
+        open_inv_query = (
+            "SELECT c.customer_id, c.balance_due, c.status, c.due_date "
+            "FROM c WHERE c.tenant_id = @tid"
+        )
+        parameters = [{"name": "@tid", "value": tenant_id}]
+        if customer_ids is not None:
+            open_inv_query += " AND ARRAY_CONTAINS(@customer_ids, c.customer_id)"
+            parameters.append({"name": "@customer_ids", "value": list(customer_ids)})
+        open_invoices = list(invoices_container.query_items(
+            query=open_inv_query,
+            parameters=parameters,
+            enable_cross_partition_query=True
+        ))
+        outstanding_map = {}
+        overdue_map = {}
+        for inv in open_invoices:
+            status = str(inv.get('status') or '').lower()
+            if status not in _OPEN_STATUSES:
+                continue
+            cid = inv.get('customer_id')
+            if not cid:
+                continue
+            bal = float(inv.get('balance_due') or 0)
+            outstanding_map[cid] = outstanding_map.get(cid, 0.0) + bal
+            due_date_str = str(inv.get('due_date') or '')
+            if status == 'overdue' or (due_date_str and due_date_str[:10] < today_str):
+                overdue_map[cid] = overdue_map.get(cid, 0.0) + bal
+        for item in items:
+            cid = item.get('id')
+            item['outstanding_amount'] = round(outstanding_map.get(cid, 0.0), 2)
+            item['overdue_amount'] = round(overdue_map.get(cid, 0.0), 2)
+    except Exception:
+        pass  # non-critical enrichment; continue without it
+
+
 @customers_blueprint.route('/customers', methods=['GET'])
 @require_permission('customers', 'view')
 @swag_from({
@@ -431,6 +479,27 @@ def list_customers():
     if sort_order not in ('ASC', 'DESC'):
         sort_order = 'ASC'
 
+    if cursor_requested(request.args):
+        # Cursor pages must be filtered server-side; this mirrors _is_archived.
+        if lifecycle == 'archived':
+            query += " AND c.status = @archived_status"
+        elif lifecycle != 'all':
+            query += " AND (NOT IS_DEFINED(c.status) OR c.status != @archived_status)"
+        if lifecycle != 'all':
+            parameters.append({"name": "@archived_status", "value": "ARCHIVED"})
+        try:
+            page = fetch_cursor_page(
+                customers_container, query, parameters,
+                sort_field=sort_by, sort_order=sort_order,
+                tenant_id=request.tenant_id, endpoint='customers',
+            )
+        except InvalidCursor as exc:
+            return jsonify({"error": str(exc)}), 400
+        _attach_invoice_balances(
+            request.tenant_id, page.items, [item.get('id') for item in page.items],
+        )
+        return jsonify(page.as_payload('data', sanitize_items(page.items)))
+
     query += f" ORDER BY c.{sort_by} {sort_order}"
 
     items = list(customers_container.query_items(
@@ -446,39 +515,7 @@ def list_customers():
     else:
         items = [item for item in items if not _is_archived(item)]
 
-    # Enrich each customer with per-customer outstanding_amount and overdue_amount
-    _OPEN_STATUSES = {'issued', 'partially paid', 'overdue', 'sent'}
-    today_str = datetime.utcnow().strftime('%Y-%m-%d')
-    try:
-        open_inv_query = (
-            "SELECT c.customer_id, c.balance_due, c.status, c.due_date "
-            "FROM c WHERE c.tenant_id = @tid"
-        )
-        open_invoices = list(invoices_container.query_items(
-            query=open_inv_query,
-            parameters=[{"name": "@tid", "value": request.tenant_id}],
-            enable_cross_partition_query=True
-        ))
-        outstanding_map = {}
-        overdue_map = {}
-        for inv in open_invoices:
-            status = str(inv.get('status') or '').lower()
-            if status not in _OPEN_STATUSES:
-                continue
-            cid = inv.get('customer_id')
-            if not cid:
-                continue
-            bal = float(inv.get('balance_due') or 0)
-            outstanding_map[cid] = outstanding_map.get(cid, 0.0) + bal
-            due_date_str = str(inv.get('due_date') or '')
-            if status == 'overdue' or (due_date_str and due_date_str[:10] < today_str):
-                overdue_map[cid] = overdue_map.get(cid, 0.0) + bal
-        for item in items:
-            cid = item.get('id')
-            item['outstanding_amount'] = round(outstanding_map.get(cid, 0.0), 2)
-            item['overdue_amount'] = round(overdue_map.get(cid, 0.0), 2)
-    except Exception:
-        pass  # non-critical enrichment; continue without it
+    _attach_invoice_balances(request.tenant_id, items)
 
     if not include_meta:
         return jsonify(sanitize_items(items))
@@ -492,6 +529,46 @@ def list_customers():
         'summary': summary,
     })
 
+_CUSTOMER_EXPORT_COLUMNS = [
+    CsvColumn("Display Name", "display_name"),
+    CsvColumn("Company", "company_name"),
+    CsvColumn("Email", "email"),
+    CsvColumn("Phone", "phone"),
+    CsvColumn("Customer Type", "customer_type"),
+    CsvColumn("GST Number", "gst_number"),
+    CsvColumn("Place of Supply", "place_of_supply"),
+    CsvColumn("Currency", "currency", "INR"),
+    CsvColumn("Payment Terms", "payment_terms"),
+    CsvColumn("Status", "status"),
+    CsvColumn("Created At", "created_at"),
+]
+
+
+@customers_blueprint.route('/customers/export', methods=['GET'])
+@require_permission('customers', 'view')
+def export_customers():
+    """Export customers for the current tenant as a streamed CSV file."""
+    lifecycle = str(request.args.get('lifecycle', 'active')).strip().lower()
+    query = "SELECT * FROM c WHERE c.tenant_id = @tenant_id"
+    parameters = [{"name": "@tenant_id", "value": request.tenant_id}]
+    # Mirrors _is_archived.
+    if lifecycle == 'archived':
+        query += " AND c.status = @archived_status"
+    elif lifecycle != 'all':
+        query += " AND (NOT IS_DEFINED(c.status) OR c.status != @archived_status)"
+    if lifecycle != 'all':
+        parameters.append({"name": "@archived_status", "value": "ARCHIVED"})
+    query += " ORDER BY c.display_name ASC"
+    try:
+        return stream_query_csv(
+            customers_container, query, parameters,
+            columns=_CUSTOMER_EXPORT_COLUMNS,
+            filename="customers-export.csv",
+        )
+    except Exception as e:
+        return jsonify({"error": f"Failed to export customers: {str(e)}"}), 500
+
+
 @customers_blueprint.route('/customers/<customer_id>', methods=['GET'])
 @require_permission('customers', 'view')
 @swag_from({
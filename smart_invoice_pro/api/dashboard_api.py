@@ -10,12 +10,14 @@ from smart_invoice_pro.utils.cosmos_client import (
     stock_container,
 )
 
+from smart_invoice_pro.utils.dashboard_rollups import count_overdue, load_rollups, sum_days
 from smart_invoice_pro.utils.permission_checker import require_permission
+from smart_invoice_pro.utils.shared_cache import cached_json_response, get_cache
 
 dashboard_blueprint = Blueprint('dashboard', __name__)
 
-_SUMMARY_CACHE = {}
 _SUMMARY_CACHE_TTL_SECONDS = 180
+_summary_cache = get_cache('dashboard_summary', _SUMMARY_CACHE_TTL_SECONDS)
 
 OPEN_INVOICE_STATUSES = {'issued', 'partially paid', 'overdue', 'sent'}
 OPEN_BILL_STATUSES = {'unpaid', 'partially paid', 'overdue'}
@@ -134,24 +136,15 @@ def _invoice_payments_in_period(invoices, start_date, end_date):
     return total
 
 
-def _summary_cache_key(tenant_id, range_type, args):
+def _summary_cache_key(range_type, args, today):
     return (
-        tenant_id or 'public',
         range_type,
         args.get('start_date') or '',
         args.get('end_date') or '',
+        today.isoformat(),
     )
 
 
-def _summary_cache_get(key):
-    cached = _SUMMARY_CACHE.get(key)
-    if not cached:
-        return None
-    if cached['expires_at'] < datetime.utcnow().timestamp():
-        _SUMMARY_CACHE.pop(key, None)
-        return None
-
-
 # ── Revenue chart helpers ─────────────────────────────────────────────────────
 
 def _chart_granularity(start_date, end_date):
@@ -210,15 +203,184 @@ def _revenue_by_chart_buckets(invoices, buckets):
                 totals[key] += amount
                 break
     return totals
-    return cached['payload']
 
 
-def _summary_cache_set(key, payload):
-    _SUMMARY_CACHE[key] = {
-        'payload': payload,
-        'expires_at': datetime.utcnow().timestamp() + _SUMMARY_CACHE_TTL_SECONDS,
+def _summary_values_from_scan(tenant_id, start_date, end_date, previous_start, previous_end, today):
+    """Compute summary figures by scanning the tenant's source documents."""
+    all_customers = _tenant_docs(customers_container, tenant_id)
+    all_products = _tenant_docs(products_container, tenant_id)
+    all_invoices = _tenant_docs(invoices_container, tenant_id)
+    all_bills = _tenant_docs(bills_container, tenant_id)
+    all_expenses = _tenant_docs(expenses_container, tenant_id)
+
+    current_customers = _filter_docs_by_period(all_customers, ['created_at', 'customer_since'], start_date, end_date)
+    previous_customers = _filter_docs_by_period(all_customers, ['created_at', 'customer_since'], previous_start, previous_end)
+
+    current_invoices = _filter_docs_by_period(all_invoices, ['created_at', 'issue_date'], start_date, end_date)
+    previous_invoices = _filter_docs_by_period(all_invoices, ['created_at', 'issue_date'], previous_start, previous_end)
+
+    current_bills = _filter_docs_by_period(all_bills, ['created_at', 'bill_date', 'issue_date'], start_date, end_date)
+    previous_bills = _filter_docs_by_period(all_bills, ['created_at', 'bill_date', 'issue_date'], previous_start, previous_end)
+
+    current_expenses = _filter_docs_by_period(all_expenses, ['created_at', 'expense_date', 'date'], start_date, end_date)
+    previous_expenses = _filter_docs_by_period(all_expenses, ['created_at', 'expense_date', 'date'], previous_start, previous_end)
+
+    revenue_current = sum(_safe_float(inv.get('total_amount')) for inv in current_invoices)
+    revenue_previous = sum(_safe_float(inv.get('total_amount')) for inv in previous_invoices)
+
+    payments_current = _invoice_payments_in_period(all_invoices, start_date, end_date)
+    payments_previous = _invoice_payments_in_period(all_invoices, previous_start, previous_end)
+
+    receivables_current = sum(
+        _safe_float(inv.get('balance_due', inv.get('total_amount')))
+        for inv in current_invoices
+        if str(inv.get('status', '')).lower() in OPEN_INVOICE_STATUSES
+    )
+    receivables_previous = sum(
+        _safe_float(inv.get('balance_due', inv.get('total_amount')))
+        for inv in previous_invoices
+        if str(inv.get('status', '')).lower() in OPEN_INVOICE_STATUSES
+    )
+
+    bill_payables_current = sum(
+        _safe_float(bill.get('balance_due', bill.get('total_amount')))
+        for bill in current_bills
+        if str(bill.get('payment_status', '')).lower() in OPEN_BILL_STATUSES
+    )
+    bill_payables_previous = sum(
+        _safe_float(bill.get('balance_due', bill.get('total_amount')))
+        for bill in previous_bills
+        if str(bill.get('payment_status', '')).lower() in OPEN_BILL_STATUSES
+    )
+    expense_total_current = sum(_safe_float(exp.get('amount', exp.get('total_amount'))) for exp in current_expenses)
+    expense_total_previous = sum(_safe_float(exp.get('amount', exp.get('total_amount'))) for exp in previous_expenses)
+
+    payables_current = bill_payables_current + expense_total_current
+    payables_previous = bill_payables_previous + expense_total_previous
+
+    overdue_count = 0
+    for inv in all_invoices:
+        if str(inv.get('status', '')).lower() not in OPEN_INVOICE_STATUSES:
+            continue
+        due_date = _parse_iso_date(inv.get('due_date'))
+        if due_date and due_date < today:
+            overdue_count += 1
+
+    return {
+        'customers_added': (len(current_customers), len(previous_customers)),
+        'invoices_created': (len(current_invoices), len(previous_invoices)),
+        'revenue': (revenue_current, revenue_previous),
+        'payments_received': (payments_current, payments_previous),
+        'receivables': (receivables_current, receivables_previous),
+        'payables': (payables_current, payables_previous),
+        'overdue_count': overdue_count,
+        'total_customers': len(all_customers),
+        'total_products': len(all_products),
+    }
+
+
+def _summary_values_from_rollups(rollups, start_date, end_date, previous_start, previous_end, today):
+    """Compute summary figures from the tenant's dashboard_rollups documents."""
+    current = sum_days(rollups['days'], start_date, end_date)
+    previous = sum_days(rollups['days'], previous_start, previous_end)
+    totals = rollups['totals']
+
+    def _pair(field, cast=float):
+        return cast(round(current[field], 2)), cast(round(previous[field], 2))
+
+    return {
+        'customers_added': _pair('customers_added', int),
+        'invoices_created': _pair('invoices_created', int),
+        'revenue': _pair('revenue'),
+        'payments_received': _pair('payments_received'),
+        'receivables': _pair('receivables'),
+        'payables': (
+            round(current['bill_payables'] + current['expenses_total'], 2),
+            round(previous['bill_payables'] + previous['expenses_total'], 2),
+        ),
+        'overdue_count': count_overdue(totals, today),
+        'total_customers': int(totals.get('total_customers') or 0),
+        'total_products': int(totals.get('total_products') or 0),
+    }
+
+
+def _build_summary_payload(tenant_id, range_type, start_date, end_date, today):
+    """Compute the /dashboard/summary payload for a resolved period."""
+    previous_start, previous_end = _previous_period(start_date, end_date)
+
+    rollups = load_rollups(tenant_id, previous_start, end_date)
+    if rollups is not None:
+        values = _summary_values_from_rollups(
+            rollups, start_date, end_date, previous_start, previous_end, today,
+        )
+    else:
+        values = _summary_values_from_scan(
+            tenant_id, start_date, end_date, previous_start, previous_end, today,
+        )
+
+    customers_added_current, customers_added_previous = values['customers_added']
+    invoices_created_current, invoices_created_previous = values['invoices_created']
+    revenue_current, revenue_previous = values['revenue']
+    payments_current, payments_previous = values['payments_received']
+    receivables_current, receivables_previous = values['receivables']
+    payables_current, payables_previous = values['payables']
+    overdue_count = values['overdue_count']
+    total_customers = values['total_customers']
+    total_products = values['total_products']
+
+    metrics = {
+        'customers_added': _metric_payload(customers_added_current, customers_added_previous),
+        'invoices_created': _metric_payload(invoices_created_current, invoices_created_previous),
+        'revenue': _metric_payload(revenue_current, revenue_previous),
+        'payments_received': _metric_payload(payments_current, payments_previous),
+        'receivables': _metric_payload(receivables_current, receivables_previous),
+        'payables': _metric_payload(payables_current, payables_previous),
+        'overdue_invoices_current': {
+            'value': overdue_count,
+            'is_time_based': False,
+        },
+        'total_customers': {
+            'value': total_customers,
+            'is_time_based': False,
+        },
+        'total_products': {
+            'value': total_products,
+            'is_time_based': False,
+        },
+    }
+
+    return {
+        'range': range_type,
+        'period': {
+            'current': {
+                'start_date': start_date.isoformat(),
+                'end_date': end_date.isoformat(),
+                'label': _period_label(range_type, start_date, end_date),
+            },
+            'previous': {
+                'start_date': previous_start.isoformat(),
+                'end_date': previous_end.isoformat(),
+                'label': f"Previous {_period_label(range_type, start_date, end_date)}",
+            },
+        },
+        'metrics': metrics,
+        # Backward-compatible aliases consumed by older clients.
+        'customers_added': metrics['customers_added']['value'],
+        'invoices_created': metrics['invoices_created']['value'],
+        'revenue': metrics['revenue']['value'],
+        'payments_received': metrics['payments_received']['value'],
+        'receivables': metrics['receivables']['value'],
+        'payables': metrics['payables']['value'],
+        'overdue_count': overdue_count,
+        'total_customers': total_customers,
+        'total_products': total_products,
+        'total_invoices': invoices_created_current,
+        'total_revenue': revenue_current,
+        'total_receivables': receivables_current,
+        'total_payables': payables_current,
     }
 
+
 @dashboard_blueprint.route('/dashboard/summary', methods=['GET'])
 @require_permission('reports', 'view')
 @swag_from({
@@ -247,142 +409,26 @@ def dashboard_summary():
         today = datetime.utcnow().date()
         tenant_id = getattr(request, 'tenant_id', None)
         use_cache = not bool(current_app.config.get('TESTING'))
-        cache_key = _summary_cache_key(tenant_id, range_type, request.args)
-        if use_cache:
-            cached_payload = _summary_cache_get(cache_key)
-            if cached_payload:
-                return jsonify(cached_payload)
 
         start_date, end_date, error = _resolve_period_from_request(range_type, request.args, today)
         if error:
             return jsonify({'error': error}), 400
 
-        previous_start, previous_end = _previous_period(start_date, end_date)
-
-        all_customers = _tenant_docs(customers_container, tenant_id)
-        all_products = _tenant_docs(products_container, tenant_id)
-        all_invoices = _tenant_docs(invoices_container, tenant_id)
-        all_bills = _tenant_docs(bills_container, tenant_id)
-        all_expenses = _tenant_docs(expenses_container, tenant_id)
-
-        current_customers = _filter_docs_by_period(all_customers, ['created_at', 'customer_since'], start_date, end_date)
-        previous_customers = _filter_docs_by_period(all_customers, ['created_at', 'customer_since'], previous_start, previous_end)
-
-        current_invoices = _filter_docs_by_period(all_invoices, ['created_at', 'issue_date'], start_date, end_date)
-        previous_invoices = _filter_docs_by_period(all_invoices, ['created_at', 'issue_date'], previous_start, previous_end)
-
-        current_bills = _filter_docs_by_period(all_bills, ['created_at', 'bill_date', 'issue_date'], start_date, end_date)
-        previous_bills = _filter_docs_by_period(all_bills, ['created_at', 'bill_date', 'issue_date'], previous_start, previous_end)
-
-        current_expenses = _filter_docs_by_period(all_expenses, ['created_at', 'expense_date', 'date'], start_date, end_date)
-        previous_expenses = _filter_docs_by_period(all_expenses, ['created_at', 'expense_date', 'date'], previous_start, previous_end)
-
-        customers_added_current = len(current_customers)
-        customers_added_previous = len(previous_customers)
-
-        invoices_created_current = len(current_invoices)
-        invoices_created_previous = len(previous_invoices)
-
-        revenue_current = sum(_safe_float(inv.get('total_amount')) for inv in current_invoices)
-        revenue_previous = sum(_safe_float(inv.get('total_amount')) for inv in previous_invoices)
-
-        payments_current = _invoice_payments_in_period(all_invoices, start_date, end_date)
-        payments_previous = _invoice_payments_in_period(all_invoices, previous_start, previous_end)
-
-        receivables_current = sum(
-            _safe_float(inv.get('balance_due', inv.get('total_amount')))
-            for inv in current_invoices
-            if str(inv.get('status', '')).lower() in OPEN_INVOICE_STATUSES
-        )
-        receivables_previous = sum(
-            _safe_float(inv.get('balance_due', inv.get('total_amount')))
-            for inv in previous_invoices
-            if str(inv.get('status', '')).lower() in OPEN_INVOICE_STATUSES
-        )
-
-        bill_payables_current = sum(
-            _safe_float(bill.get('balance_due', bill.get('total_amount')))
-            for bill in current_bills
-            if str(bill.get('payment_status', '')).lower() in OPEN_BILL_STATUSES
-        )
-        bill_payables_previous = sum(
-            _safe_float(bill.get('balance_due', bill.get('total_amount')))
-            for bill in previous_bills
-            if str(bill.get('payment_status', '')).lower() in OPEN_BILL_STATUSES
-        )
-        expense_total_current = sum(_safe_float(exp.get('amount', exp.get('total_amount'))) for exp in current_expenses)
-        expense_total_previous = sum(_safe_float(exp.get('amount', exp.get('total_amount'))) for exp in previous_expenses)
-
-        payables_current = bill_payables_current + expense_total_current
-        payables_previous = bill_payables_previous + expense_total_previous
-
-        overdue_count = 0
-        for inv in all_invoices:
-            if str(inv.get('status', '')).lower() not in OPEN_INVOICE_STATUSES:
-                continue
-            due_date = _parse_iso_date(inv.get('due_date'))
-            if due_date and due_date < today:
-                overdue_count += 1
-
-        metrics = {
-            'customers_added': _metric_payload(customers_added_current, customers_added_previous),
-            'invoices_created': _metric_payload(invoices_created_current, invoices_created_previous),
-            'revenue': _metric_payload(revenue_current, revenue_previous),
-            'payments_received': _metric_payload(payments_current, payments_previous),
-            'receivables': _metric_payload(receivables_current, receivables_previous),
-            'payables': _metric_payload(payables_current, payables_previous),
-            'overdue_invoices_current': {
-                'value': overdue_count,
-                'is_time_based': False,
-            },
-            'total_customers': {
-                'value': len(all_customers),
-                'is_time_based': False,
-            },
-            'total_products': {
-                'value': len(all_products),
-                'is_time_based': False,
-            },
-        }
-
-        payload = {
-            'range': range_type,
-            'period': {
-                'current': {
-                    'start_date': start_date.isoformat(),
-                    'end_date': end_date.isoformat(),
-                    'label': _period_label(range_type, start_date, end_date),
-                },
-                'previous': {
-                    'start_date': previous_start.isoformat(),
-                    'end_date': previous_end.isoformat(),
-                    'label': f"Previous {_period_label(range_type, start_date, end_date)}",
-                },
-            },
-            'metrics': metrics,
-            # Backward-compatible aliases consumed by older clients.
-            'customers_added': metrics['customers_added']['value'],
-            'invoices_created': metrics['invoices_created']['value'],
-            'revenue': metrics['revenue']['value'],
-            'payments_received': metrics['payments_received']['value'],
-            'receivables': metrics['receivables']['value'],
-            'payables': metrics['payables']['value'],
-            'overdue_count': overdue_count,
-            'total_customers': len(all_customers),
-            'total_products': len(all_products),
-            'total_invoices': invoices_created_current,
-            'total_revenue': revenue_current,
-            'total_receivables': receivables_current,
-            'total_payables': payables_current,
-        }
         if use_cache:
-            _summary_cache_set(cache_key, payload)
+            payload = _summary_cache.get_or_compute(
+                tenant_id,
+                _summary_cache_key(range_type, request.args, today),
+                lambda: _build_summary_payload(tenant_id, range_type, start_date, end_date, today),
+            )
+        else:
+            payload = _build_summary_payload(tenant_id, range_type, start_date, end_date, today)
         return jsonify(payload)
     except Exception as e:
         return jsonify({'error': f'Error fetching dashboard summary: {str(e)}'}), 500
 
 @dashboard_blueprint.route('/dashboard/low-stock', methods=['GET'])
 @require_permission('reports', 'view')
+@cached_json_response('dashboard', ttl=_SUMMARY_CACHE_TTL_SECONDS)
 @swag_from({
     'tags': ['Dashboard'],
     'parameters': [
@@ -441,6 +487,7 @@ def dashboard_low_stock():
 
 @dashboard_blueprint.route('/dashboard/monthly-revenue', methods=['GET'])
 @require_permission('reports', 'view')
+@cached_json_response('dashboard', ttl=_SUMMARY_CACHE_TTL_SECONDS)
 @swag_from({
     'tags': ['Dashboard'],
     'responses': {
@@ -504,6 +551,7 @@ def dashboard_monthly_revenue():
 
 @dashboard_blueprint.route('/dashboard/recent-invoices', methods=['GET'])
 @require_permission('reports', 'view')
+@cached_json_response('dashboard', ttl=_SUMMARY_CACHE_TTL_SECONDS)
 def dashboard_recent_invoices():
     """Return the 10 most recent invoices for the dashboard activity feed."""
     try:
@@ -1,6 +1,7 @@
-from flask import Blueprint, request, jsonify, make_response
+from flask import Blueprint, request, jsonify
 from flasgger import swag_from
 from smart_invoice_pro.utils.permission_checker import require_permission
+from smart_invoice_pro.utils.dashboard_rollups import record_rollup_change
 import uuid
 from datetime import datetime
 import os
@@ -21,6 +22,8 @@ from smart_invoice_pro.utils.domain_events import record_bulk_archive_completed
 from smart_invoice_pro.utils.audit_logger import log_audit
 import copy
 from smart_invoice_pro.utils.audit_logger import log_bulk_archive_summary
+from smart_invoice_pro.utils.cursor_pagination import InvalidCursor, cursor_requested, fetch_cursor_page
+from smart_invoice_pro.utils.csv_stream import CsvColumn, stream_query_csv
 from smart_invoice_pro.utils.validation_utils import (
     make_error_response, collect_errors,
     validate_required, validate_positive_number, validate_date,
@@ -164,6 +167,7 @@ def create_expense():
         }
 
         expenses_container.create_item(body=expense)
+        record_rollup_change('expense', None, expense)
         log_audit(
             "expense", "create", expense["id"], None, expense,
             user_id=getattr(request, "user_id", None),
@@ -253,6 +257,17 @@ def get_expenses():
             query += " AND c.date <= @end_date"
             parameters.append({"name": "@end_date", "value": end_date})
 
+        if cursor_requested(request.args):
+            try:
+                cursor_page = fetch_cursor_page(
+                    expenses_container, query, parameters,
+                    sort_field=sort_by, sort_order=sort_order,
+                    tenant_id=request.tenant_id, endpoint='expenses',
+                )
+            except InvalidCursor as exc:
+                return make_error_response(VALIDATION_ERROR, str(exc))
+            return jsonify(cursor_page.as_payload('data')), 200
+
         query += f" ORDER BY c.{sort_by} {sort_order}"
 
         # Execute query
@@ -292,13 +307,24 @@ def get_expenses():
 # ─────────────────────────────────────────────────────────────────────────────
 # EXPORT EXPENSES AS CSV
 # ─────────────────────────────────────────────────────────────────────────────
+_EXPENSE_EXPORT_COLUMNS = [
+    CsvColumn("Date", "date"),
+    CsvColumn("Vendor / Payee", "vendor_name"),
+    CsvColumn("Category", "category"),
+    CsvColumn("Amount", "amount", 0),
+    CsvColumn("Currency", "currency", "INR"),
+    CsvColumn("Status", lambda exp: exp.get("status") or exp.get("payment_status", "")),
+    CsvColumn("Payment Mode", "payment_mode"),
+    CsvColumn("Paid Through", "paid_through"),
+    CsvColumn("Billable", lambda exp: "Yes" if exp.get("billable") else "No"),
+    CsvColumn("Notes", "notes"),
+]
+
+
 @expenses_blueprint.route('/expenses/export', methods=['GET'])
 @require_permission('expenses', 'view')
 def export_expenses():
-    """Export expenses for the current tenant as a CSV file."""
-    import csv
-    import io as _io
-
+    """Export expenses for the current tenant as a streamed CSV file."""
     category_filter = (request.args.get('category') or '').strip()
     lifecycle = str(request.args.get('lifecycle', 'active')).strip().lower()
     start_date = (request.args.get('start_date') or '').strip()
@@ -329,38 +355,14 @@ def export_expenses():
     query = "SELECT * FROM c WHERE " + " AND ".join(where_parts) + " ORDER BY c.date DESC"
 
     try:
-        items = list(expenses_container.query_items(
-            query=query,
-            parameters=parameters,
-            enable_cross_partition_query=True,
-        ))
+        return stream_query_csv(
+            expenses_container, query, parameters,
+            columns=_EXPENSE_EXPORT_COLUMNS,
+            filename="expenses-export.csv",
+        )
     except Exception as e:
         return jsonify({"error": f"Failed to export expenses: {str(e)}"}), 500
 
-    output = _io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["Date", "Vendor / Payee", "Category", "Amount", "Currency",
-                     "Status", "Payment Mode", "Paid Through", "Billable", "Notes"])
-    for exp in items:
-        writer.writerow([
-            exp.get("date", ""),
-            exp.get("vendor_name", ""),
-            exp.get("category", ""),
-            exp.get("amount", 0),
-            exp.get("currency", "INR"),
-            exp.get("status") or exp.get("payment_status", ""),
-            exp.get("payment_mode", ""),
-            exp.get("paid_through", ""),
-            "Yes" if exp.get("billable") else "No",
-            exp.get("notes", ""),
-        ])
-
-    csv_data = output.getvalue()
-    response = make_response(csv_data)
-    response.headers["Content-Type"] = "text/csv; charset=utf-8"
-    response.headers["Content-Disposition"] = "attachment; filename=expenses-export.csv"
-    return response
-
 
 # ─────────────────────────────────────────────────────────────────────────────
 # GET EXPENSE BY ID
@@ -501,6 +503,7 @@ def update_expense(expense_id):
                 pass  # Continue without updating receipt on error
 
         expenses_container.replace_item(item=expense['id'], body=expense)
+        record_rollup_change('expense', before_snapshot, expense)
         log_audit(
             "expense", "update", expense_id, before_snapshot, expense,
             user_id=getattr(request, "user_id", None),
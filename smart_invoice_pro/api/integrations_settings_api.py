@@ -4,6 +4,8 @@ GET  /api/settings/integrations               — fetch integration config for t
 PUT  /api/settings/integrations               — save integration config
 POST /api/settings/integrations/test-email    — send a test email via Azure ACS
 GET  /api/settings/integrations/webhook-logs  — recent webhook delivery log (last 50)
+GET  /api/settings/integrations/webhook-dead-letters             — deliveries that gave up retrying
+POST /api/settings/integrations/webhook-dead-letters/<id>/retry  — re-queue one dead letter
 
 Schema stored in `settings` container:
 {
@@ -45,6 +47,12 @@ from datetime import datetime
 from flask import Blueprint, request, jsonify
 from smart_invoice_pro.utils.cosmos_client import settings_container, webhook_logs_container
 from smart_invoice_pro.utils.permission_checker import require_permission
+from smart_invoice_pro.utils.webhook_dispatcher import (
+    invalidate_webhook_config,
+    list_dead_letters,
+    requeue_dead_letter,
+)
+from smart_invoice_pro.utils.tenant_settings import invalidate_tenant_settings
 
 integrations_blueprint = Blueprint('integrations', __name__)
 
@@ -219,6 +227,8 @@ def save_integrations_settings():
 
         doc["updated_at"] = datetime.utcnow().isoformat()
         settings_container.upsert_item(body=doc)
+        invalidate_webhook_config(request.tenant_id)
+        invalidate_tenant_settings(request.tenant_id)
 
         return jsonify({
             "message":  "Integration settings saved.",
@@ -233,9 +243,9 @@ def save_integrations_settings():
 @integrations_blueprint.route('/settings/integrations/test-email', methods=['POST'])
 @require_permission('integrations', 'edit')
 def test_email_connection():
-    """Send a test email to the authenticated user's address via Azure ACS."""
+    """Send a test email to the authenticated user's address, inline on the shared email client."""
     try:
-        from azure.communication.email import EmailClient
+        from smart_invoice_pro.utils.email_service import email_configured, send_email_now
 
         # Validate recipient first — before any infrastructure checks
         body = request.get_json(silent=True) or {}
@@ -243,8 +253,7 @@ def test_email_connection():
         if not recipient or "@" not in recipient:
             return jsonify({"error": "Provide a valid 'to' email address."}), 400
 
-        connection_string = os.getenv('AZURE_EMAIL_CONNECTION_STRING')
-        if not connection_string:
+        if not email_configured():
             return jsonify({"error": "AZURE_EMAIL_CONNECTION_STRING is not configured."}), 503
 
         doc = _get_doc(request.tenant_id)
@@ -252,8 +261,8 @@ def test_email_connection():
         sender = email_cfg.get("sender_email") or os.getenv("AZURE_SENDER_EMAIL", "")
         sender_name = email_cfg.get("sender_name") or "Solidev Books"
 
-        client = EmailClient.from_connection_string(connection_string)
-        poller = client.begin_send({
+        # Inline (not queued) so the user sees whether the integration works
+        send_email_now({
             "senderAddress": sender,
             "recipients": {"to": [{"address": recipient}]},
             "content": {
@@ -264,7 +273,6 @@ def test_email_connection():
                 ),
             },
         })
-        poller.result()  # wait for delivery confirmation
         return jsonify({"message": "Test email sent successfully.", "recipient": recipient}), 200
 
     except Exception as e:
@@ -292,3 +300,31 @@ def get_webhook_logs():
         return jsonify(safe), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+
+# ── Webhook dead letters ──────────────────────────────────────────────────────
+@integrations_blueprint.route('/settings/integrations/webhook-dead-letters', methods=['GET'])
+@require_permission('integrations', 'view')
+def get_webhook_dead_letters():
+    """Return deliveries that exhausted their retries or were rejected by the endpoint."""
+    try:
+        rows = list_dead_letters(request.tenant_id)
+        # The stored headers carry the HMAC signature — never echo them back.
+        safe = [{k: v for k, v in row.items() if k not in ("headers", "body", "lease_owner", "lease_until")}
+                for row in rows]
+        return jsonify(safe), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@integrations_blueprint.route('/settings/integrations/webhook-dead-letters/<delivery_id>/retry',
+                              methods=['POST'])
+@require_permission('integrations', 'edit')
+def retry_webhook_dead_letter(delivery_id):
+    """Move a dead-lettered delivery back to the outbox with a fresh retry budget."""
+    try:
+        if not requeue_dead_letter(request.tenant_id, delivery_id):
+            return jsonify({"error": "Dead-lettered delivery not found."}), 404
+        return jsonify({"message": "Delivery re-queued.", "id": delivery_id}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -1,14 +1,21 @@
+import copy
+import hashlib
+import json
+import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from flask import Blueprint, request, make_response, jsonify
 from datetime import date
 from flasgger import swag_from
 import io
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import cm
+from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer
+
+from smart_invoice_pro.utils.pdf_cache import get_pdf_store
+from smart_invoice_pro.utils.pdf_templates import PAGE_MARGIN, PAGE_SIZE, get_compiled_template
+
+logger = logging.getLogger(__name__)
 
 invoice_generation_blueprint = Blueprint('invoice_generation', __name__)
 
@@ -77,7 +84,7 @@ def _get_tenant_branding(tenant_id: str) -> dict:
         return dict(_DEFAULT_BRANDING)
 
 
-def branding_for_document(document: dict, tenant_id: str) -> dict:
+def branding_for_document(document: dict, tenant_id: str, live: dict | None = None) -> dict:
     """
     Return the branding context for a specific document.
 
@@ -87,14 +94,16 @@ def branding_for_document(document: dict, tenant_id: str) -> dict:
 
     This ensures PDF re-generation for a previously-sent document uses the brand
     that was active at send time, not whatever the tenant has set today.
+    Batch callers pass ``live`` (from _get_tenant_branding) to resolve it once.
     """
+    if live is None:
+        live = _get_tenant_branding(tenant_id)
     snapshot = document.get('brand_snapshot') or {}
     if snapshot:
-        live = _get_tenant_branding(tenant_id)
         # Start from live (has invoice_template_settings etc.), overlay snapshot fields
         merged = {**live, **snapshot}
         return merged
-    return _get_tenant_branding(tenant_id)
+    return dict(live)
 
 
 def build_invoice_pdf(
@@ -119,24 +128,15 @@ def build_invoice_pdf(
     if branding is None:
         branding = dict(_DEFAULT_BRANDING)
 
-    accent   = branding.get('accent_color',    _DEFAULT_BRANDING['accent_color'])
-    primary  = branding.get('primary_color',   _DEFAULT_BRANDING['primary_color'])
-    its      = branding.get('invoice_template_settings') or {}
-    show_logo      = bool(its.get('show_logo', True))
-    show_signature = bool(its.get('show_signature', False))
-
-    org_name = (branding.get('organization_name') or '').strip() or 'Solidev Books'
-    logo_url = branding.get('logo_url', '')
-    doc_label = _DOC_LABELS.get(doc_type, doc_type.upper())
+    its = branding.get('invoice_template_settings') or {}
+    logo_path = _resolve_logo_path(branding.get('logo_url', '')) if its.get('show_logo', True) else None
+    tpl = get_compiled_template(branding, logo_path, _DOC_LABELS)
+    styles = tpl.styles
 
     # GST mode flags — control what appears on the PDF
     show_gst = (gst_mode == 'FULL_GST') and bool(invoice_data.get('is_gst_applicable', False))
     show_gstin = gst_mode != 'NO_GST'  # GSTIN shown for Regular and Composition
     is_composition = gst_mode == 'COMPOSITION'
-    # Composition statutory note (required by GST Act, Rule 55A)
-    _COMPOSITION_NOTE = (
-        "Composition Taxable Person. Not eligible to collect tax on supplies."
-    )
 
     def _get(key, default=''):
         return invoice_data.get(key, default)
@@ -165,44 +165,15 @@ def build_invoice_pdf(
     }
 
     buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4,
-                            leftMargin=40, rightMargin=40,
-                            topMargin=40, bottomMargin=40)
-    styles = getSampleStyleSheet()
-    for name, kwargs in [
-        ('Company',      dict(fontSize=18, textColor=colors.HexColor(accent), spaceAfter=6, leading=22)),
-        ('DocTitle',     dict(fontSize=16, alignment=2, spaceAfter=20)),
-        ('Footer',       dict(fontSize=9, alignment=1, textColor=colors.grey)),
-        ('SignatureLabel', dict(fontSize=9, textColor=colors.grey)),
-    ]:
-        try:
-            styles.add(ParagraphStyle(name=name, **kwargs))
-        except KeyError:
-            pass
+    doc = SimpleDocTemplate(buffer, pagesize=PAGE_SIZE,
+                            leftMargin=PAGE_MARGIN, rightMargin=PAGE_MARGIN,
+                            topMargin=PAGE_MARGIN, bottomMargin=PAGE_MARGIN)
 
     story = []
 
     # ── Header ────────────────────────────────────────────────────────────────
     # Left cell: logo image (when show_logo=True and logo file exists) or org name text
-    logo_path = _resolve_logo_path(logo_url) if show_logo else None
-    if logo_path:
-        max_logo_w = doc.width * 0.45
-        max_logo_h = 2.5 * cm
-        left_cell = Image(logo_path, width=max_logo_w, height=max_logo_h,
-                          kind='proportional')
-    else:
-        left_cell = Paragraph(f'<b>{org_name}</b>', styles['Company'])
-
-    header_table = Table([[
-        left_cell,
-        Paragraph(f'<b>{doc_label}</b>', styles['DocTitle']),
-    ]], colWidths=[doc.width * 0.5, doc.width * 0.5])
-    header_table.setStyle(TableStyle([
-        ('ALIGN',        (1, 0), (1, 0),   'RIGHT'),
-        ('VALIGN',       (0, 0), (-1, -1), 'MIDDLE'),
-        ('BOTTOMPADDING',(0, 0), (-1, -1), 12),
-    ]))
-    story.extend([header_table, Spacer(1, 12)])
+    story.extend([tpl.header(doc_type), Spacer(1, 12)])
 
     # ── Bill To / Invoice Details ─────────────────────────────────────────────
     bill_to = mapped['customer_name'] or f'Customer ID: {mapped["customer_id"]}'
@@ -232,10 +203,7 @@ def build_invoice_pdf(
         ),
         Paragraph(details_right, styles['Normal']),
     ]], colWidths=[doc.width * 0.48, doc.width * 0.48])
-    info_table.setStyle(TableStyle([
-        ('VALIGN',       (0, 0), (-1, -1), 'TOP'),
-        ('BOTTOMPADDING',(0, 0), (-1, -1), 12),
-    ]))
+    info_table.setStyle(tpl.info_style)
     story.extend([info_table, Spacer(1, 12)])
 
     # ── Line items ────────────────────────────────────────────────────────────
@@ -290,13 +258,7 @@ def build_invoice_pdf(
             col_widths = [doc.width * w for w in (0.5, 0.25, 0.25)]
 
     items_table = Table(rows, colWidths=col_widths)
-    items_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0),  colors.HexColor(primary).clone(alpha=0.08) if hasattr(colors.HexColor(primary), 'clone') else colors.HexColor('#f0f4fa')),
-        ('TEXTCOLOR',  (0, 0), (-1, 0),  colors.HexColor(accent)),
-        ('ALIGN',      (1, 0), (-1, -1), 'RIGHT'),
-        ('GRID',       (0, 0), (-1, -1), 0.5, colors.grey),
-        ('FONTNAME',   (0, 0), (-1, 0),  'Helvetica-Bold'),
-    ]))
+    items_table.setStyle(tpl.items_style)
     story.extend([items_table, Spacer(1, 12)])
 
     # ── Totals ────────────────────────────────────────────────────────────────
@@ -305,11 +267,7 @@ def build_invoice_pdf(
         ['Balance Due', f"\u20b9{mapped['balance_due']:,.2f}"],
         ['Grand Total', f"\u20b9{mapped['total_amount']:,.2f}"],
     ], colWidths=[doc.width * 0.6, doc.width * 0.4])
-    totals_table.setStyle(TableStyle([
-        ('ALIGN',    (1, 0), (-1, -1), 'RIGHT'),
-        ('FONTNAME', (0, 2), (-1, 2),  'Helvetica-Bold'),
-        ('LINEABOVE',(0, 2), (-1, 2),  1.5, colors.HexColor(accent)),
-    ]))
+    totals_table.setStyle(tpl.totals_style)
     story.extend([totals_table, Spacer(1, 24)])
 
     # ── Terms & conditions ────────────────────────────────────────────────────
@@ -322,50 +280,199 @@ def build_invoice_pdf(
 
     # ── Composition statutory note (GST Act, Rule 55A) ────────────────────────
     if is_composition:
-        try:
-            comp_style = ParagraphStyle(
-                'CompositionNote',
-                fontSize=8,
-                textColor=colors.HexColor('#7c3aed'),
-                leading=12,
-                borderPad=4,
-            )
-            styles.add(comp_style)
-        except KeyError:
-            comp_style = styles['Normal']
-        story.append(Paragraph(
-            f'<i>Note: {_COMPOSITION_NOTE}</i>',
-            comp_style,
-        ))
+        story.append(tpl.fragment('composition_note'))
         story.append(Spacer(1, 8))
 
     # ── Signature block (show_signature) ──────────────────────────────────────
-    if show_signature:
-        sig_table = Table([[
-            Paragraph(
-                f'<b>Authorised Signatory</b><br/><br/><br/>'
-                f'____________________________<br/>'
-                f'{org_name}',
-                styles['SignatureLabel'],
-            ),
-        ]], colWidths=[doc.width * 0.45])
-        sig_table.setStyle(TableStyle([
-            ('ALIGN',  (0, 0), (0, 0), 'RIGHT'),
-            ('VALIGN', (0, 0), (0, 0), 'BOTTOM'),
-        ]))
-        story.append(sig_table)
+    if tpl.show_signature:
+        story.append(tpl.signature())
         story.append(Spacer(1, 12))
 
     # ── Footer ────────────────────────────────────────────────────────────────
-    story.append(Paragraph(
-        f'\u00a9 {date.today().year} {org_name}. All rights reserved.',
-        styles['Footer'],
-    ))
+    story.append(tpl.fragment('footer'))
     doc.build(story)
     buffer.seek(0)
     return buffer.getvalue()
 
 
+# ── Render cache ──────────────────────────────────────────────────────────────
+# Bump whenever build_invoice_pdf's layout changes so cached PDFs re-render.
+PDF_TEMPLATE_VERSION = 1
+
+# Everything build_invoice_pdf reads; the fingerprint hashes exactly these so
+# bookkeeping fields (email_status, updated_at, portal views…) don't bust it.
+_PDF_DOCUMENT_FIELDS = (
+    'invoice_number', 'customer_id', 'customer_name', 'issue_date', 'due_date',
+    'payment_terms', 'subtotal', 'cgst_amount', 'sgst_amount', 'igst_amount',
+    'total_tax', 'total_amount', 'amount_paid', 'balance_due', 'status',
+    'payment_mode', 'notes', 'terms_conditions', 'is_gst_applicable', 'invoice_type',
+)
+_PDF_ITEM_FIELDS = ('name', 'quantity', 'rate', 'tax', 'amount')
+_PDF_BRANDING_FIELDS = (
+    'primary_color', 'accent_color', 'logo_url', 'organization_name', 'gstin',
+    'invoice_template_settings',
+)
+
+
+def pdf_render_fingerprint(
+    invoice_data: dict,
+    branding: dict | None = None,
+    doc_type: str = 'invoice',
+    gst_mode: str = 'FULL_GST',
+) -> str:
+    """
+    Content hash of everything that affects build_invoice_pdf's output:
+    document fields, branding snapshot, gst_mode, the logo file on disk,
+    the footer year and PDF_TEMPLATE_VERSION.
+    """
+    branding = branding or _DEFAULT_BRANDING
+    its = branding.get('invoice_template_settings') or {}
+    logo_path = _resolve_logo_path(branding.get('logo_url', '')) if its.get('show_logo', True) else None
+    logo_stamp = None
+    if logo_path:
+        try:
+            st = os.stat(logo_path)
+            logo_stamp = [st.st_size, int(st.st_mtime)]
+        except OSError:
+            pass
+    material = {
+        'version':  PDF_TEMPLATE_VERSION,
+        'doc_type': doc_type,
+        'gst_mode': gst_mode,
+        'year':     date.today().year,
+        'document': {k: invoice_data.get(k) for k in _PDF_DOCUMENT_FIELDS},
+        'items':    [{k: it.get(k) for k in _PDF_ITEM_FIELDS}
+                     for it in invoice_data.get('items') or [] if isinstance(it, dict)],
+        'branding': {k: branding.get(k) for k in _PDF_BRANDING_FIELDS},
+        'logo':     logo_stamp,
+    }
+    encoded = json.dumps(material, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def render_pdf_cached(
+    invoice_data: dict,
+    branding: dict | None = None,
+    doc_type: str = 'invoice',
+    gst_mode: str = 'FULL_GST',
+    tenant_id: str | None = None,
+    fingerprint: str | None = None,
+) -> tuple[bytes, str]:
+    """
+    Return ``(pdf_bytes, fingerprint)``, reading the render cache first.
+
+    Cache failures are logged and fall back to rendering, so a broken cache
+    directory or blob outage never blocks a download.
+    """
+    fingerprint = fingerprint or pdf_render_fingerprint(invoice_data, branding, doc_type, gst_mode)
+    store = get_pdf_store() if tenant_id else None
+    if store is not None:
+        try:
+            cached = store.get(tenant_id, fingerprint)
+        except Exception as exc:
+            logger.warning("[pdf_cache] read failed for %s/%s: %s", tenant_id, fingerprint, exc)
+            cached = None
+        if cached:
+            return cached, fingerprint
+
+    pdf_bytes = build_invoice_pdf(invoice_data, branding=branding, doc_type=doc_type, gst_mode=gst_mode)
+    if store is not None:
+        try:
+            store.put(tenant_id, fingerprint, pdf_bytes)
+        except Exception as exc:
+            logger.warning("[pdf_cache] write failed for %s/%s: %s", tenant_id, fingerprint, exc)
+    return pdf_bytes, fingerprint
+
+
+def pdf_response(
+    invoice_data: dict,
+    *,
+    tenant_id: str,
+    filename: str,
+    branding: dict | None = None,
+    doc_type: str = 'invoice',
+    gst_mode: str = 'FULL_GST',
+):
+    """
+    Inline PDF response served from the render cache.
+
+    The fingerprint doubles as a weak ETag: a matching If-None-Match gets a
+    304 without touching the cache or ReportLab.
+    """
+    fingerprint = pdf_render_fingerprint(invoice_data, branding, doc_type, gst_mode)
+    if request.if_none_match.contains_weak(fingerprint):
+        response = make_response('', 304)
+    else:
+        pdf_bytes, _ = render_pdf_cached(invoice_data, branding, doc_type, gst_mode,
+                                         tenant_id=tenant_id, fingerprint=fingerprint)
+        response = make_response(pdf_bytes)
+        response.headers['Content-Type'] = 'application/pdf'
+        response.headers['Content-Disposition'] = f'inline; filename={filename}.pdf'
+    response.set_etag(fingerprint, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def render_pdf_task(task: tuple) -> tuple:
+    """
+    Process-pool entry point: ``(key, invoice_data, branding, doc_type, gst_mode)``
+    → ``(key, pdf_bytes)``. Lives here because this module imports no Cosmos
+    client, so spawned worker processes start cheaply and offline.
+    """
+    key, invoice_data, branding, doc_type, gst_mode = task
+    return key, build_invoice_pdf(invoice_data, branding=branding, doc_type=doc_type, gst_mode=gst_mode)
+
+
+# ── Background pre-render ─────────────────────────────────────────────────────
+_prerender_lock = threading.Lock()
+_prerender_pool: ThreadPoolExecutor | None = None
+_prerender_pid: int | None = None
+
+
+def _prerender_executor() -> ThreadPoolExecutor | None:
+    global _prerender_pool, _prerender_pid
+    try:
+        workers = int(os.getenv('PDF_PRERENDER_WORKERS', '2'))
+    except ValueError:
+        workers = 2
+    if workers <= 0:
+        return None
+    with _prerender_lock:
+        # A pool inherited across fork has no live threads; build a fresh one.
+        if _prerender_pool is None or _prerender_pid != os.getpid():
+            _prerender_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pdf-prerender')
+            _prerender_pid = os.getpid()
+        return _prerender_pool
+
+
+def _prerender(tenant_id: str, document: dict, doc_type: str, gst_mode: str | None) -> None:
+    try:
+        from smart_invoice_pro.utils.org_tax_mode import get_org_gst_mode
+        branding = branding_for_document(document, tenant_id)
+        if gst_mode is None:
+            gst_mode = get_org_gst_mode(tenant_id)
+        render_pdf_cached(document, branding, doc_type, gst_mode, tenant_id=tenant_id)
+    except Exception as exc:
+        logger.warning("[pdf_cache] pre-render of %s %s failed: %s", doc_type, document.get('id'), exc)
+
+
+def schedule_pdf_prerender(tenant_id: str, document: dict, doc_type: str = 'invoice',
+                           gst_mode: str | None = None) -> bool:
+    """
+    Render ``document`` into the cache on a background thread (best-effort).
+
+    Called when a document is issued or sent, so the customer's first download
+    is a cache read. Returns False when caching or pre-rendering is disabled.
+    """
+    if not tenant_id or get_pdf_store() is None:
+        return False
+    executor = _prerender_executor()
+    if executor is None:
+        return False
+    executor.submit(_prerender, tenant_id, copy.deepcopy(document), doc_type, gst_mode)
+    return True
+
+
 @invoice_generation_blueprint.route('/generate-invoice-pdf', methods=['POST'])
 @swag_from({
     'tags': ['Invoice PDF'],
@@ -27,6 +27,7 @@ from flask import Blueprint, request, jsonify
 from smart_invoice_pro.utils.cosmos_client import settings_container
 from smart_invoice_pro.api.roles_api import require_role
 from smart_invoice_pro.utils.audit_logger import log_audit
+from smart_invoice_pro.utils.tenant_settings import invalidate_tenant_settings, remember_settings_doc
 import copy
 
 invoice_preferences_blueprint = Blueprint('invoice_preferences', __name__)
@@ -68,9 +69,14 @@ def _get_prefs(tenant_id: str) -> dict:
     ))
     if items:
         return items[0]
+    return _default_prefs_doc(tenant_id)
+
+
+def _default_prefs_doc(tenant_id: str) -> dict:
+    """Bare (unsaved) preferences document used until the tenant saves one."""
     now = datetime.utcnow().isoformat()
     return {
-        "id":         doc_id,
+        "id":         _pref_doc_id(tenant_id),
         "type":       "invoice_preferences",
         "tenant_id":  tenant_id,
         **DEFAULT_PREFS,
@@ -89,15 +95,31 @@ def format_invoice_number(prefix: str, number: int, padding: int, suffix: str) -
     return f"{prefix}{str(int(number)).zfill(padding)}{suffix}"
 
 
-def generate_invoice_number(tenant_id: str) -> str:
+def generate_invoice_number(tenant_id: str, prefs: dict | None = None) -> str:
     """
     Atomically claim the next invoice number for this tenant.
 
+    ``prefs`` may be the caller's already-loaded preferences document (e.g. from
+    the tenant settings snapshot); the first attempt uses it instead of a fresh
+    read, and a stale copy simply fails the ETag check and retries.
+
+    Returns the formatted invoice number string (e.g. "INV-00042").
+    """
+    return reserve_invoice_numbers(tenant_id, 1, prefs=prefs)[0]
+
+
+def reserve_invoice_numbers(tenant_id: str, count: int, prefs: dict | None = None) -> list[str]:
+    """
+    Atomically claim ``count`` consecutive invoice numbers in one counter update.
+
     Uses optimistic concurrency (ETag) with exponential-backoff retries so that
     concurrent invoice creation requests never produce duplicate numbers.
+    Batch jobs (recurring generation) reserve a block per round trip instead of
+    one number per invoice; numbers a job reserves but does not use are gaps.
 
-    Returns the formatted invoice number string (e.g. "INV-00042").
+    Returns the formatted numbers in ascending order.
     """
+    count = max(1, int(count))
     try:
         from azure.cosmos.exceptions import CosmosAccessConditionFailedError
     except ImportError:
@@ -111,13 +133,14 @@ def generate_invoice_number(tenant_id: str) -> str:
     max_retries = 8
 
     for attempt in range(max_retries):
-        prefs = _get_prefs(tenant_id)
+        if attempt or prefs is None:
+            prefs = _get_prefs(tenant_id)
         old_next = max(1, int(prefs.get('next_invoice_number', 1)))
         etag = prefs.get('_etag')
 
         updated = {
             **prefs,
-            'next_invoice_number': old_next + 1,
+            'next_invoice_number': old_next + count,
             'updated_at': datetime.utcnow().isoformat(),
         }
         # Remove internal Cosmos fields so replace_item doesn't reject them
@@ -138,16 +161,18 @@ def generate_invoice_number(tenant_id: str) -> str:
                 # Keep this conditional for compatibility with older environments.
                 if MatchConditions is not None:
                     kwargs['match_condition'] = MatchConditions.IfNotModified
-                settings_container.replace_item(**kwargs)
+                saved = settings_container.replace_item(**kwargs)
             else:
                 # First time — create; if concurrent, one will get a 409 and retry
-                settings_container.create_item(body=updated)
+                saved = settings_container.create_item(body=updated)
+            remember_settings_doc(tenant_id, saved)
 
-            # Claimed old_next successfully
+            # Claimed old_next .. old_next + count - 1 successfully
             prefix  = prefs.get('invoice_prefix', DEFAULT_PREFS['invoice_prefix'])
             suffix  = prefs.get('invoice_suffix', DEFAULT_PREFS['invoice_suffix'])
             padding = prefs.get('number_padding', DEFAULT_PREFS['number_padding'])
-            return format_invoice_number(prefix, old_next, padding, suffix)
+            return [format_invoice_number(prefix, n, padding, suffix)
+                    for n in range(old_next, old_next + count)]
 
         except CosmosAccessConditionFailedError:
             # ETag mismatch — another request updated the counter first; retry
@@ -272,6 +297,7 @@ def update_invoice_preferences():
             existing['created_at'] = now
 
         settings_container.upsert_item(existing)
+        invalidate_tenant_settings(request.tenant_id)
         log_audit(
             "invoice_preferences", "update", existing["id"], before_snapshot, existing,
             user_id=getattr(request, "user_id", None),
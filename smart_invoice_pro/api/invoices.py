@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify, make_response
+from flask import Blueprint, request, jsonify, make_response, current_app, Response
 from smart_invoice_pro.utils.cosmos_client import invoices_container, customers_container, get_container
 from smart_invoice_pro.utils.response_sanitizer import sanitize_item, sanitize_items
 from smart_invoice_pro.utils.webhook_dispatcher import dispatch_webhook_event
@@ -7,6 +7,14 @@ from smart_invoice_pro.utils.audit_logger import log_audit, log_audit_event
 from smart_invoice_pro.utils.archive_service import archive_entity, restore_entity, LIFECYCLE_ARCHIVED
 from smart_invoice_pro.utils.lifecycle_service import apply_lifecycle_action
 from smart_invoice_pro.utils.dependency_checker import check_entity_dependencies
+from smart_invoice_pro.utils.dashboard_rollups import record_rollup_change
+from smart_invoice_pro.utils.reminder_schedule import record_invoice_write
+from smart_invoice_pro.utils.email_service import document_target, email_configured, queue_email
+from smart_invoice_pro.utils.shared_cache import get_cache
+from smart_invoice_pro.utils.report_queries import ReportQuery, run_report_queries
+from smart_invoice_pro.utils.cursor_pagination import InvalidCursor, cursor_requested, fetch_cursor_page
+from smart_invoice_pro.utils.csv_stream import CsvColumn, stream_query_csv
+from smart_invoice_pro.services.pdf_export import bulk_export_service
 import copy
 import uuid
 import secrets
@@ -16,20 +24,26 @@ from datetime import datetime, timedelta
 from enum import Enum
 import jwt
 from functools import wraps
-from smart_invoice_pro.api.invoice_generation import build_invoice_pdf, _get_tenant_branding, branding_for_document
+from smart_invoice_pro.api.invoice_generation import (
+    _get_tenant_branding,
+    branding_for_document,
+    pdf_response,
+    render_pdf_cached,
+    schedule_pdf_prerender,
+)
 from smart_invoice_pro.api.invoice_preferences_api import (
     generate_invoice_number,
     peek_next_invoice_number,
-    _get_prefs,
+    _default_prefs_doc,
     DEFAULT_PREFS,
 )
 from smart_invoice_pro.api.tax_rates_api import (
     calculate_gst,
-    _get_seller_state,
     _get_customer_state,
 )
 from smart_invoice_pro.utils.org_tax_mode import get_org_gst_mode, must_suppress_sales_tax, COMPOSITION
-from smart_invoice_pro.utils.stock_utils import validate_stock_out
+from smart_invoice_pro.utils.tenant_settings import get_tenant_settings
+from smart_invoice_pro.utils.stock_utils import record_stock_transaction, validate_stock_out
 from smart_invoice_pro.utils.permission_checker import require_permission
 from smart_invoice_pro.utils.demo_guard import enforce_demo_create_limit
 
@@ -223,7 +237,7 @@ def _adjust_stock(items, invoice_number, invoice_id, tenant_id, direction, credi
         if not inv_item.get('product_id') or not inv_item.get('quantity'):
             continue
         try:
-            stock_container.create_item(body={
+            record_stock_transaction({
                 'id':           str(uuid.uuid4()),
                 'product_id':   str(inv_item['product_id']),
                 'tenant_id':    tenant_id,
@@ -232,7 +246,7 @@ def _adjust_stock(items, invoice_number, invoice_id, tenant_id, direction, credi
                 'source':       f'Invoice {invoice_number}',
                 'reference_id': invoice_id,
                 'timestamp':    now,
-            })
+            }, container=stock_container)
         except Exception as e:
             print(f"[stock] Failed to adjust stock for product "
                   f"{inv_item.get('product_id')}: {e}")
@@ -335,11 +349,13 @@ def create_invoice():
     now = datetime.utcnow().isoformat()
 
     # ── Invoice preferences: auto-generate number, apply defaults ────────────
-    prefs = _get_prefs(request.tenant_id)
+    # One snapshot read covers preferences, GST mode and seller state.
+    tenant_settings = get_tenant_settings(request.tenant_id)
+    prefs = tenant_settings.invoice_prefs or _default_prefs_doc(request.tenant_id)
     auto_gen = bool(prefs.get('auto_generate_invoice_number', DEFAULT_PREFS['auto_generate_invoice_number']))
 
     if auto_gen:
-        invoice_number = generate_invoice_number(request.tenant_id)
+        invoice_number = generate_invoice_number(request.tenant_id, prefs=prefs)
     else:
         invoice_number = data.get('invoice_number') or data.get('invoice_number', '')
         if not invoice_number:
@@ -369,8 +385,8 @@ def create_invoice():
     # ── Server-side GST calculation ──────────────────────────────────────────
     # Org registration type is the ceiling: Composition and Unregistered can
     # never charge GST on sales regardless of what the payload says.
-    org_gst_mode = get_org_gst_mode(request.tenant_id)
-    if must_suppress_sales_tax(request.tenant_id):
+    org_gst_mode = tenant_settings.gst_mode
+    if tenant_settings.suppress_sales_tax:
         is_gst_applicable = False
     else:
         is_gst_applicable = bool(data.get('is_gst_applicable', False))
@@ -384,7 +400,7 @@ def create_invoice():
 
     if is_gst_applicable:
         try:
-            seller_state = _get_seller_state(request.tenant_id)
+            seller_state = tenant_settings.seller_state
             customer_id_str = str(data.get('customer_id', ''))
             customer_state, gst_treatment, customer_pos = _get_customer_state(
                 request.tenant_id, customer_id_str
@@ -470,6 +486,10 @@ def create_invoice():
             return jsonify({'error': stock_err, 'details': stock_details or {}}), 400
 
     invoices_container.create_item(body=item)
+    record_rollup_change('invoice', None, item)
+    record_invoice_write(None, item)
+    if item['status'] in _STOCK_COMMITTED:
+        schedule_pdf_prerender(request.tenant_id, item, 'invoice', gst_mode=org_gst_mode)
 
     dispatch_webhook_event(
         tenant_id=request.tenant_id,
@@ -551,11 +571,14 @@ def bulk_invoice_actions():
                     if doc.get('status') == 'Paid':
                         skipped.append({"id": invoice_id, "reason": "already_paid"})
                         continue
+                    before_doc = copy.deepcopy(doc)
                     doc['status'] = 'Paid'
                     doc['amount_paid'] = doc.get('total_amount', 0)
                     doc['balance_due'] = 0.0
                     doc['updated_at'] = now
                     invoices_container.replace_item(item=doc['id'], body=doc)
+                    record_rollup_change('invoice', before_doc, doc)
+                    record_invoice_write(before_doc, doc)
                     processed.append({"id": invoice_id, "action": "mark_paid"})
 
                 elif action == 'send_email':
@@ -575,6 +598,46 @@ def bulk_invoice_actions():
         return jsonify({"error": f"Bulk action failed: {str(e)}"}), 500
 
 
+_LIST_META_CACHE_TTL_SECONDS = 60
+_list_meta_cache = get_cache('invoice_list_meta', _LIST_META_CACHE_TTL_SECONDS)
+
+
+def _invoice_status_summary(base_where_sql, base_parameters, today_iso):
+    """
+    Per-status counts, the effective overdue count and the unfiltered total.
+
+    Cross-partition GROUP BY is not supported by the pinned Cosmos SDK (see
+    quotes_api), so one query projects each invoice's status and overdue flag
+    and is tallied here, beside one ``SELECT VALUE COUNT(1)`` for the total;
+    both run concurrently through report_queries. Returns (summary, by_status, total).
+    """
+    params = {p['name']: p['value'] for p in base_parameters}
+    # Matches dashboard logic: status='Overdue' OR (open status AND due_date < today)
+    overdue_expr = (
+        "(c.status = 'Overdue' OR "
+        "(c.status IN ('Issued', 'Partially Paid') AND c.due_date < @summary_today))"
+    )
+    results = run_report_queries({
+        'total': ReportQuery(invoices_container, (), base_where_sql, params, select="VALUE COUNT(1)"),
+        'statuses': ReportQuery(
+            invoices_container, (), base_where_sql, {**params, '@summary_today': today_iso},
+            select=f'VALUE {{"status": c.status, "overdue": {overdue_expr}}}',
+        ),
+    })
+
+    counts = {status_name: 0 for status_name in InvoiceStatus._value2member_map_.keys()}
+    overdue_count = 0
+    for row in results['statuses']:
+        if row.get('status') in counts:
+            counts[row['status']] += 1
+        if row.get('overdue') is True:
+            overdue_count += 1
+    total = int(results['total'][0]) if results['total'] else 0
+    summary = dict(counts)
+    summary['overdue_count'] = overdue_count
+    return summary, counts, total
+
+
 @api_blueprint.route('/invoices', methods=['GET'])
 @require_permission('invoices', 'view')
 def list_invoices():
@@ -692,6 +755,22 @@ def list_invoices():
         where_sql = " AND ".join(where)
         base_query = f"SELECT * FROM c WHERE {where_sql}"
 
+        if cursor_requested(request.args):
+            # Keyset (cursor) paging: no OFFSET scan and no summary/total queries.
+            try:
+                cursor_page = fetch_cursor_page(
+                    invoices_container,
+                    base_query,
+                    parameters,
+                    sort_field=sort_by,
+                    sort_order=sort_order,
+                    tenant_id=tenant_id,
+                    endpoint='invoices',
+                )
+            except InvalidCursor as exc:
+                return jsonify({"error": str(exc)}), 400
+            return jsonify(cursor_page.as_payload('items', sanitize_items(cursor_page.items)))
+
         legacy_mode = not include_meta and not any([
             request.args.get('page'),
             request.args.get('page_size'),
@@ -717,36 +796,50 @@ def list_invoices():
             enable_cross_partition_query=True,
         ))
 
-        count_query = f"SELECT VALUE COUNT(1) FROM c WHERE {where_sql}"
-        total_items = list(invoices_container.query_items(
-            query=count_query,
-            parameters=parameters,
-            enable_cross_partition_query=True,
-        ))
-        total = int(total_items[0]) if total_items else 0
-
-        summary = {}
+        # Summary/total are cached per tenant + filter hash; invoice writes drop
+        # the tenant's entries through record_rollup_change → invalidate_tenant
+        # (invoice_list_meta is one of shared_cache.FINANCIAL_NAMESPACES).
+        today_iso = datetime.utcnow().date().isoformat()
         base_where_sql = " AND ".join(base_where)
-        for status_name in InvoiceStatus._value2member_map_.keys():
-            s_params = [*base_parameters, {"name": "@summary_status", "value": status_name}]
-            s_query = f"SELECT VALUE COUNT(1) FROM c WHERE {base_where_sql} AND c.status = @summary_status"
-            s_result = list(invoices_container.query_items(
-                query=s_query,
-                parameters=s_params,
-                enable_cross_partition_query=True,
-            ))
-            summary[status_name] = int(s_result[0]) if s_result else 0
-
-        # Effective overdue count: matches dashboard logic (due_date < today AND open status)
-        oc_today = datetime.utcnow().date().isoformat()
-        oc_params = [*base_parameters, {"name": "@oc_today", "value": oc_today}]
-        oc_where_sql = base_where_sql + " AND (c.status = 'Overdue' OR (c.status IN ('Issued', 'Partially Paid') AND c.due_date < @oc_today))"
-        oc_result = list(invoices_container.query_items(
-            query=f"SELECT VALUE COUNT(1) FROM c WHERE {oc_where_sql}",
-            parameters=oc_params,
-            enable_cross_partition_query=True,
-        ))
-        summary['overdue_count'] = int(oc_result[0]) if oc_result else 0
+        use_cache = not current_app.config.get('TESTING')
+
+        def _load_summary():
+            return _invoice_status_summary(base_where_sql, base_parameters, today_iso)
+
+        if use_cache:
+            summary, by_status, total_all = _list_meta_cache.get_or_compute(
+                tenant_id, ('summary', lifecycle, today_iso), _load_summary,
+            )
+        else:
+            summary, by_status, total_all = _load_summary()
+
+        only_status_filter = not any([search_query, date_range, min_amount, max_amount]) and (
+            not status_filter or status_filter.lower() == 'overdue' or status_filter in by_status
+        )
+        if only_status_filter:
+            # The summary counts already cover this filter — no extra COUNT needed.
+            if not status_filter:
+                total = total_all
+            elif status_filter.lower() == 'overdue':
+                total = summary['overdue_count']
+            else:
+                total = by_status.get(status_filter, 0)
+        else:
+            def _load_total():
+                count_query = f"SELECT VALUE COUNT(1) FROM c WHERE {where_sql}"
+                total_items = list(invoices_container.query_items(
+                    query=count_query,
+                    parameters=parameters,
+                    enable_cross_partition_query=True,
+                ))
+                return int(total_items[0]) if total_items else 0
+
+            if use_cache:
+                total = _list_meta_cache.get_or_compute(
+                    tenant_id, ('total', where_sql, parameters), _load_total,
+                )
+            else:
+                total = _load_total()
 
         return jsonify({
             "items": sanitize_items(items),
@@ -759,12 +852,24 @@ def list_invoices():
         return jsonify({"error": f"Failed to fetch invoices: {str(e)}"}), 500
 
 
+_INVOICE_EXPORT_COLUMNS = [
+    CsvColumn("Invoice #", "invoice_number"),
+    CsvColumn("Customer", "customer_name"),
+    CsvColumn("Issue Date", "issue_date"),
+    CsvColumn("Due Date", "due_date"),
+    CsvColumn("Status", "status"),
+    CsvColumn("Subtotal", "subtotal", 0),
+    CsvColumn("Tax", "total_tax", 0),
+    CsvColumn("Total", "total_amount", 0),
+    CsvColumn("Amount Paid", "amount_paid", 0),
+    CsvColumn("Balance Due", "balance_due", 0),
+]
+
+
 @api_blueprint.route('/invoices/export', methods=['GET'])
 @require_permission('invoices', 'view')
 def export_invoices_csv():
-    """Export invoices as a CSV file. Accepts same filter params as list endpoint."""
-    import csv
-    import io as _io
+    """Export invoices as a streamed CSV file. Accepts same filter params as list endpoint."""
     try:
         tenant_id = request.tenant_id
         status_filter = request.args.get('status')
@@ -823,42 +928,73 @@ def export_invoices_csv():
 
         where_sql = " AND ".join(where)
         query = f"SELECT * FROM c WHERE {where_sql} ORDER BY c.issue_date DESC"
-        items = list(invoices_container.query_items(
-            query=query,
-            parameters=parameters,
-            enable_cross_partition_query=True,
-        ))
-
-        output = _io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow([
-            "Invoice #", "Customer", "Issue Date", "Due Date", "Status",
-            "Subtotal", "Tax", "Total", "Amount Paid", "Balance Due"
-        ])
-        for inv in items:
-            writer.writerow([
-                inv.get("invoice_number", ""),
-                inv.get("customer_name", ""),
-                inv.get("issue_date", ""),
-                inv.get("due_date", ""),
-                inv.get("status", ""),
-                inv.get("subtotal", 0),
-                inv.get("total_tax", 0),
-                inv.get("total_amount", 0),
-                inv.get("amount_paid", 0),
-                inv.get("balance_due", 0),
-            ])
-
-        csv_data = output.getvalue()
-        response = make_response(csv_data)
-        response.headers["Content-Type"] = "text/csv; charset=utf-8"
-        response.headers["Content-Disposition"] = "attachment; filename=invoices-export.csv"
-        return response
+        return stream_query_csv(
+            invoices_container, query, parameters,
+            columns=_INVOICE_EXPORT_COLUMNS,
+            filename="invoices-export.csv",
+        )
 
     except Exception as e:
         return jsonify({"error": f"Failed to export invoices: {str(e)}"}), 500
 
 
+def _pdf_export_payload(job_doc):
+    payload = {k: v for k, v in job_doc.items() if k not in ('archive_path', 'archive_host') and not k.startswith('_')}
+    if job_doc.get('status') == 'completed' and not bulk_export_service.is_expired(job_doc):
+        payload['download_url'] = f"/api/invoices/pdf-exports/{job_doc['id']}/download"
+    return payload
+
+
+@api_blueprint.route('/invoices/pdf-exports', methods=['POST'])
+@require_permission('invoices', 'view')
+def create_invoice_pdf_export():
+    """Start a bulk PDF export; body filters: date_from, date_to, status, customer_id."""
+    try:
+        filters = bulk_export_service.normalize_filters(request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        job_doc = bulk_export_service.create_export_job(
+            tenant_id=request.tenant_id,
+            user_id=getattr(request, 'user_id', None),
+            filters=filters,
+        )
+    except Exception as e:
+        return jsonify({"error": f"Failed to start PDF export: {str(e)}"}), 500
+    return jsonify(_pdf_export_payload(job_doc)), 202
+
+
+@api_blueprint.route('/invoices/pdf-exports/<job_id>', methods=['GET'])
+@require_permission('invoices', 'view')
+def get_invoice_pdf_export(job_id):
+    job_doc = bulk_export_service.get_job(tenant_id=request.tenant_id, job_id=job_id)
+    if not job_doc:
+        return jsonify({"error": "Export job not found"}), 404
+    return jsonify(_pdf_export_payload(job_doc))
+
+
+@api_blueprint.route('/invoices/pdf-exports/<job_id>/download', methods=['GET'])
+@require_permission('invoices', 'view')
+def download_invoice_pdf_export(job_id):
+    job_doc = bulk_export_service.get_job(tenant_id=request.tenant_id, job_id=job_id)
+    if not job_doc:
+        return jsonify({"error": "Export job not found"}), 404
+    if job_doc.get('status') != 'completed':
+        return jsonify({"error": "Export is not ready", "status": job_doc.get('status')}), 409
+    if bulk_export_service.is_expired(job_doc):
+        return jsonify({"error": "Export archive has expired"}), 410
+    try:
+        chunks = bulk_export_service.open_archive(job_doc)
+    except FileNotFoundError as e:
+        return jsonify({"error": str(e) or "Export archive has expired"}), 410
+    filename = f"invoices-{job_doc['created_at'][:10]}.zip"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if job_doc.get('archive_bytes'):
+        headers["Content-Length"] = str(job_doc['archive_bytes'])
+    return Response(chunks, mimetype='application/zip', headers=headers)
+
+
+
 # @api_blueprint.route('/invoices/<customer_id>', methods=['GET'])
 # @swag_from({
 #     'tags': ['Invoices'],
@@ -1162,6 +1298,10 @@ def update_invoice(invoice_id):
         _adjust_stock(normalized_items, _inv_num, invoice_id, request.tenant_id, 'OUT')
 
     invoices_container.replace_item(item=item['id'], body=item)
+    record_rollup_change('invoice', before_snapshot, item)
+    record_invoice_write(before_snapshot, item)
+    if _new_committed and not _old_committed:
+        schedule_pdf_prerender(request.tenant_id, item, 'invoice')
     log_audit("invoice", "update", invoice_id, before_snapshot, item,
               user_id=getattr(request, 'user_id', None), tenant_id=request.tenant_id)
     dispatch_webhook_event(
@@ -1365,6 +1505,10 @@ def patch_invoice(invoice_id):
         item[k] = v
     item['updated_at'] = datetime.utcnow().isoformat()
     invoices_container.replace_item(item=item['id'], body=item)
+    record_rollup_change('invoice', before_snapshot, item)
+    record_invoice_write(before_snapshot, item)
+    if item.get('status') in _STOCK_COMMITTED and before_snapshot.get('status') not in _STOCK_COMMITTED:
+        schedule_pdf_prerender(request.tenant_id, item, 'invoice')
     log_audit("invoice", "update", invoice_id, before_snapshot, item,
               user_id=getattr(request, 'user_id', None), tenant_id=request.tenant_id)
     dispatch_webhook_event(
@@ -1691,6 +1835,8 @@ def record_payment(invoice_id):
         inv['updated_at']      = datetime.utcnow().isoformat()
 
         invoices_container.replace_item(item=inv['id'], body=inv)
+        record_rollup_change('invoice', before_payment_snapshot, inv)
+        record_invoice_write(before_payment_snapshot, inv)
         log_audit_event({
             "action": "PAYMENT_RECORDED",
             "entity": "invoice",
@@ -1782,6 +1928,8 @@ def void_invoice(invoice_id):
                       invoice_id, request.tenant_id, 'IN')
 
         invoices_container.replace_item(item=inv['id'], body=inv)
+        record_rollup_change('invoice', before_snapshot, inv)
+        record_invoice_write(before_snapshot, inv)
 
         try:
             log_audit(
@@ -1838,21 +1986,20 @@ def void_invoice(invoice_id):
         }
     ],
     'responses': {
-        '200': {'description': 'Email sent successfully'},
+        '200': {'description': 'Email sent (inline delivery)'},
+        '202': {'description': 'Email queued for delivery; email_status is written back to the invoice'},
         '400': {'description': 'Customer email not set or validation error'},
         '404': {'description': 'Invoice not found'},
         '503': {'description': 'Email service not configured'}
     }
 })
 def send_invoice_email(invoice_id):
-    """Send an invoice to the customer via Azure Communication Services."""
+    """Queue an invoice email to the customer on the email outbox."""
     import os
-    from azure.communication.email import EmailClient
 
-    connection_string = os.getenv('AZURE_EMAIL_CONNECTION_STRING')
-    sender_address    = os.getenv('SENDER_EMAIL', 'noreply@solidevelectrosoft.com')
+    sender_address = os.getenv('SENDER_EMAIL', 'noreply@solidevelectrosoft.com')
 
-    if not connection_string:
+    if not email_configured():
         return jsonify({'error': 'Email service not configured on the server'}), 503
 
     data       = request.get_json() or {}
@@ -1946,8 +2093,9 @@ def send_invoice_email(invoice_id):
         if attach_pdf:
             try:
                 _branding = _get_tenant_branding(request.tenant_id)
-                pdf_bytes = build_invoice_pdf(inv, branding=_branding, doc_type='invoice',
-                                             gst_mode=get_org_gst_mode(request.tenant_id))
+                pdf_bytes, _ = render_pdf_cached(inv, _branding, 'invoice',
+                                                 get_org_gst_mode(request.tenant_id),
+                                                 tenant_id=request.tenant_id)
                 email_message["attachments"] = [{
                     "name":          f"invoice_{invoice_number}.pdf",
                     "contentType":   "application/pdf",
@@ -1956,16 +2104,14 @@ def send_invoice_email(invoice_id):
             except Exception as pdf_err:
                 print(f"WARNING: PDF generation failed, sending without attachment: {pdf_err}")
 
-        # ── Send via Azure Communication Services ─────────────────────────────
-        client = EmailClient.from_connection_string(connection_string)
-        poller = client.begin_send(email_message)
-        result = poller.result()
-
         # ── Stamp invoice document ────────────────────────────────────────────
+        # The outbox worker writes email_status 'sent' / 'failed' back later.
         now = datetime.utcnow().isoformat()
-        inv['email_status']  = 'sent'
-        inv['email_sent_at'] = now
-        inv['last_sent_at']  = now             # backward-compat
+        outbox_id = str(uuid.uuid4())
+        inv['email_status']    = 'queued'
+        inv['email_outbox_id'] = outbox_id
+        inv['email_queued_at'] = now
+        inv['last_sent_at']    = now           # backward-compat
         inv['last_sent_to']  = recipient_email
         inv['updated_at']    = now
         if inv.get('status') == 'Draft':       # auto-advance on first send
@@ -1985,6 +2131,17 @@ def send_invoice_email(invoice_id):
             }
 
         invoices_container.replace_item(item=inv['id'], body=inv)
+        record_rollup_change('invoice', before_send_snapshot, inv)
+        record_invoice_write(before_send_snapshot, inv)
+        schedule_pdf_prerender(request.tenant_id, inv, 'invoice')
+
+        # ── Hand off to the email outbox ──────────────────────────────────────
+        sent = queue_email(request.tenant_id, email_message,
+                           target=document_target('invoices', inv, 'customer_id'),
+                           outbox_id=outbox_id)
+        if sent['status'] == 'failed':
+            return jsonify({'error': f"Failed to send email: {sent['error']}"}), 500
+
         log_audit_event({
             "action": "INVOICE_SENT",
             "entity": "invoice",
@@ -2000,13 +2157,16 @@ def send_invoice_email(invoice_id):
             "tenant_id": request.tenant_id,
         })
 
+        queued = sent['status'] == 'queued'
         return jsonify({
-            'message':        'Invoice email sent successfully',
+            'message':        'Invoice email queued for delivery' if queued else 'Invoice email sent successfully',
             'sent_to':        recipient_email,
-            'message_id':     result.get('id'),
+            'outbox_id':      outbox_id,
+            'message_id':     sent['message_id'],
+            'email_status':   sent['status'],
             'invoice_status': inv['status'],
             'pdf_attached':   attach_pdf and 'attachments' in email_message
-        }), 200
+        }), 202 if queued else 200
 
     except Exception as e:
         # Stamp failure on the invoice doc so the UI shows "Failed"
@@ -2039,13 +2199,10 @@ def get_invoice_pdf(invoice_id):
 
     try:
         _branding = branding_for_document(inv, request.tenant_id)
-        pdf_bytes = build_invoice_pdf(inv, branding=_branding, doc_type='invoice',
-                                     gst_mode=get_org_gst_mode(request.tenant_id))
         inv_number = inv.get('invoice_number', 'invoice').replace('/', '-')
-        response = make_response(pdf_bytes)
-        response.headers['Content-Type'] = 'application/pdf'
-        response.headers['Content-Disposition'] = f'inline; filename={inv_number}.pdf'
-        return response
+        return pdf_response(inv, tenant_id=request.tenant_id, filename=inv_number,
+                            branding=_branding, doc_type='invoice',
+                            gst_mode=get_org_gst_mode(request.tenant_id))
     except Exception as e:
         return jsonify({'error': f'Failed to generate PDF: {str(e)}'}), 500
 
@@ -2078,9 +2235,8 @@ def send_invoice_reminder(invoice_id):
     if not recipient_email:
         return jsonify({'error': 'No customer email on invoice. Pass recipient_email in body.'}), 400
 
-    acs_conn = os.getenv('AZURE_COMMUNICATION_CONNECTION_STRING')
-    sender   = os.getenv('ACS_SENDER_ADDRESS', 'donotreply@youremaildomain.com')
-    if not acs_conn:
+    sender = os.getenv('ACS_SENDER_ADDRESS', 'donotreply@youremaildomain.com')
+    if not email_configured():
         return jsonify({'error': 'Email service not configured on server.'}), 503
 
     inv_number  = inv.get('invoice_number', '')
@@ -2101,9 +2257,7 @@ def send_invoice_reminder(invoice_id):
     )
 
     try:
-        from azure.communication.email import EmailClient
-        client = EmailClient.from_connection_string(acs_conn)
-        poller = client.begin_send({
+        sent = queue_email(request.tenant_id, {
             "senderAddress": sender,
             "recipients": {"to": [{"address": recipient_email}]},
             "content": {
@@ -2112,7 +2266,10 @@ def send_invoice_reminder(invoice_id):
                 "html": html,
             },
         })
-        poller.result()
+        if sent['status'] == 'failed':
+            return jsonify({'error': f"Failed to send reminder: {sent['error']}"}), 500
+        if sent['status'] == 'queued':
+            return jsonify({'message': 'Reminder queued for delivery', 'outbox_id': sent['id']}), 202
         return jsonify({'message': 'Reminder sent successfully'}), 200
     except Exception as e:
         return jsonify({'error': f'Failed to send reminder: {str(e)}'}), 500
@@ -46,6 +46,7 @@ from smart_invoice_pro.utils.demo_guard import (
 )
 from smart_invoice_pro.utils.org_tax_mode import derive_gst_mode
 from smart_invoice_pro.utils.audit_logger import log_audit
+from smart_invoice_pro.utils.tenant_settings import invalidate_tenant_settings
 import copy
 
 org_profile_blueprint = Blueprint('org_profile', __name__)
@@ -202,6 +203,7 @@ def update_org_profile():
         }
 
         settings_container.upsert_item(doc)
+        invalidate_tenant_settings(request.tenant_id)
         log_audit(
             "organization_profile", "update", doc["id"], before_snapshot, doc,
             user_id=getattr(request, "user_id", None),
@@ -15,11 +15,14 @@ Required environment variables:
 """
 
 from flask import Blueprint, request, jsonify
+import copy
 import os, uuid, hmac, hashlib, requests
 from datetime import datetime
 from dotenv import load_dotenv
 from smart_invoice_pro.utils.cosmos_client import invoices_container, get_container
 from smart_invoice_pro.utils.permission_checker import require_permission
+from smart_invoice_pro.utils.dashboard_rollups import record_rollup_change
+from smart_invoice_pro.utils.reminder_schedule import record_invoice_write
 
 load_dotenv()
 
@@ -228,6 +231,7 @@ def zoho_payments_webhook():
                 ))
                 if inv_items:
                     inv = inv_items[0]
+                    before_inv         = copy.deepcopy(inv)
                     total_amount       = max(0.0, float(inv.get("total_amount", 0)))
                     new_amount_paid    = round(float(inv.get("amount_paid", 0)) + amount_paid, 2)
                     new_balance_due    = round(max(0.0, total_amount - new_amount_paid), 2)
@@ -248,6 +252,8 @@ def zoho_payments_webhook():
                         item=inv["id"], body=inv,
                         partition_key=inv.get("customer_id")
                     )
+                    record_rollup_change("invoice", before_inv, inv)
+                    record_invoice_write(before_inv, inv)
             except Exception as e:
                 print(f"[Payments] Failed to update invoice: {e}")
 
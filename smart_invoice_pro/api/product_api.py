@@ -20,6 +20,10 @@ from smart_invoice_pro.utils.bulk_archive_contracts import (
 )
 from smart_invoice_pro.utils.domain_events import record_bulk_archive_completed
 from smart_invoice_pro.utils.permission_checker import require_permission
+from smart_invoice_pro.utils.dashboard_rollups import record_rollup_change
+from smart_invoice_pro.utils.stock_balances import load_stock_map
+from smart_invoice_pro.utils.stock_utils import compute_current_stock
+from smart_invoice_pro.utils.cursor_pagination import InvalidCursor, cursor_requested, fetch_cursor_page
 
 # Create or get the products container (partition key: /product_id)
 products_container = get_container("products", "/product_id")
@@ -130,6 +134,38 @@ def _is_truthy(value):
     return str(value or '').strip().lower() in ('1', 'true', 'yes', 'y')
 
 
+def _tenant_stock_map(tenant_id, product_ids=None):
+    """
+    Return {product_id: on_hand}, from materialized balances when rebuilt.
+    ``product_ids`` narrows the ledger fallback to one page of products.
+    """
+    stock_map = load_stock_map(tenant_id)
+    if stock_map is not None:
+        return stock_map
+
+    query = "SELECT c.product_id, c.type, c.quantity FROM c WHERE c.tenant_id = @tenant_id"
+    parameters = [{"name": "@tenant_id", "value": tenant_id}]
+    if product_ids is not None:
+        query += " AND ARRAY_CONTAINS(@product_ids, c.product_id)"
+        parameters.append({"name": "@product_ids", "value": list(product_ids)})
+    stock_transactions = get_container("stock", "/product_id").query_items(
+        query=query,
+        parameters=parameters,
+        enable_cross_partition_query=True
+    )
+    stock_map = {}
+    for txn in stock_transactions:
+        pid = txn.get('product_id')
+        qty = float(txn.get('quantity', 0))
+        if pid not in stock_map:
+            stock_map[pid] = 0.0
+        if txn.get('type') == 'IN':
+            stock_map[pid] += qty
+        elif txn.get('type') == 'OUT':
+            stock_map[pid] -= qty
+    return stock_map
+
+
 def _stock_bucket(stock, reorder_level):
     """Return stock bucket string matching frontend getStockMeta logic."""
     qty = float(stock or 0)
@@ -245,6 +281,7 @@ def create_product():
         'updated_at': now
     }
     products_container.create_item(body=item)
+    record_rollup_change('product', None, item)
     log_audit_event({
         "action": "CREATE",
         "entity": "product",
@@ -261,6 +298,38 @@ def create_product():
 # ─────────────────────────────────────────────
 #  LIST
 # ─────────────────────────────────────────────
+def _list_products_cursor_page(lifecycle, sort_by, sort_order):
+    """Cursor-mode product listing; the lifecycle filter mirrors _is_archived in SQL."""
+    where = ["c.tenant_id = @tenant_id"]
+    parameters = [
+        {"name": "@tenant_id", "value": request.tenant_id},
+        {"name": "@archived_status", "value": "ARCHIVED"},
+    ]
+    if lifecycle == 'archived':
+        where.append("(c.status = @archived_status OR c.is_deleted = true)")
+    elif lifecycle != 'all':
+        where.append(
+            "(NOT IS_DEFINED(c.status) OR c.status != @archived_status) "
+            "AND (NOT IS_DEFINED(c.is_deleted) OR c.is_deleted != true)"
+        )
+    else:
+        parameters = parameters[:1]
+    query = f"SELECT * FROM c WHERE {' AND '.join(where)}"
+
+    try:
+        page = fetch_cursor_page(
+            products_container, query, parameters,
+            sort_field=sort_by, sort_order=sort_order,
+            tenant_id=request.tenant_id, endpoint='products',
+        )
+    except InvalidCursor as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    stock_map = _tenant_stock_map(request.tenant_id, [p.get('id') for p in page.items])
+    result = [dict(product, stock=stock_map.get(product.get('id'), 0.0)) for product in page.items]
+    return jsonify(page.as_payload('data', sanitize_items(result)))
+
+
 @product_blueprint.route('/products', methods=['GET'])
 @require_permission('products', 'view')
 @swag_from({
@@ -283,6 +352,9 @@ def list_products():
 
     lifecycle = str(request.args.get('lifecycle', 'active')).strip().lower()
 
+    if cursor_requested(request.args):
+        return _list_products_cursor_page(lifecycle, sort_by, sort_order)
+
     query = f"SELECT * FROM c WHERE c.tenant_id = @tenant_id ORDER BY c.{sort_by} {sort_order}"
     items = list(products_container.query_items(
         query=query,
@@ -298,22 +370,7 @@ def list_products():
         # Default to active records only.
         items = [p for p in items if not _is_archived(p)]
 
-    stock_transactions = list(get_container("stock", "/product_id").query_items(
-        query="SELECT * FROM c WHERE c.tenant_id = @tenant_id",
-        parameters=[{"name": "@tenant_id", "value": request.tenant_id}],
-        enable_cross_partition_query=True
-    ))
-    # Aggregate stock by product_id
-    stock_map = {}
-    for txn in stock_transactions:
-        pid = txn.get('product_id')
-        qty = float(txn.get('quantity', 0))
-        if pid not in stock_map:
-            stock_map[pid] = 0.0
-        if txn.get('type') == 'IN':
-            stock_map[pid] += qty
-        elif txn.get('type') == 'OUT':
-            stock_map[pid] -= qty
+    stock_map = _tenant_stock_map(request.tenant_id)
     result = []
     for product in items:
         pid = product.get('id')
@@ -496,6 +553,7 @@ def update_product(product_id):
 
     item['updated_at'] = datetime.utcnow().isoformat()
     products_container.replace_item(item=item['id'], body=item)
+    record_rollup_change('product', before_snapshot, item)
     log_audit_event({
         "action": "UPDATE",
         "entity": "product",
@@ -721,22 +779,7 @@ def products_stock_summary():
         enable_cross_partition_query=True
     ))
     products = [p for p in products if not _is_archived(p)]
-    stock_transactions = list(get_container("stock", "/product_id").query_items(
-        query="SELECT * FROM c WHERE c.tenant_id = @tenant_id",
-        parameters=[{"name": "@tenant_id", "value": request.tenant_id}],
-        enable_cross_partition_query=True
-    ))
-    # Aggregate stock by product_id
-    stock_map = {}
-    for txn in stock_transactions:
-        pid = txn.get('product_id')
-        qty = float(txn.get('quantity', 0))
-        if pid not in stock_map:
-            stock_map[pid] = 0.0
-        if txn.get('type') == 'IN':
-            stock_map[pid] += qty
-        elif txn.get('type') == 'OUT':
-            stock_map[pid] -= qty
+    stock_map = _tenant_stock_map(request.tenant_id)
     result = []
     for product in products:
         pid = product.get('id')
@@ -770,23 +813,7 @@ def get_low_stock_products():
         enable_cross_partition_query=True
     ))
     products = [p for p in products if not p.get('is_deleted', False)]
-    stock_transactions = list(get_container("stock", "/product_id").query_items(
-        query="SELECT * FROM c WHERE c.tenant_id = @tenant_id",
-        parameters=[{"name": "@tenant_id", "value": request.tenant_id}],
-        enable_cross_partition_query=True
-    ))
-
-    # Calculate current stock for each product
-    stock_map = {}
-    for txn in stock_transactions:
-        pid = txn.get('product_id')
-        qty = float(txn.get('quantity', 0))
-        if pid not in stock_map:
-            stock_map[pid] = 0.0
-        if txn.get('type') == 'IN':
-            stock_map[pid] += qty
-        elif txn.get('type') == 'OUT':
-            stock_map[pid] -= qty
+    stock_map = _tenant_stock_map(request.tenant_id)
 
     # Filter products with low stock
     low_stock_products = []
@@ -868,22 +895,7 @@ def create_restock_po(product_id):
         return jsonify({'error': 'Product not found'}), 404
 
     # --- Stock level guard ---
-    # Compute live stock from transactions
-    stock_txns = list(get_container("stock", "/product_id").query_items(
-        query="SELECT * FROM c WHERE c.tenant_id = @tenant_id AND c.product_id = @pid",
-        parameters=[
-            {"name": "@tenant_id", "value": request.tenant_id},
-            {"name": "@pid",        "value": product_id},
-        ],
-        enable_cross_partition_query=True,
-    ))
-    current_stock = 0.0
-    for txn in stock_txns:
-        qty = float(txn.get('quantity', 0))
-        if txn.get('type') == 'IN':
-            current_stock += qty
-        elif txn.get('type') == 'OUT':
-            current_stock -= qty
+    current_stock = compute_current_stock(product_id, request.tenant_id)
 
     reorder_level = float(product.get('reorder_level', 0))
     # Only allow restock when stock is at or below reorder_level.
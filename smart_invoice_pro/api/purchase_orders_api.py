@@ -1,6 +1,8 @@
-from flask import Blueprint, request, jsonify, make_response
+from flask import Blueprint, request, jsonify
 from smart_invoice_pro.utils.permission_checker import require_permission
+from smart_invoice_pro.utils.dashboard_rollups import record_rollup_change
 from smart_invoice_pro.utils.cosmos_client import purchase_orders_container, bills_container
+from smart_invoice_pro.utils.email_service import document_target, email_configured, queue_email
 from smart_invoice_pro.utils.archive_service import archive_entity, restore_entity
 from smart_invoice_pro.utils.lifecycle_service import apply_lifecycle_action
 from smart_invoice_pro.utils.dependency_checker import check_entity_dependencies
@@ -9,7 +11,7 @@ import base64
 from flasgger import swag_from
 from datetime import datetime, timedelta
 from enum import Enum
-from smart_invoice_pro.api.invoice_generation import build_invoice_pdf, _get_tenant_branding, branding_for_document
+from smart_invoice_pro.api.invoice_generation import build_invoice_pdf, _get_tenant_branding, branding_for_document, pdf_response
 from smart_invoice_pro.utils.audit_logger import log_audit, log_audit_event
 import copy
 
@@ -827,6 +829,7 @@ def convert_po_to_bill(po_id):
         }
         
         created_bill = bills_container.create_item(body=bill)
+        record_rollup_change('bill', None, bill)
         
         # Update purchase order status
         po['status'] = 'Billed'
@@ -932,12 +935,9 @@ def get_po_pdf(po_id):
     }
     try:
         branding = branding_for_document(po, request.tenant_id)
-        pdf_bytes = build_invoice_pdf(doc, branding=branding, doc_type='purchase_order')
         ref = po.get('po_number', 'po').replace('/', '-')
-        response = make_response(pdf_bytes)
-        response.headers['Content-Type'] = 'application/pdf'
-        response.headers['Content-Disposition'] = f'inline; filename={ref}.pdf'
-        return response
+        return pdf_response(doc, tenant_id=request.tenant_id, filename=ref,
+                            branding=branding, doc_type='purchase_order')
     except Exception as e:
         return jsonify({'error': f'Failed to generate PDF: {str(e)}'}), 500
 
@@ -945,13 +945,11 @@ def get_po_pdf(po_id):
 @purchase_orders_blueprint.route('/purchase-orders/<po_id>/send-email', methods=['POST'])
 @require_permission('purchase_orders', 'edit')
 def send_po_email(po_id):
-    """Send a purchase order to the vendor via Azure Communication Services."""
+    """Queue a purchase order to the vendor on the email outbox."""
     import os
-    from azure.communication.email import EmailClient
 
-    connection_string = os.getenv('AZURE_EMAIL_CONNECTION_STRING')
-    sender_address    = os.getenv('SENDER_EMAIL', 'noreply@solidevelectrosoft.com')
-    if not connection_string:
+    sender_address = os.getenv('SENDER_EMAIL', 'noreply@solidevelectrosoft.com')
+    if not email_configured():
         return jsonify({'error': 'Email service not configured on the server'}), 503
 
     data = request.get_json() or {}
@@ -1029,14 +1027,13 @@ def send_po_email(po_id):
             print(f"WARNING: PO PDF generation failed: {pdf_err}")
 
     try:
-        client = EmailClient.from_connection_string(connection_string)
-        poller = client.begin_send(email_message)
-        result = poller.result()
-
+        # The outbox worker writes email_status 'sent' / 'failed' back later.
         now = datetime.utcnow().isoformat()
-        po['email_status']  = 'sent'
-        po['email_sent_at'] = now
-        po['updated_at']    = now
+        outbox_id = str(uuid.uuid4())
+        po['email_status']    = 'queued'
+        po['email_outbox_id'] = outbox_id
+        po['email_queued_at'] = now
+        po['updated_at']      = now
         if not po.get('brand_snapshot'):
             po['brand_snapshot'] = {
                 'primary_color':     _branding.get('primary_color', ''),
@@ -1048,10 +1045,19 @@ def send_po_email(po_id):
             }
         purchase_orders_container.replace_item(item=po['id'], body=po)
 
+        sent = queue_email(request.tenant_id, email_message,
+                           target=document_target('purchase_orders', po, 'vendor_id'),
+                           outbox_id=outbox_id)
+        if sent['status'] == 'failed':
+            return jsonify({'error': f"Failed to send email: {sent['error']}"}), 500
+
+        queued = sent['status'] == 'queued'
         return jsonify({
-            'message':    'Purchase order email sent successfully',
-            'sent_to':    recipient_email,
-            'message_id': result.get('id'),
-        }), 200
+            'message':      'Purchase order email queued for delivery' if queued else 'Purchase order email sent successfully',
+            'sent_to':      recipient_email,
+            'outbox_id':    outbox_id,
+            'message_id':   sent['message_id'],
+            'email_status': sent['status'],
+        }), 202 if queued else 200
     except Exception as e:
         return jsonify({'error': f'Failed to send email: {str(e)}'}), 500
\ No newline at end of file
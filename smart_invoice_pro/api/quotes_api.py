@@ -1,13 +1,16 @@
 from flask import Blueprint, request, jsonify, make_response
 from smart_invoice_pro.utils.permission_checker import require_permission
+from smart_invoice_pro.utils.dashboard_rollups import record_rollup_change
+from smart_invoice_pro.utils.reminder_schedule import record_invoice_write
 from smart_invoice_pro.utils.cosmos_client import quotes_container, invoices_container, sales_orders_container
+from smart_invoice_pro.utils.email_service import document_target, email_configured, queue_email
 from smart_invoice_pro.utils.webhook_dispatcher import dispatch_webhook_event
 import uuid
 import base64
 from flasgger import swag_from
 from datetime import datetime, timedelta
 from enum import Enum
-from smart_invoice_pro.api.invoice_generation import build_invoice_pdf, _get_tenant_branding, branding_for_document
+from smart_invoice_pro.api.invoice_generation import build_invoice_pdf, _get_tenant_branding, branding_for_document, pdf_response
 from smart_invoice_pro.utils.dependency_checker import check_entity_dependencies
 from smart_invoice_pro.utils.archive_service import archive_entity, restore_entity
 from smart_invoice_pro.utils.lifecycle_service import apply_lifecycle_action
@@ -554,6 +557,8 @@ def bulk_quote_actions():
                     'updated_at': now
                 }
                 created_invoice = invoices_container.create_item(body=invoice)
+                record_rollup_change('invoice', None, invoice)
+                record_invoice_write(None, invoice)
                 quote['status'] = 'Converted'
                 quote['converted_to_invoice_id'] = created_invoice['id']
                 quote['updated_at'] = now
@@ -941,6 +946,8 @@ def convert_quote(quote_id):
             }
             
             created_invoice = invoices_container.create_item(body=invoice)
+            record_rollup_change('invoice', None, invoice)
+            record_invoice_write(None, invoice)
             
             # Update quote status
             quote['status'] = 'Converted'
@@ -1120,13 +1127,10 @@ def get_quote_pdf(quote_id):
     doc = {**quote, 'invoice_number': quote.get('quote_number', quote['id'])}
     try:
         branding = branding_for_document(quote, request.tenant_id)
-        pdf_bytes = build_invoice_pdf(doc, branding=branding, doc_type='quote',
-                                     gst_mode=get_org_gst_mode(request.tenant_id))
         ref = quote.get('quote_number', 'quote').replace('/', '-')
-        response = make_response(pdf_bytes)
-        response.headers['Content-Type'] = 'application/pdf'
-        response.headers['Content-Disposition'] = f'inline; filename={ref}.pdf'
-        return response
+        return pdf_response(doc, tenant_id=request.tenant_id, filename=ref,
+                            branding=branding, doc_type='quote',
+                            gst_mode=get_org_gst_mode(request.tenant_id))
     except Exception as e:
         return jsonify({'error': f'Failed to generate PDF: {str(e)}'}), 500
 
@@ -1134,13 +1138,11 @@ def get_quote_pdf(quote_id):
 @quotes_blueprint.route('/quotes/<quote_id>/send-email', methods=['POST'])
 @require_permission('quotes', 'edit')
 def send_quote_email(quote_id):
-    """Send a quote to the customer via Azure Communication Services."""
+    """Queue a quote to the customer on the email outbox."""
     import os
-    from azure.communication.email import EmailClient
 
-    connection_string = os.getenv('AZURE_EMAIL_CONNECTION_STRING')
-    sender_address    = os.getenv('SENDER_EMAIL', 'noreply@solidevelectrosoft.com')
-    if not connection_string:
+    sender_address = os.getenv('SENDER_EMAIL', 'noreply@solidevelectrosoft.com')
+    if not email_configured():
         return jsonify({'error': 'Email service not configured on the server'}), 503
 
     data = request.get_json() or {}
@@ -1214,14 +1216,13 @@ def send_quote_email(quote_id):
             print(f"WARNING: Quote PDF generation failed: {pdf_err}")
 
     try:
-        client = EmailClient.from_connection_string(connection_string)
-        poller = client.begin_send(email_message)
-        result = poller.result()
-
+        # The outbox worker writes email_status 'sent' / 'failed' back later.
         now = datetime.utcnow().isoformat()
-        quote['email_status']  = 'sent'
-        quote['email_sent_at'] = now
-        quote['updated_at']    = now
+        outbox_id = str(uuid.uuid4())
+        quote['email_status']    = 'queued'
+        quote['email_outbox_id'] = outbox_id
+        quote['email_queued_at'] = now
+        quote['updated_at']      = now
         if quote.get('status') == 'Draft':
             quote['status'] = 'Sent'
         if not quote.get('brand_snapshot'):
@@ -1235,10 +1236,19 @@ def send_quote_email(quote_id):
             }
         quotes_container.replace_item(item=quote['id'], body=quote)
 
+        sent = queue_email(request.tenant_id, email_message,
+                           target=document_target('quotes', quote, 'customer_id'),
+                           outbox_id=outbox_id)
+        if sent['status'] == 'failed':
+            return jsonify({'error': f"Failed to send email: {sent['error']}"}), 500
+
+        queued = sent['status'] == 'queued'
         return jsonify({
-            'message':    'Quote email sent successfully',
-            'sent_to':    recipient_email,
-            'message_id': result.get('id'),
-        }), 200
+            'message':      'Quote email queued for delivery' if queued else 'Quote email sent successfully',
+            'sent_to':      recipient_email,
+            'outbox_id':    outbox_id,
+            'message_id':   sent['message_id'],
+            'email_status': sent['status'],
+        }), 202 if queued else 200
     except Exception as e:
         return jsonify({'error': f'Failed to send email: {str(e)}'}), 500
@@ -1,5 +1,8 @@
 from flask import Blueprint, jsonify, request
 from smart_invoice_pro.utils.permission_checker import require_permission
+from smart_invoice_pro.utils.shared_cache import cached_json_response
+from smart_invoice_pro.utils.report_queries import ReportQuery, run_report_queries
+from smart_invoice_pro.utils.report_snapshots import SnapshotSource, compute_period_report
 from smart_invoice_pro.utils.cosmos_client import (
     invoices_container, expenses_container, bills_container,
     products_container, bank_accounts_container, customers_container
@@ -11,6 +14,15 @@ from collections import defaultdict
 
 reports_blueprint = Blueprint('reports', __name__)
 
+# Report payloads are cached per tenant + query string; financial writes
+# invalidate the tenant via dashboard_rollups.record_rollup_change.
+_REPORT_CACHE_TTL_SECONDS = 300
+
+
+_OPEN_STATUSES = ['Pending', 'Partially Paid']
+_PAID_STATUSES = ['Paid', 'Partially Paid']
+_SALES_STATUSES = ['Paid', 'Partially Paid', 'Pending']
+
 
 def parse_date(date_str):
     """Parse date string to datetime object"""
@@ -20,8 +32,39 @@ def parse_date(date_str):
         return None
 
 
+def _profit_loss_partial(rows):
+    """Additive P&L figures for one month of invoices, bills and expenses."""
+    revenue_by_category = defaultdict(float)
+    for invoice in rows['invoices']:
+        if invoice.get('status') in _PAID_STATUSES:
+            # You can categorize by product categories from items
+            revenue_by_category['Sales Revenue'] += float(invoice.get('amount_paid', 0))
+
+    cogs_by_category = defaultdict(float)
+    for bill in rows['bills']:
+        if bill.get('status') in _PAID_STATUSES:
+            cogs_by_category['Purchases'] += float(bill.get('amount_paid', 0))
+
+    expenses_by_category = defaultdict(float)
+    for expense in rows['expenses']:
+        expenses_by_category[expense.get('category', 'Other')] += float(expense.get('amount', 0))
+
+    return {
+        'revenue_total': sum(revenue_by_category.values()),
+        'revenue_by_category': dict(revenue_by_category),
+        'invoice_count': len(rows['invoices']),
+        'cogs_total': sum(cogs_by_category.values()),
+        'cogs_by_category': dict(cogs_by_category),
+        'bill_count': len(rows['bills']),
+        'expenses_total': sum(expenses_by_category.values()),
+        'expenses_by_category': dict(expenses_by_category),
+        'expense_count': len(rows['expenses']),
+    }
+
+
 @reports_blueprint.route('/reports/profit-loss', methods=['GET'])
 @require_permission('reports', 'view')
+@cached_json_response('reports', ttl=_REPORT_CACHE_TTL_SECONDS)
 @swag_from({
     'summary': 'Get Profit & Loss Report',
     'description': 'Generate profit and loss statement for a date range',
@@ -74,63 +117,18 @@ def get_profit_loss():
         end_date = parse_date(request.args.get('end_date')) or datetime.now()
         start_date = parse_date(request.args.get('start_date')) or datetime(end_date.year, 1, 1)
 
-        # Get containers
-
-        # Query invoices (Revenue)
-        invoice_query = f"""
-            SELECT * FROM c 
-            WHERE c.tenant_id = '{tenant_id}' 
-            AND c.issue_date >= '{start_date.strftime('%Y-%m-%d')}' 
-            AND c.issue_date <= '{end_date.strftime('%Y-%m-%d')}'
-        """
-        invoices = list(invoices_container.query_items(query=invoice_query, enable_cross_partition_query=True))
-
-        # Calculate revenue by category
-        revenue_total = 0
-        revenue_by_category = defaultdict(float)
-        
-        for invoice in invoices:
-            if invoice.get('status') in ['Paid', 'Partially Paid']:
-                amount = float(invoice.get('amount_paid', 0))
-                revenue_total += amount
-                # You can categorize by product categories from items
-                revenue_by_category['Sales Revenue'] += amount
-
-        # Query bills (Cost of Goods Sold)
-        bills_query = f"""
-            SELECT * FROM c 
-            WHERE c.tenant_id = '{tenant_id}' 
-            AND c.bill_date >= '{start_date.strftime('%Y-%m-%d')}' 
-            AND c.bill_date <= '{end_date.strftime('%Y-%m-%d')}'
-        """
-        bills = list(bills_container.query_items(query=bills_query, enable_cross_partition_query=True))
-
-        cogs_total = 0
-        cogs_by_category = defaultdict(float)
-        
-        for bill in bills:
-            if bill.get('status') in ['Paid', 'Partially Paid']:
-                amount = float(bill.get('amount_paid', 0))
-                cogs_total += amount
-                cogs_by_category['Purchases'] += amount
-
-        # Query expenses (Operating Expenses)
-        expenses_query = f"""
-            SELECT * FROM c 
-            WHERE c.tenant_id = '{tenant_id}' 
-            AND c.expense_date >= '{start_date.strftime('%Y-%m-%d')}' 
-            AND c.expense_date <= '{end_date.strftime('%Y-%m-%d')}'
-        """
-        expenses = list(expenses_container.query_items(query=expenses_query, enable_cross_partition_query=True))
-
-        expenses_total = 0
-        expenses_by_category = defaultdict(float)
-        
-        for expense in expenses:
-            amount = float(expense.get('amount', 0))
-            expenses_total += amount
-            category = expense.get('category', 'Other')
-            expenses_by_category[category] += amount
+        p = compute_period_report(
+            tenant_id, 'profit_loss',
+            {
+                'invoices': SnapshotSource(invoices_container, ('status', 'amount_paid'), 'issue_date'),
+                'bills': SnapshotSource(bills_container, ('status', 'amount_paid'), 'bill_date'),
+                'expenses': SnapshotSource(expenses_container, ('amount', 'category'), 'expense_date'),
+            },
+            start_date.date(), end_date.date(), _profit_loss_partial,
+        )
+        revenue_total = p['revenue_total']
+        cogs_total = p['cogs_total']
+        expenses_total = p['expenses_total']
 
         # Calculate profit
         gross_profit = revenue_total - cogs_total
@@ -145,20 +143,20 @@ def get_profit_loss():
             },
             'revenue': {
                 'total': round(revenue_total, 2),
-                'by_category': dict(revenue_by_category),
-                'invoice_count': len(invoices)
+                'by_category': p['revenue_by_category'],
+                'invoice_count': p['invoice_count']
             },
             'cost_of_goods_sold': {
                 'total': round(cogs_total, 2),
-                'by_category': dict(cogs_by_category),
-                'bill_count': len(bills)
+                'by_category': p['cogs_by_category'],
+                'bill_count': p['bill_count']
             },
             'gross_profit': round(gross_profit, 2),
             'gross_margin': round(gross_margin, 2),
             'expenses': {
                 'total': round(expenses_total, 2),
-                'by_category': dict(expenses_by_category),
-                'expense_count': len(expenses)
+                'by_category': p['expenses_by_category'],
+                'expense_count': p['expense_count']
             },
             'net_profit': round(net_profit, 2),
             'net_margin': round(net_margin, 2)
@@ -170,6 +168,7 @@ def get_profit_loss():
 
 @reports_blueprint.route('/reports/balance-sheet', methods=['GET'])
 @require_permission('reports', 'view')
+@cached_json_response('reports', ttl=_REPORT_CACHE_TTL_SECONDS)
 @swag_from({
     'summary': 'Get Balance Sheet',
     'description': 'Generate balance sheet as of a specific date',
@@ -202,29 +201,43 @@ def get_balance_sheet():
 
         as_of_date = parse_date(request.args.get('as_of_date')) or datetime.now()
 
-        # Get containers
+        # AR/AP are the open subset of the inception-to-date invoices/bills, so
+        # each container is read once and split in Python.
+        params = {'@tenant_id': tenant_id, '@as_of': as_of_date.strftime('%Y-%m-%d')}
+        rows = run_report_queries({
+            'bank_accounts': ReportQuery(
+                bank_accounts_container, ('balance',), 'c.tenant_id = @tenant_id', params,
+            ),
+            'invoices': ReportQuery(
+                invoices_container, ('status', 'amount_paid', 'balance_due'),
+                'c.tenant_id = @tenant_id AND c.issue_date <= @as_of', params,
+            ),
+            'products': ReportQuery(
+                products_container, ('availableQty', 'purchase_price', 'price'),
+                'c.tenant_id = @tenant_id', params,
+            ),
+            'bills': ReportQuery(
+                bills_container, ('status', 'amount_paid', 'balance_due'),
+                'c.tenant_id = @tenant_id AND c.bill_date <= @as_of', params,
+            ),
+            'expenses': ReportQuery(
+                expenses_container, ('amount',),
+                'c.tenant_id = @tenant_id AND c.expense_date <= @as_of', params,
+            ),
+        })
+        all_invoices, all_bills = rows['invoices'], rows['bills']
 
         # Assets
         # 1. Cash (from bank accounts)
-        bank_query = f"SELECT * FROM c WHERE c.tenant_id = '{tenant_id}'"
-        bank_accounts = list(bank_accounts_container.query_items(query=bank_query, enable_cross_partition_query=True))
-        cash_total = sum(float(acc.get('balance', 0)) for acc in bank_accounts)
+        cash_total = sum(float(acc.get('balance', 0)) for acc in rows['bank_accounts'])
 
         # 2. Accounts Receivable (unpaid invoices)
-        ar_query = f"""
-            SELECT * FROM c 
-            WHERE c.tenant_id = '{tenant_id}' 
-            AND c.issue_date <= '{as_of_date.strftime('%Y-%m-%d')}'
-            AND c.status IN ('Pending', 'Partially Paid')
-        """
-        ar_invoices = list(invoices_container.query_items(query=ar_query, enable_cross_partition_query=True))
+        ar_invoices = [inv for inv in all_invoices if inv.get('status') in _OPEN_STATUSES]
         accounts_receivable = sum(float(inv.get('balance_due', 0)) for inv in ar_invoices)
 
         # 3. Inventory (available products)
-        products_query = f"SELECT * FROM c WHERE c.tenant_id = '{tenant_id}'"
-        products = list(products_container.query_items(query=products_query, enable_cross_partition_query=True))
         inventory_value = 0
-        for product in products:
+        for product in rows['products']:
             qty = float(product.get('availableQty', 0))
             cost = float(product.get('purchase_price', 0)) if product.get('purchase_price') else float(product.get('price', 0))
             inventory_value += qty * cost
@@ -233,39 +246,16 @@ def get_balance_sheet():
 
         # Liabilities
         # 1. Accounts Payable (unpaid bills)
-        ap_query = f"""
-            SELECT * FROM c 
-            WHERE c.tenant_id = '{tenant_id}' 
-            AND c.bill_date <= '{as_of_date.strftime('%Y-%m-%d')}'
-            AND c.status IN ('Pending', 'Partially Paid')
-        """
-        ap_bills = list(bills_container.query_items(query=ap_query, enable_cross_partition_query=True))
+        ap_bills = [bill for bill in all_bills if bill.get('status') in _OPEN_STATUSES]
         accounts_payable = sum(float(bill.get('balance_due', 0)) for bill in ap_bills)
 
         total_current_liabilities = accounts_payable
 
         # Equity
         # Calculate from inception profit/loss
-        all_invoices_query = f"""
-            SELECT * FROM c WHERE c.tenant_id = '{tenant_id}' 
-            AND c.issue_date <= '{as_of_date.strftime('%Y-%m-%d')}'
-        """
-        all_invoices = list(invoices_container.query_items(query=all_invoices_query, enable_cross_partition_query=True))
-        total_revenue = sum(float(inv.get('amount_paid', 0)) for inv in all_invoices if inv.get('status') in ['Paid', 'Partially Paid'])
-
-        all_expenses_query = f"""
-            SELECT * FROM c WHERE c.tenant_id = '{tenant_id}' 
-            AND c.expense_date <= '{as_of_date.strftime('%Y-%m-%d')}'
-        """
-        all_expenses = list(expenses_container.query_items(query=all_expenses_query, enable_cross_partition_query=True))
-        total_expenses = sum(float(exp.get('amount', 0)) for exp in all_expenses)
-
-        all_bills_query = f"""
-            SELECT * FROM c WHERE c.tenant_id = '{tenant_id}' 
-            AND c.bill_date <= '{as_of_date.strftime('%Y-%m-%d')}'
-        """
-        all_bills = list(bills_container.query_items(query=all_bills_query, enable_cross_partition_query=True))
-        total_cogs = sum(float(bill.get('amount_paid', 0)) for bill in all_bills if bill.get('status') in ['Paid', 'Partially Paid'])
+        total_revenue = sum(float(inv.get('amount_paid', 0)) for inv in all_invoices if inv.get('status') in _PAID_STATUSES)
+        total_expenses = sum(float(exp.get('amount', 0)) for exp in rows['expenses'])
+        total_cogs = sum(float(bill.get('amount_paid', 0)) for bill in all_bills if bill.get('status') in _PAID_STATUSES)
 
         retained_earnings = total_revenue - total_cogs - total_expenses
         total_equity = retained_earnings
@@ -315,6 +305,7 @@ def get_balance_sheet():
 
 @reports_blueprint.route('/reports/ap-aging', methods=['GET'])
 @require_permission('reports', 'view')
+@cached_json_response('reports', ttl=_REPORT_CACHE_TTL_SECONDS)
 @swag_from({
     'summary': 'Get Accounts Payable Aging Report',
     'description': 'Generate A/P aging report showing unpaid bills by age brackets',
@@ -348,13 +339,17 @@ def get_ap_aging():
         as_of_date = parse_date(request.args.get('as_of_date')) or datetime.now()
 
 
-        query = f"""
-            SELECT * FROM c
-            WHERE c.tenant_id = '{tenant_id}'
-            AND c.status IN ('Pending', 'Partially Paid')
-            AND c.bill_date <= '{as_of_date.strftime('%Y-%m-%d')}'
-        """
-        bills = list(bills_container.query_items(query=query, enable_cross_partition_query=True))
+        bills = run_report_queries({
+            'bills': ReportQuery(
+                bills_container,
+                ('id', 'bill_number', 'vendor_id', 'vendor_name', 'bill_date', 'due_date',
+                 'total_amount', 'amount_paid', 'balance_due', 'status'),
+                'c.tenant_id = @tenant_id AND ARRAY_CONTAINS(@statuses, c.status) '
+                'AND c.bill_date <= @as_of',
+                {'@tenant_id': tenant_id, '@statuses': _OPEN_STATUSES,
+                 '@as_of': as_of_date.strftime('%Y-%m-%d')},
+            ),
+        })['bills']
 
         aging_buckets = {'current': [], '1-30': [], '31-60': [], '61-90': [], '90+': []}
         aging_totals  = {'current': 0, '1-30': 0, '31-60': 0, '61-90': 0, '90+': 0}
@@ -430,6 +425,7 @@ def get_ap_aging():
 
 @reports_blueprint.route('/reports/aging', methods=['GET'])
 @require_permission('reports', 'view')
+@cached_json_response('reports', ttl=_REPORT_CACHE_TTL_SECONDS)
 @swag_from({
     'summary': 'Get Accounts Receivable Aging Report',
     'description': 'Generate A/R aging report showing unpaid invoices by age brackets',
@@ -462,20 +458,23 @@ def get_ar_aging():
 
         as_of_date = parse_date(request.args.get('as_of_date')) or datetime.now()
 
-        # Get containers
-
-        # Query unpaid/partially paid invoices
-        query = f"""
-            SELECT * FROM c 
-            WHERE c.tenant_id = '{tenant_id}' 
-            AND c.status IN ('Pending', 'Partially Paid')
-            AND c.issue_date <= '{as_of_date.strftime('%Y-%m-%d')}'
-        """
-        invoices = list(invoices_container.query_items(query=query, enable_cross_partition_query=True))
-
-        # Get customer names
-        customers_query = f"SELECT * FROM c WHERE c.tenant_id = '{tenant_id}'"
-        customers = list(customers_container.query_items(query=customers_query, enable_cross_partition_query=True))
+        # Unpaid/partially paid invoices and customer names, fetched together
+        rows = run_report_queries({
+            'invoices': ReportQuery(
+                invoices_container,
+                ('id', 'invoice_number', 'customer_id', 'customer_name', 'issue_date', 'due_date',
+                 'total_amount', 'amount_paid', 'balance_due', 'status'),
+                'c.tenant_id = @tenant_id AND ARRAY_CONTAINS(@statuses, c.status) '
+                'AND c.issue_date <= @as_of',
+                {'@tenant_id': tenant_id, '@statuses': _OPEN_STATUSES,
+                 '@as_of': as_of_date.strftime('%Y-%m-%d')},
+            ),
+            'customers': ReportQuery(
+                customers_container, ('id', 'display_name', 'name'),
+                'c.tenant_id = @tenant_id', {'@tenant_id': tenant_id},
+            ),
+        })
+        invoices, customers = rows['invoices'], rows['customers']
         customer_map = {c['id']: c.get('display_name') or c.get('name', '') for c in customers}
         # Fallback: use the customer_name snapshot stored on invoice (survives customer deletion)
         invoice_name_map = {
@@ -595,8 +594,18 @@ def get_ar_aging():
         return jsonify({'error': str(e)}), 500
 
 
+def _cash_flow_partial(rows):
+    """Additive operating cash figures for one month."""
+    return {
+        'cash_received': sum(float(inv.get('amount_paid', 0)) for inv in rows['invoices']),
+        'cash_paid_expenses': sum(float(exp.get('amount', 0)) for exp in rows['expenses']),
+        'cash_paid_suppliers': sum(float(bill.get('amount_paid', 0)) for bill in rows['bills']),
+    }
+
+
 @reports_blueprint.route('/reports/cash-flow', methods=['GET'])
 @require_permission('reports', 'view')
+@cached_json_response('reports', ttl=_REPORT_CACHE_TTL_SECONDS)
 @swag_from({
     'summary': 'Get Cash Flow Report',
     'description': 'Generate cash flow statement for a date range',
@@ -637,38 +646,25 @@ def get_cash_flow():
         end_date = parse_date(request.args.get('end_date')) or datetime.now()
         start_date = parse_date(request.args.get('start_date')) or datetime(end_date.year, 1, 1)
 
-        # Get containers
+        p = compute_period_report(
+            tenant_id, 'cash_flow',
+            {
+                'invoices': SnapshotSource(invoices_container, ('amount_paid',), 'issue_date'),
+                'expenses': SnapshotSource(expenses_container, ('amount',), 'expense_date'),
+                'bills': SnapshotSource(bills_container, ('amount_paid',), 'bill_date'),
+            },
+            start_date.date(), end_date.date(), _cash_flow_partial,
+        )
 
         # Cash from Operating Activities
         # Cash received from customers (paid invoices)
-        invoices_query = f"""
-            SELECT * FROM c 
-            WHERE c.tenant_id = '{tenant_id}' 
-            AND c.issue_date >= '{start_date.strftime('%Y-%m-%d')}' 
-            AND c.issue_date <= '{end_date.strftime('%Y-%m-%d')}'
-        """
-        invoices = list(invoices_container.query_items(query=invoices_query, enable_cross_partition_query=True))
-        cash_received = sum(float(inv.get('amount_paid', 0)) for inv in invoices)
+        cash_received = p['cash_received']
 
         # Cash paid for expenses
-        expenses_query = f"""
-            SELECT * FROM c 
-            WHERE c.tenant_id = '{tenant_id}' 
-            AND c.expense_date >= '{start_date.strftime('%Y-%m-%d')}' 
-            AND c.expense_date <= '{end_date.strftime('%Y-%m-%d')}'
-        """
-        expenses = list(expenses_container.query_items(query=expenses_query, enable_cross_partition_query=True))
-        cash_paid_expenses = sum(float(exp.get('amount', 0)) for exp in expenses)
+        cash_paid_expenses = p['cash_paid_expenses']
 
         # Cash paid to suppliers (paid bills)
-        bills_query = f"""
-            SELECT * FROM c 
-            WHERE c.tenant_id = '{tenant_id}' 
-            AND c.bill_date >= '{start_date.strftime('%Y-%m-%d')}' 
-            AND c.bill_date <= '{end_date.strftime('%Y-%m-%d')}'
-        """
-        bills = list(bills_container.query_items(query=bills_query, enable_cross_partition_query=True))
-        cash_paid_suppliers = sum(float(bill.get('amount_paid', 0)) for bill in bills)
+        cash_paid_suppliers = p['cash_paid_suppliers']
 
         net_cash_operating = cash_received - cash_paid_expenses - cash_paid_suppliers
 
@@ -696,8 +692,35 @@ def get_cash_flow():
         return jsonify({'error': str(e)}), 500
 
 
+def _sales_summary_partial(rows):
+    """Additive sales totals, per-customer and per-month figures for one month."""
+    partial = {'total_revenue': 0.0, 'total_paid': 0.0, 'invoice_count': 0, 'customers': {}, 'monthly': {}}
+    for inv in rows['invoices']:
+        amount = float(inv.get('total_amount', 0))
+        paid   = float(inv.get('amount_paid', 0))
+        partial['total_revenue'] += amount
+        partial['total_paid']    += paid
+        partial['invoice_count'] += 1
+
+        cid = inv.get('customer_id', inv['id'])
+        customer = partial['customers'].setdefault(
+            cid, {'customer_name': 'Unknown', 'invoice_count': 0, 'total_amount': 0.0, 'total_paid': 0.0},
+        )
+        customer['customer_name']  = inv.get('customer_name', 'Unknown')
+        customer['invoice_count'] += 1
+        customer['total_amount']  += amount
+        customer['total_paid']    += paid
+
+        issue_date = inv.get('issue_date', '')
+        if issue_date and len(issue_date) >= 7:
+            month_key = issue_date[:7]  # YYYY-MM
+            partial['monthly'][month_key] = partial['monthly'].get(month_key, 0.0) + amount
+    return partial
+
+
 @reports_blueprint.route('/reports/sales-summary', methods=['GET'])
 @require_permission('reports', 'view')
+@cached_json_response('reports', ttl=_REPORT_CACHE_TTL_SECONDS)
 def get_sales_summary():
     """Get Sales Summary Report — revenue by customer and by month"""
     try:
@@ -707,36 +730,19 @@ def get_sales_summary():
         end_date   = parse_date(request.args.get('end_date'))   or datetime.now()
 
 
-        query = f"""
-            SELECT * FROM c
-            WHERE c.tenant_id = '{tenant_id}'
-            AND c.issue_date >= '{start_date.strftime('%Y-%m-%d')}'
-            AND c.issue_date <= '{end_date.strftime('%Y-%m-%d')}'
-            AND c.status IN ('Paid', 'Partially Paid', 'Pending')
-        """
-        invoices = list(invoices_container.query_items(query=query, enable_cross_partition_query=True))
-
-        total_revenue = 0.0
-        total_paid    = 0.0
-        customer_map  = defaultdict(lambda: {'customer_name': 'Unknown', 'invoice_count': 0, 'total_amount': 0.0, 'total_paid': 0.0})
-        monthly_map   = defaultdict(float)
-
-        for inv in invoices:
-            amount = float(inv.get('total_amount', 0))
-            paid   = float(inv.get('amount_paid', 0))
-            total_revenue += amount
-            total_paid    += paid
-
-            cid = inv.get('customer_id', inv['id'])
-            customer_map[cid]['customer_name']  = inv.get('customer_name', 'Unknown')
-            customer_map[cid]['invoice_count'] += 1
-            customer_map[cid]['total_amount']  += amount
-            customer_map[cid]['total_paid']    += paid
-
-            issue_date = inv.get('issue_date', '')
-            if issue_date and len(issue_date) >= 7:
-                month_key = issue_date[:7]  # YYYY-MM
-                monthly_map[month_key] += amount
+        p = compute_period_report(
+            tenant_id, 'sales_summary',
+            {'invoices': SnapshotSource(
+                invoices_container, ('id', 'total_amount', 'amount_paid', 'customer_id', 'customer_name'),
+                'issue_date', 'ARRAY_CONTAINS(@statuses, c.status)', {'@statuses': _SALES_STATUSES},
+            )},
+            start_date.date(), end_date.date(), _sales_summary_partial,
+        )
+        total_revenue = p.get('total_revenue', 0.0)
+        total_paid    = p.get('total_paid', 0.0)
+        invoice_count = p.get('invoice_count', 0)
+        customer_map  = p.get('customers', {})
+        monthly_map   = p.get('monthly', {})
 
         customer_summary = sorted(
             [
@@ -758,7 +764,7 @@ def get_sales_summary():
             for month, amt in sorted(monthly_map.items())
         ]
 
-        avg_invoice = (total_revenue / len(invoices)) if invoices else 0
+        avg_invoice = (total_revenue / invoice_count) if invoice_count else 0
 
         return jsonify({
             'period': {
@@ -767,7 +773,7 @@ def get_sales_summary():
             },
             'total_revenue': round(total_revenue, 2),
             'total_paid': round(total_paid, 2),
-            'invoice_count': len(invoices),
+            'invoice_count': invoice_count,
             'avg_invoice_value': round(avg_invoice, 2),
             'customer_summary': customer_summary,
             'monthly_breakdown': monthly_breakdown
@@ -777,8 +783,51 @@ def get_sales_summary():
         return jsonify({'error': str(e)}), 500
 
 
+def _gst_tax_partial(rows):
+    """Additive taxable value and tax amounts by GST rate for one month."""
+    rate_groups = defaultdict(lambda: {'taxable_value': 0.0, 'cgst': 0.0, 'sgst': 0.0, 'igst': 0.0, 'total_tax': 0.0})
+    totals = {'taxable_value': 0.0, 'cgst': 0.0, 'sgst': 0.0, 'igst': 0.0, 'total_tax': 0.0, 'invoice_count': 0}
+
+    for inv in rows['invoices']:
+        items = inv.get('items', [])
+        is_igst = float(inv.get('igst_amount', 0)) > 0
+
+        for item in items:
+            tax_rate = float(item.get('tax', 0))
+            qty      = float(item.get('quantity', 0))
+            rate     = float(item.get('rate', 0))
+            discount = float(item.get('discount', 0))
+            taxable  = max(0, qty * rate - discount)
+            tax_amt  = round(taxable * tax_rate / 100, 2)
+
+            if is_igst:
+                cgst_amt, sgst_amt, igst_amt = 0.0, 0.0, tax_amt
+            else:
+                cgst_amt = round(tax_amt / 2, 2)
+                sgst_amt = round(tax_amt / 2, 2)
+                igst_amt = 0.0
+
+            key = f'{tax_rate:.0f}%'
+            rate_groups[key]['taxable_value'] += taxable
+            rate_groups[key]['cgst']          += cgst_amt
+            rate_groups[key]['sgst']          += sgst_amt
+            rate_groups[key]['igst']          += igst_amt
+            rate_groups[key]['total_tax']     += tax_amt
+
+            totals['taxable_value'] += taxable
+            totals['cgst']          += cgst_amt
+            totals['sgst']          += sgst_amt
+            totals['igst']          += igst_amt
+            totals['total_tax']     += tax_amt
+
+        totals['invoice_count'] += 1
+
+    return {'rate_groups': {key: dict(group) for key, group in rate_groups.items()}, 'totals': totals}
+
+
 @reports_blueprint.route('/reports/gst-tax-summary', methods=['GET'])
 @require_permission('reports', 'view')
+@cached_json_response('reports', ttl=_REPORT_CACHE_TTL_SECONDS)
 def get_gst_tax_summary():
     """GST Tax Summary — taxable value and tax amounts grouped by GST rate"""
     try:
@@ -788,51 +837,17 @@ def get_gst_tax_summary():
         end_date   = parse_date(request.args.get('end_date'))   or datetime.now()
 
 
-        query = f"""
-            SELECT * FROM c
-            WHERE c.tenant_id = '{tenant_id}'
-            AND c.issue_date >= '{start_date.strftime('%Y-%m-%d')}'
-            AND c.issue_date <= '{end_date.strftime('%Y-%m-%d')}'
-            AND c.status IN ('Paid', 'Partially Paid', 'Pending')
-        """
-        invoices = list(invoices_container.query_items(query=query, enable_cross_partition_query=True))
-
-        rate_groups = defaultdict(lambda: {'taxable_value': 0.0, 'cgst': 0.0, 'sgst': 0.0, 'igst': 0.0, 'total_tax': 0.0})
+        p = compute_period_report(
+            tenant_id, 'gst_tax_summary',
+            {'invoices': SnapshotSource(
+                invoices_container, ('items', 'igst_amount'),
+                'issue_date', 'ARRAY_CONTAINS(@statuses, c.status)', {'@statuses': _SALES_STATUSES},
+            )},
+            start_date.date(), end_date.date(), _gst_tax_partial,
+        )
+        rate_groups = p.get('rate_groups', {})
         totals = {'taxable_value': 0.0, 'cgst': 0.0, 'sgst': 0.0, 'igst': 0.0, 'total_tax': 0.0, 'invoice_count': 0}
-
-        for inv in invoices:
-            items = inv.get('items', [])
-            is_igst = float(inv.get('igst_amount', 0)) > 0
-
-            for item in items:
-                tax_rate = float(item.get('tax', 0))
-                qty      = float(item.get('quantity', 0))
-                rate     = float(item.get('rate', 0))
-                discount = float(item.get('discount', 0))
-                taxable  = max(0, qty * rate - discount)
-                tax_amt  = round(taxable * tax_rate / 100, 2)
-
-                if is_igst:
-                    cgst_amt, sgst_amt, igst_amt = 0.0, 0.0, tax_amt
-                else:
-                    cgst_amt = round(tax_amt / 2, 2)
-                    sgst_amt = round(tax_amt / 2, 2)
-                    igst_amt = 0.0
-
-                key = f'{tax_rate:.0f}%'
-                rate_groups[key]['taxable_value'] += taxable
-                rate_groups[key]['cgst']          += cgst_amt
-                rate_groups[key]['sgst']          += sgst_amt
-                rate_groups[key]['igst']          += igst_amt
-                rate_groups[key]['total_tax']     += tax_amt
-
-                totals['taxable_value'] += taxable
-                totals['cgst']          += cgst_amt
-                totals['sgst']          += sgst_amt
-                totals['igst']          += igst_amt
-                totals['total_tax']     += tax_amt
-
-            totals['invoice_count'] += 1
+        totals.update(p.get('totals', {}))
 
         tax_breakdown = sorted(
             [
@@ -871,6 +886,7 @@ def get_gst_tax_summary():
 
 @reports_blueprint.route('/reports/payments-received', methods=['GET'])
 @require_permission('reports', 'view')
+@cached_json_response('reports', ttl=_REPORT_CACHE_TTL_SECONDS)
 def get_payments_received():
     """Payments Received — customer payments from invoice payment history"""
     try:
@@ -880,12 +896,15 @@ def get_payments_received():
         end_date   = parse_date(request.args.get('end_date'))   or datetime.now()
 
 
-        query = f"""
-            SELECT * FROM c
-            WHERE c.tenant_id = '{tenant_id}'
-            AND c.status IN ('Paid', 'Partially Paid')
-        """
-        invoices = list(invoices_container.query_items(query=query, enable_cross_partition_query=True))
+        invoices = run_report_queries({
+            'invoices': ReportQuery(
+                invoices_container,
+                ('id', 'invoice_number', 'customer_name', 'payment_history', 'amount_paid',
+                 'payment_date', 'due_date', 'payment_mode'),
+                'c.tenant_id = @tenant_id AND ARRAY_CONTAINS(@statuses, c.status)',
+                {'@tenant_id': tenant_id, '@statuses': _PAID_STATUSES},
+            ),
+        })['invoices']
 
         payments = []
         total_received = 0.0
@@ -955,6 +974,7 @@ def get_payments_received():
 
 @reports_blueprint.route('/reports/payments-made', methods=['GET'])
 @require_permission('reports', 'view')
+@cached_json_response('reports', ttl=_REPORT_CACHE_TTL_SECONDS)
 def get_payments_made():
     """Payments Made — vendor payments from bill payment history"""
     try:
@@ -964,12 +984,15 @@ def get_payments_made():
         end_date   = parse_date(request.args.get('end_date'))   or datetime.now()
 
 
-        query = f"""
-            SELECT * FROM c
-            WHERE c.tenant_id = '{tenant_id}'
-            AND c.status IN ('Paid', 'Partially Paid')
-        """
-        bills = list(bills_container.query_items(query=query, enable_cross_partition_query=True))
+        bills = run_report_queries({
+            'bills': ReportQuery(
+                bills_container,
+                ('id', 'bill_number', 'vendor_name', 'payment_history', 'amount_paid',
+                 'payment_date', 'due_date', 'payment_mode'),
+                'c.tenant_id = @tenant_id AND ARRAY_CONTAINS(@statuses, c.status)',
+                {'@tenant_id': tenant_id, '@statuses': _PAID_STATUSES},
+            ),
+        })['bills']
 
         payments = []
         total_paid = 0.0
@@ -11,6 +11,9 @@ Approval workflow
 from flask import Blueprint, request, jsonify
 from smart_invoice_pro.utils.cosmos_client import users_container, invoices_container, purchase_orders_container
 from smart_invoice_pro.utils.audit_logger import log_audit, log_audit_event
+from smart_invoice_pro.utils.dashboard_rollups import record_rollup_change
+from smart_invoice_pro.utils.reminder_schedule import record_invoice_write
+from smart_invoice_pro.utils.permission_cache import invalidate_user_permissions
 from datetime import datetime
 import copy
 from functools import wraps
@@ -145,6 +148,7 @@ def update_user_role(target_user_id):
     user['role'] = new_role
     user['updated_at'] = datetime.utcnow().isoformat()
     users_container.upsert_item(body=user)
+    invalidate_user_permissions(target_user_id, user.get('tenant_id'))
     log_audit("user", "update", target_user_id,
               {"id": target_user_id, "role": old_role},
               {"id": target_user_id, "role": new_role},
@@ -253,6 +257,8 @@ def submit_invoice_for_approval(invoice_id):
     inv['submitted_at'] = datetime.utcnow().isoformat()
     inv['updated_at'] = datetime.utcnow().isoformat()
     invoices_container.upsert_item(body=inv)
+    record_rollup_change('invoice', before, inv)
+    record_invoice_write(before, inv)
     log_audit_event({
         "action": "APPROVAL_SUBMITTED",
         "entity": "invoice",
@@ -287,6 +293,8 @@ def approve_invoice(invoice_id):
     inv['approved_at'] = datetime.utcnow().isoformat()
     inv['updated_at'] = datetime.utcnow().isoformat()
     invoices_container.upsert_item(body=inv)
+    record_rollup_change('invoice', before, inv)
+    record_invoice_write(before, inv)
     log_audit_event({
         "action": "APPROVAL_COMPLETED",
         "entity": "invoice",
@@ -323,6 +331,8 @@ def reject_invoice(invoice_id):
     inv['rejection_reason'] = data.get('reason', '')
     inv['updated_at'] = datetime.utcnow().isoformat()
     invoices_container.upsert_item(body=inv)
+    record_rollup_change('invoice', before, inv)
+    record_invoice_write(before, inv)
     log_audit_event({
         "action": "APPROVAL_REJECTED",
         "entity": "invoice",
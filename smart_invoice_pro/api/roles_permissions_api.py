@@ -53,6 +53,10 @@ from smart_invoice_pro.utils.cosmos_client import users_container, get_container
 from smart_invoice_pro.api.roles_api import require_role
 from smart_invoice_pro.utils.demo_guard import forbid_demo_settings_mutation
 from smart_invoice_pro.utils.audit_logger import log_audit
+from smart_invoice_pro.utils.permission_cache import (
+    invalidate_tenant_permissions,
+    invalidate_user_permissions,
+)
 import copy
 
 roles_permissions_blueprint = Blueprint('roles_permissions', __name__)
@@ -322,9 +326,9 @@ def _check_permission(user_id: str, tenant_id: str, module: str, action: str) ->
     Returns True if the user has permission for module+action.
     Admin always passes (role string, Admin role document, or super-admin).
     """
-    from smart_invoice_pro.utils.rbac_resolver import resolve_user_permissions
+    from smart_invoice_pro.utils.permission_checker import _get_user_permissions
 
-    is_admin, permissions = resolve_user_permissions(user_id, tenant_id)
+    is_admin, permissions = _get_user_permissions(user_id, tenant_id)
     if is_admin:
         return True
     return bool(permissions.get(module, {}).get(action, False))
@@ -477,6 +481,7 @@ def update_role(role_id):
 
         role_doc['updated_at'] = datetime.utcnow().isoformat()
         _get_roles_container().upsert_item(role_doc)
+        invalidate_tenant_permissions(request.tenant_id)
         return jsonify({k: v for k, v in role_doc.items() if not k.startswith('_')}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -512,6 +517,7 @@ def delete_role(role_id):
             users_container.upsert_item(u)
 
         _get_roles_container().delete_item(item=role_id, partition_key=request.tenant_id)
+        invalidate_tenant_permissions(request.tenant_id)
         return jsonify({'success': True}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -544,18 +550,19 @@ def list_settings_users():
 def _send_invite_email(to_email: str, to_name: str, username: str,
                        password: str, role: str, tenant_id: str) -> None:
     """
-    Send a welcome / invite email to the newly created user via Azure ACS.
+    Queue a welcome / invite email to the newly created user on the email outbox.
     Failures are logged but do NOT prevent user creation from succeeding.
     """
     import os
     import logging
 
-    connection_string = os.getenv('AZURE_EMAIL_CONNECTION_STRING')
-    sender_address    = os.getenv('SENDER_EMAIL', 'noreply@solidevelectrosoft.com')
-    app_url           = os.getenv('APP_URL', 'https://app.solidevbooks.com')
+    from smart_invoice_pro.utils.email_service import email_configured, queue_email
 
-    if not connection_string:
-        logging.warning("invite_user: AZURE_EMAIL_CONNECTION_STRING not set — skipping invite email")
+    sender_address = os.getenv('SENDER_EMAIL', 'noreply@solidevelectrosoft.com')
+    app_url        = os.getenv('APP_URL', 'https://app.solidevbooks.com')
+
+    if not email_configured():
+        logging.warning("invite_user: email transport not configured — skipping invite email")
         return
 
     try:
@@ -640,9 +647,7 @@ def _send_invite_email(to_email: str, to_name: str, username: str,
             f"Please change your password after your first login."
         )
 
-        from azure.communication.email import EmailClient
-        client = EmailClient.from_connection_string(connection_string)
-        poller = client.begin_send({
+        sent = queue_email(tenant_id, {
             "senderAddress": sender_address,
             "recipients": {"to": [{"address": to_email, "displayName": to_name}]},
             "content": {
@@ -651,8 +656,9 @@ def _send_invite_email(to_email: str, to_name: str, username: str,
                 "plainText": plain_body,
             },
         })
-        poller.result(timeout=30)
-        logging.info(f"invite_user: welcome email sent to {to_email}")
+        if sent['status'] == 'failed':
+            raise RuntimeError(sent['error'])
+        logging.info(f"invite_user: welcome email {sent['status']} for {to_email}")
 
     except Exception as exc:
         logging.error(f"invite_user: failed to send invite email to {to_email}: {exc}")
@@ -810,6 +816,7 @@ def update_settings_user(target_user_id):
 
         user['updated_at'] = datetime.utcnow().isoformat()
         users_container.upsert_item(user)
+        invalidate_user_permissions(target_user_id, request.tenant_id)
         log_audit("user", "update", target_user_id, before_snapshot, user,
                   user_id=getattr(request, 'user_id', None), tenant_id=request.tenant_id)
         return jsonify(_safe_user(user)), 200
@@ -844,6 +851,7 @@ def deactivate_user(target_user_id):
         user['is_active'] = False
         user['updated_at'] = datetime.utcnow().isoformat()
         users_container.upsert_item(user)
+        invalidate_user_permissions(target_user_id, request.tenant_id)
         log_audit("user", "delete", target_user_id, before_snapshot, user,
                   user_id=getattr(request, 'user_id', None), tenant_id=request.tenant_id)
         return jsonify({'success': True}), 200
@@ -8,6 +8,7 @@ from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
 import datetime
 from smart_invoice_pro.utils.audit_logger import log_audit_event
+from smart_invoice_pro.utils.permission_cache import invalidate_tenant_permissions
 
 try:
     import user_agents as _ua_lib
@@ -741,7 +742,12 @@ def delete_account():
         stock_container, bank_accounts_container, quotes_container,
         recurring_profiles_container, sales_orders_container,
         vendors_container, purchase_orders_container, bills_container,
-        expenses_container, settings_container
+        expenses_container, settings_container, stock_balances_container,
+        report_snapshots_container, webhook_outbox_container,
+        pdf_export_jobs_container, ai_match_jobs_container,
+        bank_txn_fingerprints_container, job_queue_container,
+        recurring_run_checkpoints_container, reminder_due_container,
+        dashboard_rollups_container,
     )
 
     user_id = request.user_id
@@ -789,6 +795,16 @@ def delete_account():
     _bulk_delete(customers_container, 'customer_id')
     _bulk_delete(products_container, 'product_id')
     _bulk_delete(stock_container, 'product_id')
+    _bulk_delete(stock_balances_container, 'tenant_id')
+    _bulk_delete(dashboard_rollups_container, 'tenant_id')
+    _bulk_delete(report_snapshots_container, 'tenant_id')
+    _bulk_delete(webhook_outbox_container, 'tenant_id')
+    _bulk_delete(pdf_export_jobs_container, 'tenant_id')
+    _bulk_delete(ai_match_jobs_container, 'tenant_id')
+    _bulk_delete(bank_txn_fingerprints_container, 'tenant_id')
+    _bulk_delete(job_queue_container, 'tenant_id')
+    _bulk_delete(recurring_run_checkpoints_container, 'tenant_id')
+    _bulk_delete(reminder_due_container, 'fire_date')
     _bulk_delete(bank_accounts_container, 'user_id')
     _bulk_delete(quotes_container, 'customer_id')
     _bulk_delete(recurring_profiles_container, 'customer_id')
@@ -815,4 +831,7 @@ def delete_account():
     except Exception:
         pass
 
+    # Roles and users are gone; nobody may keep acting on cached grants.
+    invalidate_tenant_permissions(tenant_id)
+
     return jsonify({"message": "Account deleted successfully."}), 200
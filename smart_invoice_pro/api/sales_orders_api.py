@@ -1,13 +1,16 @@
-from flask import Blueprint, request, jsonify, g, make_response
+from flask import Blueprint, request, jsonify, g
 from smart_invoice_pro.utils.permission_checker import require_permission
+from smart_invoice_pro.utils.dashboard_rollups import record_rollup_change
+from smart_invoice_pro.utils.reminder_schedule import record_invoice_write
 from smart_invoice_pro.utils.cosmos_client import sales_orders_container, invoices_container
+from smart_invoice_pro.utils.email_service import document_target, email_configured, queue_email
 from smart_invoice_pro.api.auth_middleware import token_required
 import uuid
 import base64
 from flasgger import swag_from
 from datetime import datetime
 from enum import Enum
-from smart_invoice_pro.api.invoice_generation import build_invoice_pdf, _get_tenant_branding, branding_for_document
+from smart_invoice_pro.api.invoice_generation import build_invoice_pdf, _get_tenant_branding, branding_for_document, pdf_response
 from smart_invoice_pro.utils.archive_service import archive_entity, restore_entity, LIFECYCLE_ARCHIVED
 from smart_invoice_pro.utils.lifecycle_service import apply_lifecycle_action
 from smart_invoice_pro.utils.org_tax_mode import must_suppress_sales_tax, get_org_gst_mode
@@ -776,6 +779,8 @@ def convert_so_to_invoice(so_id):
         }
         
         created_invoice = invoices_container.create_item(body=invoice)
+        record_rollup_change('invoice', None, invoice)
+        record_invoice_write(None, invoice)
         
         # Update sales order status
         so['status'] = 'Invoiced'
@@ -982,13 +987,10 @@ def get_so_pdf(so_id):
     }
     try:
         branding = branding_for_document(so, request.tenant_id)
-        pdf_bytes = build_invoice_pdf(doc, branding=branding, doc_type='sales_order',
-                                     gst_mode=get_org_gst_mode(request.tenant_id))
         ref = so.get('so_number', 'so').replace('/', '-')
-        response = make_response(pdf_bytes)
-        response.headers['Content-Type'] = 'application/pdf'
-        response.headers['Content-Disposition'] = f'inline; filename={ref}.pdf'
-        return response
+        return pdf_response(doc, tenant_id=request.tenant_id, filename=ref,
+                            branding=branding, doc_type='sales_order',
+                            gst_mode=get_org_gst_mode(request.tenant_id))
     except Exception as e:
         return jsonify({'error': f'Failed to generate PDF: {str(e)}'}), 500
 
@@ -997,13 +999,11 @@ def get_so_pdf(so_id):
 @require_permission('purchase_orders', 'edit')
 @token_required
 def send_so_email(so_id):
-    """Send a sales order to the customer via Azure Communication Services."""
+    """Queue a sales order to the customer on the email outbox."""
     import os
-    from azure.communication.email import EmailClient
 
-    connection_string = os.getenv('AZURE_EMAIL_CONNECTION_STRING')
-    sender_address    = os.getenv('SENDER_EMAIL', 'noreply@solidevelectrosoft.com')
-    if not connection_string:
+    sender_address = os.getenv('SENDER_EMAIL', 'noreply@solidevelectrosoft.com')
+    if not email_configured():
         return jsonify({'error': 'Email service not configured on the server'}), 503
 
     data = request.get_json() or {}
@@ -1080,14 +1080,13 @@ def send_so_email(so_id):
             print(f"WARNING: SO PDF generation failed: {pdf_err}")
 
     try:
-        client = EmailClient.from_connection_string(connection_string)
-        poller = client.begin_send(email_message)
-        result = poller.result()
-
+        # The outbox worker writes email_status 'sent' / 'failed' back later.
         now = datetime.utcnow().isoformat()
-        so['email_status']  = 'sent'
-        so['email_sent_at'] = now
-        so['updated_at']    = now
+        outbox_id = str(uuid.uuid4())
+        so['email_status']    = 'queued'
+        so['email_outbox_id'] = outbox_id
+        so['email_queued_at'] = now
+        so['updated_at']      = now
         if not so.get('brand_snapshot'):
             so['brand_snapshot'] = {
                 'primary_color':     _branding.get('primary_color', ''),
@@ -1099,10 +1098,19 @@ def send_so_email(so_id):
             }
         sales_orders_container.replace_item(item=so['id'], body=so)
 
+        sent = queue_email(request.tenant_id, email_message,
+                           target=document_target('sales_orders', so, 'customer_id'),
+                           outbox_id=outbox_id)
+        if sent['status'] == 'failed':
+            return jsonify({'error': f"Failed to send email: {sent['error']}"}), 500
+
+        queued = sent['status'] == 'queued'
         return jsonify({
-            'message':    'Sales order email sent successfully',
-            'sent_to':    recipient_email,
-            'message_id': result.get('id'),
-        }), 200
+            'message':      'Sales order email queued for delivery' if queued else 'Sales order email sent successfully',
+            'sent_to':      recipient_email,
+            'outbox_id':    outbox_id,
+            'message_id':   sent['message_id'],
+            'email_status': sent['status'],
+        }), 202 if queued else 200
     except Exception as e:
         return jsonify({'error': f'Failed to send email: {str(e)}'}), 500
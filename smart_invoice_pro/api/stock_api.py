@@ -5,6 +5,7 @@ from datetime import datetime
 import uuid
 
 from smart_invoice_pro.utils.permission_checker import require_permission
+from smart_invoice_pro.utils.stock_utils import record_stock_transaction
 
 stock_blueprint = Blueprint('stock', __name__)
 
@@ -98,7 +99,7 @@ def add_stock():
         'tenant_id': request.tenant_id,
         'user_id': getattr(request, 'user_id', None),
     }
-    stock_container.create_item(body=transaction)
+    record_stock_transaction(transaction, container=stock_container)
     current_stock = _compute_current_stock(product_id, request.tenant_id)
     response = {
         'message': 'Stock added',
@@ -169,7 +170,7 @@ def reduce_stock():
         'tenant_id': request.tenant_id,
         'user_id': getattr(request, 'user_id', None),
     }
-    stock_container.create_item(body=transaction)
+    record_stock_transaction(transaction, container=stock_container)
     current_stock = _compute_current_stock(product_id, request.tenant_id)
     response = {
         'message': 'Stock reduced',
@@ -413,7 +414,7 @@ def adjust_stock():
         }
         
         # Create the stock adjustment record
-        stock_container.create_item(body=adjustment)
+        record_stock_transaction(adjustment, container=stock_container)
         
         current_stock = _compute_current_stock(str(data['product_id']), request.tenant_id)
         response = {
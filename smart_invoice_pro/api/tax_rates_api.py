@@ -35,6 +35,7 @@ from smart_invoice_pro.utils.cosmos_client import get_container
 from smart_invoice_pro.api.roles_api import require_role
 from smart_invoice_pro.api.gst_api import extract_state_from_gstin, validate_gstin_format
 from smart_invoice_pro.utils.org_tax_mode import get_org_gst_mode, must_suppress_sales_tax, FULL_GST
+from smart_invoice_pro.utils.tenant_settings import get_tenant_settings
 from smart_invoice_pro.utils.audit_logger import log_audit
 import copy
 
@@ -200,23 +201,7 @@ def calculate_gst(items: list, seller_state: str, customer_state: str,
 
 def _get_seller_state(tenant_id: str) -> str:
     """Fetch seller's state from org profile (GSTIN → state, or address.state)."""
-    from smart_invoice_pro.utils.cosmos_client import settings_container
-    doc_id = f"{tenant_id}:organization_profile"
-    items = list(settings_container.query_items(
-        query="SELECT * FROM c WHERE c.id = @id AND c.tenant_id = @tid",
-        parameters=[
-            {"name": "@id",  "value": doc_id},
-            {"name": "@tid", "value": tenant_id},
-        ],
-        enable_cross_partition_query=True,
-    ))
-    if not items:
-        return ''
-    profile = items[0]
-    gstin = profile.get('gstin', '')
-    if gstin and validate_gstin_format(gstin):
-        return extract_state_from_gstin(gstin)
-    return (profile.get('address') or {}).get('state', '')
+    return get_tenant_settings(tenant_id).seller_state
 
 
 def _get_customer_state(tenant_id: str, customer_id: str) -> tuple:
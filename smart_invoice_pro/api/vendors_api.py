@@ -14,6 +14,7 @@ from smart_invoice_pro.utils.audit_logger import log_audit_event
 from smart_invoice_pro.utils.dependency_checker import check_entity_dependencies
 from smart_invoice_pro.utils.archive_service import archive_entity, restore_entity
 from smart_invoice_pro.utils.lifecycle_service import apply_lifecycle_action
+from smart_invoice_pro.utils.cursor_pagination import InvalidCursor, cursor_requested, fetch_cursor_page
 
 vendors_blueprint = Blueprint('vendors', __name__)
 
@@ -27,6 +28,10 @@ _ALLOWED_SORT_FIELDS = {
     'created_at',
 }
 
+# Sort keys stored on the vendor document; the others are derived from bills
+# and can only be sorted after loading every vendor, which cursor mode avoids.
+_CURSOR_SORT_FIELDS = {'vendor_name', 'payment_terms', 'status', 'created_at'}
+
 
 def _normalize_vendor_name(value):
     return ' '.join(str(value or '').strip().lower().split())
@@ -114,14 +119,18 @@ def _query_vendor(vendor_id, tenant_id):
     return rows[0] if rows else None
 
 
-def _aggregate_vendor_metrics(tenant_id):
+def _aggregate_vendor_metrics(tenant_id, vendor_ids=None):
     query = (
         "SELECT c.vendor_id, c.total_amount, c.balance_due, c.bill_date, c.created_at "
         "FROM c WHERE c.tenant_id = @tenant_id"
     )
+    parameters = [{"name": "@tenant_id", "value": tenant_id}]
+    if vendor_ids is not None:
+        query += " AND ARRAY_CONTAINS(@vendor_ids, c.vendor_id)"
+        parameters.append({"name": "@vendor_ids", "value": list(vendor_ids)})
     bills = list(bills_container.query_items(
         query=query,
-        parameters=[{"name": "@tenant_id", "value": tenant_id}],
+        parameters=parameters,
         enable_cross_partition_query=True,
     ))
 
@@ -357,6 +366,9 @@ def get_vendors():
             query += " AND c.payment_terms = @payment_terms"
             params.append({"name": "@payment_terms", "value": payment_terms_filter})
 
+        if cursor_requested(request.args):
+            return _list_vendors_cursor_page(query, params, lifecycle, outstanding_filter, sort_by, sort_order)
+
         query += " ORDER BY c.vendor_name ASC"
 
         rows = list(vendors_container.query_items(
@@ -419,6 +431,43 @@ def get_vendors():
         return jsonify({"error": f"Failed to retrieve vendors: {str(e)}"}), 500
 
 
+def _list_vendors_cursor_page(query, params, lifecycle, outstanding_filter, sort_by, sort_order):
+    """Cursor-mode vendor listing: lifecycle filter in SQL, metrics for the page only."""
+    if outstanding_filter or sort_by not in _CURSOR_SORT_FIELDS:
+        return make_error_response(
+            VALIDATION_ERROR,
+            "Cursor pagination supports sorting by vendor_name, payment_terms, status or "
+            "created_at and does not support the outstanding filter",
+        )
+    # Mirrors _is_archived.
+    if lifecycle == 'archived':
+        query += " AND UPPER(c.status) = @archived_status"
+    elif lifecycle != 'all':
+        query += " AND (NOT IS_DEFINED(c.status) OR IS_NULL(c.status) OR UPPER(c.status) != @archived_status)"
+    if lifecycle != 'all':
+        params = [*params, {"name": "@archived_status", "value": "ARCHIVED"}]
+
+    try:
+        page = fetch_cursor_page(
+            vendors_container, query, params,
+            sort_field=sort_by, sort_order=sort_order,
+            tenant_id=request.tenant_id, endpoint='vendors',
+        )
+    except InvalidCursor as exc:
+        return make_error_response(VALIDATION_ERROR, str(exc))
+
+    metrics = _aggregate_vendor_metrics(request.tenant_id, [row.get('id') for row in page.items])
+    enriched = []
+    for row in page.items:
+        vendor = _sanitize_vendor(row)
+        vendor_metrics = metrics.get(vendor.get('id'), {})
+        vendor['total_purchases'] = _to_float(vendor_metrics.get('total_purchases', 0.0))
+        vendor['outstanding_amount'] = _to_float(vendor_metrics.get('outstanding_amount', 0.0))
+        vendor['last_transaction_date'] = vendor_metrics.get('last_transaction_date')
+        enriched.append(vendor)
+    return jsonify(page.as_payload('data', enriched)), 200
+
+
 @vendors_blueprint.route('/vendors/bulk', methods=['POST'])
 @vendors_blueprint.route('/vendors/bulk-archive', methods=['POST'])
 @require_permission('vendors', 'edit')
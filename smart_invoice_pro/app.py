@@ -1,3 +1,4 @@
+import multiprocessing
 import os
 import sys
 
@@ -45,6 +46,8 @@ from smart_invoice_pro.api.me_api import me_blueprint
 from smart_invoice_pro.api.lifecycle_api import lifecycle_blueprint
 from smart_invoice_pro.api.auth_middleware import enforce_api_auth
 from smart_invoice_pro.services.scheduler import start_scheduler
+from smart_invoice_pro.utils.job_queue import start_job_workers
+from smart_invoice_pro.utils.webhook_dispatcher import start_webhook_workers
 import atexit
 
 
@@ -58,6 +61,18 @@ def _should_start_scheduler():
         return False
     return True
 
+def _is_pool_child():
+    """
+    True inside a multiprocessing child (the spawn render/parse pools). Spawn
+    re-imports ``__main__``, and main.py/app.py build the app at import, so
+    without this check every pool child would start its own background work.
+    The child's name is set before that re-import; ``parent_process()`` only
+    after it.
+    """
+    return (multiprocessing.parent_process() is not None
+            or multiprocessing.current_process().name != "MainProcess")
+
+
 def create_app():
     app = Flask(__name__, template_folder="../templates")
 
@@ -212,6 +227,15 @@ def create_app():
     app.register_blueprint(me_blueprint, url_prefix="/api")
     app.register_blueprint(lifecycle_blueprint, url_prefix="/api")
 
+    if _is_pool_child():
+        return app
+
+    # Job queue workers run from boot so queued jobs left by a restart resume
+    # without waiting for a new enqueue (JOB_WORKER_THREADS=0 disables them).
+    start_job_workers()
+    # Likewise the webhook delivery pool and its outbox poller (WEBHOOK_WORKERS=0 disables).
+    start_webhook_workers()
+
     # Start the background scheduler for recurring invoices outside test runs.
     if _should_start_scheduler():
         try:
@@ -3,15 +3,68 @@
 Handles Excel (xlsx/xls) and PDF bank statements from any Indian bank
 (SBI, HDFC, ICICI, Axis, PNB, etc.) by sending the raw content to
 Claude and asking it to extract structured transaction data.
+
+Excel statements are streamed: ``iter_xlsx`` walks the sheet in read-only
+mode and sends it to Claude in windows of _MAX_ROWS_FOR_PROMPT rows (each
+window carries the top of the sheet as header context), yielding normalized
+rows as each window comes back — so multi-year statements are parsed in
+full instead of being truncated to the first window.
+
+PDF statements are split into page chunks (``iter_pdf``):
+  * page text is extracted chunk by chunk on a process pool,
+  * each chunk is sent to Claude on its own, several chunks in parallel,
+  * a chunk whose Claude call fails falls back to pdfplumber's table
+    extraction (header-mapped date/narration/debit/credit/balance columns),
+  * extracted text is cached by (file hash, page range) and Claude's answer
+    by the hash of the chunk's page text — which never includes the
+    password — so re-uploads and retried imports reuse earlier chunks.
+    Entries belong to the importing tenant (nothing is cached without one).
+    For encrypted PDFs the decrypted text is never cached and Claude's rows
+    only for PDF_STATEMENT_ENCRYPTED_CACHE_TTL, long enough for import retries.
+
+Environment
+-----------
+  PDF_STATEMENT_PAGES_PER_CHUNK   – pages per Claude call (default 3)
+  PDF_STATEMENT_PROCESSES         – text-extraction processes (default CPU count
+                                    capped at 4, 0 = extract in-process)
+  PDF_STATEMENT_LLM_CONCURRENCY   – chunks sent to Claude in parallel (default 4)
+  PDF_STATEMENT_CACHE_TTL         – seconds chunk results stay cached (default 7 days)
+  PDF_STATEMENT_ENCRYPTED_CACHE_TTL – the same for encrypted PDFs, rows only
+                                    (default 900)
 """
 
+import hashlib
 import io
 import json
+import multiprocessing
 import os
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+from smart_invoice_pro.utils.shared_cache import get_cache
 
 _MAX_ROWS_FOR_PROMPT = 300   # cap rows sent to Claude to stay within token limits
 _MAX_CHARS_FOR_PROMPT = 28000  # cap raw text length sent to Claude
+_HEADER_CONTEXT_ROWS = 10      # top-of-sheet lines repeated with every later window
+_PDF_CACHE_NAMESPACE = "pdf_statement_chunks"
+_PDF_PROMPT_VERSION = "pdf-chunk-v1"  # bump when _call_claude's contract changes
+
+_PDF_PASSWORD_REQUIRED = (
+    "PDF_PASSWORD_REQUIRED: This PDF is password-protected. "
+    "Please provide the password (e.g. your date of birth or account number)."
+)
+
+_TABLE_COLUMNS = {
+    "date": ("date", "txn date", "tran date", "transaction date", "value date", "posting date"),
+    "description": ("description", "narration", "particulars", "details",
+                    "transaction details", "remarks"),
+    "debit": ("debit", "withdrawal", "withdrawals", "withdrawal amt", "dr", "debit amount"),
+    "credit": ("credit", "deposit", "deposits", "deposit amt", "cr", "credit amount"),
+    "amount": ("amount", "transaction amount"),
+    "balance": ("balance", "closing balance", "running balance", "balance amount"),
+}
 
 
 def _get_client():
@@ -30,8 +83,13 @@ def _get_client():
     return anthropic.Anthropic(api_key=api_key)
 
 
-def _call_claude(raw_content: str) -> list[dict]:
-    """Send raw bank statement content to Claude and return parsed transactions."""
+def _call_claude(raw_content: str, context: str = "") -> list[dict]:
+    """Send raw bank statement content to Claude and return parsed transactions.
+
+    ``context`` (optional) is the top of the statement — column headings and
+    account details — sent for orientation when ``raw_content`` is a later
+    window of a long statement.
+    """
     model = os.getenv("CLAUDE_MODEL", "claude-sonnet-4-6")
     client = _get_client()
 
@@ -41,6 +99,14 @@ def _call_claude(raw_content: str) -> list[dict]:
         "Always respond with valid JSON only — no markdown fences, no explanations."
     )
 
+    context_block = ""
+    if context:
+        context_block = (
+            "Header context (the top of the statement, for column order only — "
+            "do NOT extract transactions from these lines):\n"
+            f"{context[:_MAX_CHARS_FOR_PROMPT // 4]}\n\n"
+        )
+
     prompt = f"""Below is the content of a bank statement. It may be from SBI, HDFC, ICICI, Axis, PNB, Kotak, or any other Indian bank.
 
 Extract every transaction row and return a JSON array. Each object must have exactly these keys:
@@ -57,7 +123,7 @@ Rules:
 - Return an empty array [] if no transactions are found.
 - Return ONLY the JSON array, nothing else.
 
-Statement content:
+{context_block}Statement content:
 {raw_content[:_MAX_CHARS_FOR_PROMPT]}
 """
 
@@ -157,10 +223,10 @@ Statement content:
     return data
 
 
-def _normalize_rows(raw_rows: list[dict]) -> list[dict]:
+def _normalize_rows(raw_rows: list[dict], start: int = 1, parser: str = "ai_claude") -> list[dict]:
     """Convert Claude's output to the standard import_workflow row format."""
     results = []
-    for idx, item in enumerate(raw_rows, start=1):
+    for idx, item in enumerate(raw_rows, start=start):
         try:
             debit = float(item.get("debit") or 0)
             credit = float(item.get("credit") or 0)
@@ -179,7 +245,7 @@ def _normalize_rows(raw_rows: list[dict]) -> list[dict]:
                 "amount": amount,
                 "running_balance": balance,
                 "raw_row": item,
-                "parser": "ai_claude",
+                "parser": parser,
             })
         except Exception:
             # Skip malformed rows silently; they show up in warning count
@@ -187,12 +253,10 @@ def _normalize_rows(raw_rows: list[dict]) -> list[dict]:
     return results
 
 
-def parse_xlsx(file_bytes: bytes, password: str = "") -> list[dict]:
-    """Parse an Excel bank statement (xlsx/xls) using Claude AI.
+def _open_workbook(file_bytes: bytes, password: str = ""):
+    """Decrypt (when needed) and open an Excel workbook in read-only mode.
 
-    Converts the sheet to plain text then asks Claude to extract transactions.
-    If the file is password-protected, attempts decryption with the supplied
-    password. Raises ValueError("EXCEL_PASSWORD_REQUIRED: ...") if the file is
+    Raises ValueError("EXCEL_PASSWORD_REQUIRED: ...") if the file is
     encrypted and no (or wrong) password is given.
     """
     try:
@@ -233,7 +297,7 @@ def parse_xlsx(file_bytes: bytes, password: str = "") -> list[dict]:
             pass
 
     try:
-        wb = openpyxl.load_workbook(io.BytesIO(actual_bytes), read_only=True, data_only=True)
+        return openpyxl.load_workbook(io.BytesIO(actual_bytes), read_only=True, data_only=True)
     except Exception as exc:
         err_lower = str(exc).lower()
         if any(kw in err_lower for kw in ("zip", "encrypt", "password", "not a zip")):
@@ -243,12 +307,10 @@ def parse_xlsx(file_bytes: bytes, password: str = "") -> list[dict]:
             ) from exc
         raise
 
-    ws = wb.active  # use first/active sheet
 
-    lines = []
-    for row_idx, row in enumerate(ws.iter_rows(values_only=True), start=1):
-        if row_idx > _MAX_ROWS_FOR_PROMPT:
-            break
+def _sheet_lines(ws):
+    """Yield each non-empty sheet row as one tab-separated line."""
+    for row in ws.iter_rows(values_only=True):
         parts = []
         for cell in row:
             if cell is None:
@@ -261,50 +323,345 @@ def parse_xlsx(file_bytes: bytes, password: str = "") -> list[dict]:
                 parts.append(cell_str.strip())
         line = "\t".join(parts).strip()
         if line:
-            lines.append(line)
+            yield line
 
-    raw_content = "\n".join(lines)
-    if not raw_content.strip():
-        return []
 
-    raw_rows = _call_claude(raw_content)
-    return _normalize_rows(raw_rows)
+def iter_xlsx(file_bytes: bytes, password: str = ""):
+    """Stream an Excel bank statement (xlsx/xls) through Claude, window by window.
 
+    Yields rows in the standard import_workflow format as soon as each window
+    of at most _MAX_ROWS_FOR_PROMPT lines / _MAX_CHARS_FOR_PROMPT characters
+    has been parsed; row_index keeps counting across windows.
+    """
+    wb = _open_workbook(file_bytes, password)
+    try:
+        header = []
+        window = []
+        window_chars = 0
+        next_index = 1
+        first_window = True
+
+        def _flush():
+            nonlocal next_index, first_window
+            raw_content = "\n".join(window)
+            if first_window:
+                raw_rows = _call_claude(raw_content)
+            else:
+                raw_rows = _call_claude(raw_content, context="\n".join(header))
+            first_window = False
+            rows = _normalize_rows(raw_rows, start=next_index)
+            next_index += len(rows)
+            return rows
+
+        for line in _sheet_lines(wb.active):  # use first/active sheet
+            if len(header) < _HEADER_CONTEXT_ROWS:
+                header.append(line)
+            if window and (len(window) >= _MAX_ROWS_FOR_PROMPT
+                           or window_chars + len(line) + 1 > _MAX_CHARS_FOR_PROMPT):
+                yield from _flush()
+                window, window_chars = [], 0
+            window.append(line)
+            window_chars += len(line) + 1
+
+        if window:
+            yield from _flush()
+    finally:
+        close = getattr(wb, "close", None)
+        if callable(close):
+            close()
 
-def parse_pdf(file_bytes: bytes, password: str = "") -> list[dict]:
-    """Parse a PDF bank statement using Claude AI.
 
-    Extracts text with pdfplumber then asks Claude to extract transactions.
-    Raises ValueError("PDF_PASSWORD_REQUIRED: ...") if the PDF is encrypted
-    and no (or wrong) password is supplied.
+def parse_xlsx(file_bytes: bytes, password: str = "") -> list[dict]:
+    """Parse an Excel bank statement (xlsx/xls) using Claude AI.
+
+    Converts the sheet to plain text then asks Claude to extract transactions.
+    If the file is password-protected, attempts decryption with the supplied
+    password. Raises ValueError("EXCEL_PASSWORD_REQUIRED: ...") if the file is
+    encrypted and no (or wrong) password is given.  See iter_xlsx() for the
+    streaming form used by the import job.
     """
+    return list(iter_xlsx(file_bytes, password=password))
+
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _is_password_error(exc: Exception) -> bool:
+    # pdfplumber wraps pdfminer's PDFPasswordIncorrect (which has no message)
+    # in PdfminerException, so look at the wrapped exception's type as well.
+    parts = [type(exc).__name__, str(exc)]
+    parts += [type(arg).__name__ for arg in exc.args if isinstance(arg, Exception)]
+    err_lower = " ".join(parts).lower()
+    return any(kw in err_lower for kw in ("password", "encrypt", "incorrect", "decrypt", "protected"))
+
+
+def _open_pdf(file_bytes: bytes, password: str = ""):
     try:
         import pdfplumber  # noqa: PLC0415
     except ImportError as exc:
         raise ImportError("The 'pdfplumber' package is required. Run: pip install pdfplumber") from exc
+    return pdfplumber.open(io.BytesIO(file_bytes), password=password or "")
+
 
-    text_parts = []
+def _pdf_page_count(file_bytes: bytes, password: str = "") -> tuple[int, bool]:
+    """(page count, whether the PDF is encrypted)."""
     try:
-        with pdfplumber.open(io.BytesIO(file_bytes), password=password or "") as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text_parts.append(page_text)
+        with _open_pdf(file_bytes, password) as pdf:
+            return len(pdf.pages), getattr(pdf.doc, "encryption", None) is not None
+    except ImportError:
+        raise
     except Exception as exc:
-        err_lower = str(exc).lower()
-        if any(kw in err_lower for kw in ("password", "encrypt", "incorrect", "decrypt", "protected")):
-            raise ValueError(
-                "PDF_PASSWORD_REQUIRED: This PDF is password-protected. "
-                "Please provide the password (e.g. your date of birth or account number)."
-            ) from exc
+        if _is_password_error(exc):
+            raise ValueError(_PDF_PASSWORD_REQUIRED) from exc
         raise
 
-    raw_content = "\n".join(text_parts)
-    if not raw_content.strip():
-        return []
 
-    raw_rows = _call_claude(raw_content)
-    return _normalize_rows(raw_rows)
+def _extract_page_text(file_bytes: bytes, password: str, start: int, end: int) -> str:
+    with _open_pdf(file_bytes, password) as pdf:
+        parts = [page.extract_text() or "" for page in pdf.pages[start:end]]
+    return "\n".join(part for part in parts if part)
+
+
+_WORKER_PDF = {}
+
+
+def _init_pdf_worker(file_bytes: bytes, password: str) -> None:
+    """Process-pool initializer: ship the file to each worker once, not per chunk."""
+    _WORKER_PDF["bytes"] = file_bytes
+    _WORKER_PDF["password"] = password
+
+
+def _extract_page_text_task(page_range) -> str:
+    start, end = page_range
+    return _extract_page_text(_WORKER_PDF["bytes"], _WORKER_PDF["password"], start, end)
+
+
+class _ChunkCache:
+    """The statement chunk cache, scoped to one import's tenant and encryption."""
+
+    def __init__(self, tenant_id, encrypted: bool):
+        self.tenant_id = tenant_id
+        self.encrypted = encrypted
+        self._cache = get_cache(_PDF_CACHE_NAMESPACE, default_ttl=_env_int("PDF_STATEMENT_CACHE_TTL", 7 * 24 * 3600)) \
+            if tenant_id else None
+
+    def get_text(self, parts):
+        if self._cache is None or self.encrypted:
+            return None
+        return self._cache.get(self.tenant_id, parts)
+
+    def set_text(self, parts, text) -> None:
+        if self._cache is not None and not self.encrypted:
+            self._cache.set(self.tenant_id, parts, text)
+
+    def get_rows(self, parts):
+        return self._cache.get(self.tenant_id, parts) if self._cache is not None else None
+
+    def set_rows(self, parts, rows) -> None:
+        if self._cache is None:
+            return
+        ttl = _env_int("PDF_STATEMENT_ENCRYPTED_CACHE_TTL", 900) if self.encrypted else None
+        self._cache.set(self.tenant_id, parts, rows, ttl=ttl)
+
+
+def _extract_chunks(file_bytes: bytes, password: str, file_hash: str, ranges: list, cache) -> list:
+    """Page text for every (start, end) range — cached by file hash, misses on a process pool."""
+    texts = [cache.get_text(("text", file_hash, start, end)) for start, end in ranges]
+    missing = [i for i, text in enumerate(texts) if text is None]
+    if not missing:
+        return texts
+
+    processes = min(_env_int("PDF_STATEMENT_PROCESSES", min(4, os.cpu_count() or 1)), len(missing))
+    if processes > 1:
+        # spawn: never fork a process that is running request/worker threads.
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_pdf_worker, initargs=(file_bytes, password or "")) as pool:
+            extracted = list(pool.map(_extract_page_text_task, [ranges[i] for i in missing]))
+    else:
+        extracted = [_extract_page_text(file_bytes, password, *ranges[i]) for i in missing]
+
+    for i, text in zip(missing, extracted):
+        texts[i] = text
+        cache.set_text(("text", file_hash, *ranges[i]), text)
+    return texts
+
+
+def _text_windows(text: str) -> list[str]:
+    """Split chunk text on line boundaries so no Claude call is truncated."""
+    windows, current, size = [], [], 0
+    for line in text.splitlines():
+        if current and size + len(line) + 1 > _MAX_CHARS_FOR_PROMPT:
+            windows.append("\n".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        windows.append("\n".join(current))
+    return windows
+
+
+def _column_key(cell) -> str | None:
+    label = " ".join(re.sub(r"[^a-z ]", " ", str(cell or "").lower()).split())
+    if not label:
+        return None
+    for key, aliases in _TABLE_COLUMNS.items():
+        for alias in aliases:
+            # "Closing B" — headers are often clipped by text-based table detection.
+            if label == alias or label.startswith(alias + " ") or (len(label) >= 5 and alias.startswith(label)):
+                return key
+    return None
+
+
+def _table_date(value) -> str:
+    text = str(value or "").strip()
+    for fmt in ("%d/%m/%Y", "%d-%m-%Y", "%Y-%m-%d", "%d %b %Y", "%d-%b-%Y", "%d %b %y",
+                "%d-%b-%y", "%d/%m/%y", "%d.%m.%Y"):
+        try:
+            return datetime.strptime(text, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return ""
+
+
+def _table_amount(value) -> float:
+    text = str(value or "").strip()
+    negative = text.startswith("(") or text.startswith("-") or text.upper().endswith("DR")
+    try:
+        amount = float(re.sub(r"[^\d.]", "", text) or 0)
+    except ValueError:
+        return 0.0
+    return -amount if negative else amount
+
+
+def _rows_from_tables(tables: list) -> list[dict]:
+    """Deterministic fallback: map pdfplumber tables with a recognisable header to rows."""
+    rows = []
+    columns = None
+    for table in tables:
+        body = table or []
+        for i, header in enumerate(body[:3]):
+            mapped = {idx: _column_key(cell) for idx, cell in enumerate(header or [])}
+            keys = set(mapped.values())
+            if "date" in keys and keys & {"debit", "credit", "amount"}:
+                columns, body = mapped, body[i + 1:]
+                break
+        if columns is None:
+            continue  # continuation tables reuse the last header seen
+        for cells in body:
+            values = {}
+            last_key = None
+            for idx, cell in enumerate(cells or []):
+                key = columns.get(idx)
+                if key is None and last_key == "description":
+                    key = "description"  # narration spilling into an unlabelled column
+                last_key = key or last_key
+                if key and cell not in (None, ""):
+                    text = " ".join(str(cell).split())
+                    values[key] = f"{values[key]} {text}" if key in values else text
+            date = _table_date(values.get("date"))
+            if not date:
+                continue  # opening balance, sub-totals, wrapped narration lines
+            if "amount" in values:
+                amount = _table_amount(values["amount"])
+                debit, credit = (-amount, 0.0) if amount < 0 else (0.0, amount)
+            else:
+                debit = abs(_table_amount(values.get("debit")))
+                credit = abs(_table_amount(values.get("credit")))
+            rows.append({
+                "date": date,
+                "description": values.get("description", ""),
+                "debit": debit,
+                "credit": credit,
+                "balance": _table_amount(values["balance"]) if values.get("balance") else None,
+            })
+    return rows
+
+
+_TEXT_TABLE_SETTINGS = {"vertical_strategy": "text", "horizontal_strategy": "text"}
+
+
+def _table_rows(file_bytes: bytes, password: str, start: int, end: int) -> list[dict]:
+    """Rows from ruled tables on the chunk's pages, else from text-aligned columns."""
+    with _open_pdf(file_bytes, password) as pdf:
+        pages = pdf.pages[start:end]
+        rows = _rows_from_tables([t for page in pages for t in (page.extract_tables() or [])])
+        if not rows:
+            rows = _rows_from_tables(
+                [t for page in pages for t in (page.extract_tables(_TEXT_TABLE_SETTINGS) or [])])
+    return rows
+
+
+def _parse_chunk(file_bytes, password, page_range, text, context, cache):
+    """(raw_rows, parser) for one chunk: cached/Claude answer, else the table fallback."""
+    if not text.strip():
+        return [], "ai_claude"
+    model = os.getenv("CLAUDE_MODEL", "claude-sonnet-4-6")
+    parts = ("rows", _PDF_PROMPT_VERSION, model, hashlib.sha256(text.encode("utf-8")).hexdigest())
+    cached = cache.get_rows(parts)
+    if cached is not None:
+        return cached, "ai_claude"
+    try:
+        raw_rows = []
+        for window in _text_windows(text):
+            raw_rows.extend(_call_claude(window, context=context))
+    except Exception as llm_exc:
+        rows = _table_rows(file_bytes, password, *page_range)
+        if not rows:
+            raise llm_exc
+        return rows, "pdf_table"
+    cache.set_rows(parts, raw_rows)
+    return raw_rows, "ai_claude"
+
+
+def iter_pdf(file_bytes: bytes, password: str = "", tenant_id: str | None = None):
+    """Stream a PDF bank statement through Claude, page chunk by page chunk.
+
+    Yields rows in the standard import_workflow format in page order;
+    row_index keeps counting across chunks; chunks are cached for
+    ``tenant_id`` only.  Raises
+    ValueError("PDF_PASSWORD_REQUIRED: ...") if the PDF is encrypted and no
+    (or wrong) password is supplied.
+    """
+    password = password or ""
+    page_count, encrypted = _pdf_page_count(file_bytes, password)
+    if not page_count:
+        return
+    per_chunk = max(1, _env_int("PDF_STATEMENT_PAGES_PER_CHUNK", 3))
+    ranges = [(start, min(start + per_chunk, page_count)) for start in range(0, page_count, per_chunk)]
+    cache = _ChunkCache(tenant_id, encrypted)
+    file_hash = hashlib.sha256(file_bytes).hexdigest()
+
+    texts = _extract_chunks(file_bytes, password, file_hash, ranges, cache)
+    context = "\n".join(texts[0].splitlines()[:_HEADER_CONTEXT_ROWS]) if texts else ""
+
+    concurrency = max(1, min(_env_int("PDF_STATEMENT_LLM_CONCURRENCY", 4), len(ranges)))
+    next_index = 1
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        inflight = deque()
+        for n, (page_range, text) in enumerate(zip(ranges, texts)):
+            inflight.append(pool.submit(_parse_chunk, file_bytes, password, page_range, text,
+                                        context if n else "", cache))
+            # Keep at most `concurrency` chunks ahead of the consumer, yielding in page order.
+            while len(inflight) > concurrency or (inflight and n == len(ranges) - 1):
+                raw_rows, parser = inflight.popleft().result()
+                rows = _normalize_rows(raw_rows, start=next_index, parser=parser)
+                next_index += len(rows)
+                yield from rows
+
+
+def parse_pdf(file_bytes: bytes, password: str = "", tenant_id: str | None = None) -> list[dict]:
+    """Parse a PDF bank statement using Claude AI.
+
+    Extracts text with pdfplumber then asks Claude to extract transactions.
+    Raises ValueError("PDF_PASSWORD_REQUIRED: ...") if the PDF is encrypted
+    and no (or wrong) password is supplied.  See iter_pdf() for the chunked,
+    streaming form used by the import job.
+    """
+    return list(iter_pdf(file_bytes, password=password, tenant_id=tenant_id))
 
 
 def check_file_needs_password(file_bytes: bytes, extension: str, password: str = "") -> None:
@@ -350,8 +707,7 @@ def check_file_needs_password(file_bytes: bytes, extension: str, password: str =
                 # Just open the PDF to verify password works; don't read all pages
                 _ = len(pdf.pages)
         except Exception as exc:
-            err_lower = str(exc).lower()
-            if any(kw in err_lower for kw in ("password", "encrypt", "incorrect", "decrypt", "protected")):
+            if _is_password_error(exc):
                 if not password:
                     raise ValueError(
                         "PDF_PASSWORD_REQUIRED: This PDF is password-protected. "
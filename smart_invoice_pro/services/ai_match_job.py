@@ -0,0 +1,454 @@
+"""
+Background AI reconciliation — batched, concurrent Claude matching for every
+unmatched bank transaction of a user.
+
+Follows the bank-import job pattern: the request creates a job document
+(status queued → running → completed | failed, with stage/progress), the
+shared job queue runs it as JOB_KIND "ai_match", and the client polls it.
+Outages retry with the queue's backoff; a dead-lettered job is marked failed.
+
+Inside a job:
+  1. unmatched transactions and open candidates are loaded once
+     (bank_auto_match.load_candidates — already-claimed records excluded),
+  2. each transaction gets a shortlist from the deterministic amount/date
+     index (CandidateIndex windows, nearest first); transactions with an
+     empty shortlist never reach the model,
+  3. suggestions are looked up in the shared cache by
+     (model, prompt version, transaction fingerprint, candidate-set hash),
+  4. misses are sent AI_MATCH_BATCH_SIZE transactions per prompt, with up to
+     AI_MATCH_CONCURRENCY requests in flight and at most
+     AI_MATCH_RATE_PER_MINUTE requests started per minute,
+  5. suggestions at or above the confidence threshold are applied strongest
+     first, each invoice/expense at most once, in batched writes.
+
+Usage
+-----
+from smart_invoice_pro.services.ai_match_job import create_ai_match_job, get_job
+
+job = create_ai_match_job(tenant_id=..., user_id=..., confidence_threshold=0.85)
+job = get_job(tenant_id=..., job_id=job["id"])
+
+Environment variables
+---------------------
+AI_MATCH_ASYNC                 Force background (true) or inline (false) runs.
+AI_MATCH_WORKERS               Jobs running at once across workers (default 1).
+AI_MATCH_BATCH_SIZE            Transactions per prompt (default 10).
+AI_MATCH_CONCURRENCY           Requests in flight per job (default 4).
+AI_MATCH_RATE_PER_MINUTE       Requests started per minute per job (default 50, 0 = unlimited).
+AI_MATCH_PREFILTER_TOLERANCE   Relative amount window for shortlists (default 0.1).
+AI_MATCH_SHORTLIST             Candidates per kind per transaction (default 5).
+AI_MATCH_CACHE_TTL             Seconds suggestions stay cached (default 604800).
+AI_MATCH_RESULTS_LIMIT         Suggestions kept on the job document (default 500).
+AI_RECONCILIATION_CLIENT       "local" uses the offline matcher instead of Claude.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from azure.core.exceptions import ServiceRequestError, ServiceResponseError
+
+from smart_invoice_pro.services import ai_reconciliation_service as ai
+from smart_invoice_pro.services.bank_auto_match import (
+    CandidateIndex,
+    load_candidates,
+    nearest_candidates,
+    write_matches,
+)
+from smart_invoice_pro.utils.audit_logger import log_audit_event
+from smart_invoice_pro.utils.cosmos_client import (
+    ai_match_jobs_container,
+    bank_transactions_container,
+    expenses_container,
+    invoices_container,
+)
+from smart_invoice_pro.utils.job_queue import enqueue_job, register_job_kind
+from smart_invoice_pro.utils.shared_cache import get_cache
+
+logger = logging.getLogger(__name__)
+
+JOB_KIND = "ai_match"
+_PROGRESS_INTERVAL_SECONDS = 2.0
+_CACHE_NAMESPACE = "ai_match_suggestions"
+
+
+def utcnow_iso():
+    return datetime.utcnow().isoformat()
+
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _should_process_async():
+    explicit = (os.getenv("AI_MATCH_ASYNC") or "").strip().lower()
+    if explicit in {"1", "true", "yes", "on"}:
+        return True
+    if explicit in {"0", "false", "no", "off"}:
+        return False
+
+    # Keep tests deterministic by default while runtime stays async.
+    return not bool(os.getenv("PYTEST_CURRENT_TEST"))
+
+
+# ── Job documents ─────────────────────────────────────────────────────────────
+
+def _create_job_doc(*, tenant_id, user_id, confidence_threshold):
+    now = utcnow_iso()
+    job_doc = {
+        "id": str(uuid.uuid4()),
+        "tenant_id": tenant_id,
+        "user_id": user_id,
+        "confidence_threshold": confidence_threshold,
+        "status": "queued",
+        "stage": "queued",
+        "progress": 0,
+        "total": 0,
+        "processed": 0,
+        "ai_requests": 0,
+        "cache_hits": 0,
+        "skipped": 0,
+        "failed": 0,
+        "newly_matched": 0,
+        "results": [],
+        "results_truncated": False,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+        "completed_at": None,
+    }
+    ai_match_jobs_container.create_item(body=job_doc)
+    return job_doc
+
+
+def _replace_job(job_doc):
+    job_doc["updated_at"] = utcnow_iso()
+    ai_match_jobs_container.replace_item(item=job_doc["id"], body=job_doc)
+    return job_doc
+
+
+def get_job(*, tenant_id, job_id):
+    items = list(ai_match_jobs_container.query_items(
+        query="SELECT * FROM c WHERE c.id = @id AND c.tenant_id = @tid",
+        parameters=[
+            {"name": "@id", "value": job_id},
+            {"name": "@tid", "value": tenant_id},
+        ],
+        partition_key=tenant_id,
+    ))
+    return items[0] if items else None
+
+
+# ── Matching ──────────────────────────────────────────────────────────────────
+
+class _RateLimiter:
+    """Token bucket: at most ``per_minute`` acquisitions per rolling minute."""
+
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0 if per_minute > 0 else 0.0
+        self.capacity = max(1.0, min(float(per_minute), 10.0)) if per_minute > 0 else 0.0
+        self._tokens = self.capacity
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class _ProgressReporter:
+    """Throttled job-document writes so progress costs O(seconds), not O(transactions)."""
+
+    def __init__(self, job_doc):
+        self.job_doc = job_doc
+        self._last = 0.0
+
+    def advance(self, count=1, force=False):
+        self.job_doc["processed"] += count
+        now = time.monotonic()
+        if not force and now - self._last < _PROGRESS_INTERVAL_SECONDS:
+            return
+        self._last = now
+        total = max(1, self.job_doc["total"])
+        # 5–90 % is matching; the remainder covers loading and applying.
+        self.job_doc["progress"] = min(90, 5 + int(85 * self.job_doc["processed"] / total))
+        _replace_job(self.job_doc)
+
+
+def _load_unmatched(user_id, tenant_id):
+    parameters = [{"name": "@user_id", "value": user_id}]
+    legacy = ""
+    if tenant_id:
+        legacy = " AND (NOT IS_DEFINED(c.tenant_id) OR c.tenant_id = @tenant_id)"
+        parameters.append({"name": "@tenant_id", "value": tenant_id})
+    return list(bank_transactions_container.query_items(
+        query=(
+            f"SELECT * FROM c WHERE c.user_id = @user_id{legacy}"
+            " AND c.match_status = 'unmatched'"
+        ),
+        parameters=parameters,
+        partition_key=user_id,
+    ))
+
+
+def _shortlists(unmatched, invoices, expenses):
+    """[(txn, invoice_rows, expense_rows)] using the deterministic amount/date index."""
+    tolerance = min(0.99, max(0.0, _env_float("AI_MATCH_PREFILTER_TOLERANCE", 0.1)))
+    limit = max(1, _env_int("AI_MATCH_SHORTLIST", 5))
+    invoice_index = CandidateIndex("invoice", invoices, "balance_due", ("due_date", "issue_date"))
+    expense_index = CandidateIndex("expense", expenses, "amount", ("date", "expense_date"))
+    invoice_rows = {str(r["id"]): r for r in invoices if isinstance(r, dict) and r.get("id")}
+    expense_rows = {str(r["id"]): r for r in expenses if isinstance(r, dict) and r.get("id")}
+
+    work = []
+    for txn in unmatched:
+        inv = [invoice_rows[cid] for cid in nearest_candidates(invoice_index, txn, tolerance, limit)]
+        exp = [expense_rows[cid] for cid in nearest_candidates(expense_index, txn, tolerance, limit)]
+        work.append((txn, inv, exp))
+    return work
+
+
+def _cache_parts(model, txn, invoices, expenses):
+    return (ai.PROMPT_VERSION, model, ai.transaction_fingerprint(txn),
+            ai.candidate_set_hash(invoices, expenses))
+
+
+def _no_candidates():
+    return {"match_type": None, "match_id": None, "confidence": 0.0,
+            "reasoning": "No open invoice or expense within the amount window."}
+
+
+def _suggest(job_doc, work, client):
+    """Return {txn_id: suggestion}; updates the job's counters as it goes."""
+    tenant_id = job_doc["tenant_id"]
+    model = ai.default_model()
+    cache = get_cache(_CACHE_NAMESPACE, default_ttl=_env_int("AI_MATCH_CACHE_TTL", 7 * 24 * 3600))
+    reporter = _ProgressReporter(job_doc)
+
+    suggestions = {}
+    pending = []
+    for txn, invoices, expenses in work:
+        if not invoices and not expenses:
+            suggestions[txn["id"]] = _no_candidates()
+            job_doc["skipped"] += 1
+            reporter.advance()
+            continue
+        cached = cache.get(tenant_id, _cache_parts(model, txn, invoices, expenses))
+        if cached is not None:
+            suggestions[txn["id"]] = cached
+            job_doc["cache_hits"] += 1
+            reporter.advance()
+            continue
+        pending.append((txn, invoices, expenses))
+
+    if not pending:
+        return suggestions
+
+    client = client or ai.get_client()  # RuntimeError (no API key) fails the job
+    batch_size = max(1, _env_int("AI_MATCH_BATCH_SIZE", 10))
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    limiter = _RateLimiter(_env_int("AI_MATCH_RATE_PER_MINUTE", 50))
+
+    def _ask(batch):
+        limiter.acquire()
+        return ai.ai_match_batch(batch, client=client, model=model)
+
+    concurrency = max(1, min(_env_int("AI_MATCH_CONCURRENCY", 4), len(batches)))
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(_ask, batch): batch for batch in batches}
+        for future in as_completed(futures):
+            batch = futures[future]
+            job_doc["ai_requests"] += 1
+            try:
+                answers = future.result()
+            except Exception as exc:
+                logger.warning("[ai_match] batch of %d failed: %s", len(batch), exc)
+                answers = {}
+            for txn, invoices, expenses in batch:
+                suggestion = answers.get(str(txn["id"]))
+                if suggestion is None:
+                    job_doc["failed"] += 1
+                    continue
+                suggestions[txn["id"]] = suggestion
+                cache.set(tenant_id, _cache_parts(model, txn, invoices, expenses), suggestion)
+            reporter.advance(len(batch))
+    return suggestions
+
+
+def _apply(job_doc, unmatched, suggestions):
+    """Apply confident suggestions, strongest first, each candidate once."""
+    threshold = job_doc["confidence_threshold"]
+    now = utcnow_iso() + "Z"
+    by_id = {txn["id"]: txn for txn in unmatched}
+    ranked = sorted(suggestions.items(), key=lambda kv: -float(kv[1].get("confidence") or 0))
+
+    claimed = set()
+    to_write = []
+    results = []
+    for txn_id, suggestion in ranked:
+        key = (suggestion.get("match_type"), suggestion.get("match_id"))
+        will_apply = (
+            suggestion.get("match_id") is not None
+            and float(suggestion.get("confidence") or 0) >= threshold
+            and key not in claimed
+        )
+        if will_apply:
+            claimed.add(key)
+            txn = by_id[txn_id]
+            txn.update({
+                "match_status": "matched",
+                "match_type": suggestion["match_type"],
+                "match_id": suggestion["match_id"],
+                "match_confidence": suggestion["confidence"],
+                "match_reasoning": suggestion.get("reasoning", ""),
+                "updated_at": now,
+            })
+            to_write.append(txn)
+        results.append({"transaction_id": txn_id, "suggestion": suggestion, "applied": will_apply})
+
+    written = write_matches(bank_transactions_container, to_write, partition_key=job_doc["user_id"])
+    limit = max(0, _env_int("AI_MATCH_RESULTS_LIMIT", 500))
+    job_doc["results"] = results[:limit]
+    job_doc["results_truncated"] = len(results) > limit
+    return written
+
+
+_RETRYABLE_ERRORS = (ConnectionError, TimeoutError, ServiceRequestError, ServiceResponseError)
+
+
+def _is_retryable(exc):
+    """Outages and throttling are worth another attempt; bad input or config is not."""
+    if isinstance(exc, _RETRYABLE_ERRORS):
+        return True
+    status = getattr(exc, "status_code", None)
+    return isinstance(status, int) and (status in (408, 429) or status >= 500)
+
+
+def _mark_match_failed(job_doc, error):
+    job_doc.update({
+        "status": "failed",
+        "stage": "failed",
+        "progress": 100,
+        "completed_at": utcnow_iso(),
+        "error": error,
+    })
+    _replace_job(job_doc)
+
+
+def _run_ai_match_job(*, job_doc, client=None, raise_retryable=False):
+    """Load, match and apply; with ``raise_retryable`` (queued jobs) outages re-raise for a retry."""
+    tenant_id = job_doc["tenant_id"]
+    user_id = job_doc["user_id"]
+
+    job_doc.update({"status": "running", "stage": "loading", "progress": 0, "error": None})
+    _replace_job(job_doc)
+    try:
+        unmatched = _load_unmatched(user_id, tenant_id)
+        invoices, expenses = load_candidates(invoices_container, expenses_container,
+                                             bank_transactions_container,
+                                             user_id=user_id, tenant_id=tenant_id)
+        work = _shortlists(unmatched, invoices, expenses)
+        job_doc.update({"stage": "matching", "progress": 5, "total": len(work)})
+        _replace_job(job_doc)
+
+        suggestions = _suggest(job_doc, work, client)
+
+        job_doc.update({"stage": "applying", "progress": 90})
+        _replace_job(job_doc)
+        job_doc["newly_matched"] = _apply(job_doc, unmatched, suggestions)
+
+        job_doc.update({
+            "status": "completed",
+            "stage": "completed",
+            "progress": 100,
+            "completed_at": utcnow_iso(),
+        })
+        _replace_job(job_doc)
+        log_audit_event({
+            "action": "BANK_AI_MATCH_RUN",
+            "entity": "bank_account",
+            "entity_id": "all",
+            "category": "banking",
+            "metadata": {
+                "job_id": job_doc["id"],
+                "processed": job_doc["processed"],
+                "newly_matched": job_doc["newly_matched"],
+                "ai_requests": job_doc["ai_requests"],
+                "cache_hits": job_doc["cache_hits"],
+                "confidence_threshold": job_doc["confidence_threshold"],
+            },
+            "user_id": user_id,
+            "tenant_id": tenant_id,
+        })
+    except Exception as exc:
+        logger.error("[ai_match] job %s failed: %s", job_doc["id"], exc)
+        if raise_retryable and _is_retryable(exc):
+            job_doc.update({"status": "queued", "stage": "retrying", "error": str(exc)})
+            try:
+                _replace_job(job_doc)
+            except Exception:
+                pass  # the retry re-writes it
+            raise
+        _mark_match_failed(job_doc, str(exc))
+    return job_doc
+
+
+def _process_queued_match(payload, message):
+    job_doc = get_job(tenant_id=message["tenant_id"], job_id=payload["job_id"])
+    if not job_doc:
+        logger.info("[ai_match] job %s was deleted before it ran", payload["job_id"])
+        return
+    if job_doc.get("status") in ("completed", "failed"):
+        return  # finished before its queue message was settled
+    job_doc["attempt"] = message.get("attempts", 1)
+    _run_ai_match_job(job_doc=job_doc, raise_retryable=True)
+
+
+def _match_dead_lettered(payload, message, error):
+    job_doc = get_job(tenant_id=message["tenant_id"], job_id=payload.get("job_id"))
+    if job_doc and job_doc.get("status") not in ("completed", "failed"):
+        _mark_match_failed(job_doc, error)
+
+
+def create_ai_match_job(*, tenant_id, user_id, confidence_threshold=0.85, client=None):
+    """Create the job document and queue (or, in tests, run) the batched match."""
+    job_doc = _create_job_doc(tenant_id=tenant_id, user_id=user_id,
+                              confidence_threshold=confidence_threshold)
+    if _should_process_async():
+        enqueue_job(JOB_KIND, tenant_id, {"job_id": job_doc["id"]}, message_id=job_doc["id"])
+        return job_doc
+    return _run_ai_match_job(job_doc=job_doc, client=client)
+
+
+register_job_kind(
+    JOB_KIND,
+    _process_queued_match,
+    on_dead_letter=_match_dead_lettered,
+    max_running=max(1, _env_int("AI_MATCH_WORKERS", 1)),
+)
@@ -5,6 +5,11 @@ Provides `ai_match_transaction()` which accepts a bank transaction and a set of
 candidate invoices / expenses, then asks Claude to select the best match and
 return a structured confidence score + short reasoning.
 
+`ai_match_batch()` does the same for several transactions in one prompt, each
+with its own (prefiltered) candidate shortlist; it is what the background
+AI-match job (services/ai_match_job.py) uses.  `transaction_fingerprint()` and
+`candidate_set_hash()` identify a prompt's inputs so answers can be cached.
+
 Usage
 -----
 from smart_invoice_pro.services.ai_reconciliation_service import ai_match_transaction
@@ -12,18 +17,25 @@ from smart_invoice_pro.services.ai_reconciliation_service import ai_match_transa
 suggestion = ai_match_transaction(txn_doc, candidate_invoices, candidate_expenses)
 # → {"match_type": "invoice", "match_id": "inv-abc", "confidence": 0.92, "reasoning": "..."}
 
+suggestions = ai_match_batch([(txn_doc, shortlist_invoices, shortlist_expenses), ...])
+# → {"txn-1": {...same shape...}, "txn-2": {...}}
+
 Environment variables
 ---------------------
 ANTHROPIC_API_KEY   Required.  Your Anthropic API key.
 CLAUDE_MODEL        Optional.  Defaults to "claude-3-5-haiku-20241022".
                                Use "claude-3-5-sonnet-20241022" for higher accuracy.
+AI_RECONCILIATION_CLIENT  Optional.  "local" swaps Claude for LocalMatchClient, a
+                               deterministic offline matcher (tests, demos, load runs).
 """
 
 from __future__ import annotations
 
+import hashlib
 import json
 import os
 import re
+import threading
 from typing import Optional
 
 
@@ -37,6 +49,21 @@ _SYSTEM_PROMPT = (
     "Respond ONLY with valid JSON — no markdown fences, no explanation outside the JSON object."
 )
 
+_BATCH_SYSTEM_PROMPT = (
+    "You are a financial transaction matching assistant for a small-business invoicing platform. "
+    "You will receive several bank transactions, each with its own shortlist of candidate matches "
+    "(unpaid invoices and recorded expenses). For every transaction, identify the single best match "
+    "from that transaction's own shortlist, if one exists. "
+    "Prefer invoice matches for credits (money received into the account) and expense matches for debits "
+    "(money paid out). Match on payee/customer name in the description, amount proximity, and date proximity. "
+    "Only return a match when you are reasonably confident (>=0.6). "
+    "Respond ONLY with valid JSON — no markdown fences, no explanation outside the JSON object."
+)
+
+# Bump when the prompt or reply contract changes so cached answers are not reused.
+PROMPT_VERSION = "batch-v1"
+_TOKENS_PER_TRANSACTION = 160
+
 
 def _get_client():
     """Return a lazily-instantiated Anthropic client.
@@ -64,6 +91,68 @@ def _get_client():
     return anthropic.Anthropic(api_key=api_key)
 
 
+def get_client():
+    """Client for AI matching: Claude, or the offline matcher when configured."""
+    if os.getenv("AI_RECONCILIATION_CLIENT", "").strip().lower() == "local":
+        return LocalMatchClient()
+    return _get_client()
+
+
+def default_model() -> str:
+    return os.getenv("CLAUDE_MODEL", "claude-sonnet-4-6")
+
+
+def _parse_json_reply(raw: str):
+    # Strip any markdown code fences Claude might add despite instructions
+    raw = re.sub(r"^```(?:json)?\s*", "", raw.strip())
+    raw = re.sub(r"\s*```$", "", raw)
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError as exc:
+        raise ValueError(
+            f"Claude returned invalid JSON: {raw!r}"
+        ) from exc
+
+
+def _normalise_suggestion(result: dict, candidate_invoices: list, candidate_expenses: list) -> dict:
+    """Validate a raw answer against the candidates that were actually offered."""
+    match_type = result.get("match_type")
+    match_id = result.get("match_id")
+    try:
+        confidence = float(result.get("confidence", 0.0) or 0.0)
+    except (TypeError, ValueError):
+        confidence = 0.0
+
+    if match_type not in ("invoice", "expense", None):
+        match_type = None
+        match_id = None
+        confidence = 0.0
+
+    # Sanity check: ensure the returned id actually came from our candidate list
+    if match_type == "invoice":
+        valid_ids = {inv.get("id") for inv in candidate_invoices}
+    elif match_type == "expense":
+        valid_ids = {exp.get("id") for exp in candidate_expenses}
+    else:
+        valid_ids = (
+            {inv.get("id") for inv in candidate_invoices}
+            | {exp.get("id") for exp in candidate_expenses}
+        )
+    if match_id and match_id not in valid_ids:
+        match_type = None
+        match_id = None
+        confidence = 0.0
+    if not match_id:
+        match_type = None
+
+    return {
+        "match_type": match_type,
+        "match_id": match_id,
+        "confidence": max(0.0, min(1.0, confidence)),
+        "reasoning": result.get("reasoning", ""),
+    }
+
+
 def ai_match_transaction(
     txn: dict,
     candidate_invoices: list,
@@ -95,7 +184,7 @@ def ai_match_transaction(
     ValueError     if Claude returns JSON that cannot be parsed or has unexpected shape.
     """
     client = _get_client()
-    model = model or os.getenv("CLAUDE_MODEL", "claude-sonnet-4-6")
+    model = model or default_model()
 
     amount = txn.get("amount", 0)
     direction = "credit (money received)" if amount >= 0 else "debit (money paid out)"
@@ -152,42 +241,186 @@ def ai_match_transaction(
         messages=[{"role": "user", "content": user_message}],
     )
 
-    raw = response.content[0].text.strip()
+    result = _parse_json_reply(response.content[0].text)
+    if not isinstance(result, dict):
+        raise ValueError(f"Claude returned unexpected JSON: {result!r}")
+    return _normalise_suggestion(result, candidate_invoices, candidate_expenses)
 
-    # Strip any markdown code fences Claude might add despite instructions
-    raw = re.sub(r"^```(?:json)?\s*", "", raw)
-    raw = re.sub(r"\s*```$", "", raw)
 
-    try:
-        result = json.loads(raw)
-    except json.JSONDecodeError as exc:
-        raise ValueError(
-            f"Claude returned invalid JSON: {raw!r}"
-        ) from exc
+# ── Batched matching ──────────────────────────────────────────────────────────
 
-    # Validate & normalise
-    match_type = result.get("match_type")
-    match_id = result.get("match_id")
-    confidence = float(result.get("confidence", 0.0))
+def _invoice_prompt_row(inv: dict) -> dict:
+    return {
+        "id": inv.get("id"),
+        "invoice_number": inv.get("invoice_number"),
+        "customer": inv.get("customer_name") or inv.get("customer_id"),
+        "balance_due": round(float(inv.get("balance_due") or 0), 2),
+        "due_date": inv.get("due_date"),
+    }
 
-    if match_type not in ("invoice", "expense", None):
-        match_type = None
-        match_id = None
-        confidence = 0.0
-
-    # Sanity check: ensure the returned id actually came from our candidate list
-    valid_ids = (
-        {inv.get("id") for inv in candidate_invoices}
-        | {exp.get("id") for exp in candidate_expenses}
-    )
-    if match_id and match_id not in valid_ids:
-        match_type = None
-        match_id = None
-        confidence = 0.0
 
+def _expense_prompt_row(exp: dict) -> dict:
     return {
-        "match_type": match_type,
-        "match_id": match_id,
-        "confidence": confidence,
-        "reasoning": result.get("reasoning", ""),
+        "id": exp.get("id"),
+        "vendor": exp.get("vendor_name"),
+        "amount": round(float(exp.get("amount") or 0), 2),
+        "date": exp.get("date"),
+        "category": exp.get("category"),
     }
+
+
+def _digest(payload) -> str:
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def transaction_fingerprint(txn: dict) -> str:
+    """Stable id of everything the prompt says about a transaction."""
+    return _digest([
+        str(txn.get("date") or "")[:10],
+        " ".join(str(txn.get("description") or "").split()).lower(),
+        round(float(txn.get("amount") or 0), 2),
+    ])
+
+
+def candidate_set_hash(candidate_invoices: list, candidate_expenses: list) -> str:
+    """Order-independent hash of the candidate shortlist shown to the model."""
+    rows = sorted(
+        [["invoice", _invoice_prompt_row(inv)] for inv in candidate_invoices]
+        + [["expense", _expense_prompt_row(exp)] for exp in candidate_expenses],
+        key=lambda row: (row[0], str(row[1]["id"])),
+    )
+    return _digest(rows)
+
+
+def _batch_message(items) -> str:
+    transactions = []
+    for txn, invoices, expenses in items:
+        amount = float(txn.get("amount") or 0)
+        transactions.append({
+            "transaction_id": txn.get("id"),
+            "date": txn.get("date"),
+            "description": txn.get("description", ""),
+            "amount": round(abs(amount), 2),
+            "direction": "credit" if amount >= 0 else "debit",
+            "invoices": [_invoice_prompt_row(inv) for inv in invoices],
+            "expenses": [_expense_prompt_row(exp) for exp in expenses],
+        })
+    return (
+        "Match each bank transaction below to the best candidate from its own shortlist, if any.\n\n"
+        f"<input>\n{json.dumps({'transactions': transactions}, default=str)}\n</input>\n\n"
+        "Rules:\n"
+        "  - Only pick ids from the same transaction's invoices/expenses lists.\n"
+        "  - Prefer invoice matches for credits; prefer expense matches for debits.\n"
+        "  - Match on payee/customer name similarity, amount closeness, and date proximity.\n"
+        "  - Return null values when no candidate is a strong enough match (confidence < 0.6).\n\n"
+        "Respond with this exact JSON structure, one entry per transaction_id:\n"
+        '{"matches": [{"transaction_id": "<id>", "match_type": "invoice" | "expense" | null, '
+        '"match_id": "<exact candidate id>" | null, "confidence": <float 0.0-1.0>, '
+        '"reasoning": "<one concise sentence>"}]}'
+    )
+
+
+def ai_match_batch(items, client=None, model: Optional[str] = None) -> dict:
+    """Ask Claude to match several transactions in one request.
+
+    Parameters
+    ----------
+    items   List of (txn, candidate_invoices, candidate_expenses) tuples.  Each
+            transaction is only ever matched against its own candidates.
+    client  Messages-API client; defaults to get_client().
+    model   Claude model name override.
+
+    Returns
+    -------
+    {transaction_id: suggestion} with the same suggestion shape as
+    ai_match_transaction().  Transactions the reply does not cover are left
+    out so the caller can retry them.
+
+    Raises
+    ------
+    RuntimeError   if ANTHROPIC_API_KEY is missing.
+    ValueError     if the reply is not the expected JSON object.
+    """
+    items = [item for item in items if item[0].get("id")]
+    if not items:
+        return {}
+    client = client or get_client()
+    response = client.messages.create(
+        model=model or default_model(),
+        max_tokens=64 + _TOKENS_PER_TRANSACTION * len(items),
+        system=_BATCH_SYSTEM_PROMPT,
+        messages=[{"role": "user", "content": _batch_message(items)}],
+    )
+    result = _parse_json_reply(response.content[0].text)
+    answers = result.get("matches") if isinstance(result, dict) else None
+    if not isinstance(answers, list):
+        raise ValueError(f"Claude returned unexpected JSON: {result!r}")
+
+    by_id = {str(txn["id"]): (invoices, expenses) for txn, invoices, expenses in items}
+    suggestions = {}
+    for answer in answers:
+        if not isinstance(answer, dict):
+            continue
+        txn_id = str(answer.get("transaction_id") or "")
+        if txn_id in by_id and txn_id not in suggestions:
+            suggestions[txn_id] = _normalise_suggestion(answer, *by_id[txn_id])
+    return suggestions
+
+
+# ── Offline client ────────────────────────────────────────────────────────────
+
+class _LocalReply:
+    def __init__(self, text: str):
+        self.content = [type("TextBlock", (), {"text": text})()]
+
+
+class LocalMatchClient:
+    """Deterministic stand-in for the Anthropic client (batch prompts only).
+
+    Reads the <input> JSON of an ai_match_batch() prompt and picks, per
+    transaction, the candidate with the closest amount — invoices for credits,
+    expenses for debits.  Counts calls so tests can assert on request volume.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.requests = []
+        self._lock = threading.Lock()
+        self.messages = self
+
+    def create(self, *, model, max_tokens, system, messages):
+        with self._lock:
+            self.calls += 1
+            self.requests.append(messages)
+        match = re.search(r"<input>\s*(.*?)\s*</input>", messages[-1]["content"], re.S)
+        if not match:
+            return _LocalReply(json.dumps({
+                "match_type": None, "match_id": None, "confidence": 0.0,
+                "reasoning": "Local matcher only answers batch prompts.",
+            }))
+        answers = [self._answer(txn) for txn in json.loads(match.group(1))["transactions"]]
+        return _LocalReply(json.dumps({"matches": answers}))
+
+    @staticmethod
+    def _answer(txn: dict) -> dict:
+        amount = float(txn.get("amount") or 0)
+        kinds = [("invoice", "invoices", "balance_due"), ("expense", "expenses", "amount")]
+        if txn.get("direction") == "debit":
+            kinds.reverse()
+        best = None
+        for rank, (kind, key, field) in enumerate(kinds):
+            for cand in txn.get(key) or []:
+                value = float(cand.get(field) or 0)
+                if value <= 0 or amount <= 0:
+                    continue
+                rel_diff = abs(value - amount) / max(value, amount)
+                confidence = max(0.0, 1.0 - 10 * rel_diff) * (1.0 if rank == 0 else 0.8)
+                if best is None or confidence > best[0]:
+                    best = (confidence, kind, cand.get("id"))
+        if best is None or best[0] < 0.6:
+            return {"transaction_id": txn.get("transaction_id"), "match_type": None,
+                    "match_id": None, "confidence": 0.0, "reasoning": "No close amount."}
+        confidence, kind, cand_id = best
+        return {"transaction_id": txn.get("transaction_id"), "match_type": kind,
+                "match_id": cand_id, "confidence": round(confidence, 3),
+                "reasoning": "Closest amount among the shortlisted candidates."}
@@ -0,0 +1,351 @@
+"""
+Batch auto-match engine for bank reconciliation.
+
+Matches a whole set of bank transactions against open invoices and expenses
+in one pass instead of re-querying and linearly scanning every candidate for
+each transaction.
+
+How it works
+------------
+1. Candidates are loaded once per run (open invoices, tenant expenses) and
+   records already claimed by matched transactions are dropped.
+2. Each candidate kind is indexed as a sorted array keyed by
+   (amount, date ordinal).  A transaction's tolerance window
+   ``[amt·(1-tol), amt/(1-tol)]`` — equivalent to the legacy
+   ``|a-b| / max(a,b) <= tol`` rule — is found by binary search and walked
+   outward from the transaction's own (amount, date) position, so the nearest
+   candidates are examined first and at most MATCH_CANDIDATES_PER_TXN are
+   scored per transaction.
+3. Every transaction's best score is computed up front; transactions then
+   pick in descending score order, and each pick is spliced out of the index
+   with skip pointers.  Two transactions can never claim the same invoice or
+   expense, and a transaction that loses its favourite simply falls through
+   to the nearest candidate still free.
+4. Invoices are matched first, expenses second (same precedence as before).
+
+Scores combine amount closeness (70 %) with date proximity (30 %).
+
+Usage
+-----
+from smart_invoice_pro.services.bank_auto_match import load_candidates, match_transactions
+
+invoices, expenses = load_candidates(invoices_container, expenses_container,
+                                     bank_txns_container, user_id=..., tenant_id=...)
+matches = match_transactions(unmatched_txns, invoices, expenses)
+# → {txn_id: Match(kind="invoice", candidate_id="inv-1", score=0.97)}
+
+Environment variables
+---------------------
+MATCH_AMOUNT_TOLERANCE    Relative amount tolerance (default 0.01 = 1 %).
+MATCH_DATE_WINDOW_DAYS    Days after which date proximity scores 0 (default 60).
+MATCH_CANDIDATES_PER_TXN  Nearest free candidates scored per transaction (default 8).
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import date, datetime
+
+logger = logging.getLogger(__name__)
+
+_AMOUNT_WEIGHT = 0.7
+_DATE_WEIGHT = 0.3
+_UNKNOWN_DATE_SCORE = 0.5
+_TXN_BATCH_LIMIT = 100  # Cosmos transactional batch limit
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _date_ordinal(value) -> int:
+    """ISO date/datetime string → proleptic ordinal; 0 when missing or unparseable."""
+    if not value:
+        return 0
+    if isinstance(value, (date, datetime)):
+        return value.toordinal()
+    try:
+        return date.fromisoformat(str(value)[:10]).toordinal()
+    except ValueError:
+        return 0
+
+
+def _amount(value) -> float:
+    try:
+        return abs(float(value or 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+@dataclass(frozen=True)
+class Match:
+    kind: str
+    candidate_id: str
+    score: float
+
+
+class CandidateIndex:
+    """Candidates of one kind, sorted by (amount, date) with O(α) removal."""
+
+    def __init__(self, kind: str, rows, amount_field: str, date_fields: tuple):
+        self.kind = kind
+        entries = []
+        for row in rows or []:
+            if not isinstance(row, dict) or not row.get("id"):
+                continue
+            amount = _amount(row.get(amount_field))
+            if amount <= 0:
+                continue
+            ordinal = next((o for o in (_date_ordinal(row.get(f)) for f in date_fields) if o), 0)
+            entries.append((amount, ordinal, str(row["id"])))
+        entries.sort()
+        self.keys = [(amount, ordinal) for amount, ordinal, _ in entries]
+        self.amounts = [amount for amount, _, _ in entries]
+        self.dates = [ordinal for _, ordinal, _ in entries]
+        self.ids = [cid for _, _, cid in entries]
+        n = len(entries)
+        # Skip pointers over claimed slots (union-find with path halving).
+        self._next = list(range(n + 1))   # next free slot >= i; n means none
+        self._prev = list(range(n + 1))   # prev free slot <= i-1 stored at i; 0 means none
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _next_free(self, i: int) -> int:
+        nxt = self._next
+        while nxt[i] != i:
+            nxt[i] = nxt[nxt[i]]
+            i = nxt[i]
+        return i
+
+    def _prev_free(self, i: int) -> int:
+        """Largest free slot < i, or -1.  Slots are shifted by one internally."""
+        prv = self._prev
+        j = i
+        while prv[j] != j:
+            prv[j] = prv[prv[j]]
+            j = prv[j]
+        return j - 1
+
+    def claim(self, slot: int) -> None:
+        self._next[slot] = slot + 1
+        self._prev[slot + 1] = slot
+
+    def window(self, amount: float, ordinal: int, tolerance: float, limit: int):
+        """Yield up to ``limit`` free slots inside the tolerance window, nearest first."""
+        if not self.ids or amount <= 0:
+            return
+        lo_amount = amount * (1 - tolerance)
+        hi_amount = amount / (1 - tolerance) if tolerance < 1 else float("inf")
+        lo = bisect_left(self.amounts, lo_amount)
+        hi = bisect_right(self.amounts, hi_amount)
+        if lo >= hi:
+            return
+        pos = min(max(bisect_left(self.keys, (amount, ordinal)), lo), hi)
+        right = self._next_free(pos)
+        left = self._prev_free(pos)
+        found = 0
+        while found < limit:
+            right_ok = right < hi
+            left_ok = left >= lo
+            if not right_ok and not left_ok:
+                return
+            if right_ok and left_ok:
+                take_right = self._distance(right, amount, ordinal) <= self._distance(left, amount, ordinal)
+            else:
+                take_right = right_ok
+            if take_right:
+                yield right
+                right = self._next_free(right + 1)
+            else:
+                yield left
+                left = self._prev_free(left)
+            found += 1
+
+    def _distance(self, slot: int, amount: float, ordinal: int):
+        days = abs(self.dates[slot] - ordinal) if self.dates[slot] and ordinal else 0
+        return (abs(self.amounts[slot] - amount), days)
+
+
+def nearest_candidates(index: CandidateIndex, txn: dict, tolerance: float, limit: int) -> list:
+    """Ids of up to ``limit`` candidates nearest to ``txn`` inside the tolerance window."""
+    slots = index.window(_amount(txn.get("amount")), _date_ordinal(txn.get("date")), tolerance, limit)
+    return [index.ids[slot] for slot in slots]
+
+
+def score_pair(txn_amount: float, txn_ordinal: int, cand_amount: float, cand_ordinal: int,
+               tolerance: float, date_window_days: int) -> float:
+    """Combined amount/date score in [0, 1]; < 0 means outside the tolerance."""
+    rel_diff = abs(cand_amount - txn_amount) / max(cand_amount, txn_amount)
+    if rel_diff > tolerance:
+        return -1.0
+    amount_score = 1.0 - (rel_diff / tolerance if tolerance else 0.0)
+    if txn_ordinal and cand_ordinal:
+        date_score = max(0.0, 1.0 - abs(cand_ordinal - txn_ordinal) / float(max(1, date_window_days)))
+    else:
+        date_score = _UNKNOWN_DATE_SCORE
+    return _AMOUNT_WEIGHT * amount_score + _DATE_WEIGHT * date_score
+
+
+def _best(index: CandidateIndex, amount: float, ordinal: int, tolerance: float,
+          date_window_days: int, per_txn: int):
+    """(score, slot) of the best free candidate among the nearest ``per_txn``, or None."""
+    best = None
+    for slot in index.window(amount, ordinal, tolerance, per_txn):
+        score = score_pair(amount, ordinal, index.amounts[slot], index.dates[slot],
+                           tolerance, date_window_days)
+        if score >= 0 and (best is None or score > best[0]):
+            best = (score, slot)
+    return best
+
+
+def _match_against(index: CandidateIndex, pending: list, tolerance: float,
+                   date_window_days: int, per_txn: int) -> dict:
+    """Assign ``pending`` [(txn_id, amount, ordinal)] to free slots of ``index``."""
+    if not pending or not len(index):
+        return {}
+    # Pass 1: every transaction's best achievable score, with nothing claimed.
+    ranked = []
+    for order, (txn_id, amount, ordinal) in enumerate(pending):
+        best = _best(index, amount, ordinal, tolerance, date_window_days, per_txn)
+        if best is not None:
+            ranked.append((-best[0], order))
+    ranked.sort()
+
+    # Pass 2: strongest transactions pick first; a claimed slot disappears
+    # from the index, so later transactions fall through to the next nearest.
+    matches = {}
+    for _neg_score, order in ranked:
+        txn_id, amount, ordinal = pending[order]
+        best = _best(index, amount, ordinal, tolerance, date_window_days, per_txn)
+        if best is None:
+            continue
+        score, slot = best
+        index.claim(slot)
+        matches[txn_id] = Match(index.kind, index.ids[slot], round(score, 4))
+    return matches
+
+
+def match_transactions(transactions, invoices, expenses, *, tolerance=None,
+                       date_window_days=None, per_txn=None) -> dict:
+    """
+    Match bank transactions to invoices first, then expenses.
+
+    ``invoices`` rows need id/balance_due (due_date/issue_date optional);
+    ``expenses`` rows need id/amount (date optional).  Returns
+    {txn_id: Match}; each invoice/expense is used at most once.
+    """
+    tolerance = _env_float("MATCH_AMOUNT_TOLERANCE", 0.01) if tolerance is None else tolerance
+    date_window_days = (_env_int("MATCH_DATE_WINDOW_DAYS", 60)
+                        if date_window_days is None else date_window_days)
+    per_txn = max(1, _env_int("MATCH_CANDIDATES_PER_TXN", 8) if per_txn is None else per_txn)
+
+    pending = []
+    for txn in transactions or []:
+        amount = _amount(txn.get("amount"))
+        if amount > 0 and txn.get("id"):
+            pending.append((txn["id"], amount, _date_ordinal(txn.get("date"))))
+
+    invoice_index = CandidateIndex("invoice", invoices, "balance_due", ("due_date", "issue_date"))
+    matches = _match_against(invoice_index, pending, tolerance, date_window_days, per_txn)
+
+    remaining = [entry for entry in pending if entry[0] not in matches]
+    expense_index = CandidateIndex("expense", expenses, "amount", ("date", "expense_date"))
+    matches.update(_match_against(expense_index, remaining, tolerance, date_window_days, per_txn))
+    return matches
+
+
+def load_candidates(invoices_container, expenses_container, bank_txns_container, *,
+                    user_id, tenant_id):
+    """
+    One query per candidate kind, minus records already claimed by matched
+    transactions.  Returns (invoices, expenses).  ``tenant_id`` is required:
+    candidates are never loaded across tenants.
+    """
+    if not tenant_id:
+        raise ValueError("load_candidates requires a tenant_id")
+    invoices = list(invoices_container.query_items(
+        query=(
+            "SELECT c.id, c.invoice_number, c.balance_due, c.customer_id, c.customer_name, "
+            "c.due_date, c.issue_date "
+            "FROM c WHERE c.user_id = @user_id AND c.tenant_id = @tenant_id "
+            "AND c.status IN ('Issued','Overdue') AND c.balance_due > 0"
+        ),
+        parameters=[
+            {"name": "@user_id", "value": user_id},
+            {"name": "@tenant_id", "value": tenant_id},
+        ],
+        enable_cross_partition_query=True,
+    ))
+    expenses = list(expenses_container.query_items(
+        query=(
+            "SELECT c.id, c.vendor_name, c.amount, c.date, c.category FROM c "
+            "WHERE c.tenant_id = @tenant_id"
+        ),
+        parameters=[{"name": "@tenant_id", "value": tenant_id}],
+        enable_cross_partition_query=True,
+    ))
+
+    claimed = set()
+    try:
+        for row in bank_txns_container.query_items(
+            query=(
+                "SELECT c.match_type, c.match_id FROM c "
+                "WHERE c.user_id = @user_id "
+                "AND (NOT IS_DEFINED(c.tenant_id) OR c.tenant_id = @tenant_id) "
+                "AND c.match_status = 'matched'"
+            ),
+            parameters=[
+                {"name": "@user_id", "value": user_id},
+                {"name": "@tenant_id", "value": tenant_id},
+            ],
+            partition_key=user_id,
+        ):
+            if isinstance(row, dict) and row.get("match_id"):
+                claimed.add((row.get("match_type"), row["match_id"]))
+    except Exception as exc:
+        logger.warning("[auto_match] could not load existing matches: %s", exc)
+
+    if claimed:
+        invoices = [r for r in invoices if ("invoice", r.get("id")) not in claimed]
+        expenses = [r for r in expenses if ("expense", r.get("id")) not in claimed]
+    return invoices, expenses
+
+
+def write_matches(bank_txns_container, txns: list, *, partition_key) -> int:
+    """
+    Replace matched transactions in transactional batches of 100 (falling back
+    to single replaces when a batch is rejected).  Returns the number written.
+    """
+    written = 0
+    for start in range(0, len(txns), _TXN_BATCH_LIMIT):
+        chunk = txns[start:start + _TXN_BATCH_LIMIT]
+        try:
+            bank_txns_container.execute_item_batch(
+                batch_operations=[("replace", (txn["id"], txn)) for txn in chunk],
+                partition_key=partition_key,
+            )
+            written += len(chunk)
+            continue
+        except Exception as batch_exc:
+            logger.debug("[auto_match] batched replace failed, writing singly: %s", batch_exc)
+        for txn in chunk:
+            try:
+                bank_txns_container.replace_item(item=txn["id"], body=txn)
+                written += 1
+            except Exception as exc:
+                logger.warning("[auto_match] failed to save match for %s: %s", txn["id"], exc)
+    return written
@@ -0,0 +1,212 @@
+"""
+Per-bank-account fingerprint index of approved bank transactions.
+
+Every transaction approved out of an import batch gets an index document in
+``bank_txn_fingerprints`` whose id is its fingerprint — a hash of the bank
+account, date, amount, normalized description and reference.  Re-importing an
+overlapping statement then finds its duplicates with dictionary lookups
+instead of scanning ``bank_import_rows`` / ``bank_transactions``.
+
+Genuinely repeated transactions (two identical card payments on one day) are
+told apart by an occurrence ordinal: the n-th identical row of a statement
+gets fingerprint #n, so the same statement imported again reproduces the
+same fingerprints while the repeats inside it stay distinct.
+
+Index documents carry the transaction month; an import loads the index one
+(account, month) bucket at a time, the first time a row from that month is
+seen, so only the months a statement overlaps are ever read.
+
+Usage
+-----
+from smart_invoice_pro.services.bank_import.fingerprint_index import (
+    FingerprintLookup, forget_transaction, record_transactions,
+)
+
+lookup = FingerprintLookup(tenant_id, bank_account_id)
+key, duplicate_of = lookup.check(date, amount, description, reference)
+record_transactions(tenant_id, approved_txn_docs)
+forget_transaction(tenant_id, deleted_txn_doc)
+"""
+
+import hashlib
+import logging
+import re
+from datetime import datetime
+
+from azure.cosmos import exceptions
+
+from smart_invoice_pro.utils.cosmos_client import bank_txn_fingerprints_container
+
+logger = logging.getLogger(__name__)
+
+_TXN_BATCH_LIMIT = 100  # Cosmos transactional batch limit
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_description(text):
+    """Lower-case and reduce a narration to alphanumeric words."""
+    return " ".join(_NON_WORD.sub(" ", str(text or "").lower()).split())
+
+
+def fingerprint(bank_account_id, date, amount, description, reference="", occurrence=1):
+    amount = round(float(amount or 0), 2)
+    parts = [
+        str(bank_account_id or ""),
+        str(date or ""),
+        f"{amount:.2f}",
+        normalize_description(description),
+        normalize_description(reference),
+        str(occurrence),
+    ]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def _month(date):
+    return str(date or "")[:7]
+
+
+class FingerprintLookup:
+    """Duplicate check for one import into one bank account.
+
+    ``check`` numbers identical rows as it sees them and answers from the
+    index buckets loaded so far (loading the row's month on first use).
+    """
+
+    def __init__(self, tenant_id, bank_account_id):
+        self.tenant_id = tenant_id
+        self.bank_account_id = bank_account_id
+        self._known = {}        # fingerprint -> transaction id
+        self._months = set()
+        self._occurrences = {}  # base fingerprint -> count seen in this file
+
+    def _load_month(self, month):
+        self._months.add(month)
+        if not self.bank_account_id:
+            return
+        try:
+            rows = bank_txn_fingerprints_container.query_items(
+                query=(
+                    "SELECT c.id, c.transaction_id FROM c WHERE c.tenant_id = @tid "
+                    "AND c.bank_account_id = @ba AND c.month = @month"
+                ),
+                parameters=[
+                    {"name": "@tid", "value": self.tenant_id},
+                    {"name": "@ba", "value": self.bank_account_id},
+                    {"name": "@month", "value": month},
+                ],
+                partition_key=self.tenant_id,
+            )
+            for row in rows:
+                self._known[row["id"]] = row.get("transaction_id")
+        except Exception as exc:
+            logger.warning("[fingerprint_index] load failed for %s/%s: %s", self.bank_account_id, month, exc)
+
+    def check(self, date, amount, description, reference=""):
+        """Return ``(fingerprint, existing transaction id or None)``."""
+        base = fingerprint(self.bank_account_id, date, amount, description, reference, occurrence=0)
+        occurrence = self._occurrences.get(base, 0) + 1
+        self._occurrences[base] = occurrence
+        key = fingerprint(self.bank_account_id, date, amount, description, reference, occurrence)
+
+        month = _month(date)
+        if month not in self._months:
+            self._load_month(month)
+        return key, self._known.get(key)
+
+
+def _row_parts(row):
+    return (
+        row.get("bank_account_id"),
+        row.get("normalized_date"),
+        row.get("amount"),
+        row.get("description"),
+        row.get("reference") or "",
+    )
+
+
+def row_base_fingerprint(row):
+    """Fingerprint of an import row's values, without the occurrence ordinal."""
+    return fingerprint(*_row_parts(row), occurrence=0)
+
+
+def assign_fingerprints(rows):
+    """Settle the fingerprints of every row of one batch before approval.
+
+    Rows keep the fingerprint given at import, so importing the statement
+    again reproduces it. Only rows a reviewer edited (``fingerprint_edited``)
+    are fingerprinted again from their final values, with the ordinal counted
+    over all of the batch's rows in ``row_index`` order — rejected and
+    duplicate rows included — as the import numbered them.
+    """
+    occurrences = {}
+    for row in sorted(rows, key=lambda r: r.get("row_index") or 0):
+        parts = _row_parts(row)
+        base = fingerprint(*parts, occurrence=0)
+        occurrences[base] = occurrences.get(base, 0) + 1
+        if row.get("fingerprint_edited") or not row.get("fingerprint"):
+            row["fingerprint"] = fingerprint(*parts, occurrence=occurrences[base])
+    return rows
+
+
+def _index_doc(tenant_id, txn_doc, now):
+    return {
+        "id": txn_doc["fingerprint"],
+        "tenant_id": tenant_id,
+        "bank_account_id": txn_doc.get("bank_account_id"),
+        "month": _month(txn_doc.get("date")),
+        "transaction_id": txn_doc.get("id"),
+        "import_batch_id": txn_doc.get("import_batch_id"),
+        "created_at": now,
+    }
+
+
+def record_transactions(tenant_id, txn_docs):
+    """Upsert index entries for approved transactions; returns the number written.
+
+    Best-effort: a failed batch falls back to single upserts and failures are
+    logged, never raised — the transactions themselves are already saved.
+    """
+    now = datetime.utcnow().isoformat() + "Z"
+    docs = [_index_doc(tenant_id, t, now) for t in txn_docs if t.get("fingerprint") and t.get("bank_account_id")]
+    written = 0
+    for start in range(0, len(docs), _TXN_BATCH_LIMIT):
+        chunk = docs[start:start + _TXN_BATCH_LIMIT]
+        try:
+            bank_txn_fingerprints_container.execute_item_batch(
+                batch_operations=[("upsert", (doc,)) for doc in chunk],
+                partition_key=tenant_id,
+            )
+            written += len(chunk)
+            continue
+        except Exception as exc:
+            logger.warning("[fingerprint_index] batch upsert failed, writing singly: %s", exc)
+        for doc in chunk:
+            try:
+                bank_txn_fingerprints_container.upsert_item(body=doc)
+                written += 1
+            except Exception as exc:
+                logger.warning("[fingerprint_index] upsert failed for %s: %s", doc["id"], exc)
+    return written
+
+
+def forget_transaction(tenant_id, txn_doc):
+    """Drop a deleted transaction's index entry so its row can be imported again.
+
+    The entry is only removed while it still points at this transaction (a
+    released duplicate may have taken the fingerprint over). Returns True when
+    an entry was deleted; failures are logged, never raised.
+    """
+    key = txn_doc.get("fingerprint")
+    if not key:
+        return False
+    try:
+        doc = bank_txn_fingerprints_container.read_item(item=key, partition_key=tenant_id)
+        if doc.get("transaction_id") != txn_doc.get("id"):
+            return False
+        bank_txn_fingerprints_container.delete_item(item=key, partition_key=tenant_id)
+        return True
+    except exceptions.CosmosResourceNotFoundError:
+        return False
+    except Exception as exc:
+        logger.warning("[fingerprint_index] delete failed for %s: %s", key, exc)
+        return False
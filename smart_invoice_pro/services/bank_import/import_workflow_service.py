@@ -2,12 +2,22 @@ import base64
 import csv
 import hashlib
 import io
+import logging
 import os
 import re
+import time
 import uuid
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
 
+from azure.core.exceptions import ServiceRequestError, ServiceResponseError
+from cryptography.fernet import Fernet, InvalidToken
+
+from smart_invoice_pro.services.bank_import.fingerprint_index import (
+    FingerprintLookup,
+    fingerprint,
+    row_base_fingerprint,
+)
 from smart_invoice_pro.utils.audit_logger import log_audit_event
 from smart_invoice_pro.utils.cosmos_client import (
     bank_import_artifacts_container,
@@ -16,6 +26,7 @@ from smart_invoice_pro.utils.cosmos_client import (
     bank_import_rows_container,
 )
 from smart_invoice_pro.utils.domain_events import record_domain_event
+from smart_invoice_pro.utils.job_queue import enqueue_job, register_job_kind
 
 try:
     from azure.storage.blob import BlobServiceClient, ContentSettings
@@ -23,12 +34,22 @@ except ImportError:  # pragma: no cover - optional for local test runs
     BlobServiceClient = None
     ContentSettings = None
 
+try:
+    from anthropic import APIConnectionError
+except ImportError:  # pragma: no cover - only needed for AI parsing
+    APIConnectionError = ConnectionError
+
 
 SUPPORTED_PARSE_EXTENSIONS = {"csv", "qif"}
 AI_PARSE_EXTENSIONS = {"xlsx", "xls", "pdf"}
 REVIEW_ONLY_EXTENSIONS = {"txt", "docx"}
 INLINE_ARTIFACT_MAX_BYTES = 700 * 1024
-_IMPORT_WORKER = ThreadPoolExecutor(max_workers=int(os.getenv("BANK_IMPORT_WORKERS", "2")))
+JOB_KIND = "bank_import"
+_QUEUE_PRIORITY = 1  # a user is waiting on the review screen
+_TXN_BATCH_LIMIT = 100  # Cosmos transactional batch limit
+_PROGRESS_INTERVAL_SECONDS = 2.0
+
+logger = logging.getLogger(__name__)
 
 
 def utcnow_iso():
@@ -113,9 +134,9 @@ def _parse_amount(value):
         return 0.0
 
 
-def _parse_csv(text):
-    reader = csv.DictReader(io.StringIO(text))
-    rows = []
+def _iter_csv(stream):
+    """Yield normalized candidates from a CSV text stream, one row at a time."""
+    reader = csv.DictReader(stream)
     for index, row in enumerate(reader, start=1):
         row_clean = {
             str(k or "").strip().lower(): _sanitize_csv_cell(v)
@@ -144,40 +165,47 @@ def _parse_csv(text):
             or ""
         )
 
-        rows.append(
-            {
-                "row_index": index,
-                "date": _normalize_date(date_value),
-                "description": description,
-                "amount": round(amount, 2),
-                "running_balance": _parse_amount(row_clean.get("balance")),
-                "raw_row": row,
-            }
-        )
-    return rows
+        yield {
+            "row_index": index,
+            "date": _normalize_date(date_value),
+            "description": description,
+            "amount": round(amount, 2),
+            "running_balance": _parse_amount(row_clean.get("balance")),
+            "reference": (
+                row_clean.get("reference")
+                or row_clean.get("ref no")
+                or row_clean.get("chq/ref no")
+                or row_clean.get("cheque no")
+                or ""
+            ),
+            "raw_row": row,
+        }
 
 
-def _parse_qif(text):
-    rows = []
+def _parse_csv(text):
+    return list(_iter_csv(io.StringIO(text)))
+
+
+def _iter_qif(lines):
+    """Yield normalized candidates from QIF lines, one ``^``-terminated record at a time."""
     current = {}
     row_index = 0
-    for line in text.splitlines():
+    for line in lines:
         line = line.strip()
         if not line or line.startswith("!"):
             continue
         if line == "^":
             if current:
                 row_index += 1
-                rows.append(
-                    {
-                        "row_index": row_index,
-                        "date": _normalize_date(current.get("date", "")),
-                        "description": current.get("payee") or current.get("memo") or "",
-                        "amount": round(_parse_amount(current.get("amount", 0)), 2),
-                        "running_balance": None,
-                        "raw_row": dict(current),
-                    }
-                )
+                yield {
+                    "row_index": row_index,
+                    "date": _normalize_date(current.get("date", "")),
+                    "description": current.get("payee") or current.get("memo") or "",
+                    "amount": round(_parse_amount(current.get("amount", 0)), 2),
+                    "running_balance": None,
+                    "reference": current.get("number") or "",
+                    "raw_row": dict(current),
+                }
             current = {}
             continue
 
@@ -191,13 +219,21 @@ def _parse_qif(text):
             current["payee"] = payload
         elif marker == "M":
             current["memo"] = payload
-    return rows
+        elif marker == "N":
+            current["number"] = payload
 
 
-def _score_candidate(candidate):
+def _parse_qif(text):
+    return list(_iter_qif(text.splitlines()))
+
+
+def _score_candidate(candidate, duplicate_of=None):
     score = 0.35
     warnings = []
 
+    if duplicate_of:
+        warnings.append("possible_duplicate")
+
     if candidate.get("date"):
         score += 0.25
     else:
@@ -226,15 +262,22 @@ def _score_candidate(candidate):
     return confidence, level, warnings
 
 
-def _build_row_doc(*, tenant_id, user_id, batch_id, bank_account_id, filename, candidate):
-    confidence_score, confidence_level, warnings = _score_candidate(candidate)
+def _build_row_doc(*, tenant_id, user_id, batch_id, bank_account_id, filename, candidate, lookup=None):
     now = utcnow_iso()
     amount = round(float(candidate.get("amount") or 0), 2)
     description = candidate.get("description") or ""
     normalized_date = candidate.get("date") or ""
-    fingerprint = hashlib.sha256(
-        f"{tenant_id}|{bank_account_id}|{normalized_date}|{amount}|{description.strip().lower()}".encode("utf-8")
-    ).hexdigest()
+    reference = str(candidate.get("reference") or "").strip()
+    if lookup is not None:
+        row_fingerprint, duplicate_of = lookup.check(normalized_date, amount, description, reference)
+    else:
+        row_fingerprint = fingerprint(bank_account_id, normalized_date, amount, description, reference)
+        duplicate_of = None
+    confidence_score, confidence_level, warnings = _score_candidate(candidate, duplicate_of)
+    if duplicate_of:
+        review_status = "duplicate"
+    else:
+        review_status = "pending_review" if confidence_level != "high" else "ready"
 
     return {
         "id": str(uuid.uuid4()),
@@ -246,6 +289,7 @@ def _build_row_doc(*, tenant_id, user_id, batch_id, bank_account_id, filename, c
         "row_index": int(candidate.get("row_index") or 0),
         "normalized_date": normalized_date,
         "description": description,
+        "reference": reference,
         "amount": amount,
         "currency": "INR",
         "direction": "credit" if amount > 0 else "debit" if amount < 0 else "neutral",
@@ -253,14 +297,15 @@ def _build_row_doc(*, tenant_id, user_id, batch_id, bank_account_id, filename, c
         "confidence_score": confidence_score,
         "confidence_level": confidence_level,
         "warnings": warnings,
-        "review_status": "pending_review" if confidence_level != "high" else "ready",
+        "review_status": review_status,
+        "duplicate_of": duplicate_of,
         "raw_row": candidate.get("raw_row") or {},
         "provenance": {
             "parser": candidate.get("parser"),
             "row_index": candidate.get("row_index"),
             "workflow_stage": "normalized",
         },
-        "fingerprint": fingerprint,
+        "fingerprint": row_fingerprint,
         "created_at": now,
         "updated_at": now,
     }
@@ -331,6 +376,17 @@ def store_raw_artifact(*, tenant_id, user_id, batch_id, filename, content_type,
     return artifact_doc
 
 
+def load_raw_artifact(*, tenant_id, artifact_id):
+    """Return the uploaded file bytes stored by store_raw_artifact."""
+    artifact_doc = bank_import_artifacts_container.read_item(item=artifact_id, partition_key=tenant_id)
+    if artifact_doc.get("storage_mode") == "azure_blob":
+        container_client, _ = _get_blob_container_client()
+        if container_client is None:
+            raise RuntimeError("Raw artifact is stored in Azure Blob but no blob connection string is configured")
+        return container_client.download_blob(artifact_doc["blob_path"]).readall()
+    return base64.b64decode(artifact_doc.get("inline_base64") or "")
+
+
 def _create_job_doc(*, tenant_id, user_id, batch_id):
     now = utcnow_iso()
     job_doc = {
@@ -373,21 +429,215 @@ def _should_process_async():
     return not bool(os.getenv("PYTEST_CURRENT_TEST"))
 
 
-def _run_import_job(*, batch_doc, job_doc, file_profile, file_bytes, pdf_password=""):
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _candidate_stream(file_profile, file_bytes, pdf_password="", tenant_id=None):
+    """Return (candidates, fraction_read) for an upload.
+
+    ``candidates`` is a lazy iterator of normalized rows; ``fraction_read()``
+    reports how much of the file has been consumed, or is None when the
+    parser cannot tell (AI parsing).
+    """
+    if file_profile["workflow_mode"] == "review_only":
+        return iter(()), None
+
+    if file_profile["workflow_mode"] == "ai_parse":
+        from smart_invoice_pro.services.ai_bank_parser_service import iter_pdf, iter_xlsx  # noqa: PLC0415
+        if file_profile["extension"] in ("xlsx", "xls"):
+            rows = iter_xlsx(file_bytes, password=pdf_password or "")
+        else:  # pdf
+            rows = iter_pdf(file_bytes, password=pdf_password or "", tenant_id=tenant_id)
+
+        def _tagged_ai():
+            for candidate in rows:
+                candidate.setdefault("parser", "ai_claude")
+                yield candidate
+
+        return _tagged_ai(), None
+
+    # Decode lazily rather than materialising the whole statement as one str.
+    raw = io.BytesIO(file_bytes)
+    stream = io.TextIOWrapper(raw, encoding="utf-8", errors="replace", newline="")
+    parser = file_profile["extension"]
+    rows = _iter_csv(stream) if parser == "csv" else _iter_qif(stream)
+
+    def _tagged():
+        for candidate in rows:
+            candidate["parser"] = parser
+            yield candidate
+
+    size = max(1, len(file_bytes))
+    return _tagged(), lambda: min(1.0, raw.tell() / size)
+
+
+class _RowWriter:
+    """Persist row documents in bounded, concurrent transactional batches.
+
+    At most BANK_IMPORT_WRITE_CONCURRENCY batches of BANK_IMPORT_WRITE_BATCH
+    rows are in flight; ``add`` blocks once that limit is reached, so memory
+    stays flat however long the statement is.  A rejected batch is retried
+    row by row; a failing single write fails the import.
+    """
+
+    def __init__(self, partition_key):
+        self.partition_key = partition_key
+        self.batch_size = max(1, min(_TXN_BATCH_LIMIT, _env_int("BANK_IMPORT_WRITE_BATCH", _TXN_BATCH_LIMIT)))
+        self.concurrency = max(1, _env_int("BANK_IMPORT_WRITE_CONCURRENCY", 4))
+        self.written = 0
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency)
+        self._pending = []
+        self._inflight = set()
+
+    def add(self, row_doc):
+        self._pending.append(row_doc)
+        if len(self._pending) >= self.batch_size:
+            self._submit()
+
+    def close(self):
+        """Flush and wait for every write; re-raises the first write failure."""
+        try:
+            if self._pending:
+                self._submit()
+            done, _ = wait(self._inflight)
+            self._inflight = set()
+            self._collect(done)
+        finally:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def _submit(self):
+        chunk, self._pending = self._pending, []
+        while len(self._inflight) >= self.concurrency:
+            done, self._inflight = wait(self._inflight, return_when=FIRST_COMPLETED)
+            self._collect(done)
+        self._inflight.add(self._pool.submit(self._write, chunk))
+
+    def _collect(self, done):
+        for future in done:
+            self.written += future.result()
+
+    def _write(self, chunk):
+        try:
+            bank_import_rows_container.execute_item_batch(
+                batch_operations=[("create", (doc,)) for doc in chunk],
+                partition_key=self.partition_key,
+            )
+            return len(chunk)
+        except Exception as batch_exc:
+            logger.debug("[bank_import] batched create failed, writing singly: %s", batch_exc)
+        for doc in chunk:
+            bank_import_rows_container.create_item(body=doc)
+        return len(chunk)
+
+
+class _ImportProgress:
+    """Throttled job-document writes while rows stream through."""
+
+    def __init__(self, job_doc, fraction_read):
+        self.job_doc = job_doc
+        self.fraction_read = fraction_read
+        self._last = 0.0
+
+    def row(self):
+        self.job_doc["rows_processed"] += 1
+        if self.job_doc["rows_processed"] == 1:
+            self.job_doc.update({"stage": "normalizing", "progress": 60})
+            self._write()
+            return
+        if time.monotonic() - self._last < _PROGRESS_INTERVAL_SECONDS:
+            return
+        if self.fraction_read is not None:
+            # 60–95 % tracks how much of the file has been read.
+            self.job_doc["progress"] = max(self.job_doc["progress"], 60 + int(35 * self.fraction_read()))
+        self._write()
+
+    def _write(self):
+        self._last = time.monotonic()
+        _replace_job(self.job_doc)
+
+
+_RETRYABLE_ERRORS = (ConnectionError, TimeoutError, ServiceRequestError, ServiceResponseError,
+                     APIConnectionError)
+
+
+def _is_retryable(exc):
+    """Outages and throttling are worth another attempt; a bad or unreadable file is not."""
+    if isinstance(exc, _RETRYABLE_ERRORS):
+        return True
+    status = getattr(exc, "status_code", None)
+    return isinstance(status, int) and (status in (408, 429) or status >= 500)
+
+
+def _mark_import_failed(batch_doc, job_doc, error):
+    batch_doc.update(
+        {
+            "status": "failed",
+            "review_status": "review_required",
+            "warnings": (batch_doc.get("warnings") or []) + [{"code": "PROCESSING_FAILED", "message": error}],
+        }
+    )
+    _replace_batch(batch_doc)
+
+    job_doc.update(
+        {
+            "status": "failed",
+            "stage": "failed",
+            "progress": 100,
+            "completed_at": utcnow_iso(),
+            "error": error,
+        }
+    )
+    _replace_job(job_doc)
+    log_audit_event({
+        "action": "BANK_IMPORT_FAILED",
+        "entity": "bank_import_batch",
+        "entity_id": batch_doc["id"],
+        "entity_label": batch_doc.get("filename"),
+        "category": "banking",
+        "after": {"status": "failed", "error": error},
+        "user_id": batch_doc.get("user_id"),
+        "tenant_id": batch_doc["tenant_id"],
+        "metadata": {"job_id": job_doc.get("id")},
+    })
+    record_domain_event(
+        "BANK_IMPORT_FAILED",
+        tenant_id=batch_doc["tenant_id"],
+        user_id=batch_doc.get("user_id"),
+        entity_type="bank_import_batch",
+        entity_id=batch_doc["id"],
+        payload={"error": error, "job_id": job_doc.get("id")},
+    )
+
+
+def _run_import_job(*, batch_doc, job_doc, file_profile, file_bytes, pdf_password="", raise_retryable=False):
+    """Parse the upload into row documents and settle the batch and job.
+
+    Failures mark both failed, except that with ``raise_retryable`` (queued
+    imports) a transient error is re-raised so the job queue retries it; the
+    dead-letter hook marks the job failed once the attempts run out.
+    """
     tenant_id = batch_doc["tenant_id"]
     user_id = batch_doc["user_id"]
     bank_account_id = batch_doc.get("bank_account_id")
     filename = batch_doc.get("filename")
 
     warnings = []
-    row_docs = []
-
-    job_doc.update({"status": "running", "stage": "extracting", "progress": 20, "error": None})
+    row_docs = []  # preview only; the full set is streamed to Cosmos
+    preview_limit = max(0, _env_int("BANK_IMPORT_PREVIEW_ROWS", 200))
+    row_count = 0
+    row_warning_count = 0
+    duplicate_count = 0
+    needs_review = False
+
+    job_doc.update({"status": "running", "stage": "extracting", "progress": 20,
+                    "rows_processed": 0, "error": None})
     _replace_job(job_doc)
 
     try:
-        parsed_rows = []
-
         if file_profile["workflow_mode"] == "review_only":
             warnings.append(
                 {
@@ -395,25 +645,13 @@ def _run_import_job(*, batch_doc, job_doc, file_profile, file_bytes, pdf_passwor
                     "message": "This file type is accepted for review-first intake, but deterministic extraction is not enabled in this phase.",
                 }
             )
-        elif file_profile["workflow_mode"] == "ai_parse":
-            from smart_invoice_pro.services.ai_bank_parser_service import parse_xlsx, parse_pdf  # noqa: PLC0415
-            if file_profile["extension"] in ("xlsx", "xls"):
-                parsed_rows = parse_xlsx(file_bytes, password=pdf_password or "")
-            else:  # pdf
-                parsed_rows = parse_pdf(file_bytes, password=pdf_password or "")
-            for candidate in parsed_rows:
-                candidate.setdefault("parser", "ai_claude")
-        else:
-            text = file_bytes.decode("utf-8", errors="replace")
-            parsed_rows = _parse_csv(text) if file_profile["extension"] == "csv" else _parse_qif(text)
-            for candidate in parsed_rows:
-                candidate["parser"] = file_profile["extension"]
-
-        if parsed_rows:
-            job_doc.update({"stage": "normalizing", "progress": 60})
-            _replace_job(job_doc)
 
-            for candidate in parsed_rows:
+        candidates, fraction_read = _candidate_stream(file_profile, file_bytes, pdf_password, tenant_id)
+        progress = _ImportProgress(job_doc, fraction_read)
+        writer = _RowWriter(tenant_id)
+        lookup = FingerprintLookup(tenant_id, bank_account_id)
+        try:
+            for candidate in candidates:
                 row_doc = _build_row_doc(
                     tenant_id=tenant_id,
                     user_id=user_id,
@@ -421,11 +659,28 @@ def _run_import_job(*, batch_doc, job_doc, file_profile, file_bytes, pdf_passwor
                     bank_account_id=bank_account_id,
                     filename=filename,
                     candidate=candidate,
+                    lookup=lookup,
                 )
-                bank_import_rows_container.create_item(body=row_doc)
-                row_docs.append(row_doc)
+                writer.add(row_doc)
+                row_count += 1
+                duplicate_count += bool(row_doc.get("duplicate_of"))
+                row_warning_count += len(row_doc.get("warnings") or [])
+                needs_review = needs_review or row_doc.get("review_status") != "ready"
+                if len(row_docs) < preview_limit:
+                    row_docs.append(row_doc)
+                progress.row()
+        finally:
+            writer.close()
+
+        if duplicate_count:
+            warnings.append(
+                {
+                    "code": "DUPLICATE_TRANSACTIONS",
+                    "message": f"{duplicate_count} row(s) match transactions already imported into this account and will be skipped on approval unless un-flagged.",
+                }
+            )
 
-        if not row_docs and file_profile["workflow_mode"] != "review_only":
+        if not row_count and file_profile["workflow_mode"] != "review_only":
             warnings.append(
                 {
                     "code": "NO_TRANSACTIONS_FOUND",
@@ -433,14 +688,14 @@ def _run_import_job(*, batch_doc, job_doc, file_profile, file_bytes, pdf_passwor
                 }
             )
 
-        warning_count = len(warnings) + sum(len(row.get("warnings") or []) for row in row_docs)
         batch_doc.update(
             {
-                "row_count": len(row_docs),
-                "warning_count": warning_count,
+                "row_count": row_count,
+                "duplicate_count": duplicate_count,
+                "warning_count": len(warnings) + row_warning_count,
                 "warnings": warnings,
-                "status": "review_ready" if row_docs else "review_required",
-                "review_status": "review_required" if warnings or any(row.get("review_status") != "ready" for row in row_docs) else "ready",
+                "status": "review_ready" if row_count else "review_required",
+                "review_status": "review_required" if warnings or needs_review else "ready",
                 "completed_at": utcnow_iso(),
             }
         )
@@ -480,58 +735,109 @@ def _run_import_job(*, batch_doc, job_doc, file_profile, file_bytes, pdf_passwor
         )
         return batch_doc, job_doc, row_docs
     except Exception as exc:
-        batch_doc.update(
-            {
-                "status": "failed",
-                "review_status": "review_required",
-                "warnings": (batch_doc.get("warnings") or []) + [{"code": "PROCESSING_FAILED", "message": str(exc)}],
-            }
-        )
-        _replace_batch(batch_doc)
-
-        job_doc.update(
-            {
-                "status": "failed",
-                "stage": "failed",
-                "progress": 100,
-                "completed_at": utcnow_iso(),
-                "error": str(exc),
-            }
-        )
-        _replace_job(job_doc)
-        log_audit_event({
-            "action": "BANK_IMPORT_FAILED",
-            "entity": "bank_import_batch",
-            "entity_id": batch_doc["id"],
-            "entity_label": filename,
-            "category": "banking",
-            "after": {"status": "failed", "error": str(exc)},
-            "user_id": user_id,
-            "tenant_id": tenant_id,
-            "metadata": {"job_id": job_doc.get("id")},
-        })
-        record_domain_event(
-            "BANK_IMPORT_FAILED",
-            tenant_id=tenant_id,
-            user_id=user_id,
-            entity_type="bank_import_batch",
-            entity_id=batch_doc["id"],
-            payload={"error": str(exc), "job_id": job_doc.get("id")},
-        )
+        if raise_retryable and _is_retryable(exc):
+            job_doc.update({"status": "queued", "stage": "retrying", "error": str(exc)})
+            try:
+                _replace_job(job_doc)
+            except Exception:
+                pass  # the retry re-writes it
+            raise
+        _mark_import_failed(batch_doc, job_doc, str(exc))
         return batch_doc, job_doc, []
 
 
-def _enqueue_import_job(*, batch_doc, job_doc, file_profile, file_bytes, pdf_password=""):
-    _IMPORT_WORKER.submit(
-        _run_import_job,
+def _password_cipher():
+    secret = os.getenv("BANK_IMPORT_SECRET_KEY") or os.getenv(
+        "JWT_SECRET_KEY", os.getenv("SECRET_KEY", "your_secret_key")
+    )
+    return Fernet(base64.urlsafe_b64encode(hashlib.sha256(secret.encode("utf-8")).digest()))
+
+
+def _seal_password(password):
+    return _password_cipher().encrypt(password.encode("utf-8")).decode("ascii") if password else ""
+
+
+def _open_password(sealed):
+    if not sealed:
+        return ""
+    try:
+        return _password_cipher().decrypt(sealed.encode("ascii")).decode("utf-8")
+    except InvalidToken:
+        raise ValueError("The file password could not be recovered; please upload the statement again") from None
+
+
+def _enqueue_import_job(*, batch_doc, job_doc, pdf_password=""):
+    """Queue the import; the file is re-read from its raw artifact by whichever worker claims it.
+
+    The PDF/Excel password travels in the queue message only, encrypted with
+    BANK_IMPORT_SECRET_KEY (default: JWT_SECRET_KEY / SECRET_KEY), and the
+    message is deleted when the job completes or scrubbed if it is dead-lettered.
+    """
+    enqueue_job(
+        JOB_KIND,
+        batch_doc["tenant_id"],
+        {"batch_id": batch_doc["id"], "job_id": job_doc["id"], "sealed_password": _seal_password(pdf_password)},
+        priority=_QUEUE_PRIORITY,
+        message_id=job_doc["id"],
+    )
+
+
+def _clear_batch_rows(*, tenant_id, batch_id):
+    """Delete a batch's rows (a retried attempt's leftovers, or a deleted batch)."""
+    rows = list(bank_import_rows_container.query_items(
+        query="SELECT c.id FROM c WHERE c.batch_id = @batch_id AND c.tenant_id = @tenant_id",
+        parameters=[
+            {"name": "@batch_id", "value": batch_id},
+            {"name": "@tenant_id", "value": tenant_id},
+        ],
+        partition_key=tenant_id,
+    ))
+    for row in rows:
+        try:
+            bank_import_rows_container.delete_item(item=row["id"], partition_key=tenant_id)
+        except Exception:
+            pass  # best-effort cleanup
+
+
+def _process_queued_import(payload, message):
+    tenant_id = message["tenant_id"]
+    batch_doc = get_batch(tenant_id=tenant_id, batch_id=payload["batch_id"])
+    job_doc = get_job(tenant_id=tenant_id, job_id=payload["job_id"])
+    if not batch_doc or not job_doc:
+        logger.info("[bank_import] batch %s was deleted before it ran", payload["batch_id"])
+        return
+    if job_doc.get("status") in ("completed", "failed"):
+        return  # finished before its queue message was settled
+    if message.get("attempts", 1) > 1:
+        _clear_batch_rows(tenant_id=tenant_id, batch_id=batch_doc["id"])
+
+    try:
+        pdf_password = _open_password(payload.get("sealed_password"))
+    except ValueError as exc:
+        _mark_import_failed(batch_doc, job_doc, str(exc))
+        return
+    file_bytes = load_raw_artifact(tenant_id=tenant_id, artifact_id=batch_doc["raw_artifact_id"])
+    job_doc["attempt"] = message.get("attempts", 1)
+    _run_import_job(
         batch_doc=batch_doc,
         job_doc=job_doc,
-        file_profile=file_profile,
+        file_profile=detect_file_profile(batch_doc.get("filename"), batch_doc.get("content_type")),
         file_bytes=file_bytes,
         pdf_password=pdf_password,
+        raise_retryable=True,
     )
 
 
+def _import_dead_lettered(payload, message, error):
+    payload.pop("sealed_password", None)
+    tenant_id = message["tenant_id"]
+    batch_doc = get_batch(tenant_id=tenant_id, batch_id=payload.get("batch_id"))
+    job_doc = get_job(tenant_id=tenant_id, job_id=payload.get("job_id"))
+    if not batch_doc or not job_doc or job_doc.get("status") in ("completed", "failed"):
+        return
+    _mark_import_failed(batch_doc, job_doc, error)
+
+
 def create_import_batch(*, tenant_id, user_id, bank_account_id, filename, content_type, file_bytes, pdf_password=""):
     file_profile = detect_file_profile(filename, content_type)
     if not file_profile["supported"]:
@@ -589,13 +895,7 @@ def create_import_batch(*, tenant_id, user_id, bank_account_id, filename, conten
     _replace_batch(batch_doc)
 
     if _should_process_async():
-        _enqueue_import_job(
-            batch_doc=dict(batch_doc),
-            job_doc=dict(job_doc),
-            file_profile=file_profile,
-            file_bytes=file_bytes,
-            pdf_password=pdf_password,
-        )
+        _enqueue_import_job(batch_doc=batch_doc, job_doc=job_doc, pdf_password=pdf_password)
         return batch_doc, job_doc, []
 
     return _run_import_job(
@@ -650,10 +950,13 @@ def update_row(*, tenant_id, batch_id, row_id, updates):
     if not row_doc:
         return None
 
-    editable_fields = {"normalized_date", "description", "amount", "currency", "review_status", "running_balance"}
+    editable_fields = {"normalized_date", "description", "reference", "amount", "currency", "review_status", "running_balance"}
+    imported_base = row_base_fingerprint(row_doc)
     for key, value in (updates or {}).items():
         if key in editable_fields:
             row_doc[key] = value
+    if row_base_fingerprint(row_doc) != imported_base:
+        row_doc["fingerprint_edited"] = True  # re-fingerprinted at approval
 
     if row_doc.get("review_status") == "pending_review":
         row_doc["review_status"] = "reviewed"
@@ -678,15 +981,7 @@ def delete_batch(*, tenant_id, batch_id):
         raise ValueError("Cannot delete an approved import batch — its transactions are already in reconciliation.")
 
     # Delete all rows for this batch
-    rows = list(bank_import_rows_container.query_items(
-        query=f"SELECT c.id FROM c WHERE c.batch_id = '{batch_id}' AND c.tenant_id = '{tenant_id}'",
-        enable_cross_partition_query=True,
-    ))
-    for row in rows:
-        try:
-            bank_import_rows_container.delete_item(item=row["id"], partition_key=tenant_id)
-        except Exception:
-            pass  # best-effort cleanup
+    _clear_batch_rows(tenant_id=tenant_id, batch_id=batch_id)
 
     # Delete the associated job if present
     job_id = batch_doc.get("job_id")
@@ -720,4 +1015,12 @@ def mark_batch_approved(*, tenant_id, batch_id, approved_row_count):
     batch_doc["approved_at"] = utcnow_iso()
     batch_doc["updated_at"] = utcnow_iso()
     bank_import_batches_container.replace_item(item=batch_id, body=batch_doc)
-    return batch_doc
\ No newline at end of file
+    return batch_doc
+
+
+register_job_kind(
+    JOB_KIND,
+    _process_queued_import,
+    on_dead_letter=_import_dead_lettered,
+    max_running=max(1, _env_int("BANK_IMPORT_MAX_RUNNING", 8)),
+)
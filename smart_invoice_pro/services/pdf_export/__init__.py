@@ -0,0 +1 @@
+"""Bulk document PDF export services."""
@@ -0,0 +1,605 @@
+"""
+Bulk invoice PDF export — renders every matching invoice into one ZIP archive.
+
+Follows the bank-import job pattern: the request creates a job document
+(status queued → running → completed | failed, with stage/progress) and
+enqueues it on the durable job queue (kind "pdf_export"), and the client
+polls the job until a download link appears. A job whose worker dies is
+re-run once its queue lease expires; outages are retried with the queue's
+backoff, and a dead-lettered job is marked failed.
+
+Inside a job:
+  1. invoices are paged from Cosmos (one continuation page in memory),
+  2. PDFs already in the render cache (utils/pdf_cache.py) are reused,
+  3. misses are rendered with build_invoice_pdf on a process pool so all
+     cores are used, and written back to the render cache,
+  4. results are streamed into a ZIP file on disk as they complete.
+
+Finished archives live in PDF_EXPORT_DIR, or in Azure Blob when a connection
+string is configured, and expire after PDF_EXPORT_TTL_HOURS: downloads are
+refused once the job's ``expires_at`` has passed, and the scheduler's daily
+``prune_expired_exports`` deletes expired files and blobs. A local archive
+can only be downloaded from the host whose worker wrote it, so deployments
+with more than one host need blob storage; PDF_EXPORT_STORAGE=blob makes
+exports fail instead of falling back to local disk.
+
+Environment
+-----------
+  PDF_EXPORT_ASYNC           – force background (true) or inline (false) runs
+  PDF_EXPORT_WORKERS         – concurrent export jobs across workers (default 1)
+  PDF_EXPORT_PROCESSES       – render processes per job (default CPU count,
+                               0 = render in the job thread)
+  PDF_EXPORT_MAX_DOCUMENTS   – cap on invoices per archive (default 5000)
+  PDF_EXPORT_DIR             – local archive directory
+  PDF_EXPORT_STORAGE         – "auto" (default: blob when configured, else
+                               local) or "blob" (require blob storage)
+  PDF_EXPORT_TTL_HOURS       – archive lifetime (default 24)
+  PDF_EXPORT_BLOB_CONTAINER  – blob container (default "pdf-exports")
+  PDF_EXPORT_BLOB_CONNECTION_STRING / AZURE_STORAGE_CONNECTION_STRING
+"""
+import logging
+import multiprocessing
+import os
+import re
+import socket
+import tempfile
+import time
+import uuid
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+
+from azure.core.exceptions import ServiceRequestError, ServiceResponseError
+
+from smart_invoice_pro.api.invoice_generation import (
+    _get_tenant_branding,
+    branding_for_document,
+    pdf_render_fingerprint,
+    render_pdf_task,
+)
+from smart_invoice_pro.utils.archive_service import LIFECYCLE_ARCHIVED
+from smart_invoice_pro.utils.audit_logger import log_audit_event
+from smart_invoice_pro.utils.cosmos_client import invoices_container, pdf_export_jobs_container
+from smart_invoice_pro.utils.csv_stream import iter_query_pages
+from smart_invoice_pro.utils.job_queue import enqueue_job, register_job_kind
+from smart_invoice_pro.utils.org_tax_mode import get_org_gst_mode
+from smart_invoice_pro.utils.pdf_cache import get_pdf_store
+
+try:
+    from azure.storage.blob import BlobServiceClient, ContentSettings
+except ImportError:  # pragma: no cover - optional for local test runs
+    BlobServiceClient = None
+    ContentSettings = None
+
+logger = logging.getLogger(__name__)
+
+JOB_KIND = "pdf_export"
+_PROGRESS_INTERVAL_SECONDS = 2.0
+_UNSAFE_FILENAME = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+def utcnow_iso():
+    return datetime.utcnow().isoformat()
+
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _should_process_async():
+    explicit = (os.getenv("PDF_EXPORT_ASYNC") or "").strip().lower()
+    if explicit in {"1", "true", "yes", "on"}:
+        return True
+    if explicit in {"0", "false", "no", "off"}:
+        return False
+
+    # Keep tests deterministic by default while runtime stays async.
+    return not bool(os.getenv("PYTEST_CURRENT_TEST"))
+
+
+def _export_dir():
+    path = os.getenv("PDF_EXPORT_DIR") or os.path.join(tempfile.gettempdir(), "smart_invoice_pro_pdf_exports")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _require_blob():
+    return (os.getenv("PDF_EXPORT_STORAGE") or "auto").strip().lower() == "blob"
+
+
+def _get_blob_container_client():
+    connection_string = (os.getenv("PDF_EXPORT_BLOB_CONNECTION_STRING")
+                         or os.getenv("AZURE_STORAGE_CONNECTION_STRING"))
+    container_name = os.getenv("PDF_EXPORT_BLOB_CONTAINER", "pdf-exports")
+    if not connection_string or BlobServiceClient is None:
+        return None
+    service = BlobServiceClient.from_connection_string(connection_string)
+    container_client = service.get_container_client(container_name)
+    try:
+        container_client.create_container()
+    except Exception:
+        pass
+    return container_client
+
+
+# ── Filters ───────────────────────────────────────────────────────────────────
+
+def normalize_filters(raw):
+    """Validate the request body; raises ValueError with a client-facing message."""
+    raw = raw or {}
+    filters = {}
+    for key in ("date_from", "date_to"):
+        value = (raw.get(key) or "").strip()
+        if value:
+            try:
+                datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                raise ValueError(f"{key} must be YYYY-MM-DD")
+            filters[key] = value
+    if filters.get("date_from") and filters.get("date_to") and filters["date_from"] > filters["date_to"]:
+        raise ValueError("date_from must be on or before date_to")
+
+    statuses = raw.get("status") or []
+    if isinstance(statuses, str):
+        statuses = [s.strip() for s in statuses.split(",")]
+    if not isinstance(statuses, list):
+        raise ValueError("status must be a string or an array")
+    statuses = [str(s).strip() for s in statuses if str(s).strip()]
+    if statuses:
+        filters["status"] = statuses
+
+    customer_id = str(raw.get("customer_id") or "").strip()
+    if customer_id:
+        filters["customer_id"] = customer_id
+    return filters
+
+
+def _build_query(tenant_id, filters, projection="*"):
+    where = [
+        "c.tenant_id = @tenant_id",
+        "(NOT IS_DEFINED(c.status) OR UPPER(c.status) != @archived_status)",
+    ]
+    parameters = [
+        {"name": "@tenant_id", "value": tenant_id},
+        {"name": "@archived_status", "value": LIFECYCLE_ARCHIVED},
+    ]
+    if filters.get("date_from"):
+        where.append("c.issue_date >= @date_from")
+        parameters.append({"name": "@date_from", "value": filters["date_from"]})
+    if filters.get("date_to"):
+        where.append("c.issue_date <= @date_to")
+        parameters.append({"name": "@date_to", "value": filters["date_to"]})
+    if filters.get("status"):
+        where.append("ARRAY_CONTAINS(@statuses, c.status)")
+        parameters.append({"name": "@statuses", "value": filters["status"]})
+    if filters.get("customer_id"):
+        where.append("c.customer_id = @customer_id")
+        parameters.append({"name": "@customer_id", "value": filters["customer_id"]})
+    query = f"SELECT {projection} FROM c WHERE {' AND '.join(where)}"
+    if projection == "*":
+        query += " ORDER BY c.issue_date ASC"
+    return query, parameters
+
+
+def _count_matches(tenant_id, filters):
+    query, parameters = _build_query(tenant_id, filters, projection="VALUE COUNT(1)")
+    rows = list(invoices_container.query_items(
+        query=query, parameters=parameters, enable_cross_partition_query=True,
+    ))
+    return int(rows[0]) if rows and isinstance(rows[0], (int, float)) else 0
+
+
+# ── Job documents ─────────────────────────────────────────────────────────────
+
+def _create_job_doc(*, tenant_id, user_id, filters):
+    now = utcnow_iso()
+    job_doc = {
+        "id": str(uuid.uuid4()),
+        "tenant_id": tenant_id,
+        "user_id": user_id,
+        "doc_type": "invoice",
+        "filters": filters,
+        "status": "queued",
+        "stage": "queued",
+        "progress": 0,
+        "total": 0,
+        "processed": 0,
+        "cache_hits": 0,
+        "failed_documents": [],
+        "storage_mode": None,
+        "archive_path": None,
+        "archive_host": None,
+        "archive_bytes": 0,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+        "completed_at": None,
+        "expires_at": None,
+    }
+    pdf_export_jobs_container.create_item(body=job_doc)
+    return job_doc
+
+
+def _replace_job(job_doc):
+    job_doc["updated_at"] = utcnow_iso()
+    pdf_export_jobs_container.replace_item(item=job_doc["id"], body=job_doc)
+    return job_doc
+
+
+def get_job(*, tenant_id, job_id):
+    items = list(pdf_export_jobs_container.query_items(
+        query="SELECT * FROM c WHERE c.id = @id AND c.tenant_id = @tid",
+        parameters=[
+            {"name": "@id", "value": job_id},
+            {"name": "@tid", "value": tenant_id},
+        ],
+        partition_key=tenant_id,
+    ))
+    return items[0] if items else None
+
+
+# ── Rendering ─────────────────────────────────────────────────────────────────
+
+def _archive_name(invoice, used):
+    base = _UNSAFE_FILENAME.sub("-", str(invoice.get("invoice_number") or invoice.get("id") or "invoice")).strip("-")
+    base = base or "invoice"
+    name = f"{base}.pdf"
+    n = 2
+    while name in used:
+        name = f"{base}-{n}.pdf"
+        n += 1
+    used.add(name)
+    return name
+
+
+def _render_pool(pending_count):
+    """Return (pool, size); pool is None when rendering inline."""
+    processes = _env_int("PDF_EXPORT_PROCESSES", os.cpu_count() or 1)
+    processes = min(processes, pending_count)
+    if processes <= 0:
+        return None, 0
+    # spawn: never fork a process that is running request/worker threads.
+    pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+    return pool, processes
+
+
+class _ProgressReporter:
+    """Throttled job-document writes so progress costs O(seconds), not O(documents)."""
+
+    def __init__(self, job_doc):
+        self.job_doc = job_doc
+        self._last = 0.0
+
+    def advance(self, *, cache_hit=False, failed=None, force=False):
+        self.job_doc["processed"] += 1
+        if cache_hit:
+            self.job_doc["cache_hits"] += 1
+        if failed:
+            self.job_doc["failed_documents"].append(failed)
+        self.flush(force=force)
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last < _PROGRESS_INTERVAL_SECONDS:
+            return
+        self._last = now
+        total = max(1, self.job_doc["total"])
+        # 5–95 % is rendering; the remainder covers counting and upload.
+        self.job_doc["progress"] = min(95, 5 + int(90 * self.job_doc["processed"] / total))
+        _replace_job(self.job_doc)
+
+
+def _write_archive(job_doc, archive_path):
+    """Render every matching invoice into ``archive_path``; returns the document count."""
+    tenant_id = job_doc["tenant_id"]
+    filters = job_doc.get("filters") or {}
+    max_documents = max(1, _env_int("PDF_EXPORT_MAX_DOCUMENTS", 5000))
+    live_branding = _get_tenant_branding(tenant_id)
+    gst_mode = get_org_gst_mode(tenant_id)
+    store = get_pdf_store()
+    reporter = _ProgressReporter(job_doc)
+    used_names = set()
+    written = 0
+
+    query, parameters = _build_query(tenant_id, filters)
+    pool, pool_size, pool_checked = None, 0, False
+    in_flight = {}
+    try:
+        with zipfile.ZipFile(archive_path, "w", compression=zipfile.ZIP_STORED) as archive:
+            # PDF streams are already deflate-compressed; ZIP_STORED avoids a
+            # second, nearly useless compression pass.
+
+            def _add(name, pdf_bytes):
+                nonlocal written
+                archive.writestr(name, pdf_bytes)
+                written += 1
+
+            def _collect(done):
+                for future in done:
+                    name, invoice_id, fingerprint = in_flight.pop(future)
+                    try:
+                        _key, pdf_bytes = future.result()
+                    except Exception as exc:
+                        logger.warning("[pdf_export] render failed for invoice %s: %s", invoice_id, exc)
+                        reporter.advance(failed={"invoice_id": invoice_id, "error": str(exc)})
+                        continue
+                    _add(name, pdf_bytes)
+                    if store is not None:
+                        try:
+                            store.put(tenant_id, fingerprint, pdf_bytes)
+                        except Exception as exc:
+                            logger.warning("[pdf_export] cache write failed: %s", exc)
+                    reporter.advance()
+
+            seen = 0
+            for page in iter_query_pages(invoices_container, query, parameters):
+                for invoice in page:
+                    if seen >= max_documents:
+                        break
+                    seen += 1
+                    name = _archive_name(invoice, used_names)
+                    branding = branding_for_document(invoice, tenant_id, live=live_branding)
+                    fingerprint = pdf_render_fingerprint(invoice, branding, "invoice", gst_mode)
+
+                    cached = None
+                    if store is not None:
+                        try:
+                            cached = store.get(tenant_id, fingerprint)
+                        except Exception as exc:
+                            logger.warning("[pdf_export] cache read failed: %s", exc)
+                    if cached:
+                        _add(name, cached)
+                        reporter.advance(cache_hit=True)
+                        continue
+
+                    task = (name, invoice, branding, "invoice", gst_mode)
+                    if not pool_checked:
+                        pool, pool_size = _render_pool(max(1, job_doc["total"] - job_doc["processed"]))
+                        pool_checked = True
+                    if pool is None:
+                        future = _EagerFuture(render_pdf_task, task)
+                    else:
+                        # Bound outstanding work so memory stays ~2 documents per process.
+                        while len(in_flight) >= pool_size * 2:
+                            done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                            _collect(done)
+                        future = pool.submit(render_pdf_task, task)
+                    in_flight[future] = (name, invoice.get("id"), fingerprint)
+                    if pool is None:
+                        _collect([future])
+                if seen >= max_documents:
+                    break
+
+            if in_flight:
+                done, _ = wait(list(in_flight))
+                _collect(done)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+    reporter.flush(force=True)
+    return written
+
+
+class _EagerFuture:
+    """Future-shaped wrapper used when rendering inline (PDF_EXPORT_PROCESSES=0)."""
+
+    def __init__(self, fn, arg):
+        try:
+            self._result, self._error = fn(arg), None
+        except Exception as exc:
+            self._result, self._error = None, exc
+
+    def result(self):
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+def _publish_archive(job_doc, archive_path):
+    container_client = _get_blob_container_client()
+    if container_client is None:
+        return {"storage_mode": "local", "archive_path": archive_path, "archive_host": socket.gethostname()}
+    blob_path = f"{job_doc['tenant_id']}/{job_doc['id']}.zip"
+    upload_kwargs = {}
+    if ContentSettings is not None:
+        upload_kwargs["content_settings"] = ContentSettings(content_type="application/zip")
+    with open(archive_path, "rb") as fh:
+        container_client.upload_blob(name=blob_path, data=fh, overwrite=True, **upload_kwargs)
+    os.unlink(archive_path)
+    return {"storage_mode": "azure_blob", "archive_path": blob_path}
+
+
+def _archive_ttl_seconds():
+    return max(1, _env_int("PDF_EXPORT_TTL_HOURS", 24)) * 3600
+
+
+def _prune_expired_archives():
+    cutoff = time.time() - _archive_ttl_seconds()
+    root = _export_dir()
+    removed = 0
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        try:
+            if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                os.unlink(path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def _prune_expired_blobs():
+    container_client = _get_blob_container_client()
+    if container_client is None:
+        return 0
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=_archive_ttl_seconds())
+    removed = 0
+    for blob in container_client.list_blobs():
+        if blob.last_modified and blob.last_modified < cutoff:
+            try:
+                container_client.delete_blob(blob.name)
+                removed += 1
+            except Exception as exc:
+                logger.warning("[pdf_export] could not delete expired blob %s: %s", blob.name, exc)
+    return removed
+
+
+def prune_expired_exports():
+    """Delete expired archives from local disk and blob storage (scheduled daily)."""
+    summary = {"local": _prune_expired_archives(), "blob": _prune_expired_blobs()}
+    logger.info("[pdf_export] pruned %(local)d local and %(blob)d blob archives", summary)
+    return summary
+
+
+def is_expired(job_doc, now=None):
+    """True once a finished job's archive is past its ``expires_at``."""
+    expires_at = job_doc.get("expires_at")
+    return bool(expires_at) and expires_at <= (now or datetime.utcnow()).isoformat()
+
+
+_RETRYABLE_ERRORS = (ConnectionError, TimeoutError, ServiceRequestError, ServiceResponseError)
+
+
+def _is_retryable(exc):
+    """Outages and throttling are worth another attempt; bad input or config is not."""
+    if isinstance(exc, _RETRYABLE_ERRORS):
+        return True
+    status = getattr(exc, "status_code", None)
+    return isinstance(status, int) and (status in (408, 429) or status >= 500)
+
+
+def _mark_export_failed(job_doc, error):
+    job_doc.update({
+        "status": "failed",
+        "stage": "failed",
+        "progress": 100,
+        "completed_at": utcnow_iso(),
+        "error": error,
+    })
+    _replace_job(job_doc)
+
+
+def _run_export_job(*, job_doc, raise_retryable=False):
+    """Render, archive and publish; with ``raise_retryable`` (queued jobs) outages re-raise for a retry."""
+    tenant_id = job_doc["tenant_id"]
+    archive_path = os.path.join(_export_dir(), f"{job_doc['id']}.zip")
+
+    job_doc.update({"status": "running", "stage": "counting", "progress": 0, "error": None})
+    _replace_job(job_doc)
+    try:
+        if _require_blob() and _get_blob_container_client() is None:
+            raise RuntimeError("PDF_EXPORT_STORAGE=blob but no blob connection string is configured")
+        _prune_expired_archives()
+        job_doc["total"] = min(_count_matches(tenant_id, job_doc.get("filters") or {}),
+                               max(1, _env_int("PDF_EXPORT_MAX_DOCUMENTS", 5000)))
+        job_doc.update({"stage": "rendering", "progress": 5, "processed": 0, "cache_hits": 0,
+                        "failed_documents": []})
+        _replace_job(job_doc)
+
+        written = _write_archive(job_doc, archive_path)
+
+        job_doc.update({"stage": "uploading", "archive_bytes": os.path.getsize(archive_path)})
+        job_doc.update(_publish_archive(job_doc, archive_path))
+        ttl_hours = max(1, _env_int("PDF_EXPORT_TTL_HOURS", 24))
+        job_doc.update({
+            "status": "completed",
+            "stage": "completed",
+            "progress": 100,
+            "document_count": written,
+            "completed_at": utcnow_iso(),
+            "expires_at": (datetime.utcnow() + timedelta(hours=ttl_hours)).isoformat(),
+        })
+        _replace_job(job_doc)
+        log_audit_event({
+            "action": "INVOICE_PDF_EXPORT_COMPLETED",
+            "entity": "pdf_export_job",
+            "entity_id": job_doc["id"],
+            "after": {"document_count": written, "filters": job_doc.get("filters")},
+            "user_id": job_doc.get("user_id"),
+            "tenant_id": tenant_id,
+        })
+    except Exception as exc:
+        logger.error("[pdf_export] job %s failed: %s", job_doc["id"], exc)
+        try:
+            os.unlink(archive_path)
+        except OSError:
+            pass
+        if raise_retryable and _is_retryable(exc):
+            job_doc.update({"status": "queued", "stage": "retrying", "error": str(exc)})
+            try:
+                _replace_job(job_doc)
+            except Exception:
+                pass  # the retry re-writes it
+            raise
+        _mark_export_failed(job_doc, str(exc))
+    return job_doc
+
+
+def _process_queued_export(payload, message):
+    job_doc = get_job(tenant_id=message["tenant_id"], job_id=payload["job_id"])
+    if not job_doc:
+        logger.info("[pdf_export] job %s was deleted before it ran", payload["job_id"])
+        return
+    if job_doc.get("status") in ("completed", "failed"):
+        return  # finished before its queue message was settled
+    job_doc["attempt"] = message.get("attempts", 1)
+    _run_export_job(job_doc=job_doc, raise_retryable=True)
+
+
+def _export_dead_lettered(payload, message, error):
+    job_doc = get_job(tenant_id=message["tenant_id"], job_id=payload.get("job_id"))
+    if job_doc and job_doc.get("status") not in ("completed", "failed"):
+        _mark_export_failed(job_doc, error)
+
+
+def create_export_job(*, tenant_id, user_id, filters):
+    """Create the job document and queue (or, in tests, run) the export."""
+    job_doc = _create_job_doc(tenant_id=tenant_id, user_id=user_id, filters=filters)
+    if _should_process_async():
+        enqueue_job(JOB_KIND, tenant_id, {"job_id": job_doc["id"]}, message_id=job_doc["id"])
+        return job_doc
+    return _run_export_job(job_doc=job_doc)
+
+
+def open_archive(job_doc, chunk_size=64 * 1024):
+    """
+    Yield the finished archive's bytes in chunks.
+
+    Raises FileNotFoundError when the archive has expired or was removed.
+    """
+    if is_expired(job_doc):
+        raise FileNotFoundError("Archive has expired")
+    if job_doc.get("storage_mode") == "azure_blob":
+        container_client = _get_blob_container_client()
+        if container_client is None:
+            raise FileNotFoundError("Archive storage is not configured")
+        downloader = container_client.get_blob_client(job_doc["archive_path"]).download_blob()
+        return downloader.chunks()
+
+    host = job_doc.get("archive_host")
+    if host and host != socket.gethostname():
+        raise FileNotFoundError(f"Archive is stored on host {host}; configure blob storage for multi-host exports")
+    path = job_doc.get("archive_path") or ""
+    if not path or not os.path.isfile(path):
+        raise FileNotFoundError("Archive has expired")
+
+    def _chunks():
+        with open(path, "rb") as fh:
+            while True:
+                chunk = fh.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    return _chunks()
+
+
+register_job_kind(
+    JOB_KIND,
+    _process_queued_export,
+    on_dead_letter=_export_dead_lettered,
+    max_running=max(1, _env_int("PDF_EXPORT_WORKERS", 1)),
+)
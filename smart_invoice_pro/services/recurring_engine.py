@@ -0,0 +1,373 @@
+"""
+Recurring invoice run engine — generates the invoices for every due recurring
+profile, tenant by tenant, in a bounded thread pool.
+
+Used by the daily scheduler job (scheduler.process_recurring_profiles) and the
+/cron/generate-recurring endpoint. A run:
+  1. streams the due profiles (status Active, next_run_date <= run date) once
+     and groups them by tenant,
+  2. resumes tenants that already have a checkpoint for this run id — only
+     profiles still due are loaded, so a re-run (after a crash, or for profiles
+     that became due later in the day) picks up exactly what is left,
+  3. processes up to RECURRING_RUN_WORKERS tenants concurrently; within a
+     tenant, profiles run in order and invoice numbers are reserved
+     RECURRING_NUMBER_BATCH at a time with one ETag update of the tenant's
+     counter (invoice_preferences_api.reserve_invoice_numbers),
+  4. writes the tenant's checkpoint (processed / generated / errors) every
+     RECURRING_CHECKPOINT_EVERY profiles and when it finishes.
+
+Crash safety: a profile only stops being due once its next_run_date is
+advanced, which happens after its invoice is written, with an ETag check so
+an edit made while the run was in flight is not overwritten. The invoice id is
+derived from (profile id, occurrence date), so re-processing a profile whose
+invoice was written just before a crash finds the existing invoice instead of
+creating a second one. Numbers reserved but not used leave gaps.
+
+Usage
+-----
+from smart_invoice_pro.services.recurring_engine import run_recurring_generation
+
+summary = run_recurring_generation()                      # every tenant, today (UTC)
+summary = run_recurring_generation(tenant_id="t-1")       # one tenant (one shard)
+
+Environment variables
+---------------------
+RECURRING_RUN_WORKERS        Tenants processed concurrently (default 8).
+RECURRING_NUMBER_BATCH       Invoice numbers reserved per counter update (default 50).
+RECURRING_CHECKPOINT_EVERY   Profiles between checkpoint writes (default 100).
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import secrets
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from azure.core import MatchConditions
+from azure.cosmos import exceptions
+
+from smart_invoice_pro.api import invoice_preferences_api
+from smart_invoice_pro.utils.audit_logger import log_audit
+from smart_invoice_pro.utils.cosmos_client import (
+    invoices_container,
+    recurring_profiles_container,
+    recurring_run_checkpoints_container,
+)
+from smart_invoice_pro.utils.dashboard_rollups import record_rollup_change
+from smart_invoice_pro.utils.notifications import create_notification
+from smart_invoice_pro.utils.reminder_schedule import record_invoice_write
+
+logger = logging.getLogger(__name__)
+
+_CHECKPOINT_ERRORS = 50     # error details kept on a checkpoint document
+_INVOICE_NAMESPACE = uuid.UUID("6f1c2b0e-7d0a-4f55-9a53-3c1f0f6a2e11")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def recurring_invoice_id(profile_id: str, occurrence_date: str) -> str:
+    """Deterministic invoice id for one occurrence of a profile."""
+    return str(uuid.uuid5(_INVOICE_NAMESPACE, f"{profile_id}:{occurrence_date}"))
+
+
+def load_due_profiles(run_date: str, tenant_id: str | None = None) -> dict[str, list[dict]]:
+    """Due profiles grouped by tenant, in one streamed query."""
+    query = "SELECT * FROM c WHERE c.status = 'Active' AND c.next_run_date <= @today"
+    params = [{"name": "@today", "value": run_date}]
+    if tenant_id:
+        query += " AND c.tenant_id = @tenant_id"
+        params.append({"name": "@tenant_id", "value": tenant_id})
+    by_tenant: dict[str, list[dict]] = {}
+    for profile in recurring_profiles_container.query_items(
+        query=query, parameters=params, enable_cross_partition_query=True,
+    ):
+        by_tenant.setdefault(profile.get("tenant_id"), []).append(profile)
+    return by_tenant
+
+
+# ── Profile rules ─────────────────────────────────────────────────────────────
+
+def _finished(profile: dict, run_date: str) -> bool:
+    """True when the profile has hit its occurrence limit or end date."""
+    ends_type = profile.get("ends_type")
+    limit = profile.get("occurrence_limit")
+    if limit is not None and ends_type in ("after_occurrences", None):
+        if int(profile.get("occurrences_created", 0)) >= int(limit):
+            return True
+    end_date = profile.get("end_date")
+    if end_date and ends_type in ("on_date", None) and run_date > str(end_date)[:10]:
+        return True
+    return False
+
+
+def _subtotal(items: list[dict]) -> float:
+    return sum(
+        float(i.get("quantity", 0)) * float(i.get("unit_price", i.get("price", i.get("rate", 0))))
+        - float(i.get("discount", 0) or 0)
+        for i in items
+    )
+
+
+def build_invoice(profile: dict, invoice_number: str, run_date: str, now: str) -> dict:
+    items = profile.get("items", [])
+    subtotal = _subtotal(items)
+    cgst_amount = float(profile.get("cgst_amount", 0.0))
+    sgst_amount = float(profile.get("sgst_amount", 0.0))
+    igst_amount = float(profile.get("igst_amount", 0.0))
+    total_tax = cgst_amount + sgst_amount + igst_amount
+    total_amount = round(subtotal + total_tax, 2)
+    return {
+        "id":                   recurring_invoice_id(profile["id"], profile.get("next_run_date") or run_date),
+        "invoice_number":       invoice_number,
+        "customer_id":          profile.get("customer_id"),
+        "customer_name":        profile.get("customer_name", ""),
+        "issue_date":           run_date,
+        "due_date":             run_date,
+        "payment_terms":        profile.get("payment_terms", ""),
+        "subtotal":             round(subtotal, 2),
+        "cgst_amount":          cgst_amount,
+        "sgst_amount":          sgst_amount,
+        "igst_amount":          igst_amount,
+        "total_tax":            total_tax,
+        "total_amount":         total_amount,
+        "amount_paid":          0.0,
+        "balance_due":          total_amount,
+        "invoice_discount":     0.0,
+        "round_off":            0.0,
+        "status":               "Issued" if profile.get("auto_send") else "Draft",
+        "lifecycle_status":     "ACTIVE",
+        "payment_mode":         "",
+        "notes":                profile.get("notes", ""),
+        "terms_conditions":     profile.get("terms_conditions", ""),
+        "is_gst_applicable":    bool(profile.get("is_gst_applicable", False)),
+        "gst_treatment":        "regular",
+        "invoice_type":         "recurring",
+        "recurring_profile_id": profile["id"],
+        "items":                items,
+        "tenant_id":            profile.get("tenant_id"),
+        "portal_token":         secrets.token_urlsafe(32),
+        "created_at":           now,
+        "updated_at":           now,
+    }
+
+
+def _create_invoice(invoice: dict) -> tuple[dict, bool]:
+    """Create the occurrence's invoice; returns (invoice, created) — an existing one is reused."""
+    try:
+        invoices_container.create_item(body=invoice)
+        return invoice, True
+    except exceptions.CosmosResourceExistsError:
+        existing = invoices_container.read_item(item=invoice["id"], partition_key=invoice["customer_id"])
+        return existing, False
+
+
+def _replace_profile(profile: dict) -> None:
+    """Write the profile back only if nobody changed it since it was loaded."""
+    kwargs = {"item": profile["id"], "body": profile}
+    if profile.get("_etag"):
+        kwargs["etag"] = profile["_etag"]
+        kwargs["match_condition"] = MatchConditions.IfNotModified
+    recurring_profiles_container.replace_item(**kwargs)
+
+
+def _advance_profile(profile: dict, run_date: str, now: str) -> None:
+    from smart_invoice_pro.api.recurring_profiles_api import calculate_next_run_date
+
+    occurrences = int(profile.get("occurrences_created", 0)) + 1
+    profile["last_run_date"] = run_date
+    profile["next_run_date"] = calculate_next_run_date(
+        run_date, profile.get("frequency", "Monthly"), profile.get("recurrence_rule") or profile,
+    )
+    profile["occurrences_created"] = occurrences
+    profile["updated_at"] = now
+    limit = profile.get("occurrence_limit")
+    if limit is not None and profile.get("ends_type") in ("after_occurrences", None) and occurrences >= int(limit):
+        profile["status"] = "Completed"
+    _replace_profile(profile)
+
+
+def _announce(invoice: dict, profile: dict) -> None:
+    tenant_id = invoice["tenant_id"]
+    log_audit("invoice", "create", invoice["id"], None, invoice, user_id="cron", tenant_id=tenant_id)
+    create_notification(
+        tenant_id=tenant_id,
+        notification_type="recurring_invoice_generated",
+        title="Recurring Invoice Generated",
+        message=(
+            f"Invoice {invoice['invoice_number']} for {profile.get('customer_name', '')} "
+            f"(₹{invoice['total_amount']:,.2f}) was auto-generated from recurring profile "
+            f"'{profile.get('profile_name', profile['id'])}'."
+        ),
+        entity_id=invoice["id"],
+        entity_type="invoice",
+        user_id="cron",
+    )
+
+
+# ── Checkpoints ───────────────────────────────────────────────────────────────
+
+def _checkpoint_id(run_id: str) -> str:
+    return f"recurring_run:{run_id}"
+
+
+def _load_checkpoint(tenant_id: str, run_id: str) -> dict | None:
+    try:
+        doc = recurring_run_checkpoints_container.read_item(item=_checkpoint_id(run_id), partition_key=tenant_id)
+    except exceptions.CosmosResourceNotFoundError:
+        return None
+    return doc if isinstance(doc, dict) else None
+
+
+def _save_checkpoint(checkpoint: dict) -> None:
+    checkpoint["updated_at"] = datetime.utcnow().isoformat()
+    try:
+        recurring_run_checkpoints_container.upsert_item(body=checkpoint)
+    except Exception as exc:
+        logger.warning("[recurring] checkpoint write failed for tenant %s: %s", checkpoint["tenant_id"], exc)
+
+
+def _record_progress(checkpoint: dict, generated: list, errors: list) -> None:
+    checkpoint["generated_count"] = checkpoint["previously_generated"] + len(generated)
+    checkpoint["error_count"] = len(errors)
+    checkpoint["errors"] = errors[:_CHECKPOINT_ERRORS]
+    _save_checkpoint(checkpoint)
+
+
+# ── Tenant run ────────────────────────────────────────────────────────────────
+
+def process_tenant(tenant_id: str, profiles: list[dict], run_date: str, run_id: str,
+                   previous: dict | None = None) -> dict:
+    """
+    Generate the due invoices for one tenant's profiles; returns its generated and errors.
+
+    ``previous`` is the tenant's existing checkpoint for this run id; a resumed
+    run keeps its start time and adds to its generated count.
+    """
+    now = datetime.utcnow().isoformat()
+    previous = previous or {}
+    batch_size = max(1, _env_int("RECURRING_NUMBER_BATCH", 50))
+    checkpoint_every = max(1, _env_int("RECURRING_CHECKPOINT_EVERY", 100))
+    checkpoint = {
+        "id": _checkpoint_id(run_id),
+        "tenant_id": tenant_id,
+        "run_id": run_id,
+        "run_date": run_date,
+        "status": "running",
+        "profiles_total": len(profiles),
+        "processed": 0,
+        "generated_count": 0,
+        "error_count": 0,
+        "errors": [],
+        "last_profile_id": None,
+        "previously_generated": int(previous.get("generated_count") or 0),
+        "resumes": int(previous.get("resumes") or 0) + 1 if previous else 0,
+        "started_at": previous.get("started_at") or now,
+    }
+    _save_checkpoint(checkpoint)
+    generated, errors = [], []
+
+    due = []
+    for profile in profiles:
+        if _finished(profile, run_date):
+            try:
+                profile["status"] = "Completed"
+                profile["updated_at"] = now
+                _replace_profile(profile)
+            except Exception as exc:
+                errors.append({"profile_id": profile.get("id"), "error": str(exc)})
+            checkpoint["processed"] += 1
+        else:
+            due.append(profile)
+
+    numbers: list[str] = []
+    for index, profile in enumerate(due):
+        profile_id = profile.get("id")
+        try:
+            if not numbers:
+                numbers = invoice_preferences_api.reserve_invoice_numbers(
+                    tenant_id, min(batch_size, len(due) - index),
+                )
+            invoice, created = _create_invoice(build_invoice(profile, numbers.pop(0), run_date, now))
+            if created:
+                record_rollup_change("invoice", None, invoice)
+                record_invoice_write(None, invoice)
+                _announce(invoice, profile)
+            _advance_profile(profile, run_date, now)
+            generated.append({
+                "profile_id": profile_id, "invoice_id": invoice["id"],
+                "invoice_number": invoice["invoice_number"],
+            })
+        except Exception as exc:
+            logger.error("[recurring] profile %s failed: %s", profile_id, exc)
+            errors.append({"profile_id": profile_id, "error": str(exc)})
+        checkpoint["processed"] += 1
+        checkpoint["last_profile_id"] = profile_id
+        if checkpoint["processed"] % checkpoint_every == 0:
+            _record_progress(checkpoint, generated, errors)
+
+    checkpoint["status"] = "completed"
+    checkpoint["finished_at"] = datetime.utcnow().isoformat()
+    _record_progress(checkpoint, generated, errors)
+    return {"tenant_id": tenant_id, "generated": generated, "errors": errors}
+
+
+def run_recurring_generation(run_date: str | None = None, tenant_id: str | None = None,
+                             run_id: str | None = None, workers: int | None = None) -> dict:
+    """
+    Generate every due recurring invoice for ``run_date`` (default today).
+
+    Re-running with the same ``run_id`` (default: the run date) resumes each
+    tenant's checkpoint with the profiles that are still due. Raises if the due
+    profiles cannot be queried; per-profile failures are collected in the summary.
+    """
+    run_date = run_date or datetime.utcnow().date().isoformat()
+    run_id = run_id or run_date
+    workers = max(1, workers or _env_int("RECURRING_RUN_WORKERS", 8))
+
+    by_tenant = load_due_profiles(run_date, tenant_id)
+    previous = {tid: _load_checkpoint(tid, run_id) for tid in by_tenant}
+    resumed = [tid for tid, checkpoint in previous.items() if checkpoint]
+
+    logger.info("[recurring] run %s: %d profiles across %d tenants (%d resumed)",
+                run_id, sum(len(p) for p in by_tenant.values()), len(by_tenant), len(resumed))
+
+    results = []
+    lock = threading.Lock()
+
+    def _run(tid):
+        try:
+            result = process_tenant(tid, by_tenant[tid], run_date, run_id, previous[tid])
+        except Exception as exc:
+            logger.error("[recurring] tenant %s failed: %s", tid, exc)
+            result = {"tenant_id": tid, "generated": [], "errors": [{"tenant_id": tid, "error": str(exc)}]}
+        with lock:
+            results.append(result)
+
+    if len(by_tenant) <= 1:
+        for tid in by_tenant:
+            _run(tid)
+    else:
+        with ThreadPoolExecutor(max_workers=min(workers, len(by_tenant)),
+                                thread_name_prefix="recurring-run") as pool:
+            list(pool.map(_run, by_tenant))
+
+    generated = [g for r in results for g in r["generated"]]
+    errors = [e for r in results for e in r["errors"]]
+    logger.info("[recurring] run %s finished: %d generated, %d errors", run_id, len(generated), len(errors))
+    return {
+        "run_id": run_id,
+        "run_date": run_date,
+        "tenant_count": len(by_tenant),
+        "resumed_tenants": resumed,
+        "generated": generated,
+        "errors": errors,
+    }
@@ -1,103 +1,35 @@
 """
 Payment reminder job — runs daily at 09:05 AM.
 
-For each unpaid invoice (status Issued or Partially Paid, balance_due > 0):
-  - Checks configured before-due and after-due offsets
+Reads today's partition of the precomputed reminder schedule
+(utils/reminder_schedule.py) rather than every open invoice. For each entry:
+  - Re-reads the invoice and checks it is still open (Issued or Partially
+    Paid, balance_due > 0), still due on the planned date, and that the
+    tenant's config still has that before-due / on-due / after-due rule
   - Skips if reminder already sent for that offset (dedup via reminder_log)
-  - Sends email via Azure Communication Services (same pattern as cron_jobs.py)
+  - Queues the email on the shared outbox (utils/email_service.py)
   - Appends entry to invoice.reminder_log and saves back to Cosmos DB
+  - Removes the schedule entry
 """
 import os
 import logging
-from datetime import datetime, date, timedelta
+from datetime import datetime, date
 
-from azure.communication.email import EmailClient
+from azure.cosmos import exceptions
+from smart_invoice_pro.utils.email_service import email_configured, queue_email
 from smart_invoice_pro.utils.notifications import create_notification
+from smart_invoice_pro.utils.reminder_schedule import (
+    REMINDER_STATUSES,  # noqa: F401  (re-exported)
+    due_entries,
+    is_remindable,
+    remove_entry,
+    reminder_config,
+    reminder_rules,
+)
 
 logger = logging.getLogger(__name__)
 
-CONNECTION_STRING = os.getenv('AZURE_EMAIL_CONNECTION_STRING')
-SENDER_ADDRESS    = os.getenv('SENDER_EMAIL', 'admin@solidevelectrosoft.com')
-
-# Statuses that should receive reminders
-REMINDER_STATUSES = {'Issued', 'Partially Paid'}
-
-
-def _load_reminder_config(settings_container, tenant_id):
-    """
-    Load reminder config for tenant.
-
-    Priority:
-    1. New ``automation_settings`` doc  (richer per-rule format)
-    2. Legacy ``reminder_settings`` doc (flat arrays)
-    3. Hard-coded defaults
-
-    Always returns an internal dict:
-      {
-        reminders_enabled: bool,
-        before_due_days:   list[int],
-        after_due_days:    list[int],
-        on_due_enabled:    bool,
-      }
-    """
-    # ── 1. New automation_settings format ─────────────────────────────────────
-    auto_id = f"{tenant_id}:automation_settings"
-    auto_items = list(settings_container.query_items(
-        query="SELECT * FROM c WHERE c.id = @id AND c.tenant_id = @tid",
-        parameters=[
-            {"name": "@id",  "value": auto_id},
-            {"name": "@tid", "value": tenant_id},
-        ],
-        enable_cross_partition_query=True
-    ))
-    if auto_items:
-        doc = auto_items[0]
-        enabled       = doc.get('email_enabled', True)
-        reminders     = doc.get('payment_reminders', [])
-        before_days: list[int] = []
-        after_days:  list[int] = []
-        on_due_enabled = False
-        for r in reminders:
-            if not r.get('enabled', True):
-                continue
-            rtype = r.get('type')
-            days  = int(r.get('days', 0))
-            if rtype == 'before_due' and days > 0:
-                before_days.append(days)
-            elif rtype == 'after_due' and days > 0:
-                after_days.append(days)
-            elif rtype == 'on_due':
-                on_due_enabled = True
-        return {
-            'reminders_enabled': enabled,
-            'before_due_days':   before_days,
-            'after_due_days':    after_days,
-            'on_due_enabled':    on_due_enabled,
-        }
-
-    # ── 2. Legacy reminder_settings format ────────────────────────────────────
-    legacy_id = f"{tenant_id}:reminder_settings"
-    legacy_items = list(settings_container.query_items(
-        query="SELECT * FROM c WHERE c.id = @id AND c.tenant_id = @tid",
-        parameters=[
-            {"name": "@id",  "value": legacy_id},
-            {"name": "@tid", "value": tenant_id},
-        ],
-        enable_cross_partition_query=True
-    ))
-    if legacy_items:
-        cfg = legacy_items[0]
-        cfg.setdefault('on_due_enabled', False)
-        return cfg
-
-    # ── 3. Defaults ────────────────────────────────────────────────────────────
-    return {
-        'reminders_enabled': True,
-        'before_due_days':   [3],
-        'after_due_days':    [1, 3, 7],
-        'on_due_enabled':    True,
-    }
-
+SENDER_ADDRESS = os.getenv('SENDER_EMAIL', 'admin@solidevelectrosoft.com')
 
 def _already_sent(invoice, reminder_type, days_offset):
     """Return True if this exact reminder was already sent."""
@@ -109,14 +41,14 @@ def _already_sent(invoice, reminder_type, days_offset):
 
 
 def _send_reminder_email(invoice, days_label):
-    """Send a payment reminder email using ACS.  Returns True on success."""
+    """Queue a payment reminder email.  Returns True once it is queued (or sent inline)."""
     recipient = invoice.get('customer_email', '').strip()
     if not recipient:
         logger.warning(f"Invoice {invoice.get('invoice_number')} — no customer email, skipping.")
         return False
 
-    if not CONNECTION_STRING:
-        logger.warning("AZURE_EMAIL_CONNECTION_STRING not set. Email NOT sent.")
+    if not email_configured():
+        logger.warning("Email transport not configured. Email NOT sent.")
         return False
 
     invoice_number = invoice.get('invoice_number', invoice.get('id', 'N/A'))
@@ -166,92 +98,72 @@ def _send_reminder_email(invoice, days_label):
     """
 
     try:
-        client = EmailClient.from_connection_string(CONNECTION_STRING)
-        poller = client.begin_send({
+        sent = queue_email(invoice.get('tenant_id'), {
             "senderAddress": SENDER_ADDRESS,
             "recipients": {"to": [{"address": recipient}]},
             "content": {"subject": subject, "html": html_body},
         })
-        poller.result()
-        logger.info(f"Reminder sent for invoice {invoice_number} to {recipient}")
+        if sent['status'] == 'failed':
+            logger.error(f"Reminder for invoice {invoice_number} rejected: {sent['error']}")
+            return False
+        logger.info(f"Reminder {sent['status']} for invoice {invoice_number} to {recipient}")
         return True
     except Exception as e:
         logger.error(f"Failed to send reminder for invoice {invoice_number}: {e}")
         return False
 
 
-def process_payment_reminders():
+def _reminder_label(reminder_type, offset):
+    if reminder_type == 'on_due':
+        return 'due today'
+    plural = 's' if offset != 1 else ''
+    if reminder_type == 'after_due':
+        return f"overdue by {offset} day{plural}"
+    return f"due in {offset} day{plural}"
+
+
+def process_payment_reminders(tenant_id=None):
     """
-    Scheduled job — evaluate every open invoice against the tenant's
-    reminder config and send emails where needed.
+    Scheduled job — send the reminders scheduled for today. ``tenant_id``
+    limits the run to one tenant (one shard of a sharded run).
     """
     try:
-        from smart_invoice_pro.utils.cosmos_client import invoices_container, settings_container
+        from smart_invoice_pro.utils.cosmos_client import invoices_container
 
         today = date.today()
         logger.info(f"[reminders] Starting payment reminder job for {today.isoformat()}")
 
-        # Fetch all remindable invoices across all tenants
-        invoices = list(invoices_container.query_items(
-            query=(
-                "SELECT * FROM c WHERE c.status IN ('Issued', 'Partially Paid') "
-                "AND (c.balance_due > 0 OR NOT IS_DEFINED(c.balance_due))"
-            ),
-            enable_cross_partition_query=True
-        ))
-
-        logger.info(f"[reminders] Found {len(invoices)} open invoices to evaluate")
+        entries = due_entries(today, tenant_id)
+        logger.info(f"[reminders] Found {len(entries)} scheduled reminders for today")
 
         # Group by tenant so we only load each tenant's config once
         by_tenant: dict[str, list] = {}
-        for inv in invoices:
-            tid = inv.get('tenant_id', '__none__')
-            by_tenant.setdefault(tid, []).append(inv)
+        for entry in entries:
+            by_tenant.setdefault(entry.get('tenant_id'), []).append(entry)
 
         sent_count = 0
         skipped_count = 0
 
-        for tenant_id, tenant_invoices in by_tenant.items():
-            cfg = _load_reminder_config(settings_container, tenant_id)
-
+        for tenant_id, tenant_entries in by_tenant.items():
+            cfg = reminder_config(tenant_id)
             if not cfg.get('reminders_enabled', True):
                 logger.info(f"[reminders] Tenant {tenant_id}: reminders disabled, skipping.")
-                continue
-
-            before_days: list[int] = cfg.get('before_due_days', [])
-            after_days:  list[int] = cfg.get('after_due_days', [])
-            on_due_enabled: bool   = cfg.get('on_due_enabled', False)
-
-            for inv in tenant_invoices:
-                due_date_str = inv.get('due_date', '')
-                if not due_date_str:
-                    skipped_count += 1
-                    continue
+            rules = {(rtype, offset) for rtype, offset, _ in reminder_rules(cfg)}
 
+            for entry in tenant_entries:
+                reminder_type = entry.get('reminder_type')
+                offset = entry.get('days_offset')
                 try:
-                    due = date.fromisoformat(due_date_str[:10])
-                except ValueError:
-                    skipped_count += 1
-                    continue
-
-                days_diff = (today - due).days  # negative = before due
-
-                checks = [
-                    *[('before_due', d, f"due in {d} day{'s' if d != 1 else ''}") for d in before_days],
-                    *[('after_due',  d, f"overdue by {d} day{'s' if d != 1 else ''}") for d in after_days],
-                ]
-                if on_due_enabled:
-                    checks.append(('on_due', 0, 'due today'))
-
-                for reminder_type, offset, label in checks:
-                    if reminder_type == 'on_due':
-                        expected_diff = 0
-                    elif reminder_type == 'after_due':
-                        expected_diff = offset
-                    else:  # before_due
-                        expected_diff = -offset
-
-                    if days_diff != expected_diff:
+                    if (reminder_type, offset) not in rules:
+                        skipped_count += 1
+                        continue
+                    try:
+                        inv = invoices_container.read_item(item=entry['invoice_id'], partition_key=entry['customer_id'])
+                    except exceptions.CosmosResourceNotFoundError:
+                        skipped_count += 1
+                        continue
+                    if not is_remindable(inv) or str(inv.get('due_date', ''))[:10] != entry.get('due_date'):
+                        skipped_count += 1
                         continue
 
                     if _already_sent(inv, reminder_type, offset):
@@ -261,6 +173,7 @@ def process_payment_reminders():
                         )
                         continue
 
+                    label = _reminder_label(reminder_type, offset)
                     ok = _send_reminder_email(inv, label)
 
                     log_entry = {
@@ -290,6 +203,8 @@ def process_payment_reminders():
                         )
                     else:
                         skipped_count += 1
+                finally:
+                    remove_entry(entry)
 
         logger.info(
             f"[reminders] Job complete — sent: {sent_count}, skipped/failed: {skipped_count}"
@@ -1,176 +1,146 @@
 """
 Background scheduler for recurring invoice generation
 Uses APScheduler to run daily and generate invoices from active recurring profiles
+
+Every worker process starts a scheduler, but a job only runs in the process
+holding the leader lease and only once per idempotency key
+(``<job id>:<date>``) — see smart_invoice_pro/utils/scheduler_leases.py. With
+SCHEDULER_SHARD_BY_TENANT the leader does not run the job itself: it enqueues
+one job-queue message per tenant with work, and the job workers on every
+instance share them.
+
+Environment variables:
+    SCHEDULER_LEADER_BACKEND   – "cosmos" (default), "file" or "none"
+    SCHEDULER_SHARD_BY_TENANT  – "true" to fan jobs out per tenant (default off)
+    SCHEDULER_LEASE_SECONDS    – leader lease time to live (default 60)
 """
 from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime
-import uuid
+import os
 import logging
+from smart_invoice_pro.services.recurring_engine import run_recurring_generation
 from smart_invoice_pro.services.reminder_job import process_payment_reminders
+from smart_invoice_pro.utils import scheduler_leases
+from smart_invoice_pro.utils.job_queue import enqueue_job, register_job_kind
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def process_recurring_profiles():
+def process_recurring_profiles(tenant_id=None):
+    """
+    Generate invoices from due recurring profiles (services.recurring_engine)
+    This function is called by the scheduler; ``tenant_id`` limits it to one
+    tenant's profiles (one shard of a sharded run). A failed profile query
+    raises, so the run record is marked failed and can be retried
     """
-    Process active recurring profiles and generate invoices
-    This function is called by the scheduler
+    summary = run_recurring_generation(tenant_id=tenant_id)
+    logger.info(f"Recurring invoice generation job completed: {len(summary['generated'])} generated, "
+                f"{len(summary['errors'])} errors")
+    return summary
+
+
+SHARD_JOB_KIND = "scheduled_job"
+
+
+def _due_profile_tenants(run_key):
+    from smart_invoice_pro.utils.cosmos_client import recurring_profiles_container
+    return list(recurring_profiles_container.query_items(
+        query="SELECT DISTINCT VALUE c.tenant_id FROM c WHERE c.status = 'Active' AND c.next_run_date <= @today",
+        parameters=[{"name": "@today", "value": run_key}],
+        enable_cross_partition_query=True
+    ))
+
+
+def _prune_pdf_exports():
+    from smart_invoice_pro.services.pdf_export.bulk_export_service import prune_expired_exports
+    return prune_expired_exports()
+
+
+def _reminder_tenants(run_key):
+    from smart_invoice_pro.utils.reminder_schedule import tenants_due
+    return tenants_due(datetime.strptime(run_key, "%Y-%m-%d").date())
+
+
+# job id -> how to run it; ``tenants`` lists the tenants with work for a sharded run
+# (jobs without it always run whole on the leader)
+SCHEDULED_JOBS = {
+    'recurring_invoice_job': {
+        'name': 'Generate Recurring Invoices',
+        'func': lambda tenant_id=None: process_recurring_profiles(tenant_id=tenant_id),
+        'tenants': _due_profile_tenants,
+        'hour': 0,
+        'minute': 5,
+    },
+    'payment_reminder_job': {
+        'name': 'Send Payment Reminders',
+        'func': lambda tenant_id=None: process_payment_reminders(tenant_id=tenant_id),
+        'tenants': _reminder_tenants,
+        'hour': 9,
+        'minute': 5,
+    },
+    # Not per tenant: runs on the leader even when sharding is on.
+    'pdf_export_cleanup_job': {
+        'name': 'Prune Expired PDF Export Archives',
+        'func': lambda tenant_id=None: _prune_pdf_exports(),
+        'hour': 1,
+        'minute': 15,
+    },
+}
+
+
+def _shard_by_tenant():
+    return (os.getenv("SCHEDULER_SHARD_BY_TENANT") or "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def run_scheduled_job(job_id, run_key=None, lease=None, ledger=None):
+    """
+    Run one scheduled job if this process is the leader and the run for
+    ``run_key`` (default: today's UTC date) has not been claimed yet.
+
+    Returns "not_leader", "already_ran", "completed", "dispatched" or "failed".
     """
+    spec = SCHEDULED_JOBS[job_id]
+    run_key = run_key or datetime.utcnow().date().isoformat()
+    lease = lease or scheduler_leases.NoLeaderLease()
+    if not lease.try_acquire():
+        return "not_leader"
+
+    ledger = ledger or scheduler_leases.build_run_ledger()
+    record = ledger.claim(job_id, run_key, lease.owner)
+    if record is None:
+        logger.info(f"[scheduler] {job_id} for {run_key} already ran; skipping")
+        return "already_ran"
+
     try:
-        from smart_invoice_pro.utils.cosmos_client import recurring_profiles_container, invoices_container
-        from smart_invoice_pro.api.recurring_profiles_api import calculate_next_run_date
-        
-        logger.info("Starting recurring invoice generation job...")
-        
-        today = datetime.utcnow().date().isoformat()
-        
-        # Query active profiles where next_run_date <= today
-        query = f"SELECT * FROM c WHERE c.status = 'Active' AND c.next_run_date <= '{today}'"
-        
-        profiles = list(recurring_profiles_container.query_items(
-            query=query,
-            enable_cross_partition_query=True
-        ))
-        
-        logger.info(f"Found {len(profiles)} profiles to process")
-        
-        for profile in profiles:
-            try:
-                # Check if we've reached the occurrence limit
-                if profile.get('occurrence_limit'):
-                    if profile.get('occurrences_created', 0) >= profile['occurrence_limit']:
-                        # Mark as expired
-                        profile['status'] = 'Expired'
-                        profile['updated_at'] = datetime.utcnow().isoformat()
-                        recurring_profiles_container.replace_item(
-                            item=profile['id'],
-                            body=profile
-                        )
-                        logger.info(f"Profile {profile['id']} marked as expired (reached occurrence limit)")
-                        continue
-                
-                # Check if we've passed the end date
-                if profile.get('end_date'):
-                    end_date = datetime.fromisoformat(profile['end_date'].replace('Z', '+00:00')).date()
-                    if datetime.utcnow().date() > end_date:
-                        profile['status'] = 'Expired'
-                        profile['updated_at'] = datetime.utcnow().isoformat()
-                        recurring_profiles_container.replace_item(
-                            item=profile['id'],
-                            body=profile
-                        )
-                        logger.info(f"Profile {profile['id']} marked as expired (passed end date)")
-                        continue
-                
-                # Get next invoice number
-                query_invoice = "SELECT * FROM c ORDER BY c.created_at DESC OFFSET 0 LIMIT 1"
-                last_invoices = list(invoices_container.query_items(
-                    query=query_invoice,
-                    enable_cross_partition_query=True
-                ))
-                
-                if last_invoices:
-                    last_number = last_invoices[0].get('invoice_number', 'INV-000')
-                    try:
-                        prefix = 'INV-'
-                        if last_number.startswith(prefix):
-                            number = int(last_number.replace(prefix, ''))
-                            next_invoice_number = f"{prefix}{str(number + 1).zfill(3)}"
-                        else:
-                            next_invoice_number = "INV-001"
-                    except:
-                        next_invoice_number = "INV-001"
-                else:
-                    next_invoice_number = "INV-001"
-                
-                # Calculate totals from items
-                subtotal = 0
-                items = profile.get('items', [])
-                for item in items:
-                    item_total = (item.get('quantity', 0) * item.get('rate', 0) - item.get('discount', 0))
-                    subtotal += item_total
-                
-                total_tax = profile.get('cgst_amount', 0) + profile.get('sgst_amount', 0) + profile.get('igst_amount', 0)
-                total_amount = subtotal + total_tax
-                
-                # Calculate due date (e.g., 30 days from issue)
-                issue_date = datetime.utcnow().date().isoformat()
-                due_date_obj = datetime.utcnow().date()
-                try:
-                    # Add 30 days for due date
-                    from datetime import timedelta
-                    due_date_obj = due_date_obj + timedelta(days=30)
-                except:
-                    pass
-                due_date = due_date_obj.isoformat()
-                
-                # Create the invoice
-                now = datetime.utcnow().isoformat()
-                invoice = {
-                    'id': str(uuid.uuid4()),
-                    'invoice_number': next_invoice_number,
-                    'customer_id': profile['customer_id'],
-                    'customer_name': profile.get('customer_name', ''),
-                    'customer_email': profile.get('customer_email', ''),
-                    'customer_phone': profile.get('customer_phone', ''),
-                    'issue_date': issue_date,
-                    'due_date': due_date,
-                    'payment_terms': profile.get('payment_terms', 'Net 30'),
-                    'subtotal': subtotal,
-                    'cgst_amount': profile.get('cgst_amount', 0.0),
-                    'sgst_amount': profile.get('sgst_amount', 0.0),
-                    'igst_amount': profile.get('igst_amount', 0.0),
-                    'total_tax': total_tax,
-                    'total_amount': total_amount,
-                    'amount_paid': 0.0,
-                    'balance_due': total_amount,
-                    'status': 'Draft',
-                    'payment_mode': '',
-                    'notes': profile.get('notes', ''),
-                    'terms_conditions': profile.get('terms_conditions', ''),
-                    'is_gst_applicable': profile.get('is_gst_applicable', False),
-                    'invoice_type': 'Tax Invoice',
-                    'subject': f"Recurring Invoice - {profile.get('profile_name', '')}",
-                    'salesperson': '',
-                    'items': items,
-                    'recurring_profile_id': profile['id'],
-                    'created_at': now,
-                    'updated_at': now
-                }
-                
-                # Save the invoice
-                created_invoice = invoices_container.create_item(body=invoice)
-                logger.info(f"Created invoice {created_invoice['invoice_number']} from profile {profile['id']}")
-                
-                # TODO: Send email if email_reminder is True
-                # This would integrate with an email service
-                
-                # Update the profile
-                profile['last_run_date'] = today
-                profile['next_run_date'] = calculate_next_run_date(
-                    today,
-                    profile.get('frequency'),
-                    profile.get('recurrence_rule') or profile,
-                )
-                profile['occurrences_created'] = profile.get('occurrences_created', 0) + 1
-                profile['updated_at'] = datetime.utcnow().isoformat()
-                
-                recurring_profiles_container.replace_item(
-                    item=profile['id'],
-                    body=profile
+        if _shard_by_tenant() and spec.get('tenants'):
+            tenants = [t for t in spec['tenants'](run_key) if t]
+            for tenant_id in tenants:
+                enqueue_job(
+                    SHARD_JOB_KIND, tenant_id, {"job_id": job_id, "run_key": run_key},
+                    message_id=f"{job_id}:{run_key}:{tenant_id}",
                 )
-                
-                logger.info(f"Updated profile {profile['id']}, next run: {profile['next_run_date']}")
-                
-            except Exception as e:
-                logger.error(f"Error processing profile {profile.get('id', 'unknown')}: {str(e)}")
-                continue
-        
-        logger.info("Recurring invoice generation job completed")
-        
+            record.update(status=scheduler_leases.RUN_DISPATCHED, result={"shards": len(tenants)})
+        else:
+            spec['func']()
+            record.update(status=scheduler_leases.RUN_COMPLETED)
+    except Exception as e:
+        logger.error(f"[scheduler] {job_id} for {run_key} failed: {e}")
+        record.update(status=scheduler_leases.RUN_FAILED, error=str(e))
+    record["finished_at"] = datetime.utcnow().timestamp()
+    try:
+        ledger.finish(record)
     except Exception as e:
-        logger.error(f"Error in recurring invoice generation job: {str(e)}")
+        logger.error(f"[scheduler] could not record {job_id} run {run_key}: {e}")
+    return record["status"]
+
+
+def _run_tenant_shard(payload, message):
+    SCHEDULED_JOBS[payload["job_id"]]['func'](tenant_id=message["tenant_id"])
+
+
+register_job_kind(SHARD_JOB_KIND, _run_tenant_shard)
+
 
 def start_scheduler(app):
     """
@@ -178,52 +148,49 @@ def start_scheduler(app):
     This should be called when the Flask app starts
     """
     scheduler = BackgroundScheduler()
-    
-    # Schedule the job to run daily at 00:05 (5 minutes past midnight)
-    scheduler.add_job(
-        func=process_recurring_profiles,
-        trigger='cron',
-        hour=0,
-        minute=5,
-        id='recurring_invoice_job',
-        name='Generate Recurring Invoices',
-        replace_existing=True
-    )
+    lease = scheduler_leases.build_leader_lease()
+    ledger = scheduler_leases.build_run_ledger()
 
-    # Daily payment reminder job — runs at 09:05 AM
+    for job_id, spec in SCHEDULED_JOBS.items():
+        scheduler.add_job(
+            func=run_scheduled_job,
+            args=[job_id],
+            kwargs={'lease': lease, 'ledger': ledger},
+            trigger='cron',
+            hour=spec['hour'],
+            minute=spec['minute'],
+            id=job_id,
+            name=spec['name'],
+            replace_existing=True
+        )
+
+    # Keep the lease renewed (or pick it up from a dead leader) between job runs
     scheduler.add_job(
-        func=process_payment_reminders,
-        trigger='cron',
-        hour=9,
-        minute=5,
-        id='payment_reminder_job',
-        name='Send Payment Reminders',
+        func=lease.try_acquire,
+        trigger='interval',
+        seconds=max(1, int(getattr(lease, 'ttl', 60)) // 3),
+        id='scheduler_leader_lease',
+        name='Renew Scheduler Leader Lease',
         replace_existing=True
     )
-    
-    # For testing, you can also add a job that runs more frequently
-    # Uncomment this to run every 5 minutes for testing:
-    # scheduler.add_job(
-    #     func=process_recurring_profiles,
-    #     trigger='interval',
-    #     minutes=5,
-    #     id='recurring_invoice_test_job',
-    #     name='Test Recurring Invoices (Every 5 min)',
-    #     replace_existing=True
-    # )
-    
+    lease.try_acquire()
+
     scheduler.start()
-    logger.info("Background scheduler started successfully")
+    logger.info(f"Background scheduler started successfully ({lease.name} lease, "
+                f"leader={lease.is_leader()})")
     
     # Store scheduler in app context for cleanup on shutdown
     app.scheduler = scheduler
+    app.scheduler_lease = lease
     
     return scheduler
 
 def shutdown_scheduler(app):
     """
-    Gracefully shutdown the scheduler
+    Gracefully shutdown the scheduler and hand the leader lease back
     """
     if hasattr(app, 'scheduler'):
         app.scheduler.shutdown()
         logger.info("Background scheduler shut down successfully")
+    if hasattr(app, 'scheduler_lease'):
+        app.scheduler_lease.release()
@@ -2,7 +2,10 @@ from datetime import datetime
 from copy import deepcopy
 
 from smart_invoice_pro.utils.audit_logger import log_audit_event
+from smart_invoice_pro.utils.dashboard_rollups import record_rollup_change
 from smart_invoice_pro.utils.domain_events import ENTITY_ARCHIVED, ENTITY_RESTORED, record_domain_event
+from smart_invoice_pro.utils.reminder_schedule import record_invoice_write
+from smart_invoice_pro.utils.shared_cache import invalidate_tenant
 
 
 LIFECYCLE_ARCHIVED = "ARCHIVED"
@@ -25,6 +28,10 @@ def archive_entity(container, item, entity_type, tenant_id, user_id=None, reason
         item["deleted_at"] = now
 
     container.replace_item(item=item["id"], body=item)
+    invalidate_tenant(tenant_id)
+    record_rollup_change(str(entity_type).strip().lower(), deepcopy(before_snapshot), deepcopy(item))
+    if str(entity_type).strip().lower() == "invoice":
+        record_invoice_write(before_snapshot, item)
 
     log_audit_event({
         "action": "ENTITY_ARCHIVED",
@@ -54,7 +61,6 @@ def archive_entity(container, item, entity_type, tenant_id, user_id=None, reason
     )
 
     return item
-    return item
 
 
 def restore_entity(container, item, entity_type, tenant_id, user_id=None, reason=None):
@@ -75,6 +81,10 @@ def restore_entity(container, item, entity_type, tenant_id, user_id=None, reason
         item["deleted_at"] = None
 
     container.replace_item(item=item["id"], body=item)
+    invalidate_tenant(tenant_id)
+    record_rollup_change(str(entity_type).strip().lower(), deepcopy(before_snapshot), deepcopy(item))
+    if str(entity_type).strip().lower() == "invoice":
+        record_invoice_write(before_snapshot, item)
 
     log_audit_event({
         "action": "ENTITY_RESTORED",
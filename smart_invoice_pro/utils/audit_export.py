@@ -1,9 +1,9 @@
 """CSV export helpers for compliance-grade audit trails."""
 
-import csv
-import io
 import json
 
+from smart_invoice_pro.utils.csv_stream import CsvColumn, iter_csv_chunks
+
 
 EXPORT_COLUMNS = [
     "created_at",
@@ -32,12 +32,12 @@ def _cell(value):
     return str(value)
 
 
+def audit_csv_columns(*, include_tenant=False):
+    """CsvColumn list for the streaming exporter (same layout as audit_rows_to_csv)."""
+    names = ADMIN_EXPORT_COLUMNS if include_tenant else EXPORT_COLUMNS
+    return [CsvColumn(name, lambda row, name=name: _cell(row.get(name))) for name in names]
+
+
 def audit_rows_to_csv(rows, *, include_tenant=False):
     """Serialize enriched audit rows to CSV text."""
-    columns = ADMIN_EXPORT_COLUMNS if include_tenant else EXPORT_COLUMNS
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(columns)
-    for row in rows or []:
-        writer.writerow([_cell(row.get(col)) for col in columns])
-    return output.getvalue()
+    return "".join(iter_csv_chunks([rows or []], audit_csv_columns(include_tenant=include_tenant)))
@@ -1,23 +1,147 @@
+"""
+cosmos_client.py
+================
+Cosmos DB client and container registry.
+
+Importing this module makes no network calls. ``get_container(name, pk)``
+records the container in the registry and returns a memoized handle that
+creates the client and resolves its ``ContainerProxy`` on first use
+(``get_database_client`` / ``get_container_client`` are local and cost no
+control-plane round trip). Every later call with the same name returns the
+same handle, so calling ``get_container`` on a hot path is a dict lookup.
+
+Databases and containers are provisioned once per environment, not on every
+worker start:
+
+    python scripts/init_db.py
+
+Environment
+-----------
+  COSMOS_URI, COSMOS_KEY, COSMOS_DB_NAME – account and database
+  COSMOS_AUTO_PROVISION                  – "true" to create each container the
+                                           first time it is used (fresh dev
+                                           accounts; off by default)
+"""
+import logging
 import os
-from azure.cosmos import CosmosClient, PartitionKey, exceptions
+import threading
+
+from azure.cosmos import CosmosClient, PartitionKey, exceptions  # noqa: F401  (exceptions re-exported)
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 uri = os.getenv("COSMOS_URI")
 key = os.getenv("COSMOS_KEY")
 database_name = os.getenv("COSMOS_DB_NAME")
 
-client = CosmosClient(uri, credential=key)
-database = client.create_database_if_not_exists(id=database_name)
+_lock = threading.RLock()
+_client = None
+_database = None
+_registry = {}     # container name -> partition key path
+_handles = {}      # container name -> LazyContainer
+
+
+def _auto_provision():
+    return (os.getenv("COSMOS_AUTO_PROVISION") or "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def get_client():
+    global _client
+    with _lock:
+        if _client is None:
+            _client = CosmosClient(uri, credential=key)
+        return _client
+
+
+def get_database():
+    global _database
+    with _lock:
+        if _database is None:
+            client = get_client()
+            if _auto_provision():
+                _database = client.create_database_if_not_exists(id=database_name)
+            else:
+                _database = client.get_database_client(database_name)
+        return _database
+
+
+class LazyContainer:
+    """Stands in for a ContainerProxy; resolves it once, on first attribute access."""
+
+    def __init__(self, name, partition_key):
+        self.name = name
+        self.partition_key = partition_key
+        self._proxy = None
+
+    def resolve(self):
+        if self._proxy is None:
+            with _lock:
+                if self._proxy is None:
+                    database = get_database()
+                    if _auto_provision():
+                        self._proxy = database.create_container_if_not_exists(
+                            id=self.name, partition_key=PartitionKey(path=self.partition_key)
+                        )
+                    else:
+                        self._proxy = database.get_container_client(self.name)
+        return self._proxy
+
+    def __getattr__(self, attr):
+        if attr.startswith("__") or attr == "_proxy":
+            raise AttributeError(attr)
+        return getattr(self.resolve(), attr)
+
+    def __repr__(self):
+        return f"<LazyContainer {self.name} pk={self.partition_key}>"
+
 
 def get_container(container_name, partition_key):
-    # Create container if it doesn't exist, or get existing container
-    # Note: offer_throughput is not supported for serverless accounts
-    return database.create_container_if_not_exists(
-        id=container_name,
-        partition_key=PartitionKey(path=partition_key)
-    )
+    """Return the memoized handle for *container_name*, registering it for init-db."""
+    handle = _handles.get(container_name)
+    if handle is not None:
+        if handle.partition_key != partition_key:
+            raise ValueError(
+                f"Container {container_name!r} is registered with partition key "
+                f"{handle.partition_key!r}, not {partition_key!r}"
+            )
+        return handle
+    with _lock:
+        if container_name not in _handles:
+            _registry[container_name] = partition_key
+            _handles[container_name] = LazyContainer(container_name, partition_key)
+    return get_container(container_name, partition_key)  # re-checks the partition key
+
+
+def registered_containers():
+    """{name: partition key} for every container declared so far."""
+    with _lock:
+        return dict(_registry)
+
+
+def provision_containers(names=None):
+    """
+    Create the database and the registered containers when missing.
+
+    Control-plane calls; run from ``scripts/init_db.py`` (or a deploy step),
+    never on the request path. Returns ``{name: "ok" | error message}``.
+    """
+    client = get_client()
+    database = client.create_database_if_not_exists(id=database_name)
+    results = {}
+    for name, partition_key in sorted(registered_containers().items()):
+        if names and name not in names:
+            continue
+        try:
+            database.create_container_if_not_exists(id=name, partition_key=PartitionKey(path=partition_key))
+            results[name] = "ok"
+        except exceptions.CosmosHttpResponseError as exc:
+            logger.error("[cosmos] provisioning %s failed: %s", name, exc)
+            results[name] = str(exc)
+    return results
+
 
 users_container = get_container("users", "/userid")
 invoices_container = get_container("invoices", "/customer_id")
@@ -47,4 +171,19 @@ bank_import_jobs_container = get_container("bank_import_jobs", "/tenant_id")
 bank_import_rows_container = get_container("bank_import_rows", "/tenant_id")
 bank_import_artifacts_container = get_container("bank_import_artifacts", "/tenant_id")
 webhook_logs_container = get_container("webhook_logs", "/tenant_id")
-
+dashboard_rollups_container = get_container("dashboard_rollups", "/tenant_id")
+stock_balances_container = get_container("stock_balances", "/tenant_id")
+report_snapshots_container = get_container("report_snapshots", "/tenant_id")
+webhook_outbox_container = get_container("webhook_outbox", "/tenant_id")
+pdf_export_jobs_container = get_container("pdf_export_jobs", "/tenant_id")
+bank_transactions_container = get_container("bank_transactions", "/user_id")
+ai_match_jobs_container = get_container("ai_match_jobs", "/tenant_id")
+bank_txn_fingerprints_container = get_container("bank_txn_fingerprints", "/tenant_id")
+job_queue_container = get_container("job_queue", "/tenant_id")
+payments_container = get_container("payments", "/user_id")
+roles_container = get_container("roles", "/tenant_id")
+tax_rates_container = get_container("tax_rates", "/tenant_id")
+scheduler_leases_container = get_container("scheduler_leases", "/id")
+scheduler_runs_container = get_container("scheduler_runs", "/job_id")
+recurring_run_checkpoints_container = get_container("recurring_run_checkpoints", "/tenant_id")
+reminder_due_container = get_container("reminder_due", "/fire_date")
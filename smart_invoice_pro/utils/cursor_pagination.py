@@ -0,0 +1,268 @@
+"""
+cursor_pagination.py
+====================
+Keyset (cursor) pagination for the large list endpoints (invoices,
+customers, products, vendors, bills, expenses).
+
+OFFSET/LIMIT makes Cosmos read and discard every skipped row, so deep pages
+get linearly more expensive. Cursor mode instead remembers where the last
+page ended — the last row's sort value and id — and asks for the rows after
+it:
+
+    SELECT TOP @n * FROM c WHERE <filters>
+        AND (c.<sort> < @v OR (c.<sort> = @v AND c.id < @id))
+    ORDER BY c.<sort> DESC
+
+The SDK's own continuation tokens are not used: these containers are not
+partitioned by tenant, and the cross-partition ORDER BY context in
+azure-cosmos 4.6 has no resumable continuation (its token is one partition's
+backend header), so resuming from it skips or repeats rows. Every page here
+is a fresh query. Rows that share the page's last sort value are ordered by
+id in Python — one extra single-value query per page — so the default
+indexing policy suffices (no composite (sort, id) index).
+
+The position travels to the client wrapped in an opaque, signed cursor:
+
+    base64url(json({"t": tenant_id, "s": scope, "c": {"v": value, "id": id}, "iat": ts})) + "." + hmac
+
+The scope is a hash of the endpoint, query text and parameters, so a cursor
+only resumes the exact listing it came from — it cannot be replayed against
+another tenant or with different filters. Tampered, expired or foreign
+cursors raise ``InvalidCursor``; endpoints answer those with HTTP 400.
+
+Cursor mode is opt-in so existing clients keep their legacy responses:
+
+    GET /api/invoices?paginate=cursor&limit=50      -> first page
+    GET /api/invoices?cursor=<next_cursor>&limit=50 -> following pages
+
+Usage
+-----
+    from smart_invoice_pro.utils.cursor_pagination import (
+        InvalidCursor, cursor_requested, fetch_cursor_page,
+    )
+
+    if cursor_requested(request.args):
+        try:
+            page = fetch_cursor_page(container, "SELECT * FROM c WHERE ...", parameters,
+                                     sort_field="created_at", sort_order="DESC",
+                                     tenant_id=request.tenant_id, endpoint="invoices")
+        except InvalidCursor as exc:
+            return jsonify({"error": str(exc)}), 400
+        return jsonify(page.as_payload("items", sanitize_items(page.items)))
+
+Environment
+-----------
+  CURSOR_SIGNING_KEY         – HMAC key (default: JWT_SECRET_KEY / SECRET_KEY)
+  CURSOR_MAX_AGE_SECONDS     – reject cursors older than this (default 86400, 0 = never)
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import itertools
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Mapping
+
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 200
+
+
+class InvalidCursor(ValueError):
+    """The cursor is malformed, tampered with, expired or belongs to another query."""
+
+
+@dataclass
+class CursorPage:
+    items: list[dict]
+    next_cursor: str | None
+    limit: int
+
+    def as_payload(self, key: str = "data", items: list | None = None) -> dict:
+        """Response body shared by every cursor-mode list endpoint."""
+        return {
+            key: self.items if items is None else items,
+            "next_cursor": self.next_cursor,
+            "has_more": self.next_cursor is not None,
+            "limit": self.limit,
+        }
+
+
+def cursor_requested(args: Mapping[str, Any]) -> bool:
+    """True when the client opted into cursor mode (``cursor=`` or ``paginate=cursor``)."""
+    return "cursor" in args or str(args.get("paginate") or "").strip().lower() == "cursor"
+
+
+def page_limit(args: Mapping[str, Any], default: int = DEFAULT_PAGE_LIMIT) -> int:
+    raw = args.get("limit", args.get("page_size", default))
+    try:
+        value = int(raw)
+    except (TypeError, ValueError):
+        value = default
+    return max(1, min(value, MAX_PAGE_LIMIT))
+
+
+def _signing_key() -> bytes:
+    key = os.getenv("CURSOR_SIGNING_KEY") or os.getenv(
+        "JWT_SECRET_KEY", os.getenv("SECRET_KEY", "your_secret_key")
+    )
+    return key.encode("utf-8")
+
+
+def _max_age_seconds() -> int:
+    try:
+        return max(0, int(os.getenv("CURSOR_MAX_AGE_SECONDS", "86400")))
+    except ValueError:
+        return 86400
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _sign(body: str) -> str:
+    return _b64encode(hmac.new(_signing_key(), body.encode("ascii"), hashlib.sha256).digest())
+
+
+def query_scope(endpoint: str, query: str, parameters: list[dict] | None = None) -> str:
+    """Stable fingerprint of one listing: endpoint + query text + parameter values."""
+    material = json.dumps(
+        [endpoint, query, sorted((p["name"], p["value"]) for p in parameters or [])],
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:32]
+
+
+def encode_cursor(tenant_id: str, scope: str, position: Any) -> str:
+    body = _b64encode(json.dumps(
+        {"t": tenant_id, "s": scope, "c": position, "iat": int(time.time())},
+        separators=(",", ":"),
+    ).encode("utf-8"))
+    return f"{body}.{_sign(body)}"
+
+
+def decode_cursor(token: str, tenant_id: str, scope: str) -> Any:
+    """Return the position inside ``token`` or raise InvalidCursor."""
+    try:
+        body, signature = token.split(".", 1)
+    except (AttributeError, ValueError):
+        raise InvalidCursor("Malformed cursor") from None
+    if not hmac.compare_digest(signature, _sign(body)):
+        raise InvalidCursor("Invalid cursor signature")
+    try:
+        payload = json.loads(_b64decode(body))
+    except (ValueError, TypeError):
+        raise InvalidCursor("Malformed cursor") from None
+    if payload.get("t") != tenant_id or payload.get("s") != scope:
+        raise InvalidCursor("Cursor does not match this listing; restart from the first page")
+    max_age = _max_age_seconds()
+    if max_age and time.time() - int(payload.get("iat") or 0) > max_age:
+        raise InvalidCursor("Cursor expired; restart from the first page")
+    position = payload.get("c")
+    if position in (None, "", {}):
+        raise InvalidCursor("Malformed cursor")
+    return position
+
+
+_SELECT_PREFIX = re.compile(r"^\s*SELECT \* FROM c WHERE\s+", re.IGNORECASE)
+_SORT_FIELD = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def _where_clause(query: str) -> str:
+    match = _SELECT_PREFIX.match(query)
+    if not match or " ORDER BY " in query.upper():
+        raise ValueError("cursor queries must be 'SELECT * FROM c WHERE ...' without ORDER BY")
+    return query[match.end():]
+
+
+def _order_ties_by_id(rows: list[dict], sort_field: str, descending: bool) -> list[dict]:
+    """Cosmos orders by the sort field only; order each run of equal values by id."""
+    ordered = []
+    for _, group in itertools.groupby(rows, key=lambda row: row.get(sort_field)):
+        ordered.extend(sorted(group, key=lambda row: str(row.get("id")), reverse=descending))
+    return ordered
+
+
+def fetch_cursor_page(
+    container,
+    query: str,
+    parameters: list[dict],
+    *,
+    sort_field: str,
+    sort_order: str = "DESC",
+    tenant_id: str,
+    endpoint: str,
+    args: Mapping[str, Any] | None = None,
+    limit: int | None = None,
+) -> CursorPage:
+    """
+    Return the page after the request's ``cursor`` arg, ordered by
+    ``sort_field`` then id. ``query`` is ``SELECT * FROM c WHERE <filters>``
+    without ORDER BY.
+
+    ``args`` defaults to ``flask.request.args``. The returned ``next_cursor``
+    is None on the last page.
+    """
+    if args is None:
+        from flask import request
+        args = request.args
+    if not _SORT_FIELD.match(sort_field):
+        raise ValueError(f"invalid sort field {sort_field!r}")
+    limit = limit or page_limit(args)
+    descending = str(sort_order).upper() != "ASC"
+    order, after = ("DESC", "<") if descending else ("ASC", ">")
+    field = f"c.{sort_field}"
+    scope = query_scope(endpoint, f"{query} ORDER BY {field} {order}", parameters)
+    token = str(args.get("cursor") or "").strip()
+
+    where = _where_clause(query)
+    params = list(parameters)
+    if token:
+        position = decode_cursor(token, tenant_id, scope)
+        if not isinstance(position, dict) or "id" not in position:
+            raise InvalidCursor("Malformed cursor")
+        where = (f"({where}) AND ({field} {after} @cursor_value "
+                 f"OR ({field} = @cursor_value AND c.id {after} @cursor_id))")
+        params += [{"name": "@cursor_value", "value": position.get("v")},
+                   {"name": "@cursor_id", "value": position["id"]}]
+
+    rows = list(container.query_items(
+        query=f"SELECT TOP {limit + 1} * FROM c WHERE {where} ORDER BY {field} {order}",
+        parameters=params,
+        enable_cross_partition_query=True,
+    ))
+    if len(rows) <= limit:
+        return CursorPage(items=_order_ties_by_id(rows, sort_field, descending),
+                          next_cursor=None, limit=limit)
+
+    # The page ends inside the run of rows sharing ``boundary``; which of them
+    # made the TOP cut is arbitrary, so read the whole run and take it by id.
+    boundary = rows[limit - 1].get(sort_field)
+    if boundary is None:
+        # Rows without the sort value cannot be compared against; stop here
+        # rather than hand out a cursor that never advances.
+        return CursorPage(items=_order_ties_by_id(rows[:limit], sort_field, descending),
+                          next_cursor=None, limit=limit)
+    head = [row for row in rows[:limit] if row.get(sort_field) != boundary]
+    ties = list(container.query_items(
+        query=f"SELECT * FROM c WHERE {where} AND {field} = @cursor_boundary",
+        parameters=[*params, {"name": "@cursor_boundary", "value": boundary}],
+        enable_cross_partition_query=True,
+    ))
+    ties.sort(key=lambda row: str(row.get("id")), reverse=descending)
+    items = _order_ties_by_id(head, sort_field, descending) + ties[:limit - len(head)]
+    last = items[-1]
+    return CursorPage(
+        items=items,
+        next_cursor=encode_cursor(tenant_id, scope, {"v": last.get(sort_field), "id": last.get("id")}),
+        limit=limit,
+    )
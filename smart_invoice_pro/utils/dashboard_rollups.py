@@ -0,0 +1,404 @@
+"""
+dashboard_rollups.py
+====================
+Incrementally maintained per-tenant aggregates for GET /api/dashboard/summary.
+
+Container: "dashboard_rollups", partition: /tenant_id
+
+Day document (one per tenant per calendar day that has activity)
+{
+    "id":                "<tenant_id>:day:2025-06-01",
+    "tenant_id":         "<tenant_id>",
+    "doc_type":          "day",
+    "day":               "2025-06-01",
+    "customers_added":   2,
+    "invoices_created":  3,
+    "revenue":           4500.0,
+    "payments_received": 1200.0,
+    "receivables":       3300.0,    # open invoices dated this day
+    "bill_payables":     800.0,     # open bills dated this day
+    "expenses_total":    250.0
+}
+
+Totals document (one per tenant)
+{
+    "id":              "<tenant_id>:totals",
+    "doc_type":        "totals",
+    "total_customers": 10,
+    "total_products":  20,
+    "open_due":        {"2025-06-15": 2, ...},   # open invoices by due date
+    "rebuilt_at":      "..."                      # set by rebuild_tenant_rollups
+}
+
+Every write site reports ``record_rollup_change(kind, before, after)``. The
+old document's contribution is subtracted and the new one added using Cosmos
+patch ``incr`` operations, so concurrent writers never lose updates. The
+summary only trusts a tenant's rollups once ``rebuild_tenant_rollups`` has
+stamped ``rebuilt_at``; until then the dashboard falls back to a live scan.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from collections import defaultdict
+from datetime import date, datetime
+
+from azure.cosmos import exceptions
+
+from smart_invoice_pro.utils.cosmos_client import (
+    bills_container,
+    customers_container,
+    dashboard_rollups_container,
+    expenses_container,
+    invoices_container,
+    products_container,
+    tenants_container,
+)
+from smart_invoice_pro.utils.report_snapshots import document_months, invalidate_report_snapshots
+from smart_invoice_pro.utils.shared_cache import invalidate_tenant
+
+logger = logging.getLogger(__name__)
+
+TOTALS_KEY = "totals"
+DAY_FIELDS = (
+    "customers_added",
+    "invoices_created",
+    "revenue",
+    "payments_received",
+    "receivables",
+    "bill_payables",
+    "expenses_total",
+)
+
+CUSTOMER_DATE_FIELDS = ["created_at", "customer_since"]
+INVOICE_DATE_FIELDS = ["created_at", "issue_date"]
+BILL_DATE_FIELDS = ["created_at", "bill_date", "issue_date"]
+EXPENSE_DATE_FIELDS = ["created_at", "expense_date", "date"]
+PAYMENT_DATE_FIELDS = ["payment_date", "paid_date", "created_at", "date"]
+
+OPEN_INVOICE_STATUSES = {"issued", "partially paid", "overdue", "sent"}
+OPEN_BILL_STATUSES = {"unpaid", "partially paid", "overdue"}
+
+# Cosmos accepts at most 10 operations per patch request.
+_MAX_PATCH_OPS = 10
+
+
+def rollups_enabled() -> bool:
+    return os.getenv("DASHBOARD_ROLLUPS_ENABLED", "true").strip().lower() not in {"0", "false", "no"}
+
+
+def _safe_float(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _parse_iso_date(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value)[:10]).date()
+    except Exception:
+        return None
+
+
+def _doc_day(document, fields):
+    for field in fields:
+        parsed = _parse_iso_date(document.get(field))
+        if parsed:
+            return parsed.isoformat()
+    return None
+
+
+def _day_doc_id(tenant_id, day):
+    return f"{tenant_id}:day:{day}"
+
+
+def _totals_doc_id(tenant_id):
+    return f"{tenant_id}:totals"
+
+
+# ── Per-document contributions ────────────────────────────────────────────────
+
+def _invoice_contribution(inv, out):
+    day = _doc_day(inv, INVOICE_DATE_FIELDS)
+    is_open = str(inv.get("status", "")).lower() in OPEN_INVOICE_STATUSES
+    if day:
+        out[day]["invoices_created"] += 1
+        out[day]["revenue"] += _safe_float(inv.get("total_amount"))
+        if is_open:
+            out[day]["receivables"] += _safe_float(inv.get("balance_due", inv.get("total_amount")))
+
+    payment_history = inv.get("payment_history")
+    if isinstance(payment_history, list) and payment_history:
+        for payment in payment_history:
+            pay_day = _doc_day(payment, PAYMENT_DATE_FIELDS)
+            if pay_day:
+                out[pay_day]["payments_received"] += _safe_float(
+                    payment.get("amount")
+                    or payment.get("paid_amount")
+                    or payment.get("amount_paid")
+                )
+    elif day:
+        out[day]["payments_received"] += _safe_float(inv.get("amount_paid"))
+
+    if is_open:
+        due = _parse_iso_date(inv.get("due_date"))
+        if due:
+            out[TOTALS_KEY][f"open_due/{due.isoformat()}"] += 1
+
+
+def _bill_contribution(bill, out):
+    day = _doc_day(bill, BILL_DATE_FIELDS)
+    if day and str(bill.get("payment_status", "")).lower() in OPEN_BILL_STATUSES:
+        out[day]["bill_payables"] += _safe_float(bill.get("balance_due", bill.get("total_amount")))
+
+
+def _expense_contribution(exp, out):
+    day = _doc_day(exp, EXPENSE_DATE_FIELDS)
+    if day:
+        out[day]["expenses_total"] += _safe_float(exp.get("amount", exp.get("total_amount")))
+
+
+def _customer_contribution(cust, out):
+    out[TOTALS_KEY]["total_customers"] += 1
+    day = _doc_day(cust, CUSTOMER_DATE_FIELDS)
+    if day:
+        out[day]["customers_added"] += 1
+
+
+def _product_contribution(_product, out):
+    out[TOTALS_KEY]["total_products"] += 1
+
+
+_CONTRIBUTORS = {
+    "invoice": _invoice_contribution,
+    "bill": _bill_contribution,
+    "expense": _expense_contribution,
+    "customer": _customer_contribution,
+    "product": _product_contribution,
+}
+
+
+def _contributions(kind, documents):
+    out = defaultdict(lambda: defaultdict(float))
+    contribute = _CONTRIBUTORS[kind]
+    for doc in documents:
+        if doc:
+            contribute(doc, out)
+    return out
+
+
+def _diff(before, after):
+    delta = defaultdict(dict)
+    for key in set(before) | set(after):
+        fields = set(before.get(key, {})) | set(after.get(key, {}))
+        for field in fields:
+            change = after.get(key, {}).get(field, 0) - before.get(key, {}).get(field, 0)
+            if change:
+                delta[key][field] = change
+    return {k: v for k, v in delta.items() if v}
+
+
+# ── Writes ────────────────────────────────────────────────────────────────────
+
+def _seed_doc(tenant_id, key):
+    if key == TOTALS_KEY:
+        return {
+            "id": _totals_doc_id(tenant_id),
+            "tenant_id": tenant_id,
+            "doc_type": "totals",
+            "total_customers": 0,
+            "total_products": 0,
+            "open_due": {},
+        }
+    doc = {
+        "id": _day_doc_id(tenant_id, key),
+        "tenant_id": tenant_id,
+        "doc_type": "day",
+        "day": key,
+    }
+    doc.update({field: 0 for field in DAY_FIELDS})
+    return doc
+
+
+def _apply_doc_delta(tenant_id, key, fields):
+    doc_id = _totals_doc_id(tenant_id) if key == TOTALS_KEY else _day_doc_id(tenant_id, key)
+    ops = [{"op": "incr", "path": f"/{field}", "value": value} for field, value in fields.items()]
+    try:
+        for i in range(0, len(ops), _MAX_PATCH_OPS):
+            dashboard_rollups_container.patch_item(
+                item=doc_id,
+                partition_key=tenant_id,
+                patch_operations=ops[i:i + _MAX_PATCH_OPS],
+            )
+        return
+    except exceptions.CosmosResourceNotFoundError:
+        pass
+
+    doc = _seed_doc(tenant_id, key)
+    for field, value in fields.items():
+        if field.startswith("open_due/"):
+            doc["open_due"][field.split("/", 1)[1]] = value
+        else:
+            doc[field] = doc.get(field, 0) + value
+    try:
+        dashboard_rollups_container.create_item(body=doc)
+    except exceptions.CosmosResourceExistsError:
+        # Another writer created the document first — fall back to increments.
+        for i in range(0, len(ops), _MAX_PATCH_OPS):
+            dashboard_rollups_container.patch_item(
+                item=doc_id,
+                partition_key=tenant_id,
+                patch_operations=ops[i:i + _MAX_PATCH_OPS],
+            )
+
+
+def record_rollup_change(kind, before=None, after=None):
+    """
+    Apply the aggregate delta for one document write, drop the tenant's
+    cached dashboard/report payloads and unfreeze report snapshots for the
+    months the document touches. Best-effort: a failure is logged and
+    repaired by the next rebuild, never raised to the caller.
+    """
+    if kind not in _CONTRIBUTORS:
+        return
+    try:
+        tenant_id = (after or before or {}).get("tenant_id")
+        if not tenant_id:
+            return
+        invalidate_tenant(tenant_id)
+        invalidate_report_snapshots(tenant_id, document_months(kind, before, after))
+        if not rollups_enabled():
+            return
+        delta = _diff(_contributions(kind, [before]), _contributions(kind, [after]))
+        for key, fields in delta.items():
+            _apply_doc_delta(tenant_id, key, fields)
+    except Exception as exc:
+        logger.warning("[dashboard_rollups] %s delta failed: %s", kind, exc)
+
+
+# ── Reads ─────────────────────────────────────────────────────────────────────
+
+def load_rollups(tenant_id, start_date, end_date):
+    """
+    Return ``{"totals": {...}, "days": {day: {...}}}`` covering
+    [start_date, end_date], or None if the tenant has not been rebuilt yet.
+    """
+    if not tenant_id or not rollups_enabled():
+        return None
+    try:
+        totals = dashboard_rollups_container.read_item(
+            item=_totals_doc_id(tenant_id), partition_key=tenant_id,
+        )
+    except exceptions.CosmosResourceNotFoundError:
+        return None
+    if not totals.get("rebuilt_at"):
+        return None
+
+    rows = dashboard_rollups_container.query_items(
+        query=(
+            "SELECT * FROM c WHERE c.tenant_id = @tid AND c.doc_type = 'day' "
+            "AND c.day >= @start AND c.day <= @end"
+        ),
+        parameters=[
+            {"name": "@tid", "value": tenant_id},
+            {"name": "@start", "value": start_date.isoformat()},
+            {"name": "@end", "value": end_date.isoformat()},
+        ],
+        partition_key=tenant_id,
+    )
+    return {"totals": totals, "days": {row["day"]: row for row in rows}}
+
+
+def sum_days(days, start_date, end_date):
+    """Sum DAY_FIELDS over the inclusive ISO-day window."""
+    start, end = start_date.isoformat(), end_date.isoformat()
+    totals = {field: 0.0 for field in DAY_FIELDS}
+    for day, row in days.items():
+        if start <= day <= end:
+            for field in DAY_FIELDS:
+                totals[field] += _safe_float(row.get(field))
+    return totals
+
+
+def count_overdue(totals_doc, today: date):
+    cutoff = today.isoformat()
+    return int(sum(
+        count for due, count in (totals_doc.get("open_due") or {}).items()
+        if due < cutoff and count > 0
+    ))
+
+
+# ── Rebuild ───────────────────────────────────────────────────────────────────
+
+def _tenant_query(container, tenant_id):
+    return container.query_items(
+        query="SELECT * FROM c WHERE c.tenant_id = @tid",
+        parameters=[{"name": "@tid", "value": tenant_id}],
+        enable_cross_partition_query=True,
+    )
+
+
+def rebuild_tenant_rollups(tenant_id):
+    """Recompute every rollup document for one tenant from the source containers."""
+    merged = defaultdict(lambda: defaultdict(float))
+    sources = (
+        ("customer", customers_container),
+        ("product", products_container),
+        ("invoice", invoices_container),
+        ("bill", bills_container),
+        ("expense", expenses_container),
+    )
+    for kind, container in sources:
+        for key, fields in _contributions(kind, _tenant_query(container, tenant_id)).items():
+            for field, value in fields.items():
+                merged[key][field] += value
+
+    existing_day_ids = {
+        row["id"] for row in dashboard_rollups_container.query_items(
+            query="SELECT c.id FROM c WHERE c.tenant_id = @tid AND c.doc_type = 'day'",
+            parameters=[{"name": "@tid", "value": tenant_id}],
+            partition_key=tenant_id,
+        )
+    }
+
+    written = 0
+    for key, fields in merged.items():
+        if key == TOTALS_KEY:
+            continue
+        doc = _seed_doc(tenant_id, key)
+        doc.update({field: round(value, 2) for field, value in fields.items()})
+        dashboard_rollups_container.upsert_item(body=doc)
+        existing_day_ids.discard(doc["id"])
+        written += 1
+
+    for stale_id in existing_day_ids:
+        dashboard_rollups_container.delete_item(item=stale_id, partition_key=tenant_id)
+
+    totals = _seed_doc(tenant_id, TOTALS_KEY)
+    for field, value in merged.get(TOTALS_KEY, {}).items():
+        if field.startswith("open_due/"):
+            totals["open_due"][field.split("/", 1)[1]] = int(value)
+        else:
+            totals[field] = int(value)
+    totals["rebuilt_at"] = datetime.utcnow().isoformat()
+    dashboard_rollups_container.upsert_item(body=totals)
+
+    return {"tenant_id": tenant_id, "day_docs": written, "stale_removed": len(existing_day_ids)}
+
+
+def rebuild_all_rollups():
+    """Rebuild rollups for every tenant. Returns a per-tenant summary list."""
+    results = []
+    for tenant in tenants_container.query_items(
+        query="SELECT c.id FROM c", enable_cross_partition_query=True,
+    ):
+        try:
+            results.append(rebuild_tenant_rollups(tenant["id"]))
+        except Exception as exc:
+            logger.error("[dashboard_rollups] rebuild failed for %s: %s", tenant["id"], exc)
+            results.append({"tenant_id": tenant["id"], "error": str(exc)})
+    return results
@@ -0,0 +1,339 @@
+"""
+email_service.py
+================
+Outbound email for every feature (documents, reminders, invites, alerts,
+the contact form) behind one pipeline, instead of a new ACS client and a
+blocking ``begin_send(...).result()`` inside each request.
+
+  * One transport per process. The ACS ``EmailClient`` (and its HTTP
+    connection pool) is created once and shared by all threads.
+  * ``queue_email`` writes the message to the durable job queue (kind
+    "email_send") and returns at once; queue workers send it. Failed sends
+    are retried with the queue's backoff, then dead-lettered.
+  * Workers share a token bucket sized to the ACS sending quota, and the job
+    kind's ``max_running`` caps concurrent sends across the cluster.
+  * When the message belongs to a document, its delivery status is written
+    back with a conditional patch (only if the document still points at this
+    outbox message, so an older send never overwrites a newer one):
+
+        email_status      "queued" → "sent" | "failed"
+        email_outbox_id   outbox message id (stamped by the caller when queuing)
+        email_message_id  ACS operation id once sent
+        email_sent_at / email_failed_at, email_error
+
+Messages use the ACS dict format (senderAddress, recipients, content,
+attachments). Sends are at-least-once: a worker that dies between the ACS
+accept and the queue ack re-sends on retry.
+
+Transports
+----------
+  acs   – Azure Communication Services (default)
+  fake  – records messages in memory; for development and tests
+
+Environment
+-----------
+  EMAIL_TRANSPORT               – "acs" (default) or "fake"
+  AZURE_EMAIL_CONNECTION_STRING – ACS connection string
+                                  (AZURE_COMMUNICATION_CONNECTION_STRING is
+                                  accepted as a fallback)
+  EMAIL_ASYNC                   – queue sends (default true; false, or unset
+                                  under pytest, sends inline)
+  EMAIL_RATE_PER_MINUTE         – sends per minute per process (default 30,
+                                  the ACS default quota; 0 = unlimited)
+  EMAIL_MAX_CONCURRENT          – concurrent sends across workers (default 4)
+  EMAIL_MAX_ATTEMPTS            – send attempts before dead-lettering (default 5)
+  EMAIL_SEND_TIMEOUT_SECONDS    – wait for the ACS send operation (default 60)
+  EMAIL_MAX_QUEUED_BYTES        – larger messages (big attachments) are sent
+                                  inline instead of queued (default 1500000)
+"""
+
+from __future__ import annotations
+
+import copy
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from azure.communication.email import EmailClient
+from azure.core.exceptions import HttpResponseError
+from azure.cosmos import exceptions
+
+from smart_invoice_pro.utils.cosmos_client import get_container, registered_containers
+from smart_invoice_pro.utils.job_queue import enqueue_job, register_job_kind
+
+logger = logging.getLogger(__name__)
+
+EMAIL_JOB_KIND = "email_send"
+
+STATUS_QUEUED = "queued"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _connection_string() -> str | None:
+    return (os.getenv("AZURE_EMAIL_CONNECTION_STRING")
+            or os.getenv("AZURE_COMMUNICATION_CONNECTION_STRING") or None)
+
+
+# ── Transports ────────────────────────────────────────────────────────────────
+
+class AcsTransport:
+    """Azure Communication Services, with one client shared by every thread."""
+
+    name = "acs"
+
+    def __init__(self, connection_string: str):
+        self.connection_string = connection_string
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = EmailClient.from_connection_string(self.connection_string)
+            return self._client
+
+    def send(self, message: dict) -> str:
+        poller = self.client.begin_send(message)
+        result = poller.result(timeout=_env_int("EMAIL_SEND_TIMEOUT_SECONDS", 60))
+        return (result or {}).get("id") or ""
+
+
+class FakeTransport:
+    """Records messages instead of sending them. Queue exceptions in ``failures``."""
+
+    name = "fake"
+
+    def __init__(self):
+        self.sent: list[dict] = []
+        self.failures: list[Exception] = []
+        self._lock = threading.Lock()
+
+    def send(self, message: dict) -> str:
+        with self._lock:
+            if self.failures:
+                raise self.failures.pop(0)
+            self.sent.append(copy.deepcopy(message))
+            message_id = f"fake-{len(self.sent)}"
+        recipients = [r.get("address") for r in (message.get("recipients") or {}).get("to", [])]
+        logger.info("[email] fake send %s to %s: %s", message_id, recipients,
+                    (message.get("content") or {}).get("subject"))
+        return message_id
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """The process-wide transport selected by EMAIL_TRANSPORT, or None when unconfigured."""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            kind = (os.getenv("EMAIL_TRANSPORT") or "acs").strip().lower()
+            if kind == "fake":
+                _transport = FakeTransport()
+            elif _connection_string():
+                _transport = AcsTransport(_connection_string())
+        return _transport
+
+
+def reset_transport() -> None:
+    """Testing helper — rebuild the transport (and its client) from env on next use."""
+    global _transport
+    with _transport_lock:
+        _transport = None
+
+
+def email_configured() -> bool:
+    return get_transport() is not None
+
+
+# ── Rate limiting ─────────────────────────────────────────────────────────────
+
+class _TokenBucket:
+    """Refills ``rate_per_minute`` tokens a minute, holding at most a minute's worth."""
+
+    def __init__(self, rate_per_minute: int):
+        self.rate_per_minute = rate_per_minute
+        self.tokens = float(rate_per_minute)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate_per_minute <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(float(self.rate_per_minute),
+                                  self.tokens + (now - self.updated) * self.rate_per_minute / 60.0)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) * 60.0 / self.rate_per_minute
+            time.sleep(wait)
+
+
+_bucket = None
+_bucket_lock = threading.Lock()
+
+
+def _rate_limiter() -> _TokenBucket:
+    global _bucket
+    with _bucket_lock:
+        if _bucket is None:
+            _bucket = _TokenBucket(_env_int("EMAIL_RATE_PER_MINUTE", 30))
+        return _bucket
+
+
+def reset_rate_limiter() -> None:
+    global _bucket
+    with _bucket_lock:
+        _bucket = None
+
+
+# ── Delivery status ───────────────────────────────────────────────────────────
+
+def document_target(container_name: str, doc: dict, partition_field: str) -> dict:
+    """Where ``email_status`` for a send of ``doc`` is written back."""
+    return {"container": container_name, "id": doc["id"], "partition_key": doc.get(partition_field)}
+
+
+def _record_status(target: dict | None, outbox_id: str, fields: dict) -> None:
+    """Patch the target document, only while it still points at this outbox message."""
+    if not target:
+        return
+    name = target.get("container")
+    partition_key = registered_containers().get(name)
+    if partition_key is None:
+        logger.warning("[email] unknown status container %r", name)
+        return
+    ops = [{"op": "set", "path": f"/{field}", "value": value} for field, value in fields.items()]
+    try:
+        get_container(name, partition_key).patch_item(
+            item=target["id"],
+            partition_key=target.get("partition_key"),
+            patch_operations=ops,
+            filter_predicate=f"FROM c WHERE c.email_outbox_id = '{outbox_id}'",
+        )
+    except (exceptions.CosmosAccessConditionFailedError, exceptions.CosmosResourceNotFoundError):
+        pass   # re-sent since (a newer message owns the status) or deleted
+    except Exception as exc:
+        logger.warning("[email] status write-back failed for %s %s: %s", name, target.get("id"), exc)
+
+
+def _is_permanent(exc: Exception) -> bool:
+    """ACS rejections that a retry cannot fix (bad address, sender not verified…)."""
+    status = getattr(exc, "status_code", None)
+    return isinstance(exc, HttpResponseError) and status is not None and 400 <= status < 500 \
+        and status not in (408, 429)
+
+
+def _transport_or_raise():
+    transport = get_transport()
+    if transport is None:
+        raise RuntimeError("Email transport is not configured (AZURE_EMAIL_CONNECTION_STRING)")
+    return transport
+
+
+def _deliver(message: dict, target: dict | None, outbox_id: str) -> tuple[str | None, str | None]:
+    """
+    Send one message and record the outcome. Returns ``(acs_message_id, None)``,
+    or ``(None, error)`` when ACS rejected it permanently. Raises on retryable
+    failures.
+    """
+    transport = _transport_or_raise()
+    _rate_limiter().acquire()
+    try:
+        provider_id = transport.send(message)
+    except Exception as exc:
+        if not _is_permanent(exc):
+            raise
+        logger.error("[email] %s rejected: %s", outbox_id, exc)
+        error = str(exc)[:500]
+        _record_status(target, outbox_id, {
+            "email_status":    STATUS_FAILED,
+            "email_failed_at": datetime.utcnow().isoformat(),
+            "email_error":     error,
+        })
+        return None, error
+    _record_status(target, outbox_id, {
+        "email_status":     STATUS_SENT,
+        "email_sent_at":    datetime.utcnow().isoformat(),
+        "email_message_id": provider_id,
+        "email_error":      None,
+    })
+    return provider_id, None
+
+
+# ── Outbox ────────────────────────────────────────────────────────────────────
+
+def _should_queue() -> bool:
+    explicit = (os.getenv("EMAIL_ASYNC") or "").strip().lower()
+    if explicit in {"1", "true", "yes", "on"}:
+        return True
+    if explicit in {"0", "false", "no", "off"}:
+        return False
+    return not bool(os.getenv("PYTEST_CURRENT_TEST"))
+
+
+def queue_email(tenant_id: str | None, message: dict, *, target: dict | None = None,
+                outbox_id: str | None = None, priority: int = 0) -> dict:
+    """
+    Hand a message to the outbox. Returns ``{"id", "status", "message_id", "error"}``:
+    status "queued" when a worker will send it, else "sent" / "failed" for an
+    inline send. Pass the same ``outbox_id`` the caller stamped on the target
+    document as ``email_outbox_id``. Inline sends raise on retryable failures;
+    queuing raises only if the outbox write fails.
+    """
+    outbox_id = outbox_id or str(uuid.uuid4())
+    payload = {"message": message, "target": target}
+    if _should_queue() and len(json.dumps(payload)) <= _env_int("EMAIL_MAX_QUEUED_BYTES", 1_500_000):
+        enqueue_job(EMAIL_JOB_KIND, tenant_id or "system", payload,
+                    priority=priority, message_id=outbox_id)
+        return {"id": outbox_id, "status": STATUS_QUEUED, "message_id": None, "error": None}
+    provider_id, error = _deliver(message, target, outbox_id)
+    return {"id": outbox_id, "status": STATUS_FAILED if error else STATUS_SENT,
+            "message_id": provider_id, "error": error}
+
+
+def send_email_now(message: dict) -> str:
+    """Send inline on the shared client (e.g. a settings "send test email" button)."""
+    transport = _transport_or_raise()
+    _rate_limiter().acquire()
+    return transport.send(message)
+
+
+def _handle_email_job(payload: dict, message: dict) -> None:
+    _deliver(payload["message"], payload.get("target"), message["id"])
+
+
+def _on_dead_letter(payload: dict, message: dict, error: str) -> None:
+    _record_status(payload.get("target"), message["id"], {
+        "email_status":    STATUS_FAILED,
+        "email_failed_at": datetime.utcnow().isoformat(),
+        "email_error":     (error or "")[:500],
+    })
+
+
+register_job_kind(
+    EMAIL_JOB_KIND,
+    _handle_email_job,
+    on_dead_letter=_on_dead_letter,
+    max_running=max(1, _env_int("EMAIL_MAX_CONCURRENT", 4)),
+    max_attempts=max(1, _env_int("EMAIL_MAX_ATTEMPTS", 5)),
+)
@@ -0,0 +1,670 @@
+"""
+job_queue.py
+============
+Durable queue for long-running background operations (bank imports first;
+bulk archive and exports can register their own job kinds).
+
+A request enqueues a message and returns; any worker process — the web
+workers' in-process threads (started by ``create_app``) or a dedicated
+``scripts/run_job_worker.py`` — claims it with a lease, keeps the lease
+alive with heartbeats while the handler runs, and then completes, retries or
+dead-letters it. A message whose worker dies is reclaimed once its lease
+expires, so jobs survive restarts and deploys.
+
+Message document
+{
+    "id":              "<uuid, or the caller's job id>",
+    "tenant_id":       "<tenant>",
+    "kind":            "bank_import",
+    "payload":         {...},            # handler arguments; keep it small
+    "priority":        0,                # higher runs first
+    "rank":            1718000000.0,     # claim order: next_attempt_at aged by priority
+    "status":          "pending" | "dead_letter",
+    "attempts":        0,                # incremented on every claim
+    "max_attempts":    3,
+    "next_attempt_at": 1718000000.0,     # epoch seconds
+    "lease_owner":     "<worker id>" | null,
+    "lease_until":     1718000120.0 | null,
+    "heartbeat_at":    1718000040.0 | null,
+    "last_error":      null,
+    "created_at":      "..."
+}
+
+Completed messages are deleted; the job's own document (e.g. bank_import_jobs)
+keeps its history. A live lease is what "running" means.
+
+Priority
+--------
+One priority level is worth PRIORITY_STEP_SECONDS of queue age, so urgent
+work jumps ahead without starving older low-priority messages, and claims sort
+on a single indexed field.
+
+Concurrency
+-----------
+Every claim is exclusive (ETag replace on Cosmos, conditional UPDATE on
+SQLite). A job kind may also set ``max_running``: workers only claim that kind
+while fewer live leases exist across the cluster (a soft cap — two workers can
+race for the last slot).
+
+Backends
+--------
+  cosmos  – "job_queue" container, partition /tenant_id (default)
+  sqlite  – local file, for single-host deployments and development
+
+Environment
+-----------
+  JOB_QUEUE_BACKEND               – "cosmos" (default) or "sqlite"
+  JOB_QUEUE_SQLITE_PATH           – database file for the sqlite backend
+  JOB_WORKER_THREADS              – in-process worker threads per web process
+                                    (default 2, 0 = dedicated worker only)
+  JOB_QUEUE_LEASE_SECONDS         – claim lease, renewed by heartbeats (default 120)
+  JOB_QUEUE_POLL_SECONDS          – idle poll interval (default 5)
+  JOB_QUEUE_MAX_ATTEMPTS          – default attempts before dead-lettering (default 3)
+  JOB_QUEUE_BACKOFF_BASE_SECONDS  – first retry delay (default 30)
+  JOB_QUEUE_BACKOFF_MAX_SECONDS   – retry delay cap (default 1800)
+"""
+
+from __future__ import annotations
+
+import importlib
+import json
+import logging
+import os
+import random
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from azure.core import MatchConditions
+from azure.cosmos import exceptions
+
+from smart_invoice_pro.utils.cosmos_client import job_queue_container
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = "pending"
+STATUS_DEAD_LETTER = "dead_letter"
+PRIORITY_STEP_SECONDS = 3600
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _rank(next_attempt_at: float, priority: int) -> float:
+    return next_attempt_at - int(priority or 0) * PRIORITY_STEP_SECONDS
+
+
+def _lease_token(owner: str) -> str:
+    """Unique per claim, so two threads of one process never share a lease."""
+    return f"{owner}/{uuid.uuid4().hex[:8]}"
+
+
+def _strip(doc: dict) -> dict:
+    return {k: v for k, v in doc.items() if not k.startswith("_") or k == "_etag"}
+
+
+# ── Backends ──────────────────────────────────────────────────────────────────
+
+class CosmosJobQueue:
+    """Messages in the job_queue container; leases use ETag replaces."""
+
+    name = "cosmos"
+
+    def __init__(self, container=None):
+        self._container = container
+
+    @property
+    def container(self):
+        return self._container if self._container is not None else job_queue_container
+
+    def enqueue(self, message: dict) -> None:
+        self.container.create_item(body=message)
+
+    def _conditional_replace(self, message: dict) -> bool:
+        body = dict(message)
+        etag = body.pop("_etag", None)
+        try:
+            saved = self.container.replace_item(
+                item=body["id"], body=body,
+                etag=etag, match_condition=MatchConditions.IfNotModified,
+            )
+        except (exceptions.CosmosAccessConditionFailedError, exceptions.CosmosResourceNotFoundError):
+            return False
+        message["_etag"] = saved.get("_etag") if isinstance(saved, dict) else None
+        return True
+
+    def claim_due(self, owner: str, kinds: list[str], limit: int, lease_seconds: float) -> list[dict]:
+        now = time.time()
+        candidates = self.container.query_items(
+            query=(
+                "SELECT TOP @limit * FROM c WHERE c.status = @pending "
+                "AND ARRAY_CONTAINS(@kinds, c.kind) AND c.next_attempt_at <= @now "
+                "AND (NOT IS_DEFINED(c.lease_until) OR IS_NULL(c.lease_until) OR c.lease_until <= @now) "
+                "ORDER BY c.rank ASC"
+            ),
+            parameters=[
+                {"name": "@limit", "value": int(limit)},
+                {"name": "@pending", "value": STATUS_PENDING},
+                {"name": "@kinds", "value": list(kinds)},
+                {"name": "@now", "value": now},
+            ],
+            enable_cross_partition_query=True,
+        )
+        claimed = []
+        for doc in candidates:
+            message = _strip(doc)
+            message.update(lease_owner=_lease_token(owner), lease_until=now + lease_seconds, heartbeat_at=now,
+                           attempts=message.get("attempts", 0) + 1)
+            if self._conditional_replace(message):   # another worker may have claimed it first
+                claimed.append(message)
+        return claimed
+
+    def heartbeat(self, message: dict, lease_seconds: float) -> bool:
+        now = time.time()
+        renewed = dict(message, lease_until=now + lease_seconds, heartbeat_at=now)
+        if not self._conditional_replace(renewed):
+            return False
+        message.update(renewed)
+        return True
+
+    def complete(self, message: dict) -> bool:
+        try:
+            self.container.delete_item(
+                item=message["id"], partition_key=message["tenant_id"],
+                etag=message.get("_etag"), match_condition=MatchConditions.IfNotModified,
+            )
+        except exceptions.CosmosAccessConditionFailedError:
+            return False
+        except exceptions.CosmosResourceNotFoundError:
+            pass
+        return True
+
+    def update(self, message: dict, owner: str | None) -> bool:
+        """Write *message* back, provided the lease ``owner`` held is still current.
+
+        The ETag from that claim (or its last heartbeat) pins the lease, so a
+        message reclaimed by another worker fails the replace.
+        """
+        return self._conditional_replace(message)
+
+    def get(self, tenant_id: str, message_id: str) -> dict | None:
+        try:
+            return _strip(self.container.read_item(item=message_id, partition_key=tenant_id))
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+
+    def active_count(self, kind: str) -> int:
+        rows = list(self.container.query_items(
+            query=(
+                "SELECT VALUE COUNT(1) FROM c WHERE c.kind = @kind "
+                "AND c.status = @pending AND c.lease_until > @now"
+            ),
+            parameters=[
+                {"name": "@kind", "value": kind},
+                {"name": "@pending", "value": STATUS_PENDING},
+                {"name": "@now", "value": time.time()},
+            ],
+            enable_cross_partition_query=True,
+        ))
+        return int(rows[0]) if rows else 0
+
+    def list_dead_letters(self, tenant_id: str, limit: int = 50) -> list[dict]:
+        return [_strip(d) for d in self.container.query_items(
+            query=(
+                "SELECT TOP @limit * FROM c WHERE c.tenant_id = @tenant_id "
+                "AND c.status = @dead ORDER BY c.next_attempt_at DESC"
+            ),
+            parameters=[
+                {"name": "@limit", "value": int(limit)},
+                {"name": "@tenant_id", "value": tenant_id},
+                {"name": "@dead", "value": STATUS_DEAD_LETTER},
+            ],
+            partition_key=tenant_id,
+        )]
+
+
+class SQLiteJobQueue:
+    """Single-host stand-in with the same semantics; claims are atomic UPDATEs."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS job_queue ("
+            " id TEXT PRIMARY KEY, tenant_id TEXT NOT NULL, kind TEXT NOT NULL,"
+            " status TEXT NOT NULL, rank REAL NOT NULL, next_attempt_at REAL NOT NULL,"
+            " lease_owner TEXT, lease_until REAL, doc TEXT NOT NULL)"
+        )
+        self._conn().execute(
+            "CREATE INDEX IF NOT EXISTS job_queue_due ON job_queue (status, kind, rank)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _columns(message: dict) -> tuple:
+        return (message["tenant_id"], message["kind"], message["status"], message["rank"],
+                message["next_attempt_at"], message.get("lease_owner"), message.get("lease_until"),
+                json.dumps(message))
+
+    def enqueue(self, message: dict) -> None:
+        self._conn().execute(
+            "INSERT INTO job_queue "
+            "(tenant_id, kind, status, rank, next_attempt_at, lease_owner, lease_until, doc, id) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (*self._columns(message), message["id"]),
+        )
+
+    def claim_due(self, owner: str, kinds: list[str], limit: int, lease_seconds: float) -> list[dict]:
+        if not kinds:
+            return []
+        conn = self._conn()
+        now = time.time()
+        marks = ", ".join("?" for _ in kinds)
+        rows = conn.execute(
+            f"SELECT id, doc FROM job_queue WHERE status = ? AND kind IN ({marks}) "
+            "AND next_attempt_at <= ? AND (lease_until IS NULL OR lease_until <= ?) "
+            "ORDER BY rank LIMIT ?",
+            (STATUS_PENDING, *kinds, now, now, int(limit)),
+        ).fetchall()
+        claimed = []
+        for message_id, doc in rows:
+            message = json.loads(doc)
+            message.update(lease_owner=_lease_token(owner), lease_until=now + lease_seconds, heartbeat_at=now,
+                           attempts=message.get("attempts", 0) + 1)
+            cur = conn.execute(
+                "UPDATE job_queue SET lease_owner = ?, lease_until = ?, doc = ? "
+                "WHERE id = ? AND (lease_until IS NULL OR lease_until <= ?)",
+                (message["lease_owner"], message["lease_until"], json.dumps(message), message_id, now),
+            )
+            if cur.rowcount == 1:
+                claimed.append(message)
+        return claimed
+
+    def heartbeat(self, message: dict, lease_seconds: float) -> bool:
+        now = time.time()
+        renewed = dict(message, lease_until=now + lease_seconds, heartbeat_at=now)
+        cur = self._conn().execute(
+            "UPDATE job_queue SET lease_until = ?, doc = ? WHERE id = ? AND lease_owner = ?",
+            (renewed["lease_until"], json.dumps(renewed), message["id"], message.get("lease_owner")),
+        )
+        if cur.rowcount != 1:
+            return False
+        message.update(renewed)
+        return True
+
+    def complete(self, message: dict) -> bool:
+        cur = self._conn().execute(
+            "DELETE FROM job_queue WHERE id = ? AND lease_owner IS ?",
+            (message["id"], message.get("lease_owner")),
+        )
+        return cur.rowcount == 1
+
+    def update(self, message: dict, owner: str | None) -> bool:
+        """Write *message* back, provided the lease ``owner`` held is still current."""
+        cur = self._conn().execute(
+            "UPDATE job_queue SET tenant_id = ?, kind = ?, status = ?, rank = ?, next_attempt_at = ?, "
+            "lease_owner = ?, lease_until = ?, doc = ? WHERE id = ? AND lease_owner IS ?",
+            (*self._columns(message), message["id"], owner),
+        )
+        return cur.rowcount == 1
+
+    def get(self, tenant_id: str, message_id: str) -> dict | None:
+        row = self._conn().execute(
+            "SELECT doc FROM job_queue WHERE id = ? AND tenant_id = ?", (message_id, tenant_id)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def active_count(self, kind: str) -> int:
+        row = self._conn().execute(
+            "SELECT COUNT(*) FROM job_queue WHERE kind = ? AND status = ? AND lease_until > ?",
+            (kind, STATUS_PENDING, time.time()),
+        ).fetchone()
+        return int(row[0]) if row else 0
+
+    def list_dead_letters(self, tenant_id: str, limit: int = 50) -> list[dict]:
+        rows = self._conn().execute(
+            "SELECT doc FROM job_queue WHERE tenant_id = ? AND status = ? "
+            "ORDER BY next_attempt_at DESC LIMIT ?",
+            (tenant_id, STATUS_DEAD_LETTER, int(limit)),
+        ).fetchall()
+        return [json.loads(doc) for (doc,) in rows]
+
+
+_queue_lock = threading.Lock()
+_queue = None
+
+
+def get_queue():
+    """Return the process-wide queue backend selected by JOB_QUEUE_BACKEND."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            kind = (os.getenv("JOB_QUEUE_BACKEND") or "cosmos").strip().lower()
+            if kind == "sqlite":
+                path = os.getenv("JOB_QUEUE_SQLITE_PATH") or os.path.join(
+                    tempfile.gettempdir(), "smart_invoice_pro_job_queue.sqlite3"
+                )
+                _queue = SQLiteJobQueue(path)
+            else:
+                _queue = CosmosJobQueue()
+        return _queue
+
+
+def reset_queue() -> None:
+    """Testing helper — rebuild the backend from env on next use."""
+    global _queue
+    with _queue_lock:
+        _queue = None
+
+
+# ── Job kinds ─────────────────────────────────────────────────────────────────
+
+_KINDS: dict[str, dict] = {}
+
+# Every module that calls register_job_kind at import. Workers load them all
+# (load_job_kinds) so no kind is left unclaimed; add new job features here.
+JOB_KIND_MODULES = (
+    "smart_invoice_pro.services.ai_match_job",
+    "smart_invoice_pro.services.bank_import.import_workflow_service",
+    "smart_invoice_pro.services.pdf_export.bulk_export_service",
+    "smart_invoice_pro.services.scheduler",
+    "smart_invoice_pro.utils.email_service",
+    "smart_invoice_pro.utils.reminder_schedule",
+)
+
+
+def register_job_kind(kind: str, handler, *, on_dead_letter=None, max_running: int | None = None,
+                      max_attempts: int | None = None) -> None:
+    """
+    Register the handler for a job kind.
+
+    ``handler(payload, message)`` runs the job; raising schedules a retry with
+    backoff. ``on_dead_letter(payload, message, error)`` runs once the attempts
+    are exhausted, so the owning feature can mark its own job document failed.
+    """
+    _KINDS[kind] = {
+        "handler": handler,
+        "on_dead_letter": on_dead_letter,
+        "max_running": max_running,
+        "max_attempts": max_attempts,
+    }
+
+
+def registered_kinds() -> list[str]:
+    return sorted(_KINDS)
+
+
+def load_job_kinds() -> list[str]:
+    """Import every JOB_KIND_MODULES module; returns the registered kinds."""
+    for module in JOB_KIND_MODULES:
+        importlib.import_module(module)
+    return registered_kinds()
+
+
+def _claimable_kinds(queue, kinds) -> list[str]:
+    allowed = []
+    for kind in kinds:
+        cap = (_KINDS.get(kind) or {}).get("max_running")
+        try:
+            if cap is not None and queue.active_count(kind) >= cap:
+                continue
+        except Exception as exc:
+            logger.warning("[job_queue] active count failed for %s: %s", kind, exc)
+        allowed.append(kind)
+    return allowed
+
+
+def _backoff_seconds(attempts: int) -> float:
+    base = max(1, _env_int("JOB_QUEUE_BACKOFF_BASE_SECONDS", 30))
+    cap = max(base, _env_int("JOB_QUEUE_BACKOFF_MAX_SECONDS", 1800))
+    delay = min(cap, base * (2 ** max(0, attempts - 1)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def enqueue_job(kind: str, tenant_id: str, payload: dict, *, priority: int = 0,
+                delay_seconds: float = 0, message_id: str | None = None,
+                max_attempts: int | None = None) -> dict:
+    """Persist a job message and wake this process's workers, if any. Returns the message."""
+    now = time.time()
+    due = now + max(0.0, delay_seconds)
+    spec = _KINDS.get(kind) or {}
+    message = {
+        "id":              message_id or str(uuid.uuid4()),
+        "tenant_id":       tenant_id,
+        "kind":            kind,
+        "payload":         payload,
+        "priority":        int(priority or 0),
+        "rank":            _rank(due, priority),
+        "status":          STATUS_PENDING,
+        "attempts":        0,
+        "max_attempts":    max_attempts or spec.get("max_attempts") or max(1, _env_int("JOB_QUEUE_MAX_ATTEMPTS", 3)),
+        "next_attempt_at": due,
+        "lease_owner":     None,
+        "lease_until":     None,
+        "heartbeat_at":    None,
+        "last_error":      None,
+        "created_at":      datetime.utcnow().isoformat(),
+    }
+    get_queue().enqueue(message)
+    with _worker_lock:
+        worker = _worker
+    if worker is not None:
+        if worker.pid != os.getpid():
+            worker = start_job_workers()    # forked after boot: the threads did not survive
+        worker.wake()
+    return message
+
+
+# ── Processing ────────────────────────────────────────────────────────────────
+
+class _Heartbeat:
+    """Renews a claimed message's lease in the background while its handler runs."""
+
+    def __init__(self, queue, message: dict, lease_seconds: float):
+        self.queue = queue
+        self.message = message
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"job-heartbeat-{message['id'][:8]}", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(max(1.0, self.lease_seconds / 3)):
+            try:
+                if not self.queue.heartbeat(self.message, self.lease_seconds):
+                    self.lost = True
+                    logger.warning("[job_queue] lease lost for %s", self.message["id"])
+                    return
+            except Exception as exc:
+                logger.warning("[job_queue] heartbeat failed for %s: %s", self.message["id"], exc)
+
+
+def _dead_letter(queue, message: dict, spec: dict, error: str, owner: str | None) -> None:
+    message.update(status=STATUS_DEAD_LETTER, last_error=error, lease_owner=None, lease_until=None,
+                   dead_lettered_at=datetime.utcnow().isoformat())
+    hook = spec.get("on_dead_letter")
+    if hook is not None:
+        try:
+            hook(message.get("payload") or {}, message, error)
+        except Exception as exc:
+            logger.error("[job_queue] dead-letter hook failed for %s: %s", message["id"], exc)
+    queue.update(message, owner)
+
+
+def process_message(message: dict, queue=None) -> str:
+    """
+    Run one claimed message and settle it in the queue.
+    Returns "completed", "retry", "dead_letter" or "lost" (the lease moved to
+    another worker, which now owns the outcome).
+    """
+    queue = queue or get_queue()
+    owner = message.get("lease_owner")
+    spec = _KINDS.get(message["kind"])
+    if spec is None:
+        _dead_letter(queue, message, {}, f"no handler registered for {message['kind']!r}", owner)
+        return "dead_letter"
+    if message.get("attempts", 0) > message.get("max_attempts", 1):
+        # Claimed again after its worker kept dying mid-run (lease expiry).
+        _dead_letter(queue, message, spec, message.get("last_error") or "lease expired repeatedly", owner)
+        return "dead_letter"
+
+    lease_seconds = max(10, _env_int("JOB_QUEUE_LEASE_SECONDS", 120))
+    error = None
+    with _Heartbeat(queue, message, lease_seconds) as heartbeat:
+        try:
+            spec["handler"](message.get("payload") or {}, message)
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+            logger.exception("[job_queue] %s job %s failed (attempt %s)",
+                             message["kind"], message["id"], message.get("attempts"))
+    if heartbeat.lost:
+        return "lost"
+
+    if error is None:
+        return "completed" if queue.complete(message) else "lost"
+    if message.get("attempts", 0) >= message.get("max_attempts", 1):
+        _dead_letter(queue, message, spec, error, owner)
+        return "dead_letter"
+    due = time.time() + _backoff_seconds(message.get("attempts", 0))
+    message.update(last_error=error, lease_owner=None, lease_until=None,
+                   next_attempt_at=due, rank=_rank(due, message.get("priority", 0)))
+    return "retry" if queue.update(message, owner) else "lost"
+
+
+def drain_job_queue(kinds: list[str] | None = None, limit: int = 10) -> dict:
+    """Claim and run due messages inline (cron, tests, JOB_WORKER_THREADS=0)."""
+    counts = {"completed": 0, "retry": 0, "dead_letter": 0, "lost": 0}
+    queue = get_queue()
+    lease_seconds = max(10, _env_int("JOB_QUEUE_LEASE_SECONDS", 120))
+    for _ in range(max(0, limit)):
+        allowed = _claimable_kinds(queue, kinds or registered_kinds())
+        claimed = queue.claim_due(_worker_id(), allowed, 1, lease_seconds) if allowed else []
+        if not claimed:
+            break
+        counts[process_message(claimed[0], queue)] += 1
+    return counts
+
+
+# ── Workers ───────────────────────────────────────────────────────────────────
+
+class JobWorker:
+    """Threads that each claim one message at a time and run it to completion."""
+
+    def __init__(self, threads: int, kinds: list[str] | None = None):
+        self.pid = os.getpid()
+        self.kinds = kinds
+        self._stop = threading.Event()
+        self._wake = threading.Condition()
+        self._claim_lock = threading.Lock()   # max_running is checked then claimed
+        self._threads = [
+            threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            for i in range(max(1, threads))
+        ]
+
+    def start(self) -> "JobWorker":
+        for t in self._threads:
+            t.start()
+        return self
+
+    def wake(self) -> None:
+        with self._wake:
+            self._wake.notify()
+
+    def _claim(self, queue) -> dict | None:
+        lease_seconds = max(10, _env_int("JOB_QUEUE_LEASE_SECONDS", 120))
+        with self._claim_lock:
+            allowed = _claimable_kinds(queue, self.kinds or registered_kinds())
+            if not allowed:
+                return None
+            claimed = queue.claim_due(_worker_id(), allowed, 1, lease_seconds)
+        return claimed[0] if claimed else None
+
+    def _work(self) -> None:
+        poll = max(1, _env_int("JOB_QUEUE_POLL_SECONDS", 5))
+        while not self._stop.is_set():
+            try:
+                queue = get_queue()
+                message = self._claim(queue)
+                if message is not None:
+                    process_message(message, queue)
+                    continue
+            except Exception as exc:
+                logger.warning("[job_queue] worker poll failed: %s", exc)
+            with self._wake:
+                self._wake.wait(poll)
+
+    def stop(self, wait: bool = True, timeout: float | None = None) -> None:
+        self._stop.set()
+        with self._wake:
+            self._wake.notify_all()
+        if wait:
+            for t in self._threads:
+                t.join(timeout)
+
+    def run_forever(self) -> None:
+        """Block until interrupted (dedicated worker entry point)."""
+        self.start()
+        try:
+            while any(t.is_alive() for t in self._threads):
+                time.sleep(1)
+        except KeyboardInterrupt:
+            logger.info("[job_queue] stopping; in-flight jobs finish first")
+            self.stop(wait=True)
+
+
+_worker_lock = threading.Lock()
+_worker: JobWorker | None = None
+
+
+def start_job_workers() -> JobWorker | None:
+    """
+    Start this process's in-process workers (at app boot), or return the
+    running ones; restarts them after a fork. None when JOB_WORKER_THREADS=0.
+    """
+    global _worker
+    threads = _env_int("JOB_WORKER_THREADS", 2)
+    if threads <= 0:
+        return None
+    load_job_kinds()
+    with _worker_lock:
+        if _worker is None or _worker.pid != os.getpid():
+            _worker = JobWorker(threads).start()
+        return _worker
+
+
+def shutdown_job_workers(wait: bool = True) -> None:
+    """Stop the in-process workers (tests, graceful shutdown)."""
+    global _worker
+    with _worker_lock:
+        worker, _worker = _worker, None
+    if worker is not None:
+        worker.stop(wait=wait)
@@ -3,8 +3,10 @@ from datetime import datetime
 
 from smart_invoice_pro.utils.archive_service import archive_entity, restore_entity
 from smart_invoice_pro.utils.audit_logger import log_audit_event
+from smart_invoice_pro.utils.dashboard_rollups import record_rollup_change
 from smart_invoice_pro.utils.dependency_checker import check_entity_dependencies
 from smart_invoice_pro.utils.domain_events import record_domain_event
+from smart_invoice_pro.utils.reminder_schedule import record_invoice_write
 
 
 ENTITY_DELETED = "ENTITY_DELETED"
@@ -124,6 +126,9 @@ def hard_delete_entity(container, item, entity_type, tenant_id, user_id=None, re
     partition_key_value = _resolve_partition_key(item, entity_type)
 
     container.delete_item(item=item["id"], partition_key=partition_key_value)
+    record_rollup_change(normalize_entity_type(entity_type), before_snapshot, None)
+    if normalize_entity_type(entity_type) == "invoice":
+        record_invoice_write(before_snapshot, None)
 
     log_audit_event({
         "action": "ENTITY_DELETED",
@@ -10,14 +10,14 @@ gst_mode values
   NO_GST      – Unregistered. No GSTIN, no tax on any document.
 
 Call get_org_gst_mode(tenant_id) from any API or service that needs to
-enforce tax behaviour. The result is intentionally NOT cached — it must
-always reflect the current org setting to be legally safe.
+enforce tax behaviour. The profile comes from the tenant settings snapshot
+(utils/tenant_settings.py), which is revalidated against the document's
+_etag before reuse — the result always reflects the current org setting,
+as it must to be legally safe, without re-reading the profile per call.
 """
 
 from __future__ import annotations
 
-from smart_invoice_pro.utils.cosmos_client import settings_container as _settings_container
-
 FULL_GST = "FULL_GST"
 COMPOSITION = "COMPOSITION"
 NO_GST = "NO_GST"
@@ -32,8 +32,14 @@ _REG_TYPE_TO_MODE = {
 
 
 def get_org_gst_mode(tenant_id: str) -> str:
+    """Return the gst_mode for the given tenant (see gst_mode_from_profile)."""
+    from smart_invoice_pro.utils.tenant_settings import get_tenant_settings
+    return get_tenant_settings(tenant_id).gst_mode
+
+
+def gst_mode_from_profile(profile: dict | None) -> str:
     """
-    Return the gst_mode for the given tenant.
+    Resolve gst_mode from an organization_profile document.
 
     Lookup order:
       1. ``gst_mode`` field on org profile (written by migration + settings update)
@@ -41,20 +47,9 @@ def get_org_gst_mode(tenant_id: str) -> str:
       3. Derived from legacy ``gst_enabled`` boolean
       4. Default: FULL_GST (fail-safe for existing Regular tenants)
     """
-    doc_id = f"{tenant_id}:organization_profile"
-    items = list(_settings_container.query_items(
-        query="SELECT * FROM c WHERE c.id = @id AND c.tenant_id = @tid",
-        parameters=[
-            {"name": "@id",  "value": doc_id},
-            {"name": "@tid", "value": tenant_id},
-        ],
-        enable_cross_partition_query=True,
-    ))
-    if not items:
+    if not profile:
         return FULL_GST
 
-    profile = items[0]
-
     # 1. Explicit gst_mode field (post-migration)
     mode = (profile.get("gst_mode") or "").strip().upper()
     if mode in _VALID_MODES:
@@ -0,0 +1,206 @@
+"""
+pdf_cache.py
+============
+Content-addressed store for rendered document PDFs.
+
+Keys are the render fingerprint computed by invoice_generation
+(``pdf_render_fingerprint``): a hash of the rendered document fields, the
+branding snapshot, gst_mode, the logo file and the template version. A
+changed invoice simply hashes to a new key, so entries never need explicit
+invalidation — stale ones just stop being requested and age out.
+
+Objects are stored as ``<tenant_id>/<fingerprint>.pdf``.
+
+Backends
+--------
+  local  – directory on the host (default); shared by every worker process.
+           Writes are atomic (temp file + rename) and the directory is pruned
+           oldest-first once it grows past PDF_CACHE_MAX_MB.
+  blob   – Azure Blob container, shared across hosts
+  off    – no caching; every request renders
+
+Environment
+-----------
+  PDF_CACHE_BACKEND            – "local" (default), "blob" or "off"
+  PDF_CACHE_DIR                – directory for the local backend
+  PDF_CACHE_MAX_MB             – local size budget before pruning (default 512)
+  PDF_CACHE_BLOB_CONTAINER     – blob container name (default "pdf-cache")
+  PDF_CACHE_BLOB_CONNECTION_STRING / AZURE_STORAGE_CONNECTION_STRING
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import tempfile
+import threading
+
+try:
+    from azure.storage.blob import BlobServiceClient, ContentSettings
+except ImportError:  # pragma: no cover - optional for local test runs
+    BlobServiceClient = None
+    ContentSettings = None
+
+logger = logging.getLogger(__name__)
+
+_SAFE_SEGMENT = re.compile(r"[^A-Za-z0-9_.-]")
+_PRUNE_EVERY_WRITES = 50
+
+
+def object_name(tenant_id: str, fingerprint: str) -> str:
+    tenant = _SAFE_SEGMENT.sub("_", str(tenant_id or "_"))
+    return f"{tenant}/{_SAFE_SEGMENT.sub('_', fingerprint)}.pdf"
+
+
+class LocalPdfStore:
+    """PDFs as files under ``root``; reads touch mtime so pruning is LRU-ish."""
+
+    name = "local"
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, tenant_id: str, fingerprint: str) -> str:
+        return os.path.join(self.root, *object_name(tenant_id, fingerprint).split("/"))
+
+    def get(self, tenant_id: str, fingerprint: str) -> bytes | None:
+        path = self._path(tenant_id, fingerprint)
+        try:
+            with open(path, "rb") as fh:
+                data = fh.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, tenant_id: str, fingerprint: str, pdf_bytes: bytes) -> None:
+        path = self._path(tenant_id, fingerprint)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(pdf_bytes)
+            os.replace(tmp, path)
+        except Exception:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        with self._lock:
+            self._writes += 1
+            due = self._writes % _PRUNE_EVERY_WRITES == 0
+        if due:
+            self.prune()
+
+    def prune(self) -> int:
+        """Delete least-recently-used files until the directory fits the budget."""
+        entries = []
+        total = 0
+        for dirpath, _dirs, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        removed = 0
+        for _mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+
+class BlobPdfStore:
+    """PDFs in an Azure Blob container."""
+
+    name = "blob"
+
+    def __init__(self, container_client):
+        self.container_client = container_client
+
+    def get(self, tenant_id: str, fingerprint: str) -> bytes | None:
+        blob = self.container_client.get_blob_client(object_name(tenant_id, fingerprint))
+        try:
+            return blob.download_blob().readall()
+        except Exception as exc:
+            if "BlobNotFound" in str(exc) or getattr(exc, "status_code", None) == 404:
+                return None
+            raise
+
+    def put(self, tenant_id: str, fingerprint: str, pdf_bytes: bytes) -> None:
+        kwargs = {}
+        if ContentSettings is not None:
+            kwargs["content_settings"] = ContentSettings(content_type="application/pdf")
+        self.container_client.upload_blob(
+            name=object_name(tenant_id, fingerprint), data=pdf_bytes, overwrite=True, **kwargs,
+        )
+
+
+def _blob_store():
+    connection_string = (os.getenv("PDF_CACHE_BLOB_CONNECTION_STRING")
+                         or os.getenv("AZURE_STORAGE_CONNECTION_STRING"))
+    if not connection_string or BlobServiceClient is None:
+        logger.warning("[pdf_cache] blob backend requested but not configured; using local directory")
+        return None
+    service = BlobServiceClient.from_connection_string(connection_string)
+    container_client = service.get_container_client(os.getenv("PDF_CACHE_BLOB_CONTAINER", "pdf-cache"))
+    try:
+        container_client.create_container()
+    except Exception:
+        pass
+    return BlobPdfStore(container_client)
+
+
+def _local_store():
+    root = os.getenv("PDF_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "smart_invoice_pro_pdf_cache")
+    try:
+        max_mb = int(os.getenv("PDF_CACHE_MAX_MB", "512"))
+    except ValueError:
+        max_mb = 512
+    return LocalPdfStore(root, max(1, max_mb) * 1024 * 1024)
+
+
+_store_lock = threading.Lock()
+_store = None
+_store_built = False
+
+
+def get_pdf_store():
+    """Return the process-wide store selected by PDF_CACHE_BACKEND, or None when off."""
+    global _store, _store_built
+    with _store_lock:
+        if not _store_built:
+            kind = (os.getenv("PDF_CACHE_BACKEND") or "local").strip().lower()
+            if kind == "off":
+                _store = None
+            elif kind == "blob":
+                _store = _blob_store() or _local_store()
+            else:
+                _store = _local_store()
+            _store_built = True
+        return _store
+
+
+def reset_pdf_store() -> None:
+    """Testing helper — rebuild the store from env on next use."""
+    global _store, _store_built
+    with _store_lock:
+        _store = None
+        _store_built = False
@@ -0,0 +1,257 @@
+"""
+pdf_templates.py
+================
+Compiled ReportLab templates for build_invoice_pdf.
+
+Everything in a document PDF that depends only on the tenant's branding is
+compiled once and reused across renders:
+
+  * the paragraph style sheet (brand-coloured Company/Footer/… styles),
+  * colour objects and the TableStyles for header, info, items and totals,
+  * the logo — read and decoded into an ImageReader once,
+  * static fragments: org-name heading, per-document-type titles, the
+    signature block and the © footer.
+
+The logo is the big win: ReportLab otherwise re-reads the file and decodes
+it for every single document, which dominates render time for tenants with
+a logo. Only ReportLab's public drawing API is used, so each document still
+compresses the cached pixels into its own image XObject.
+
+Templates are keyed by a hash of the branding fields that feed them, the logo
+file's size/mtime and the current year (for the footer), so a branding change
+compiles a fresh template and the old one simply ages out of the LRU.
+
+Compiled templates are shared by every thread in the process. Styles, colours
+and TableStyles are read-only during a build; flowable fragments are handed
+out as shallow copies because ReportLab stores layout state on flowables.
+
+Environment
+-----------
+  PDF_TEMPLATE_CACHE_SIZE  – compiled templates kept per process (default 256)
+"""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import Flowable, Paragraph, Table, TableStyle
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = A4
+PAGE_MARGIN = 40
+FRAME_WIDTH = PAGE_SIZE[0] - 2 * PAGE_MARGIN
+
+COMPOSITION_NOTE = "Composition Taxable Person. Not eligible to collect tax on supplies."
+
+_DEFAULT_ACCENT = "#2d6cdf"
+_DEFAULT_PRIMARY = "#2563EB"
+
+_LOGO_MAX_WIDTH = FRAME_WIDTH * 0.45
+_LOGO_MAX_HEIGHT = 2.5 * cm
+
+
+def _max_templates() -> int:
+    try:
+        return max(1, int(os.getenv("PDF_TEMPLATE_CACHE_SIZE", "256")))
+    except ValueError:
+        return 256
+
+
+def _logo_stamp(logo_path: str | None):
+    if not logo_path:
+        return None
+    try:
+        st = os.stat(logo_path)
+    except OSError:
+        return None
+    return [logo_path, st.st_size, int(st.st_mtime)]
+
+
+def template_key(branding: dict, logo_path: str | None) -> str:
+    """Hash of every input that shapes the compiled template."""
+    its = branding.get("invoice_template_settings") or {}
+    material = {
+        "accent": branding.get("accent_color") or _DEFAULT_ACCENT,
+        "primary": branding.get("primary_color") or _DEFAULT_PRIMARY,
+        "org": (branding.get("organization_name") or "").strip() or "Solidev Books",
+        "show_logo": bool(its.get("show_logo", True)),
+        "show_signature": bool(its.get("show_signature", False)),
+        "logo": _logo_stamp(logo_path) if its.get("show_logo", True) else None,
+        "year": date.today().year,
+    }
+    encoded = json.dumps(material, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class CompiledLogo:
+    """A logo decoded once into a shared ImageReader, plus its drawn size."""
+
+    def __init__(self, logo_path: str):
+        self.reader = ImageReader(logo_path)
+        image_w, image_h = self.reader.getSize()
+        factor = min(_LOGO_MAX_WIDTH / float(image_w), _LOGO_MAX_HEIGHT / float(image_h))
+        self.width = image_w * factor
+        self.height = image_h * factor
+        # Decode now so renders on other threads only read the cached pixels.
+        self.reader.getRGBData()
+
+    def flowable(self) -> Flowable:
+        return _LogoFlowable(self)
+
+
+class _LogoFlowable(Flowable):
+    """Draws a CompiledLogo from its cached ImageReader, alpha channel as a soft mask."""
+
+    def __init__(self, logo: CompiledLogo):
+        super().__init__()
+        self._logo = logo
+
+    def wrap(self, availWidth, availHeight):
+        return self._logo.width, self._logo.height
+
+    def draw(self):
+        self.canv.drawImage(self._logo.reader, 0, 0, self._logo.width, self._logo.height, mask="auto")
+
+
+class CompiledTemplate:
+    """Branding-derived styles, colours, table styles and fragments for one tenant look."""
+
+    def __init__(self, key: str, branding: dict, logo_path: str | None, doc_labels: dict):
+        self.key = key
+        its = branding.get("invoice_template_settings") or {}
+        self.show_logo = bool(its.get("show_logo", True))
+        self.show_signature = bool(its.get("show_signature", False))
+        self.org_name = (branding.get("organization_name") or "").strip() or "Solidev Books"
+        self._doc_labels = doc_labels
+
+        self.accent = colors.HexColor(branding.get("accent_color") or _DEFAULT_ACCENT)
+        primary = colors.HexColor(branding.get("primary_color") or _DEFAULT_PRIMARY)
+        header_fill = primary.clone(alpha=0.08) if hasattr(primary, "clone") else colors.HexColor("#f0f4fa")
+
+        styles = getSampleStyleSheet()
+        for name, kwargs in [
+            ("Company",        dict(fontSize=18, textColor=self.accent, spaceAfter=6, leading=22)),
+            ("DocTitle",       dict(fontSize=16, alignment=2, spaceAfter=20)),
+            ("Footer",         dict(fontSize=9, alignment=1, textColor=colors.grey)),
+            ("SignatureLabel", dict(fontSize=9, textColor=colors.grey)),
+            ("CompositionNote", dict(fontSize=8, textColor=colors.HexColor("#7c3aed"),
+                                     leading=12, borderPad=4)),
+        ]:
+            styles.add(ParagraphStyle(name=name, **kwargs))
+        self.styles = styles
+
+        self.header_style = TableStyle([
+            ("ALIGN",         (1, 0), (1, 0),   "RIGHT"),
+            ("VALIGN",        (0, 0), (-1, -1), "MIDDLE"),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 12),
+        ])
+        self.info_style = TableStyle([
+            ("VALIGN",        (0, 0), (-1, -1), "TOP"),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 12),
+        ])
+        self.items_style = TableStyle([
+            ("BACKGROUND", (0, 0), (-1, 0),  header_fill),
+            ("TEXTCOLOR",  (0, 0), (-1, 0),  self.accent),
+            ("ALIGN",      (1, 0), (-1, -1), "RIGHT"),
+            ("GRID",       (0, 0), (-1, -1), 0.5, colors.grey),
+            ("FONTNAME",   (0, 0), (-1, 0),  "Helvetica-Bold"),
+        ])
+        self.totals_style = TableStyle([
+            ("ALIGN",     (1, 0), (-1, -1), "RIGHT"),
+            ("FONTNAME",  (0, 2), (-1, 2),  "Helvetica-Bold"),
+            ("LINEABOVE", (0, 2), (-1, 2),  1.5, self.accent),
+        ])
+        self.signature_style = TableStyle([
+            ("ALIGN",  (0, 0), (0, 0), "RIGHT"),
+            ("VALIGN", (0, 0), (0, 0), "BOTTOM"),
+        ])
+
+        self.logo = None
+        if self.show_logo and logo_path:
+            try:
+                self.logo = CompiledLogo(logo_path)
+            except Exception as exc:
+                logger.warning("[pdf_templates] could not compile logo %s: %s", logo_path, exc)
+
+        self._fragments = {
+            "org_heading": Paragraph(f"<b>{self.org_name}</b>", styles["Company"]),
+            "signature": Paragraph(
+                f"<b>Authorised Signatory</b><br/><br/><br/>"
+                f"____________________________<br/>"
+                f"{self.org_name}",
+                styles["SignatureLabel"],
+            ),
+            "composition_note": Paragraph(f"<i>Note: {COMPOSITION_NOTE}</i>", styles["CompositionNote"]),
+            "footer": Paragraph(
+                f"© {date.today().year} {self.org_name}. All rights reserved.",
+                styles["Footer"],
+            ),
+        }
+        self._titles = {}
+        self._lock = threading.Lock()
+
+    def fragment(self, name: str) -> Flowable:
+        return copy.copy(self._fragments[name])
+
+    def doc_title(self, doc_type: str) -> Flowable:
+        with self._lock:
+            title = self._titles.get(doc_type)
+            if title is None:
+                label = self._doc_labels.get(doc_type, doc_type.upper())
+                title = Paragraph(f"<b>{label}</b>", self.styles["DocTitle"])
+                self._titles[doc_type] = title
+        return copy.copy(title)
+
+    def header(self, doc_type: str) -> Table:
+        left_cell = self.logo.flowable() if self.logo else self.fragment("org_heading")
+        table = Table([[left_cell, self.doc_title(doc_type)]],
+                      colWidths=[FRAME_WIDTH * 0.5, FRAME_WIDTH * 0.5])
+        table.setStyle(self.header_style)
+        return table
+
+    def signature(self) -> Table:
+        table = Table([[self.fragment("signature")]], colWidths=[FRAME_WIDTH * 0.45])
+        table.setStyle(self.signature_style)
+        return table
+
+
+_templates: "OrderedDict[str, CompiledTemplate]" = OrderedDict()
+_templates_lock = threading.Lock()
+
+
+def get_compiled_template(branding: dict, logo_path: str | None, doc_labels: dict) -> CompiledTemplate:
+    """Return the compiled template for ``branding``, compiling it on first use."""
+    key = template_key(branding, logo_path)
+    with _templates_lock:
+        template = _templates.get(key)
+        if template is not None:
+            _templates.move_to_end(key)
+            return template
+
+    # Compile outside the lock; a concurrent duplicate compile is harmless.
+    template = CompiledTemplate(key, branding, logo_path, doc_labels)
+    with _templates_lock:
+        template = _templates.setdefault(key, template)
+        _templates.move_to_end(key)
+        while len(_templates) > _max_templates():
+            _templates.popitem(last=False)
+    return template
+
+
+def reset_template_cache() -> None:
+    """Testing helper — drop every compiled template."""
+    with _templates_lock:
+        _templates.clear()
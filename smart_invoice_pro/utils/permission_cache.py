@@ -0,0 +1,146 @@
+"""
+permission_cache.py
+===================
+Tenant-aware cache for resolved RBAC permissions.
+
+Two layers sit in front of rbac_resolver.resolve_user_permissions:
+
+1. Request memo on ``flask.g`` — search_api.global_search and other handlers
+   that call check_permission several times resolve the user only once.
+2. Process-level LRU keyed by (tenant_id, user_id) with a short TTL, so a
+   typical API call costs no extra Cosmos round trips for authorization.
+
+Writers that change a user's role/status or a role's permissions must call
+``invalidate_user_permissions`` / ``invalidate_tenant_permissions``. The LRU
+is per worker process; the TTL bounds how long another worker may serve a
+stale entry after an invalidation it did not see.
+
+Environment
+-----------
+  RBAC_CACHE_TTL_SECONDS   – entry lifetime (default 60, 0 disables the LRU)
+  RBAC_CACHE_MAX_ENTRIES   – LRU size bound (default 2048)
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+from flask import g, has_app_context
+
+_G_ATTR = '_rbac_permission_memo'
+
+_lock = threading.Lock()
+_entries: "OrderedDict[tuple[str, str], tuple[float, tuple[bool, dict]]]" = OrderedDict()
+_STATS = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def _ttl_seconds() -> float:
+    try:
+        return max(0.0, float(os.getenv("RBAC_CACHE_TTL_SECONDS", "60")))
+    except ValueError:
+        return 60.0
+
+
+def _max_entries() -> int:
+    try:
+        return max(1, int(os.getenv("RBAC_CACHE_MAX_ENTRIES", "2048")))
+    except ValueError:
+        return 2048
+
+
+def _request_memo() -> dict | None:
+    if not has_app_context():
+        return None
+    memo = getattr(g, _G_ATTR, None)
+    if memo is None:
+        memo = {}
+        setattr(g, _G_ATTR, memo)
+    return memo
+
+
+def get_or_resolve(
+    user_id: str,
+    tenant_id: str,
+    resolver: Callable[[str, str], tuple[bool, dict]],
+) -> tuple[bool, dict]:
+    """Return cached (is_admin, permissions) or call ``resolver`` and cache it."""
+    key = (tenant_id or '', user_id or '')
+
+    memo = _request_memo()
+    if memo is not None and key in memo:
+        return memo[key]
+
+    ttl = _ttl_seconds()
+    now = time.monotonic()
+    if ttl > 0:
+        with _lock:
+            entry = _entries.get(key)
+            if entry and entry[0] > now:
+                _entries.move_to_end(key)
+                _STATS["hits"] += 1
+                if memo is not None:
+                    memo[key] = entry[1]
+                return entry[1]
+            if entry:
+                _entries.pop(key, None)
+            _STATS["misses"] += 1
+
+    result = resolver(user_id, tenant_id)
+
+    if memo is not None:
+        memo[key] = result
+    if ttl > 0:
+        with _lock:
+            _entries[key] = (now + ttl, result)
+            _entries.move_to_end(key)
+            limit = _max_entries()
+            while len(_entries) > limit:
+                _entries.popitem(last=False)
+    return result
+
+
+def invalidate_user_permissions(user_id: str, tenant_id: str | None = None) -> None:
+    """Drop cached permissions for one user (in every tenant when tenant_id is None)."""
+    if not user_id:
+        return
+    with _lock:
+        stale = [k for k in _entries if k[1] == user_id and (tenant_id is None or k[0] == tenant_id)]
+        for k in stale:
+            _entries.pop(k, None)
+        _STATS["invalidations"] += 1
+    memo = _request_memo()
+    if memo:
+        for k in [k for k in memo if k[1] == user_id and (tenant_id is None or k[0] == tenant_id)]:
+            memo.pop(k, None)
+
+
+def invalidate_tenant_permissions(tenant_id: str) -> None:
+    """Drop cached permissions for every user of a tenant (role edits)."""
+    if not tenant_id:
+        return
+    with _lock:
+        stale = [k for k in _entries if k[0] == tenant_id]
+        for k in stale:
+            _entries.pop(k, None)
+        _STATS["invalidations"] += 1
+    memo = _request_memo()
+    if memo:
+        for k in [k for k in memo if k[0] == tenant_id]:
+            memo.pop(k, None)
+
+
+def clear_permission_cache() -> None:
+    """Testing helper — reset the process-level cache and counters."""
+    with _lock:
+        _entries.clear()
+        for k in _STATS:
+            _STATS[k] = 0
+
+
+def permission_cache_stats() -> dict:
+    with _lock:
+        return {**_STATS, "size": len(_entries)}
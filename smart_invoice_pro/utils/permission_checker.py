@@ -15,7 +15,8 @@ def create_invoice():
 How it works
 ------------
 1. Reads request.user_id (set by auth_middleware.enforce_api_auth)
-2. Resolves user + role via rbac_resolver.resolve_user_permissions
+2. Resolves user + role via rbac_resolver.resolve_user_permissions, memoized
+   per request and per process by utils.permission_cache
 3. Admin (by role string OR Admin role document via role_id) always passes
 4. Returns 403 if permission is False or missing
 """
@@ -27,14 +28,15 @@ from functools import wraps
 
 from flask import jsonify, request
 
+from smart_invoice_pro.utils.permission_cache import get_or_resolve
 from smart_invoice_pro.utils.rbac_resolver import resolve_user_permissions
 
 logger = logging.getLogger(__name__)
 
 
 def _get_user_permissions(user_id: str, tenant_id: str) -> tuple[bool, dict]:
-    """Backward-compatible wrapper around the shared RBAC resolver."""
-    return resolve_user_permissions(user_id, tenant_id)
+    """Backward-compatible wrapper around the shared (cached) RBAC resolver."""
+    return get_or_resolve(user_id, tenant_id, resolve_user_permissions)
 
 
 def require_permission(module: str, action: str):
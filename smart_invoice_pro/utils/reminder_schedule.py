@@ -0,0 +1,303 @@
+"""
+reminder_schedule.py
+====================
+Precomputed payment-reminder schedule ("reminder_due" container, partition
+/fire_date), so the daily reminder job reads one partition — the reminders
+that fire today — instead of scanning every open invoice of every tenant.
+
+One document per (invoice, reminder rule):
+
+{
+    "id":            "<invoice_id>:after_due:3",
+    "fire_date":     "2026-10-20",              # partition key
+    "tenant_id":     "...",
+    "invoice_id":    "...",
+    "customer_id":   "...",                     # invoices partition key, for the point read
+    "due_date":      "2026-10-17",
+    "reminder_type": "before_due" | "on_due" | "after_due",
+    "days_offset":   3
+}
+
+Maintenance
+-----------
+  * every invoice write site calls ``record_invoice_write(before, after)`` next
+    to ``record_rollup_change("invoice", ...)``: when the invoice becomes remindable
+    (Issued / Partially Paid with a balance), its due date moves or it stops
+    being remindable, the affected entries are deleted and re-planned from the
+    tenant's reminder config (automation_settings → legacy reminder_settings →
+    defaults). Writes that change none of that cost nothing.
+  * saving automation settings queues ``rebuild_tenant_schedule`` on the job
+    queue, which re-plans the tenant's open invoices.
+  * ``POST /api/cron/rebuild-reminder-schedule`` rebuilds every tenant — run
+    once after deploy to index invoices issued before the schedule existed.
+
+Entries are hints, not truth: the daily job re-reads each invoice and checks
+it is still open, still due on the planned date, still covered by the
+tenant's config and not already reminded before sending.
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import date, timedelta
+
+from azure.cosmos import exceptions
+
+from smart_invoice_pro.utils.cosmos_client import (
+    invoices_container,
+    reminder_due_container,
+    settings_container,
+    tenants_container,
+)
+from smart_invoice_pro.utils.job_queue import enqueue_job, register_job_kind
+
+logger = logging.getLogger(__name__)
+
+REBUILD_JOB_KIND = "reminder_schedule_rebuild"
+
+# Statuses that should receive reminders
+REMINDER_STATUSES = {'Issued', 'Partially Paid'}
+
+DEFAULT_REMINDER_CONFIG = {
+    'reminders_enabled': True,
+    'before_due_days':   [3],
+    'after_due_days':    [1, 3, 7],
+    'on_due_enabled':    True,
+}
+
+
+# ── Tenant config ─────────────────────────────────────────────────────────────
+
+def config_from_automation(doc: dict) -> dict:
+    """Internal reminder config from an ``automation_settings`` document."""
+    before_days: list[int] = []
+    after_days: list[int] = []
+    on_due_enabled = False
+    for r in doc.get('payment_reminders', []):
+        if not r.get('enabled', True):
+            continue
+        rtype = r.get('type')
+        days = int(r.get('days', 0))
+        if rtype == 'before_due' and days > 0:
+            before_days.append(days)
+        elif rtype == 'after_due' and days > 0:
+            after_days.append(days)
+        elif rtype == 'on_due':
+            on_due_enabled = True
+    return {
+        'reminders_enabled': doc.get('email_enabled', True),
+        'before_due_days':   before_days,
+        'after_due_days':    after_days,
+        'on_due_enabled':    on_due_enabled,
+    }
+
+
+def load_legacy_config(tenant_id: str) -> dict:
+    """Legacy ``reminder_settings`` document, else the defaults."""
+    items = list(settings_container.query_items(
+        query="SELECT * FROM c WHERE c.id = @id AND c.tenant_id = @tid",
+        parameters=[
+            {"name": "@id",  "value": f"{tenant_id}:reminder_settings"},
+            {"name": "@tid", "value": tenant_id},
+        ],
+        enable_cross_partition_query=True
+    ))
+    if items:
+        cfg = items[0]
+        cfg.setdefault('on_due_enabled', False)
+        return cfg
+    return dict(DEFAULT_REMINDER_CONFIG)
+
+
+def reminder_config(tenant_id: str) -> dict:
+    """The tenant's reminder config, via the cached settings snapshot."""
+    from smart_invoice_pro.utils.tenant_settings import get_tenant_settings
+
+    automation = get_tenant_settings(tenant_id).automation
+    if automation:
+        return config_from_automation(automation)
+    return load_legacy_config(tenant_id)
+
+
+def reminder_rules(cfg: dict) -> list[tuple[str, int, int]]:
+    """(reminder_type, days_offset, days relative to the due date) for each enabled rule."""
+    if not cfg.get('reminders_enabled', True):
+        return []
+    rules = [('before_due', int(d), -int(d)) for d in cfg.get('before_due_days', [])]
+    if cfg.get('on_due_enabled', False):
+        rules.append(('on_due', 0, 0))
+    rules += [('after_due', int(d), int(d)) for d in cfg.get('after_due_days', [])]
+    return rules
+
+
+# ── Planning ──────────────────────────────────────────────────────────────────
+
+def _due_date(invoice: dict | None) -> date | None:
+    try:
+        return date.fromisoformat(str((invoice or {}).get('due_date') or '')[:10])
+    except ValueError:
+        return None
+
+
+def is_remindable(invoice: dict | None) -> bool:
+    if not invoice or invoice.get('status') not in REMINDER_STATUSES:
+        return False
+    balance = invoice.get('balance_due')
+    return (balance is None or float(balance) > 0) and _due_date(invoice) is not None
+
+
+def _schedule_key(invoice: dict | None):
+    if not is_remindable(invoice):
+        return None
+    return (invoice.get('tenant_id'), invoice.get('id'), invoice.get('customer_id'), _due_date(invoice))
+
+
+def plan_reminders(invoice: dict, cfg: dict, today: date | None = None) -> list[dict]:
+    """Schedule entries for the invoice's reminders that fire today or later."""
+    if not is_remindable(invoice):
+        return []
+    due = _due_date(invoice)
+    today = today or date.today()
+    entries = []
+    for reminder_type, offset, delta in reminder_rules(cfg):
+        fire = due + timedelta(days=delta)
+        if fire < today:
+            continue
+        entries.append({
+            'id':            f"{invoice['id']}:{reminder_type}:{offset}",
+            'fire_date':     fire.isoformat(),
+            'tenant_id':     invoice.get('tenant_id'),
+            'invoice_id':    invoice['id'],
+            'customer_id':   invoice.get('customer_id'),
+            'due_date':      due.isoformat(),
+            'reminder_type': reminder_type,
+            'days_offset':   offset,
+        })
+    return entries
+
+
+def _delete_entry(entry: dict) -> None:
+    try:
+        reminder_due_container.delete_item(item=entry['id'], partition_key=entry['fire_date'])
+    except exceptions.CosmosResourceNotFoundError:
+        pass
+
+
+def sync_reminder_schedule(before: dict | None, after: dict | None) -> None:
+    """
+    Re-plan one invoice's reminders after a write. A no-op unless the write
+    changes whether the invoice is remindable or when it is due. Best-effort.
+    """
+    try:
+        old_key, new_key = _schedule_key(before), _schedule_key(after)
+        if old_key == new_key:
+            return
+        tenant_id = (after or before).get('tenant_id')
+        if not tenant_id:
+            return
+        cfg = reminder_config(tenant_id)
+        old_entries = plan_reminders(before, cfg) if old_key else []
+        new_entries = plan_reminders(after, cfg) if new_key else []
+        keep = {(e['id'], e['fire_date']) for e in new_entries}
+        had = {(e['id'], e['fire_date']) for e in old_entries}
+        for entry in old_entries:
+            if (entry['id'], entry['fire_date']) not in keep:
+                _delete_entry(entry)
+        for entry in new_entries:
+            if (entry['id'], entry['fire_date']) not in had:
+                reminder_due_container.upsert_item(body=entry)
+    except Exception as exc:
+        logger.warning("[reminder_schedule] sync failed for invoice %s: %s",
+                       (after or before or {}).get('id'), exc)
+
+
+def record_invoice_write(before: dict | None, after: dict | None) -> None:
+    """
+    Invoice write-site hook (create, update, archive, restore, delete): keeps
+    the invoice's reminder schedule in step. Never raises.
+    """
+    try:
+        sync_reminder_schedule(before, after)
+    except Exception as exc:
+        logger.warning("[reminder_schedule] invoice write hook failed: %s", exc)
+
+
+# ── Reads ─────────────────────────────────────────────────────────────────────
+
+def due_entries(fire_date: date, tenant_id: str | None = None) -> list[dict]:
+    """Entries firing on ``fire_date`` — a single-partition query."""
+    query = "SELECT * FROM c"
+    parameters = []
+    if tenant_id:
+        query += " WHERE c.tenant_id = @tid"
+        parameters.append({"name": "@tid", "value": tenant_id})
+    return list(reminder_due_container.query_items(
+        query=query, parameters=parameters, partition_key=fire_date.isoformat(),
+    ))
+
+
+def tenants_due(fire_date: date) -> list[str]:
+    return list(reminder_due_container.query_items(
+        query="SELECT DISTINCT VALUE c.tenant_id FROM c",
+        partition_key=fire_date.isoformat(),
+    ))
+
+
+def remove_entry(entry: dict) -> None:
+    _delete_entry(entry)
+
+
+# ── Rebuilds ──────────────────────────────────────────────────────────────────
+
+def rebuild_tenant_schedule(tenant_id: str, today: date | None = None) -> dict:
+    """Drop the tenant's pending entries and re-plan every open invoice."""
+    today = today or date.today()
+    removed = 0
+    for entry in reminder_due_container.query_items(
+        query="SELECT c.id, c.fire_date FROM c WHERE c.tenant_id = @tid AND c.fire_date >= @today",
+        parameters=[{"name": "@tid", "value": tenant_id}, {"name": "@today", "value": today.isoformat()}],
+        enable_cross_partition_query=True,
+    ):
+        _delete_entry(entry)
+        removed += 1
+
+    cfg = reminder_config(tenant_id)
+    invoices = invoices_container.query_items(
+        query=(
+            "SELECT * FROM c WHERE c.tenant_id = @tid AND c.status IN ('Issued', 'Partially Paid') "
+            "AND (c.balance_due > 0 OR NOT IS_DEFINED(c.balance_due))"
+        ),
+        parameters=[{"name": "@tid", "value": tenant_id}],
+        enable_cross_partition_query=True,
+    )
+    planned = 0
+    for invoice in invoices:
+        for entry in plan_reminders(invoice, cfg, today):
+            reminder_due_container.upsert_item(body=entry)
+            planned += 1
+    return {"tenant_id": tenant_id, "removed": removed, "planned": planned}
+
+
+def rebuild_all_schedules() -> list[dict]:
+    """Rebuild every tenant's schedule. Returns a per-tenant summary list."""
+    results = []
+    for tenant in tenants_container.query_items(
+        query="SELECT c.id FROM c", enable_cross_partition_query=True,
+    ):
+        try:
+            results.append(rebuild_tenant_schedule(tenant["id"]))
+        except Exception as exc:
+            logger.error("[reminder_schedule] rebuild failed for %s: %s", tenant["id"], exc)
+            results.append({"tenant_id": tenant["id"], "error": str(exc)})
+    return results
+
+
+def queue_tenant_rebuild(tenant_id: str) -> None:
+    """Re-plan the tenant's schedule in the background (after a config change)."""
+    try:
+        enqueue_job(REBUILD_JOB_KIND, tenant_id, {})
+    except Exception as exc:
+        logger.warning("[reminder_schedule] could not queue rebuild for %s: %s", tenant_id, exc)
+
+
+register_job_kind(REBUILD_JOB_KIND, lambda payload, message: rebuild_tenant_schedule(message["tenant_id"]))
@@ -0,0 +1,321 @@
+"""
+report_snapshots.py
+===================
+Frozen per-month partial results for period reports (P&L, cash flow, sales
+summary, GST summary).
+
+Container: "report_snapshots", partition: /tenant_id
+
+Snapshot document (one per tenant, report and closed calendar month)
+{
+    "id":          "<tenant_id>:profit_loss:2025-03",
+    "tenant_id":   "<tenant_id>",
+    "report":      "profit_loss",
+    "month":       "2025-03",
+    "version":     1,
+    "generation":  3,              # the month's generation it was computed at
+    "partial":     {...},          # report-specific, additive across months
+    "computed_at": "..."
+}
+
+Generation document (one per tenant and invalidated month)
+{
+    "id":          "<tenant_id>:generation:2025-03",
+    "tenant_id":   "<tenant_id>",
+    "doc_type":    "generation",
+    "month":       "2025-03",
+    "generation":  3               # bumped by every invalidation of the month
+}
+
+A report describes its inputs as ``SnapshotSource`` objects and supplies a
+``build_partial(rows_by_source)`` function. ``compute_period_report`` splits
+the requested range into calendar months; every fully covered month that
+ended before the current month is served from its snapshot (computed and
+frozen on first use). Partial months at the edges and the current month are
+computed live. Missing months are read in one query per source, all run
+concurrently through report_queries. Partials merge by adding numbers and
+recursing into dicts.
+
+Writers invalidate through ``invalidate_report_snapshots(tenant_id, months)``,
+which dashboard_rollups.record_rollup_change calls with the months of the
+before/after documents, so a backdated invoice, bill or expense unfreezes
+the months it touches. Invalidation bumps the month's generation; a snapshot
+is only served while its generation is still the month's current one, so a
+report that read the month before a write and saved it after is ignored
+rather than frozen stale. As a safety net, snapshots older than
+REPORT_SNAPSHOT_MAX_AGE_DAYS are recomputed.
+
+Environment
+-----------
+  REPORT_SNAPSHOTS_ENABLED       – "false" computes every month live (default on)
+  REPORT_SNAPSHOT_MAX_AGE_DAYS   – refresh frozen months after N days (default 30, 0 = never)
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Mapping
+
+from azure.cosmos import exceptions
+
+from smart_invoice_pro.utils.cosmos_client import report_snapshots_container
+from smart_invoice_pro.utils.report_queries import ReportQuery, run_report_queries
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+# Document date fields that place invoices/bills/expenses into a report month.
+SNAPSHOT_DATE_FIELDS = {
+    "invoice": ("issue_date",),
+    "bill": ("bill_date",),
+    "expense": ("expense_date",),
+}
+
+
+@dataclass(frozen=True)
+class SnapshotSource:
+    """One input of a period report, bucketed into months by ``date_field``."""
+
+    container: Any
+    fields: tuple[str, ...]
+    date_field: str
+    where: str = ""
+    parameters: Mapping[str, Any] = field(default_factory=dict)
+
+
+def snapshots_enabled() -> bool:
+    return os.getenv("REPORT_SNAPSHOTS_ENABLED", "true").strip().lower() not in ("0", "false", "no")
+
+
+def _max_age_days() -> int:
+    try:
+        return max(0, int(os.getenv("REPORT_SNAPSHOT_MAX_AGE_DAYS", "30")))
+    except ValueError:
+        return 30
+
+
+def _snapshot_id(tenant_id: str, report: str, month: str) -> str:
+    return f"{tenant_id}:{report}:{month}"
+
+
+def _generation_id(tenant_id: str, month: str) -> str:
+    return f"{tenant_id}:generation:{month}"
+
+
+def _utc_month() -> str:
+    return datetime.utcnow().strftime("%Y-%m")
+
+
+def _month_segments(start: date, end: date) -> list[tuple[str, date, date, bool]]:
+    """Split [start, end] into (month, seg_start, seg_end, covers_whole_month)."""
+    segments = []
+    cursor = date(start.year, start.month, 1)
+    while cursor <= end:
+        next_month = date(cursor.year + (cursor.month == 12), cursor.month % 12 + 1, 1)
+        month_end = next_month - timedelta(days=1)
+        seg_start, seg_end = max(start, cursor), min(end, month_end)
+        segments.append((cursor.strftime("%Y-%m"), seg_start, seg_end,
+                         seg_start == cursor and seg_end == month_end))
+        cursor = next_month
+    return segments
+
+
+def merge_partials(target: dict, partial: dict) -> dict:
+    """Add ``partial`` into ``target``: numbers sum, dicts recurse, others overwrite."""
+    for key, value in partial.items():
+        current = target.get(key)
+        if isinstance(value, dict):
+            target[key] = merge_partials(dict(current) if isinstance(current, dict) else {}, value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) \
+                and isinstance(current, (int, float)) and not isinstance(current, bool):
+            target[key] = current + value
+        else:
+            target[key] = value
+    return target
+
+
+def _load_snapshots(tenant_id: str, report: str,
+                    months: list[str]) -> tuple[dict[str, dict], dict[str, int] | None]:
+    """Return (current snapshots by month, generation by month); generations are None if unreadable."""
+    if not months:
+        return {}, {}
+    try:
+        docs = list(report_snapshots_container.query_items(
+            query=(
+                "SELECT c.month, c.partial, c.computed_at, c.generation, c.doc_type FROM c "
+                "WHERE c.tenant_id = @tenant_id AND ARRAY_CONTAINS(@months, c.month) "
+                "AND ((c.report = @report AND c.version = @version) OR c.doc_type = 'generation')"
+            ),
+            parameters=[
+                {"name": "@tenant_id", "value": tenant_id},
+                {"name": "@report", "value": report},
+                {"name": "@version", "value": SNAPSHOT_VERSION},
+                {"name": "@months", "value": months},
+            ],
+            partition_key=tenant_id,
+        ))
+        generations = {
+            doc["month"]: int(doc.get("generation") or 0)
+            for doc in docs if doc.get("doc_type") == "generation"
+        }
+        max_age = _max_age_days()
+        cutoff = (datetime.utcnow() - timedelta(days=max_age)).isoformat() if max_age else ""
+        frozen = {
+            doc["month"]: doc["partial"]
+            for doc in docs
+            if isinstance(doc.get("partial"), dict) and (doc.get("computed_at") or "") >= cutoff
+            and int(doc.get("generation") or 0) == generations.get(doc["month"], 0)
+        }
+        return frozen, generations
+    except Exception as exc:
+        logger.warning("[report_snapshots] load failed for %s/%s: %s", tenant_id, report, exc)
+        return {}, None
+
+
+def _save_snapshot(tenant_id: str, report: str, month: str, partial: dict, generation: int) -> None:
+    try:
+        report_snapshots_container.upsert_item(body={
+            "id": _snapshot_id(tenant_id, report, month),
+            "tenant_id": tenant_id,
+            "report": report,
+            "month": month,
+            "version": SNAPSHOT_VERSION,
+            "generation": generation,
+            "partial": partial,
+            "computed_at": datetime.utcnow().isoformat(),
+        })
+    except Exception as exc:
+        logger.warning("[report_snapshots] save failed for %s/%s/%s: %s", tenant_id, report, month, exc)
+
+
+def compute_period_report(
+    tenant_id: str,
+    report: str,
+    sources: Mapping[str, SnapshotSource],
+    start: date,
+    end: date,
+    build_partial: Callable[[dict[str, list[dict]]], dict],
+    today: date | None = None,
+) -> dict:
+    """Return the merged partial for [start, end], reusing frozen closed months."""
+    today = today or datetime.utcnow().date()
+    current_month = today.strftime("%Y-%m")
+    segments = _month_segments(start, end)
+    use_snapshots = snapshots_enabled()
+
+    frozen_months = [
+        month for month, _, _, whole in segments if whole and month < current_month
+    ] if use_snapshots else []
+    # Generations are read before any month is computed: an invalidation
+    # racing the computation leaves the saved snapshot a generation behind.
+    frozen, generations = _load_snapshots(tenant_id, report, frozen_months)
+
+    live = [seg for seg in segments if seg[0] not in frozen]
+    rows_by_month: dict[str, dict[str, list[dict]]] = {
+        month: {name: [] for name in sources} for month, _, _, _ in live
+    }
+    if live:
+        range_start = min(seg[1] for seg in live).strftime("%Y-%m-%d")
+        range_end = max(seg[2] for seg in live).strftime("%Y-%m-%d")
+        queries = {}
+        for name, src in sources.items():
+            where = (
+                f"c.tenant_id = @tenant_id AND c.{src.date_field} >= @start "
+                f"AND c.{src.date_field} <= @end"
+            )
+            if src.where:
+                where += f" AND {src.where}"
+            fields = src.fields if src.date_field in src.fields else src.fields + (src.date_field,)
+            queries[name] = ReportQuery(
+                src.container, fields, where,
+                {**src.parameters, "@tenant_id": tenant_id, "@start": range_start, "@end": range_end},
+            )
+        bounds = {month: (s.strftime("%Y-%m-%d"), e.strftime("%Y-%m-%d")) for month, s, e, _ in live}
+        for name, rows in run_report_queries(queries).items():
+            date_field = sources[name].date_field
+            for row in rows:
+                value = str(row.get(date_field) or "")
+                month = value[:7]
+                if month in bounds and bounds[month][0] <= value <= bounds[month][1]:
+                    rows_by_month[month][name].append(row)
+
+    merged: dict = {}
+    for month, _, _, whole in segments:
+        if month in frozen:
+            partial = frozen[month]
+        else:
+            partial = build_partial(rows_by_month[month])
+            if use_snapshots and whole and month < current_month and generations is not None:
+                _save_snapshot(tenant_id, report, month, partial, generations.get(month, 0))
+        merge_partials(merged, partial)
+    if not segments:
+        merge_partials(merged, build_partial({name: [] for name in sources}))
+    return merged
+
+
+def document_months(kind: str, *docs: dict | None) -> set[str]:
+    """Months (YYYY-MM) that the given invoice/bill/expense versions fall into."""
+    months = set()
+    for doc in docs:
+        if not doc:
+            continue
+        for field_name in SNAPSHOT_DATE_FIELDS.get(kind, ()):
+            value = str(doc.get(field_name) or "")
+            if len(value) >= 7:
+                months.add(value[:7])
+    return months
+
+
+def _bump_generation(tenant_id: str, month: str) -> None:
+    doc_id = _generation_id(tenant_id, month)
+    ops = [{"op": "incr", "path": "/generation", "value": 1}]
+    try:
+        report_snapshots_container.patch_item(item=doc_id, partition_key=tenant_id, patch_operations=ops)
+        return
+    except exceptions.CosmosResourceNotFoundError:
+        pass
+    try:
+        report_snapshots_container.create_item(body={
+            "id": doc_id,
+            "tenant_id": tenant_id,
+            "doc_type": "generation",
+            "month": month,
+            "generation": 1,
+        })
+    except exceptions.CosmosResourceExistsError:
+        # Another writer created it first — fall back to the increment.
+        report_snapshots_container.patch_item(item=doc_id, partition_key=tenant_id, patch_operations=ops)
+
+
+def invalidate_report_snapshots(tenant_id: str, months) -> int:
+    """
+    Bump the given closed months' generations and delete every report's
+    snapshots for them; returns the number deleted. Never raises.
+    """
+    months = sorted(m for m in months or () if m and m < _utc_month())
+    if not tenant_id or not months:
+        return 0
+    removed = 0
+    try:
+        for month in months:
+            _bump_generation(tenant_id, month)
+        for doc in report_snapshots_container.query_items(
+            query=(
+                "SELECT c.id FROM c WHERE c.tenant_id = @tenant_id "
+                "AND ARRAY_CONTAINS(@months, c.month) AND IS_DEFINED(c.report)"
+            ),
+            parameters=[
+                {"name": "@tenant_id", "value": tenant_id},
+                {"name": "@months", "value": months},
+            ],
+            partition_key=tenant_id,
+        ):
+            report_snapshots_container.delete_item(item=doc["id"], partition_key=tenant_id)
+            removed += 1
+    except Exception as exc:
+        logger.warning("[report_snapshots] invalidate failed for %s %s: %s", tenant_id, months, exc)
+    return removed
@@ -0,0 +1,357 @@
+"""
+scheduler_leases.py
+===================
+Leader election and run records for the background scheduler.
+
+Every gunicorn worker on every instance starts the APScheduler, but a
+scheduled job only runs in the process holding the leader lease, and only
+if it can claim the run record for its idempotency key
+(``<job id>:<scheduled date>``). The run record is the exactly-once guard —
+it holds even when leadership changes hands mid-run — while the lease keeps
+non-leaders from doing any work at all.
+
+Leader lease
+------------
+  cosmos  – one document per lease name in "scheduler_leases" (partition /id),
+            renewed by ETag-conditioned replaces; a crashed leader's lease
+            expires after SCHEDULER_LEASE_SECONDS and another process takes over
+  file    – exclusive flock on a local file; single-host deployments
+  none    – every process is the leader (single-process development)
+
+Run record
+{
+    "id":           "recurring_invoice_job:2026-10-17",   # idempotency key
+    "job_id":       "recurring_invoice_job",
+    "run_key":      "2026-10-17",
+    "status":       "running" | "completed" | "dispatched" | "failed",
+    "owner":        "<host:pid>",
+    "attempts":     1,
+    "started_at":   1760659500.0,
+    "finished_at":  1760659560.0 | null,
+    "result":       {...} | null,
+    "error":        null
+}
+
+A record left "failed", or "running" for longer than SCHEDULER_RUN_STALE_SECONDS
+(its owner died), can be claimed again; a "completed" or "dispatched" one never.
+
+Environment
+-----------
+  SCHEDULER_LEADER_BACKEND     – "cosmos" (default), "file" or "none"
+  SCHEDULER_LEASE_SECONDS      – lease time to live (default 60)
+  SCHEDULER_LEASE_PATH         – lock file for the file backend
+  SCHEDULER_RUNS_SQLITE_PATH   – run records for the file/none backends
+  SCHEDULER_RUN_STALE_SECONDS  – when a "running" record may be taken over (default 21600)
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+
+from azure.core import MatchConditions
+from azure.cosmos import exceptions
+
+from smart_invoice_pro.utils.cosmos_client import scheduler_leases_container, scheduler_runs_container
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX hosts
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+RUN_RUNNING = "running"
+RUN_COMPLETED = "completed"
+RUN_DISPATCHED = "dispatched"
+RUN_FAILED = "failed"
+_FINAL = {RUN_COMPLETED, RUN_DISPATCHED}
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def process_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _strip(doc: dict) -> dict:
+    return {k: v for k, v in doc.items() if not k.startswith("_") or k == "_etag"}
+
+
+# ── Leader lease ──────────────────────────────────────────────────────────────
+
+class CosmosLeaderLease:
+    """Lease document renewed with ETag-conditioned replaces."""
+
+    name = "cosmos"
+
+    def __init__(self, lease_name: str = "scheduler", owner: str | None = None,
+                 ttl_seconds: float | None = None, container=None):
+        self.lease_name = lease_name
+        self.owner = owner or process_id()
+        self.ttl = ttl_seconds or max(5, _env_int("SCHEDULER_LEASE_SECONDS", 60))
+        self._container = container
+        self._expires_at = 0.0
+
+    @property
+    def container(self):
+        return self._container if self._container is not None else scheduler_leases_container
+
+    def is_leader(self) -> bool:
+        return time.time() < self._expires_at
+
+    def try_acquire(self) -> bool:
+        """Acquire the lease if it is free or expired, or renew it if held. Returns leadership."""
+        now = time.time()
+        body = {"id": self.lease_name, "owner": self.owner, "expires_at": now + self.ttl, "renewed_at": now}
+        try:
+            current = self.container.read_item(item=self.lease_name, partition_key=self.lease_name)
+        except exceptions.CosmosResourceNotFoundError:
+            try:
+                self.container.create_item(body=body)
+            except exceptions.CosmosResourceExistsError:
+                self._expires_at = 0.0
+                return False
+            self._expires_at = body["expires_at"]
+            return True
+
+        if current.get("owner") != self.owner and current.get("expires_at", 0) > now:
+            self._expires_at = 0.0
+            return False
+        try:
+            self.container.replace_item(
+                item=self.lease_name, body=body,
+                etag=current.get("_etag"), match_condition=MatchConditions.IfNotModified,
+            )
+        except exceptions.CosmosAccessConditionFailedError:
+            self._expires_at = 0.0
+            return False
+        if current.get("owner") != self.owner:
+            logger.info("[scheduler] %s became leader for %r", self.owner, self.lease_name)
+        self._expires_at = body["expires_at"]
+        return True
+
+    def release(self) -> None:
+        if not self.is_leader():
+            return
+        self._expires_at = 0.0
+        try:
+            current = self.container.read_item(item=self.lease_name, partition_key=self.lease_name)
+            if current.get("owner") == self.owner:
+                self.container.replace_item(
+                    item=self.lease_name, body=dict(_strip(current), expires_at=0),
+                    etag=current.get("_etag"), match_condition=MatchConditions.IfNotModified,
+                )
+        except Exception as exc:
+            logger.warning("[scheduler] lease release failed: %s", exc)
+
+
+class FileLeaderLease:
+    """Exclusive flock held for the life of the process; single host only."""
+
+    name = "file"
+
+    def __init__(self, path: str, owner: str | None = None):
+        self.path = path
+        self.owner = owner or process_id()
+        self._fd = None
+
+    def is_leader(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        if fcntl is None:
+            logger.warning("[scheduler] file leases need fcntl; running as leader")
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, self.owner.encode())
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+class NoLeaderLease:
+    """Every process leads — only for a single scheduler process."""
+
+    name = "none"
+    owner = process_id()
+
+    def is_leader(self) -> bool:
+        return True
+
+    def try_acquire(self) -> bool:
+        return True
+
+    def release(self) -> None:
+        pass
+
+
+# ── Run records ───────────────────────────────────────────────────────────────
+
+def _new_run(job_id: str, run_key: str, owner: str, attempts: int) -> dict:
+    return {
+        "id": f"{job_id}:{run_key}",
+        "job_id": job_id,
+        "run_key": run_key,
+        "status": RUN_RUNNING,
+        "owner": owner,
+        "attempts": attempts,
+        "started_at": time.time(),
+        "finished_at": None,
+        "result": None,
+        "error": None,
+    }
+
+
+def _claimable(existing: dict) -> bool:
+    if existing.get("status") in _FINAL:
+        return False
+    if existing.get("status") == RUN_FAILED:
+        return True
+    stale = max(60, _env_int("SCHEDULER_RUN_STALE_SECONDS", 21600))
+    return time.time() - float(existing.get("started_at") or 0) > stale
+
+
+class CosmosRunLedger:
+    """Run records in "scheduler_runs" (partition /job_id); the id is the idempotency key."""
+
+    name = "cosmos"
+
+    def __init__(self, container=None):
+        self._container = container
+
+    @property
+    def container(self):
+        return self._container if self._container is not None else scheduler_runs_container
+
+    def claim(self, job_id: str, run_key: str, owner: str) -> dict | None:
+        record = _new_run(job_id, run_key, owner, attempts=1)
+        try:
+            self.container.create_item(body=record)
+            return record
+        except exceptions.CosmosResourceExistsError:
+            pass
+        existing = self.container.read_item(item=record["id"], partition_key=job_id)
+        if not _claimable(existing):
+            return None
+        record["attempts"] = int(existing.get("attempts") or 1) + 1
+        try:
+            self.container.replace_item(
+                item=record["id"], body=record,
+                etag=existing.get("_etag"), match_condition=MatchConditions.IfNotModified,
+            )
+        except exceptions.CosmosAccessConditionFailedError:
+            return None
+        return record
+
+    def finish(self, record: dict) -> None:
+        self.container.upsert_item(body=record)
+
+    def get(self, job_id: str, run_key: str) -> dict | None:
+        try:
+            return _strip(self.container.read_item(item=f"{job_id}:{run_key}", partition_key=job_id))
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+
+
+class SQLiteRunLedger:
+    """Single-host stand-in; the claim is one conditional INSERT/UPDATE."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS scheduler_runs ("
+            " id TEXT PRIMARY KEY, status TEXT NOT NULL, started_at REAL NOT NULL, doc TEXT NOT NULL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def claim(self, job_id: str, run_key: str, owner: str) -> dict | None:
+        record = _new_run(job_id, run_key, owner, attempts=1)
+        conn = self._conn()
+        try:
+            conn.execute("INSERT INTO scheduler_runs (id, status, started_at, doc) VALUES (?, ?, ?, ?)",
+                         (record["id"], record["status"], record["started_at"], json.dumps(record)))
+            return record
+        except sqlite3.IntegrityError:
+            pass
+        row = conn.execute("SELECT doc FROM scheduler_runs WHERE id = ?", (record["id"],)).fetchone()
+        existing = json.loads(row[0])
+        if not _claimable(existing):
+            return None
+        record["attempts"] = int(existing.get("attempts") or 1) + 1
+        cur = conn.execute(
+            "UPDATE scheduler_runs SET status = ?, started_at = ?, doc = ? "
+            "WHERE id = ? AND status = ? AND started_at = ?",
+            (record["status"], record["started_at"], json.dumps(record),
+             record["id"], existing["status"], existing["started_at"]),
+        )
+        return record if cur.rowcount == 1 else None
+
+    def finish(self, record: dict) -> None:
+        self._conn().execute("UPDATE scheduler_runs SET status = ?, doc = ? WHERE id = ?",
+                             (record["status"], json.dumps(record), record["id"]))
+
+    def get(self, job_id: str, run_key: str) -> dict | None:
+        row = self._conn().execute("SELECT doc FROM scheduler_runs WHERE id = ?",
+                                   (f"{job_id}:{run_key}",)).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+def _backend() -> str:
+    return (os.getenv("SCHEDULER_LEADER_BACKEND") or "cosmos").strip().lower()
+
+
+def build_leader_lease(lease_name: str = "scheduler"):
+    """A fresh lease handle for this process, per SCHEDULER_LEADER_BACKEND."""
+    kind = _backend()
+    if kind == "file":
+        path = os.getenv("SCHEDULER_LEASE_PATH") or os.path.join(
+            tempfile.gettempdir(), f"smart_invoice_pro_{lease_name}.lock"
+        )
+        return FileLeaderLease(path)
+    if kind == "none":
+        return NoLeaderLease()
+    return CosmosLeaderLease(lease_name)
+
+
+def build_run_ledger():
+    if _backend() == "cosmos":
+        return CosmosRunLedger()
+    path = os.getenv("SCHEDULER_RUNS_SQLITE_PATH") or os.path.join(
+        tempfile.gettempdir(), "smart_invoice_pro_scheduler_runs.sqlite3"
+    )
+    return SQLiteRunLedger(path)
@@ -0,0 +1,450 @@
+"""
+shared_cache.py
+===============
+Pluggable TTL cache for expensive, read-mostly endpoints (dashboard, reports).
+
+Backends
+--------
+  memory  – bounded in-process LRU (default). Each gunicorn worker has its own.
+  sqlite  – file-backed store shared by every worker on the host.
+
+Features
+--------
+  * TTL per entry, LRU size bound for the memory backend
+  * single-flight recompute: concurrent misses for the same key wait for the
+    first caller instead of stampeding Cosmos (per-key thread lock, plus a
+    lease row in SQLite so other worker processes wait as well)
+  * tenant-scoped invalidation and hit/miss metrics. ``invalidate_tenant``
+    drops a tenant's entries in the FINANCIAL_NAMESPACES after financial
+    writes, by key prefix in the backend, so entries cached by other worker
+    processes (or namespaces this process never used) go too
+  * expired SQLite rows are purged every CACHE_PURGE_INTERVAL seconds
+
+Usage
+-----
+    from smart_invoice_pro.utils.shared_cache import get_cache
+
+    payload = get_cache("dashboard_summary").get_or_compute(
+        tenant_id, ("this_year", "", ""), lambda: build_payload(), ttl=180,
+    )
+
+Environment
+-----------
+  CACHE_BACKEND          – "memory" (default) or "sqlite"
+  CACHE_SQLITE_PATH      – database file for the sqlite backend
+  CACHE_MAX_ENTRIES      – memory LRU bound (default 1024)
+  CACHE_LOCK_TIMEOUT     – seconds a waiter blocks on another computation (default 15)
+  CACHE_PURGE_INTERVAL   – seconds between purges of expired sqlite rows (default 300)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# Namespaces computed from a tenant's invoices, bills, payments, expenses and
+# stock; ``invalidate_tenant`` clears these after financial writes. Other
+# namespaces (AI match results, webhook config, parsed statements) expire or
+# are invalidated on their own terms.
+FINANCIAL_NAMESPACES = ("dashboard", "dashboard_summary", "reports", "invoice_list_meta")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def tenant_prefix(namespace: str, tenant_id: str | None) -> str:
+    return f"{namespace}:{tenant_id or 'public'}:"
+
+
+# ── Backends ──────────────────────────────────────────────────────────────────
+
+class MemoryBackend:
+    """Bounded in-process LRU with per-entry expiry."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            if entry[0] <= time.time():
+                self._entries.pop(key, None)
+                return _MISSING
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete_prefix(self, prefix: str) -> int:
+        with self._lock:
+            stale = [k for k in self._entries if k.startswith(prefix)]
+            for k in stale:
+                self._entries.pop(k, None)
+            return len(stale)
+
+    def acquire_lease(self, key: str, ttl: float) -> bool:
+        # Cross-process leases are meaningless in memory; the per-key thread
+        # lock in SharedCache already serialises computation in this process.
+        return True
+
+    def release_lease(self, key: str) -> None:
+        return None
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteBackend:
+    """File-backed cache shared across worker processes on one host."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._next_purge = 0.0
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_leases ("
+            " key TEXT PRIMARY KEY, expires_at REAL NOT NULL)"
+        )
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str):
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM cache_entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[1] <= time.time():
+            return _MISSING
+        return json.loads(row[0])
+
+    def set(self, key: str, value, ttl: float) -> None:
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value, default=str), now + ttl),
+        )
+        if now >= self._next_purge:
+            self._next_purge = now + max(1, _env_int("CACHE_PURGE_INTERVAL", 300))
+            self.purge_expired()
+
+    def purge_expired(self) -> int:
+        """Delete expired entries and leases (reads skip them; this reclaims the space)."""
+        conn = self._conn()
+        now = time.time()
+        cur = conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (now,))
+        conn.execute("DELETE FROM cache_leases WHERE expires_at <= ?", (now,))
+        return cur.rowcount or 0
+
+    def delete_prefix(self, prefix: str) -> int:
+        cur = self._conn().execute(
+            "DELETE FROM cache_entries WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+        )
+        return cur.rowcount or 0
+
+    def acquire_lease(self, key: str, ttl: float) -> bool:
+        conn = self._conn()
+        now = time.time()
+        conn.execute("DELETE FROM cache_leases WHERE key = ? AND expires_at <= ?", (key, now))
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO cache_leases (key, expires_at) VALUES (?, ?)", (key, now + ttl)
+        )
+        return cur.rowcount == 1
+
+    def release_lease(self, key: str) -> None:
+        self._conn().execute("DELETE FROM cache_leases WHERE key = ?", (key,))
+
+    def size(self) -> int:
+        row = self._conn().execute(
+            "SELECT COUNT(*) FROM cache_entries WHERE expires_at > ?", (time.time(),)
+        ).fetchone()
+        return int(row[0]) if row else 0
+
+    def clear(self) -> None:
+        conn = self._conn()
+        conn.execute("DELETE FROM cache_entries")
+        conn.execute("DELETE FROM cache_leases")
+
+
+def _build_backend():
+    kind = (os.getenv("CACHE_BACKEND") or "memory").strip().lower()
+    if kind == "sqlite":
+        path = os.getenv("CACHE_SQLITE_PATH") or os.path.join(
+            tempfile.gettempdir(), "smart_invoice_pro_cache.sqlite3"
+        )
+        try:
+            return SQLiteBackend(path)
+        except sqlite3.Error as exc:
+            logger.warning("[cache] sqlite backend unavailable (%s); using memory", exc)
+    return MemoryBackend(_env_int("CACHE_MAX_ENTRIES", 1024))
+
+
+# ── Cache facade ──────────────────────────────────────────────────────────────
+
+class SharedCache:
+    """A namespaced view over the process-wide backend."""
+
+    def __init__(self, namespace: str, backend, default_ttl: float):
+        self.namespace = namespace
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self.stats = {"hits": 0, "misses": 0, "computes": 0, "waits": 0, "errors": 0}
+        self._stats_lock = threading.Lock()
+        self._key_locks: dict[str, list] = {}    # key -> [lock, holders and waiters]
+        self._key_locks_guard = threading.Lock()
+
+    def _bump(self, name: str) -> None:
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def tenant_prefix(self, tenant_id: str | None) -> str:
+        return tenant_prefix(self.namespace, tenant_id)
+
+    def make_key(self, tenant_id: str | None, parts) -> str:
+        digest = hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+        return self.tenant_prefix(tenant_id) + digest
+
+    @contextmanager
+    def _key_lock(self, key: str):
+        """Hold the per-key lock; it is dropped once no thread holds or waits on it."""
+        with self._key_locks_guard:
+            entry = self._key_locks.get(key)
+            if entry is None:
+                entry = self._key_locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._key_locks_guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    self._key_locks.pop(key, None)
+
+    def _safe_get(self, key: str):
+        try:
+            return self.backend.get(key)
+        except Exception as exc:
+            self._bump("errors")
+            logger.warning("[cache] %s get failed: %s", self.namespace, exc)
+            return _MISSING
+
+    def _safe_set(self, key: str, value, ttl: float) -> None:
+        try:
+            self.backend.set(key, value, ttl)
+        except Exception as exc:
+            self._bump("errors")
+            logger.warning("[cache] %s set failed: %s", self.namespace, exc)
+
+    def get(self, tenant_id, parts, default=None):
+        """Cached value for (tenant_id, parts), or ``default`` — never computes."""
+        value = self._safe_get(self.make_key(tenant_id, parts))
+        if value is _MISSING:
+            self._bump("misses")
+            return default
+        self._bump("hits")
+        return value
+
+    def set(self, tenant_id, parts, value, ttl: float | None = None) -> None:
+        """Store a value computed outside get_or_compute (e.g. in a batch)."""
+        self._safe_set(self.make_key(tenant_id, parts), value, self.default_ttl if ttl is None else ttl)
+
+    def get_or_compute(self, tenant_id, parts, compute: Callable[[], Any], ttl: float | None = None):
+        """Return the cached value for (tenant_id, parts), computing it at most once."""
+        ttl = self.default_ttl if ttl is None else ttl
+        key = self.make_key(tenant_id, parts)
+
+        value = self._safe_get(key)
+        if value is not _MISSING:
+            self._bump("hits")
+            return value
+        self._bump("misses")
+
+        with self._key_lock(key):
+            # Another thread may have filled the entry while we waited.
+            value = self._safe_get(key)
+            if value is not _MISSING:
+                self._bump("waits")
+                return value
+
+            lock_timeout = _env_int("CACHE_LOCK_TIMEOUT", 15)
+            try:
+                leased = self.backend.acquire_lease(key, lock_timeout)
+            except Exception:
+                leased = True
+            if not leased:
+                # Another worker process is computing — poll for its result.
+                self._bump("waits")
+                deadline = time.time() + lock_timeout
+                while time.time() < deadline:
+                    time.sleep(0.05)
+                    value = self._safe_get(key)
+                    if value is not _MISSING:
+                        return value
+
+            try:
+                self._bump("computes")
+                value = compute()
+                self._safe_set(key, value, ttl)
+                return value
+            finally:
+                if leased:
+                    try:
+                        self.backend.release_lease(key)
+                    except Exception:
+                        pass
+
+    def invalidate_tenant(self, tenant_id: str | None) -> int:
+        try:
+            return self.backend.delete_prefix(self.tenant_prefix(tenant_id))
+        except Exception as exc:
+            self._bump("errors")
+            logger.warning("[cache] %s invalidate failed: %s", self.namespace, exc)
+            return 0
+
+    def snapshot(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+_registry_lock = threading.Lock()
+_backend = None
+_caches: dict[str, SharedCache] = {}
+
+
+def _get_backend():
+    global _backend
+    if _backend is None:
+        _backend = _build_backend()
+    return _backend
+
+
+def get_cache(namespace: str, default_ttl: float = 180) -> SharedCache:
+    """Return the process-wide cache for ``namespace``."""
+    with _registry_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            cache = _caches[namespace] = SharedCache(namespace, _get_backend(), default_ttl)
+        return cache
+
+
+def invalidate_tenant(tenant_id: str | None) -> None:
+    """Drop a tenant's FINANCIAL_NAMESPACES entries (called after financial writes)."""
+    with _registry_lock:
+        backend = _get_backend()
+    for namespace in FINANCIAL_NAMESPACES:
+        try:
+            backend.delete_prefix(tenant_prefix(namespace, tenant_id))
+        except Exception as exc:
+            logger.warning("[cache] %s invalidate failed: %s", namespace, exc)
+
+
+def cache_stats() -> dict:
+    with _registry_lock:
+        caches = dict(_caches)
+    backend = _get_backend()
+    try:
+        size = backend.size()
+    except Exception:
+        size = None
+    return {
+        "backend": backend.name,
+        "size": size,
+        "namespaces": {name: cache.snapshot() for name, cache in caches.items()},
+    }
+
+
+def reset_caches() -> None:
+    """Testing helper — drop all namespaces and rebuild the backend from env."""
+    global _backend
+    with _registry_lock:
+        _caches.clear()
+        _backend = None
+
+
+def cached_json_response(namespace: str, ttl: float = 180):
+    """
+    Decorator for GET endpoints returning ``jsonify(...)``: caches successful
+    JSON bodies per (tenant, path, query string). Bypassed when the app runs
+    with TESTING=True so endpoint tests always see fresh container mocks.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            from flask import current_app, jsonify, request
+
+            if current_app.config.get("TESTING"):
+                return fn(*args, **kwargs)
+
+            tenant_id = getattr(request, "tenant_id", None)
+            parts = (request.path, sorted(request.args.items(multi=True)))
+            failure = {}
+
+            def _compute():
+                rv = fn(*args, **kwargs)
+                response = current_app.make_response(rv)
+                if response.status_code != 200 or not response.is_json:
+                    failure["response"] = response
+                    raise _Uncacheable()
+                return response.get_json()
+
+            try:
+                body = get_cache(namespace, ttl).get_or_compute(tenant_id, parts, _compute, ttl=ttl)
+            except _Uncacheable:
+                return failure["response"]
+            return jsonify(body)
+        return wrapper
+    return decorator
+
+
+class _Uncacheable(Exception):
+    """Raised inside a compute callback to skip caching non-200 responses."""
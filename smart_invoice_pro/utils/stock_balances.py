@@ -0,0 +1,408 @@
+"""
+stock_balances.py
+=================
+Materialized per-product stock balances maintained alongside the stock ledger.
+
+Container: "stock_balances", partition: /tenant_id
+
+Balance document (one per tenant per product with ledger activity)
+{
+    "id":             "<tenant_id>:stock:<product_id>",
+    "tenant_id":      "<tenant_id>",
+    "doc_type":       "balance",
+    "product_id":     "<product_id>",
+    "on_hand":        42.0,
+    "stock_in":       100.0,
+    "stock_out":      58.0,
+    "txn_count":      17,
+    "last_txn_at":    "2025-06-01T10:00:00",
+    "recent_txn_ids": ["..."],             # idempotency window for retries
+    "stale":          true,                # only after a failed update
+    "checkpoint":     {"on_hand": ..., "stock_in": ..., "stock_out": ...,
+                       "txn_count": ..., "as_of": "<ledger timestamp>"}
+}
+
+Meta document (one per tenant)
+{
+    "id":         "<tenant_id>:stock_meta",
+    "doc_type":   "meta",
+    "rebuilt_at": "..."                    # set by rebuild_tenant_balances
+}
+
+Every ledger write goes through ``stock_utils.record_stock_transaction`` which
+creates the ledger entry and then folds it into the balance document with an
+ETag-guarded replace (read → modify → replace IfNotModified, retried on 412).
+The first write for a product seeds its balance from the ledger. Every
+``STOCK_CHECKPOINT_EVERY`` entries the balance stamps a checkpoint, so
+``reconcile_product`` only has to re-read the ledger tail to detect drift.
+
+When folding an entry fails the balance is patched ``stale``. Stale balances
+are never read: callers sum the ledger instead until the next write for the
+product re-seeds the balance from the ledger, or a reconcile/rebuild rewrites
+it.
+
+Point reads (``get_product_balance``) are trusted as soon as the document
+exists. Tenant-wide reads (``load_stock_map``) are only trusted once
+``rebuild_tenant_balances`` has stamped the meta document and no balance is
+stale; until then callers fall back to summing the ledger.
+
+Environment
+-----------
+  STOCK_BALANCES_ENABLED   – "false" disables maintenance and reads (default on)
+  STOCK_CHECKPOINT_EVERY   – ledger entries between checkpoints (default 500)
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from datetime import datetime
+
+from azure.cosmos import exceptions
+
+from smart_invoice_pro.utils.cosmos_client import (
+    stock_balances_container,
+    stock_container,
+    tenants_container,
+)
+
+logger = logging.getLogger(__name__)
+
+_MAX_RETRIES = 8
+_RECENT_TXN_IDS = 50
+_COSMOS_SYSTEM_FIELDS = ("_rid", "_self", "_etag", "_attachments", "_ts")
+
+try:
+    from azure.core import MatchConditions
+except ImportError:  # pragma: no cover - older SDKs
+    MatchConditions = None
+
+
+def balances_enabled() -> bool:
+    return os.getenv("STOCK_BALANCES_ENABLED", "true").strip().lower() not in ("0", "false", "no")
+
+
+def _checkpoint_every() -> int:
+    try:
+        return max(1, int(os.getenv("STOCK_CHECKPOINT_EVERY", "500")))
+    except ValueError:
+        return 500
+
+
+def _balance_id(tenant_id: str, product_id: str) -> str:
+    return f"{tenant_id}:stock:{product_id}"
+
+
+def _meta_id(tenant_id: str) -> str:
+    return f"{tenant_id}:stock_meta"
+
+
+def _quantity(txn: dict) -> float:
+    try:
+        return float(txn.get("quantity") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _empty_balance(tenant_id: str, product_id: str) -> dict:
+    return {
+        "id": _balance_id(tenant_id, product_id),
+        "tenant_id": tenant_id,
+        "doc_type": "balance",
+        "product_id": product_id,
+        "on_hand": 0.0,
+        "stock_in": 0.0,
+        "stock_out": 0.0,
+        "txn_count": 0,
+        "last_txn_at": None,
+        "recent_txn_ids": [],
+        "checkpoint": None,
+    }
+
+
+def _fold(doc: dict, txn: dict) -> None:
+    """Add one ledger entry to a balance document in place."""
+    qty = _quantity(txn)
+    if txn.get("type") == "IN":
+        doc["stock_in"] = doc.get("stock_in", 0.0) + qty
+    elif txn.get("type") == "OUT":
+        doc["stock_out"] = doc.get("stock_out", 0.0) + qty
+    doc["on_hand"] = doc.get("stock_in", 0.0) - doc.get("stock_out", 0.0)
+    doc["txn_count"] = int(doc.get("txn_count", 0)) + 1
+    ts = txn.get("timestamp")
+    if ts and (not doc.get("last_txn_at") or ts > doc["last_txn_at"]):
+        doc["last_txn_at"] = ts
+    if txn.get("id"):
+        recent = [i for i in doc.get("recent_txn_ids") or [] if i != txn["id"]]
+        recent.append(txn["id"])
+        doc["recent_txn_ids"] = recent[-_RECENT_TXN_IDS:]
+
+
+def _stamp_checkpoint(doc: dict) -> None:
+    doc["checkpoint"] = {
+        "on_hand": doc["on_hand"],
+        "stock_in": doc.get("stock_in", 0.0),
+        "stock_out": doc.get("stock_out", 0.0),
+        "txn_count": doc.get("txn_count", 0),
+        "as_of": doc.get("last_txn_at"),
+    }
+
+
+def _maybe_checkpoint(doc: dict) -> None:
+    last = (doc.get("checkpoint") or {}).get("txn_count", 0)
+    if doc.get("txn_count", 0) - last >= _checkpoint_every():
+        _stamp_checkpoint(doc)
+
+
+def _ledger_rows(tenant_id: str, product_id: str | None = None, after: str | None = None) -> list[dict]:
+    query = "SELECT c.id, c.product_id, c.type, c.quantity, c.timestamp FROM c WHERE c.tenant_id = @tenant_id"
+    parameters = [{"name": "@tenant_id", "value": tenant_id}]
+    if product_id is not None:
+        query += " AND c.product_id = @product_id"
+        parameters.append({"name": "@product_id", "value": str(product_id)})
+    if after:
+        query += " AND c.timestamp > @after"
+        parameters.append({"name": "@after", "value": after})
+    return list(stock_container.query_items(
+        query=query, parameters=parameters, enable_cross_partition_query=True,
+    ))
+
+
+def _sorted_rows(rows: list[dict]) -> list[dict]:
+    return sorted(rows, key=lambda r: (r.get("timestamp") or "", r.get("id") or ""))
+
+
+def _balance_from_rows(tenant_id: str, product_id: str, rows: list[dict]) -> dict:
+    doc = _empty_balance(tenant_id, product_id)
+    for row in _sorted_rows(rows):
+        _fold(doc, row)
+    _stamp_checkpoint(doc)
+    return doc
+
+
+def _strip_system_fields(doc: dict) -> dict:
+    return {k: v for k, v in doc.items() if k not in _COSMOS_SYSTEM_FIELDS}
+
+
+def _replace_if_unchanged(doc: dict, etag: str | None) -> None:
+    body = _strip_system_fields(doc)
+    kwargs = {"item": body["id"], "body": body}
+    if etag:
+        kwargs["etag"] = etag
+        if MatchConditions is not None:
+            kwargs["match_condition"] = MatchConditions.IfNotModified
+    stock_balances_container.replace_item(**kwargs)
+
+
+def _mark_stale(tenant_id: str, doc_id: str) -> None:
+    """Flag a balance that missed a ledger entry so reads fall back to the ledger."""
+    try:
+        stock_balances_container.patch_item(
+            item=doc_id,
+            partition_key=tenant_id,
+            patch_operations=[{"op": "set", "path": "/stale", "value": True}],
+        )
+    except exceptions.CosmosResourceNotFoundError:
+        pass   # no balance yet: reads already sum the ledger
+    except Exception as exc:
+        logger.error("[stock_balances] could not mark %s stale, rebuild needed: %s", doc_id, exc)
+
+
+# ── Incremental maintenance ───────────────────────────────────────────────────
+
+def apply_stock_transaction(txn: dict) -> None:
+    """
+    Fold a ledger entry that has just been written into its product balance.
+
+    Best-effort: the ledger entry is already durable, so failures are logged
+    and never propagate to the caller. The balance is marked stale instead,
+    and the next write for the product re-seeds it from the ledger.
+    """
+    if not balances_enabled():
+        return
+    tenant_id = txn.get("tenant_id")
+    product_id = txn.get("product_id")
+    if not tenant_id or not product_id:
+        return
+    product_id = str(product_id)
+    doc_id = _balance_id(tenant_id, product_id)
+
+    try:
+        for _ in range(_MAX_RETRIES):
+            try:
+                doc = stock_balances_container.read_item(item=doc_id, partition_key=tenant_id)
+            except exceptions.CosmosResourceNotFoundError:
+                # First write for this product: seed from the ledger, which
+                # already contains ``txn``.
+                doc = _balance_from_rows(tenant_id, product_id, _ledger_rows(tenant_id, product_id))
+                if txn.get("id") not in doc["recent_txn_ids"]:
+                    _fold(doc, txn)
+                try:
+                    stock_balances_container.create_item(body=doc)
+                    return
+                except exceptions.CosmosResourceExistsError:
+                    continue
+
+            etag = doc.get("_etag")
+            if doc.get("stale"):
+                # Missed an earlier entry: re-seed from the ledger, which has ``txn``.
+                doc = _balance_from_rows(tenant_id, product_id, _ledger_rows(tenant_id, product_id))
+                if txn.get("id") not in doc["recent_txn_ids"]:
+                    _fold(doc, txn)
+            elif txn.get("id") and txn["id"] in (doc.get("recent_txn_ids") or []):
+                return
+            else:
+                _fold(doc, txn)
+                _maybe_checkpoint(doc)
+            try:
+                _replace_if_unchanged(doc, etag)
+                return
+            except exceptions.CosmosAccessConditionFailedError:
+                continue
+        logger.warning("[stock_balances] gave up updating %s after %d attempts", doc_id, _MAX_RETRIES)
+    except Exception as exc:
+        logger.warning("[stock_balances] update failed for %s: %s", doc_id, exc)
+    _mark_stale(tenant_id, doc_id)
+
+
+# ── Reads ─────────────────────────────────────────────────────────────────────
+
+def get_product_balance(tenant_id: str, product_id: str) -> float | None:
+    """Return the materialized on-hand quantity, or None if there is no usable balance."""
+    if not balances_enabled() or not tenant_id or not product_id:
+        return None
+    try:
+        doc = stock_balances_container.read_item(
+            item=_balance_id(tenant_id, str(product_id)), partition_key=tenant_id,
+        )
+    except exceptions.CosmosResourceNotFoundError:
+        return None
+    except Exception as exc:
+        logger.warning("[stock_balances] read failed for %s/%s: %s", tenant_id, product_id, exc)
+        return None
+    if doc.get("stale"):
+        return None
+    return float(doc.get("on_hand", 0.0))
+
+
+def load_stock_map(tenant_id: str) -> dict[str, float] | None:
+    """
+    Return {product_id: on_hand} for a tenant, or None when the tenant's
+    balances have not been rebuilt yet or one is stale (callers then sum the
+    ledger).
+    """
+    if not balances_enabled() or not tenant_id:
+        return None
+    try:
+        meta = stock_balances_container.read_item(item=_meta_id(tenant_id), partition_key=tenant_id)
+        if not meta.get("rebuilt_at"):
+            return None
+        rows = stock_balances_container.query_items(
+            query=(
+                "SELECT c.product_id, c.on_hand, c.stale FROM c "
+                "WHERE c.tenant_id = @tenant_id AND c.doc_type = 'balance'"
+            ),
+            parameters=[{"name": "@tenant_id", "value": tenant_id}],
+            partition_key=tenant_id,
+        )
+        rows = list(rows)
+        if any(row.get("stale") for row in rows):
+            return None
+        return {row["product_id"]: float(row.get("on_hand", 0.0)) for row in rows}
+    except exceptions.CosmosResourceNotFoundError:
+        return None
+    except Exception as exc:
+        logger.warning("[stock_balances] load failed for %s: %s", tenant_id, exc)
+        return None
+
+
+# ── Reconciliation / rebuild ──────────────────────────────────────────────────
+
+def reconcile_product(tenant_id: str, product_id: str, repair: bool = True) -> dict:
+    """
+    Compare a product's balance with the ledger.
+
+    With a checkpoint only ledger entries newer than ``checkpoint.as_of`` are
+    read; on drift (or without a checkpoint) the full ledger is summed and,
+    when ``repair`` is set, the balance document is rewritten from it.
+    """
+    product_id = str(product_id)
+    try:
+        doc = stock_balances_container.read_item(
+            item=_balance_id(tenant_id, product_id), partition_key=tenant_id,
+        )
+    except exceptions.CosmosResourceNotFoundError:
+        doc = None
+
+    checkpoint = (doc or {}).get("checkpoint") or {}
+    if doc is not None and checkpoint.get("as_of") and not doc.get("stale"):
+        tail = _ledger_rows(tenant_id, product_id, after=checkpoint["as_of"])
+        expected = checkpoint.get("on_hand", 0.0) + sum(
+            _quantity(r) if r.get("type") == "IN" else -_quantity(r) if r.get("type") == "OUT" else 0.0
+            for r in tail
+        )
+        if abs(expected - float(doc.get("on_hand", 0.0))) < 1e-9:
+            return {"product_id": product_id, "on_hand": doc["on_hand"], "drift": 0.0, "repaired": False}
+
+    fresh = _balance_from_rows(tenant_id, product_id, _ledger_rows(tenant_id, product_id))
+    actual = float((doc or {}).get("on_hand", 0.0))
+    drift = fresh["on_hand"] - actual
+    repaired = False
+    if repair and (doc is None or abs(drift) >= 1e-9 or not checkpoint or (doc or {}).get("stale")):
+        stock_balances_container.upsert_item(body=fresh)
+        repaired = True
+    return {"product_id": product_id, "on_hand": fresh["on_hand"], "drift": drift, "repaired": repaired}
+
+
+def rebuild_tenant_balances(tenant_id: str) -> dict:
+    """
+    Recompute every balance document of a tenant from its stock ledger,
+    delete balances of products that no longer have ledger entries, and stamp
+    the meta document so tenant-wide reads start using the balances.
+    """
+    by_product: dict[str, list[dict]] = {}
+    for row in _ledger_rows(tenant_id):
+        pid = row.get("product_id")
+        if pid:
+            by_product.setdefault(str(pid), []).append(row)
+
+    for pid, rows in by_product.items():
+        stock_balances_container.upsert_item(body=_balance_from_rows(tenant_id, pid, rows))
+
+    wanted = {_balance_id(tenant_id, pid) for pid in by_product}
+    stale = 0
+    for existing in stock_balances_container.query_items(
+        query="SELECT c.id FROM c WHERE c.tenant_id = @tenant_id AND c.doc_type = 'balance'",
+        parameters=[{"name": "@tenant_id", "value": tenant_id}],
+        partition_key=tenant_id,
+    ):
+        if existing["id"] not in wanted:
+            stock_balances_container.delete_item(item=existing["id"], partition_key=tenant_id)
+            stale += 1
+
+    stock_balances_container.upsert_item(body={
+        "id": _meta_id(tenant_id),
+        "tenant_id": tenant_id,
+        "doc_type": "meta",
+        "rebuilt_at": datetime.utcnow().isoformat(),
+    })
+    return {
+        "tenant_id": tenant_id,
+        "products": len(by_product),
+        "ledger_entries": sum(len(rows) for rows in by_product.values()),
+        "stale_removed": stale,
+    }
+
+
+def rebuild_all_balances() -> list[dict]:
+    """Rebuild stock balances for every tenant. Returns a per-tenant summary list."""
+    results = []
+    for tenant in tenants_container.query_items(
+        query="SELECT c.id FROM c", enable_cross_partition_query=True,
+    ):
+        try:
+            results.append(rebuild_tenant_balances(tenant["id"]))
+        except Exception as exc:
+            logger.error("[stock_balances] rebuild failed for %s: %s", tenant["id"], exc)
+            results.append({"tenant_id": tenant["id"], "error": str(exc)})
+    return results
@@ -1,5 +1,7 @@
 """Shared stock ledger helpers for invoices and stock API."""
 from smart_invoice_pro.utils.cosmos_client import stock_container, products_container
+from smart_invoice_pro.utils.shared_cache import get_cache
+from smart_invoice_pro.utils.stock_balances import apply_stock_transaction, get_product_balance
 
 
 def product_exists_for_tenant(product_id, tenant_id):
@@ -17,7 +19,22 @@ def product_exists_for_tenant(product_id, tenant_id):
     return bool(rows) and not rows[0].get('is_deleted', False)
 
 
+def record_stock_transaction(transaction, container=None):
+    """
+    Append a ledger entry and fold it into the product's materialized balance.
+    All stock ledger writes should go through here.
+    """
+    created = (container or stock_container).create_item(body=transaction)
+    apply_stock_transaction(transaction)
+    # /dashboard/low-stock is cached in the "dashboard" namespace.
+    get_cache("dashboard").invalidate_tenant(transaction.get("tenant_id"))
+    return created
+
+
 def compute_current_stock(product_id, tenant_id):
+    balance = get_product_balance(tenant_id, product_id)
+    if balance is not None:
+        return balance
     items = list(stock_container.query_items(
         query=(
             "SELECT c.type, c.quantity FROM c "
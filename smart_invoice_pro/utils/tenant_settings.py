@@ -0,0 +1,273 @@
+"""
+tenant_settings.py
+==================
+Per-tenant settings snapshot for the document-creation hot path.
+
+Creating an invoice used to read the settings container five or six times
+(invoice preferences twice, the org profile three times for GST mode,
+sales-tax suppression and seller state). A snapshot bundles the four settings
+documents a tenant owns and is loaded with ONE partition-scoped query:
+
+  {tenant}:organization_profile   → org_profile, gst_mode, seller_state
+  {tenant}:invoice_preferences    → invoice_prefs
+  {tenant}:automation_settings    → automation
+  {tenant}:integrations_settings  → integrations
+
+Caching
+-------
+  * per request – memoized on ``flask.g``, so every helper called while
+    handling a request shares one snapshot
+  * per process – kept in a bounded LRU together with each document's _etag.
+    Before a cached snapshot is reused it is revalidated with a projection
+    query (``SELECT c.id, c._etag``); only a changed ETag triggers a full
+    reload. GST mode therefore still reflects the current org setting on
+    every request, which is what org_tax_mode requires.
+  * invalidation – the settings PUT endpoints call ``invalidate_tenant_settings``
+    and invoice-number generation writes its new counter document back with
+    ``remember_settings_doc``, so the next request needs no reload.
+
+Snapshot documents are shared between callers — treat them as read-only.
+
+Usage
+-----
+    from smart_invoice_pro.utils.tenant_settings import get_tenant_settings
+
+    settings = get_tenant_settings(request.tenant_id)
+    if settings.suppress_sales_tax: ...
+    seller_state = settings.seller_state
+
+Environment
+-----------
+  SETTINGS_SNAPSHOT_TRUST_SECONDS – skip revalidation for snapshots younger
+                                    than this (default 0: revalidate per request)
+  SETTINGS_SNAPSHOT_MAX_TENANTS   – process LRU bound (default 1024)
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from flask import g, has_request_context
+
+from smart_invoice_pro.utils.cosmos_client import settings_container
+from smart_invoice_pro.utils.org_tax_mode import COMPOSITION, NO_GST, gst_mode_from_profile
+
+logger = logging.getLogger(__name__)
+
+SETTINGS_KINDS = (
+    "organization_profile",
+    "invoice_preferences",
+    "automation_settings",
+    "integrations_settings",
+)
+
+_G_ATTR = "_tenant_settings_snapshots"
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def settings_doc_ids(tenant_id: str) -> list[str]:
+    return [f"{tenant_id}:{kind}" for kind in SETTINGS_KINDS]
+
+
+@dataclass
+class TenantSettingsSnapshot:
+    """The tenant's settings documents as of ``loaded_at`` (missing docs are ``{}``)."""
+
+    tenant_id: str
+    docs: dict = field(default_factory=dict)    # kind → document
+    etags: dict = field(default_factory=dict)   # doc id → _etag
+    loaded_at: float = 0.0
+
+    @property
+    def org_profile(self) -> dict:
+        return self.docs.get("organization_profile") or {}
+
+    @property
+    def invoice_prefs(self) -> dict:
+        return self.docs.get("invoice_preferences") or {}
+
+    @property
+    def automation(self) -> dict:
+        return self.docs.get("automation_settings") or {}
+
+    @property
+    def integrations(self) -> dict:
+        return self.docs.get("integrations_settings") or {}
+
+    @property
+    def gst_mode(self) -> str:
+        return gst_mode_from_profile(self.docs.get("organization_profile"))
+
+    @property
+    def suppress_sales_tax(self) -> bool:
+        return self.gst_mode in (COMPOSITION, NO_GST)
+
+    @property
+    def gst_active(self) -> bool:
+        return self.gst_mode != NO_GST
+
+    @property
+    def seller_state(self) -> str:
+        """Seller state from the GSTIN when valid, else the org address."""
+        from smart_invoice_pro.api.gst_api import extract_state_from_gstin, validate_gstin_format
+
+        profile = self.org_profile
+        if not profile:
+            return ""
+        gstin = profile.get("gstin", "")
+        if gstin and validate_gstin_format(gstin):
+            return extract_state_from_gstin(gstin)
+        return (profile.get("address") or {}).get("state", "")
+
+
+# ── Loading ───────────────────────────────────────────────────────────────────
+
+def _query(tenant_id: str, projection: str) -> list[dict]:
+    return list(settings_container.query_items(
+        query=f"SELECT {projection} FROM c WHERE c.tenant_id = @tid AND ARRAY_CONTAINS(@ids, c.id)",
+        parameters=[
+            {"name": "@tid", "value": tenant_id},
+            {"name": "@ids", "value": settings_doc_ids(tenant_id)},
+        ],
+        partition_key=tenant_id,
+    ))
+
+
+def _kind_of(tenant_id: str, doc_id) -> str | None:
+    prefix = f"{tenant_id}:"
+    if isinstance(doc_id, str) and doc_id.startswith(prefix):
+        kind = doc_id[len(prefix):]
+        if kind in SETTINGS_KINDS:
+            return kind
+    return None
+
+
+def load_tenant_settings(tenant_id: str) -> TenantSettingsSnapshot:
+    """Read every settings document for the tenant in one query (uncached)."""
+    snapshot = TenantSettingsSnapshot(tenant_id=tenant_id, loaded_at=time.time())
+    for doc in _query(tenant_id, "*"):
+        if not isinstance(doc, dict):
+            continue
+        kind = _kind_of(tenant_id, doc.get("id"))
+        if kind is None:
+            continue
+        snapshot.docs[kind] = doc
+        snapshot.etags[doc["id"]] = doc.get("_etag")
+    return snapshot
+
+
+def _current_etags(tenant_id: str) -> dict:
+    return {
+        row["id"]: row.get("_etag")
+        for row in _query(tenant_id, "c.id, c._etag")
+        if isinstance(row, dict) and _kind_of(tenant_id, row.get("id"))
+    }
+
+
+# ── Process cache ─────────────────────────────────────────────────────────────
+
+_lock = threading.Lock()
+_snapshots: "OrderedDict[str, TenantSettingsSnapshot]" = OrderedDict()
+
+
+def _cached(tenant_id: str) -> TenantSettingsSnapshot | None:
+    with _lock:
+        snapshot = _snapshots.get(tenant_id)
+        if snapshot is not None:
+            _snapshots.move_to_end(tenant_id)
+        return snapshot
+
+
+def _store(snapshot: TenantSettingsSnapshot) -> None:
+    max_tenants = max(1, int(_env_float("SETTINGS_SNAPSHOT_MAX_TENANTS", 1024)))
+    with _lock:
+        _snapshots[snapshot.tenant_id] = snapshot
+        _snapshots.move_to_end(snapshot.tenant_id)
+        while len(_snapshots) > max_tenants:
+            _snapshots.popitem(last=False)
+
+
+def _fresh_snapshot(tenant_id: str) -> TenantSettingsSnapshot:
+    cached = _cached(tenant_id)
+    if cached is not None:
+        trust = _env_float("SETTINGS_SNAPSHOT_TRUST_SECONDS", 0)
+        if trust > 0 and time.time() - cached.loaded_at < trust:
+            return cached
+        try:
+            unchanged = _current_etags(tenant_id) == cached.etags
+        except Exception as exc:
+            logger.warning("[tenant_settings] revalidation failed for %s, serving cached snapshot: %s",
+                           tenant_id, exc)
+            return cached
+        if unchanged:
+            cached.loaded_at = time.time()
+            return cached
+
+    snapshot = load_tenant_settings(tenant_id)
+    _store(snapshot)
+    return snapshot
+
+
+def get_tenant_settings(tenant_id: str) -> TenantSettingsSnapshot:
+    """Return the tenant's settings snapshot, shared for the rest of the request."""
+    if not has_request_context():
+        return _fresh_snapshot(tenant_id)
+    memo = getattr(g, _G_ATTR, None)
+    if memo is None:
+        memo = {}
+        setattr(g, _G_ATTR, memo)
+    snapshot = memo.get(tenant_id)
+    if snapshot is None:
+        snapshot = memo[tenant_id] = _fresh_snapshot(tenant_id)
+    return snapshot
+
+
+# ── Invalidation ──────────────────────────────────────────────────────────────
+
+def invalidate_tenant_settings(tenant_id: str) -> None:
+    """Drop the cached snapshot after a settings write (this process and request)."""
+    with _lock:
+        _snapshots.pop(tenant_id, None)
+    if has_request_context():
+        memo = getattr(g, _G_ATTR, None)
+        if memo:
+            memo.pop(tenant_id, None)
+
+
+def remember_settings_doc(tenant_id: str, doc) -> None:
+    """
+    Write-through for a settings document this process just saved.
+
+    ``doc`` is the body Cosmos returned (with its new _etag). Anything else
+    falls back to plain invalidation.
+    """
+    kind = _kind_of(tenant_id, doc.get("id")) if isinstance(doc, dict) else None
+    if kind is None or not doc.get("_etag"):
+        invalidate_tenant_settings(tenant_id)
+        return
+    with _lock:
+        cached = _snapshots.get(tenant_id)
+        if cached is None:
+            return
+        docs = {**cached.docs, kind: doc}
+        etags = {**cached.etags, doc["id"]: doc["_etag"]}
+        _snapshots[tenant_id] = TenantSettingsSnapshot(
+            tenant_id=tenant_id, docs=docs, etags=etags, loaded_at=cached.loaded_at,
+        )
+
+
+def reset_tenant_settings_cache() -> None:
+    """Testing helper — forget every cached snapshot."""
+    with _lock:
+        _snapshots.clear()
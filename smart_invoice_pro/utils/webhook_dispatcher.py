@@ -11,9 +11,33 @@ Usage (call from any API handler after a notable event):
         payload={"invoice_id": "...", "amount": 1000, ...}
     )
 
-The function fires-and-forgets: it runs the HTTP calls in a background
-thread so that the originating request is never delayed or failed by a
-slow/unavailable webhook endpoint.
+The call never blocks on the network: it resolves the tenant's subscribed
+endpoints (cached, invalidated when integrations settings are saved), writes
+one delivery per endpoint to the durable outbox (webhook_outbox.py) and hands
+it to a bounded in-process worker pool. Deliveries therefore survive restarts,
+and bursts of invoice activity queue up instead of spawning threads. If the
+outbox write itself fails the delivery is dropped; that is logged as an error
+and recorded as a failed, dead-lettered attempt in webhook_logs.
+
+Delivery
+--------
+  * WEBHOOK_WORKERS threads share a bounded queue; when it is full the row
+    simply waits in the outbox for the poller.
+  * Each worker thread reuses a pooled ``requests.Session``.
+  * At most WEBHOOK_ENDPOINT_CONCURRENCY requests run against one endpoint
+    host at a time; a busy endpoint defers the row briefly instead of
+    holding a worker.
+  * Network errors, timeouts, 408, 429 and 5xx are retried with exponential
+    backoff plus jitter; other 4xx responses and rows that exhaust
+    WEBHOOK_MAX_ATTEMPTS are dead-lettered (kept in the outbox, listable and
+    re-queueable from the integrations settings API).
+  * A poller thread claims due rows (leased, so several workers never send the
+    same row) — this is how retries and rows left over from a restart are
+    picked up. ``/api/cron/drain-webhook-outbox`` does the same on demand.
+    The pool and poller start with the app (``start_webhook_workers``).
+  * A row may wait in the local queue longer than its lease. Right before
+    the POST its lease is renewed, which fails if another worker has since
+    reclaimed it; that row is then skipped ("lost") rather than sent twice.
 
 Each webhook endpoint has its own optional `secret` field. If set, that
 per-endpoint secret is used for HMAC-SHA256 signing; otherwise no signature
@@ -21,29 +45,70 @@ header is sent. This decouples outbound webhook signing from the inbound
 payment webhook verification secret.
 
 Every delivery attempt (success or failure) is written to the
-`webhook_logs` Cosmos container so tenants have delivery visibility.
+`webhook_logs` Cosmos container so tenants have delivery visibility. Log
+writes are buffered and flushed in per-tenant transactional batches.
+
+Environment
+-----------
+  WEBHOOK_WORKERS               – delivery threads per process, started with the app
+                                  (default 4, 0 = cron drain only)
+  WEBHOOK_QUEUE_SIZE            – in-memory queue bound (default 1000)
+  WEBHOOK_ENDPOINT_CONCURRENCY  – concurrent requests per endpoint host (default 2)
+  WEBHOOK_MAX_ATTEMPTS          – attempts before dead-lettering (default 8)
+  WEBHOOK_BACKOFF_BASE_SECONDS  – first retry delay (default 30)
+  WEBHOOK_BACKOFF_MAX_SECONDS   – retry delay cap (default 3600)
+  WEBHOOK_POLL_SECONDS          – outbox poll interval (default 5)
+  WEBHOOK_CONFIG_TTL            – seconds endpoint config is cached (default 60)
 """
+import atexit
 import hashlib
 import hmac
 import json
 import logging
+import os
+import queue
+import random
+import socket
 import threading
 import time
 import uuid
 from datetime import datetime
+from urllib.parse import urlsplit
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from smart_invoice_pro.utils.cosmos_client import settings_container, webhook_logs_container
+from smart_invoice_pro.utils.shared_cache import get_cache
+from smart_invoice_pro.utils.webhook_outbox import STATUS_DEAD_LETTER, STATUS_PENDING, get_outbox, lease_token
 
 logger = logging.getLogger(__name__)
 
 _REQUEST_TIMEOUT = 10   # seconds per webhook call
-_MAX_RETRIES     = 2    # simple retry count on connection errors
+_LEASE_SECONDS = 60     # claim lease, renewed before the POST; well above the request timeout
+_ENDPOINT_WAIT_SECONDS = 5
+_LOG_BATCH_SIZE = 50
+_LOG_FLUSH_SECONDS = 2.0
+_RETRYABLE_STATUS = {408, 425, 429}
 
 
-def _get_webhooks_for_tenant(tenant_id: str) -> list[dict]:
-    """Return the list of active webhook entries for this tenant."""
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+_config_cache = get_cache("webhook_config", _env_int("WEBHOOK_CONFIG_TTL", 60))
+
+
+def _worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+# ── Endpoint configuration ────────────────────────────────────────────────────
+
+def _load_webhooks(tenant_id: str) -> list[dict]:
     doc_id = f"{tenant_id}:integrations_settings"
     items = list(settings_container.query_items(
         query="SELECT * FROM c WHERE c.id = @id AND c.tenant_id = @tid",
@@ -58,86 +123,398 @@ def _get_webhooks_for_tenant(tenant_id: str) -> list[dict]:
     return [wh for wh in items[0].get("webhooks", []) if wh.get("active")]
 
 
+def _get_webhooks_for_tenant(tenant_id: str) -> list[dict]:
+    """Return the list of active webhook entries for this tenant (cached)."""
+    return _config_cache.get_or_compute(tenant_id, ("webhooks",), lambda: _load_webhooks(tenant_id))
+
+
+def invalidate_webhook_config(tenant_id: str) -> None:
+    """Drop the cached endpoint list; called when integrations settings are saved."""
+    _config_cache.invalidate_tenant(tenant_id)
+
+
 def _sign_payload(secret: str, body: bytes) -> str:
     """Return HMAC-SHA256 hex signature for the payload."""
     return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
 
 
-def _write_log(tenant_id: str, webhook_id: str, event: str,
-               url: str, status_code: int | None,
-               success: bool, error: str | None) -> None:
-    """Persist a delivery attempt to webhook_logs. Non-blocking best-effort."""
+# ── Delivery logs (batched) ───────────────────────────────────────────────────
+
+class _LogBatcher:
+    """Buffers webhook_logs documents and writes them in per-tenant batches."""
+
+    def __init__(self):
+        self._queue: "queue.Queue[dict]" = queue.Queue(maxsize=5000)
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def add(self, doc: dict) -> None:
+        try:
+            self._queue.put_nowait(doc)
+        except queue.Full:
+            self._write([doc])
+            return
+        self._ensure_thread()
+        if self._queue.qsize() >= _LOG_BATCH_SIZE:
+            self.flush()
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="webhook-log-flusher", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(_LOG_FLUSH_SECONDS)
+            self.flush()
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            docs = []
+            while True:
+                try:
+                    docs.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if docs:
+                self._write(docs)
+            return len(docs)
+
+    def _write(self, docs: list[dict]) -> None:
+        by_tenant: dict[str, list[dict]] = {}
+        for doc in docs:
+            by_tenant.setdefault(doc["tenant_id"], []).append(doc)
+        for tenant_id, tenant_docs in by_tenant.items():
+            for start in range(0, len(tenant_docs), 100):  # transactional batch limit
+                chunk = tenant_docs[start:start + 100]
+                try:
+                    webhook_logs_container.execute_item_batch(
+                        batch_operations=[("create", (doc,)) for doc in chunk],
+                        partition_key=tenant_id,
+                    )
+                except Exception as batch_exc:
+                    logger.debug("[webhook] batched log write failed, writing singly: %s", batch_exc)
+                    for doc in chunk:
+                        try:
+                            webhook_logs_container.create_item(body=doc)
+                        except Exception as log_exc:
+                            logger.warning("[webhook] failed to write delivery log: %s", log_exc)
+
+
+_log_batcher = _LogBatcher()
+atexit.register(lambda: _log_batcher.flush())
+
+
+def _write_log(record: dict, status_code: int | None, success: bool,
+               error: str | None, dead_lettered: bool = False) -> None:
+    """Queue a delivery attempt for webhook_logs. Best-effort."""
+    _log_batcher.add({
+        "id":            str(uuid.uuid4()),
+        "tenant_id":     record["tenant_id"],
+        "webhook_id":    record.get("webhook_id", ""),
+        "delivery_id":   record["id"],
+        "event":         record["event"],
+        "url":           record["url"],
+        "attempt":       record.get("attempts", 0) + 1,
+        "status_code":   status_code,
+        "success":       success,
+        "error":         error,
+        "dead_lettered": dead_lettered,
+        "delivered_at":  datetime.utcnow().isoformat(),
+    })
+
+
+def flush_webhook_logs() -> int:
+    """Write buffered delivery logs now; returns the number flushed."""
+    return _log_batcher.flush()
+
+
+# ── HTTP ──────────────────────────────────────────────────────────────────────
+
+_thread_state = threading.local()
+_endpoint_slots: dict[str, threading.BoundedSemaphore] = {}
+_endpoint_slots_lock = threading.Lock()
+
+
+def _session() -> requests.Session:
+    """One pooled session per worker thread (keep-alive across deliveries)."""
+    session = getattr(_thread_state, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=_env_int("WEBHOOK_ENDPOINT_CONCURRENCY", 2))
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _thread_state.session = session
+    return session
+
+
+def _endpoint_slot(url: str) -> threading.BoundedSemaphore:
+    host = urlsplit(url).netloc.lower()
+    with _endpoint_slots_lock:
+        slot = _endpoint_slots.get(host)
+        if slot is None:
+            slot = _endpoint_slots[host] = threading.BoundedSemaphore(
+                max(1, _env_int("WEBHOOK_ENDPOINT_CONCURRENCY", 2))
+            )
+        return slot
+
+
+def _backoff_seconds(attempts: int) -> float:
+    base = max(1, _env_int("WEBHOOK_BACKOFF_BASE_SECONDS", 30))
+    cap = max(base, _env_int("WEBHOOK_BACKOFF_MAX_SECONDS", 3600))
+    delay = min(cap, base * (2 ** max(0, attempts - 1)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def _outbox_call(method: str, record: dict, *args) -> bool:
     try:
-        webhook_logs_container.create_item(body={
-            "id":           str(uuid.uuid4()),
-            "tenant_id":    tenant_id,
-            "webhook_id":   webhook_id,
-            "event":        event,
-            "url":          url,
-            "status_code":  status_code,
-            "success":      success,
-            "error":        error,
-            "delivered_at": datetime.utcnow().isoformat(),
-        })
-    except Exception as log_exc:
-        logger.warning("[webhook] failed to write delivery log: %s", log_exc)
-
-
-def _deliver(tenant_id: str, webhook_id: str, url: str,
-             event: str, payload: dict, secret: str | None) -> None:
-    """Send one webhook HTTP POST (with retries) and log the outcome."""
+        return bool(getattr(get_outbox(), method)(record, *args))
+    except Exception as exc:
+        logger.error("[webhook] outbox %s failed for %s: %s", method, record.get("id"), exc)
+        return False
+
+
+def process_delivery(record: dict) -> str:
+    """
+    Attempt one claimed delivery and settle it in the outbox.
+    Returns "delivered", "retry", "dead_letter", "deferred" or "lost" (the
+    lease expired and another worker reclaimed the row).
+    """
+    owner = record.get("lease_owner")
+    slot = _endpoint_slot(record["url"])
+    if not slot.acquire(timeout=_ENDPOINT_WAIT_SECONDS):
+        record.update(lease_owner=None, lease_until=None, next_attempt_at=time.time() + 1)
+        _outbox_call("update", record, owner)
+        return "deferred"
+
+    status_code, error, retryable = None, None, True
+    try:
+        if not _outbox_call("renew", record, _LEASE_SECONDS):
+            logger.info("[webhook] lease on %s moved to another worker; not sending", record["id"])
+            return "lost"
+        resp = _session().post(
+            record["url"], data=record["body"].encode(), headers=record.get("headers") or {},
+            timeout=_REQUEST_TIMEOUT,
+        )
+        status_code = resp.status_code
+        logger.info("[webhook] %s → %s  status=%s", record["event"], record["url"], status_code)
+        if resp.ok:
+            _write_log(record, status_code, True, None)
+            if not _outbox_call("complete", record):
+                logger.warning("[webhook] delivered %s but its lease was lost before completion", record["id"])
+            return "delivered"
+        error = f"HTTP {status_code}"
+        retryable = status_code >= 500 or status_code in _RETRYABLE_STATUS
+    except requests.RequestException as exc:
+        error = str(exc)
+        logger.warning("[webhook] attempt %d failed for %s: %s",
+                       record.get("attempts", 0) + 1, record["url"], exc)
+    finally:
+        slot.release()
+
+    max_attempts = max(1, _env_int("WEBHOOK_MAX_ATTEMPTS", 8))
+    dead = not retryable or record.get("attempts", 0) + 1 >= max_attempts
+    _write_log(record, status_code, False, error, dead_lettered=dead)
+    record["attempts"] = record.get("attempts", 0) + 1
+    record.update(last_error=error, lease_owner=None, lease_until=None)
+    if dead:
+        record["status"] = STATUS_DEAD_LETTER
+        record["dead_lettered_at"] = datetime.utcnow().isoformat()
+    else:
+        record["next_attempt_at"] = time.time() + _backoff_seconds(record["attempts"])
+    _outbox_call("update", record, owner)
+    return "dead_letter" if dead else "retry"
+
+
+# ── Worker pool ───────────────────────────────────────────────────────────────
+
+class _WorkerPool:
+    """Fixed delivery threads fed by a bounded queue, plus an outbox poller."""
+
+    def __init__(self, workers: int, queue_size: int):
+        self.pid = os.getpid()
+        self.queue: "queue.Queue[dict]" = queue.Queue(maxsize=max(1, queue_size))
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"webhook-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        self._threads.append(threading.Thread(target=self._poll, name="webhook-poller", daemon=True))
+        for t in self._threads:
+            t.start()
+
+    def submit(self, record: dict) -> bool:
+        try:
+            self.queue.put_nowait(record)
+            return True
+        except queue.Full:
+            return False
+
+    def free_slots(self) -> int:
+        return self.queue.maxsize - self.queue.qsize()
+
+    def _work(self) -> None:
+        while not self._stop.is_set():
+            try:
+                record = self.queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            try:
+                process_delivery(record)
+            except Exception as exc:
+                logger.error("[webhook] worker error: %s", exc)
+            finally:
+                self.queue.task_done()
+
+    def _poll(self) -> None:
+        interval = max(1, _env_int("WEBHOOK_POLL_SECONDS", 5))
+        while not self._stop.wait(interval):
+            free = self.free_slots()
+            if free <= 0:
+                continue
+            try:
+                for record in get_outbox().claim_due(_worker_id(), free, _LEASE_SECONDS):
+                    if not self.submit(record):
+                        break  # lease expires and the row is reclaimed later
+            except Exception as exc:
+                logger.warning("[webhook] outbox poll failed: %s", exc)
+
+    def stop(self, wait: bool = True) -> None:
+        if wait:
+            self.queue.join()
+        self._stop.set()
+
+
+_pool_lock = threading.Lock()
+_pool: _WorkerPool | None = None
+
+
+def start_webhook_workers() -> _WorkerPool | None:
+    """
+    Start this process's delivery pool and outbox poller (at app boot), or
+    return the running one; restarts it after a fork. None when WEBHOOK_WORKERS=0.
+    """
+    global _pool
+    workers = _env_int("WEBHOOK_WORKERS", 4)
+    if workers <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None or _pool.pid != os.getpid():
+            _pool = _WorkerPool(workers, _env_int("WEBHOOK_QUEUE_SIZE", 1000))
+        return _pool
+
+
+def _running_pool() -> _WorkerPool | None:
+    with _pool_lock:
+        pool = _pool
+    if pool is not None and pool.pid != os.getpid():
+        pool = start_webhook_workers()    # forked after boot: the threads did not survive
+    return pool
+
+
+def shutdown_webhook_workers(wait: bool = True) -> None:
+    """Stop the worker pool (tests, graceful shutdown) and flush logs."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.stop(wait=wait)
+    flush_webhook_logs()
+
+
+# ── Public API ────────────────────────────────────────────────────────────────
+
+def _build_record(tenant_id: str, webhook: dict, event: str, payload: dict) -> dict:
+    delivery_id = str(uuid.uuid4())
     envelope = {
-        "id":         str(uuid.uuid4()),
+        "id":         delivery_id,
         "event":      event,
         "created_at": datetime.utcnow().isoformat(),
         "data":       payload,
     }
-    body = json.dumps(envelope, ensure_ascii=False).encode()
+    body = json.dumps(envelope, ensure_ascii=False, default=str)
     headers = {
-        "Content-Type":         "application/json",
-        "X-SmartInvoice-Event": event,
+        "Content-Type":            "application/json",
+        "X-SmartInvoice-Event":    event,
+        "X-SmartInvoice-Delivery": delivery_id,
     }
+    # Use per-endpoint secret; without one no signature header is sent.
+    secret = webhook.get("secret") or None
     if secret:
-        headers["X-SmartInvoice-Signature"] = _sign_payload(secret, body)
-
-    last_exc: str | None = None
-    for attempt in range(1, _MAX_RETRIES + 1):
-        try:
-            resp = requests.post(url, data=body, headers=headers,
-                                 timeout=_REQUEST_TIMEOUT)
-            logger.info("[webhook] %s → %s  status=%s", event, url, resp.status_code)
-            _write_log(tenant_id, webhook_id, event, url,
-                       resp.status_code, resp.ok, None if resp.ok else f"HTTP {resp.status_code}")
-            return
-        except requests.RequestException as exc:
-            last_exc = str(exc)
-            logger.warning("[webhook] attempt %d/%d failed for %s: %s",
-                           attempt, _MAX_RETRIES, url, exc)
-            if attempt < _MAX_RETRIES:
-                time.sleep(1)
-
-    _write_log(tenant_id, webhook_id, event, url, None, False, last_exc)
+        headers["X-SmartInvoice-Signature"] = _sign_payload(secret, body.encode())
+    return {
+        "id":              delivery_id,
+        "tenant_id":       tenant_id,
+        "webhook_id":      webhook.get("id", ""),
+        "url":             webhook["url"],
+        "event":           event,
+        "body":            body,
+        "headers":         headers,
+        "status":          STATUS_PENDING,
+        "attempts":        0,
+        "next_attempt_at": time.time(),
+        "lease_owner":     None,
+        "lease_until":     None,
+        "last_error":      None,
+        "created_at":      envelope["created_at"],
+    }
 
 
-def _fire(tenant_id: str, event: str, payload: dict) -> None:
-    """Worker function executed in a daemon thread."""
+def dispatch_webhook_event(tenant_id: str, event: str, payload: dict) -> None:
+    """
+    Queue webhooks for *event* through the durable outbox.
+    Returns immediately — does not block the caller on any HTTP call.
+    """
     try:
-        webhooks = _get_webhooks_for_tenant(tenant_id)
+        webhooks = [wh for wh in _get_webhooks_for_tenant(tenant_id) if event in wh.get("events", [])]
         if not webhooks:
             return
+        pool = _running_pool()
         for wh in webhooks:
-            if event in wh.get("events", []):
-                # Use per-endpoint secret; fall back to None (no signature)
-                secret = wh.get("secret") or None
-                _deliver(tenant_id, wh.get("id", ""), wh["url"], event, payload, secret)
+            record = _build_record(tenant_id, wh, event, payload)
+            fast_path = pool is not None and pool.free_slots() > 0
+            if fast_path:
+                # Leased to this process so pollers elsewhere leave it alone.
+                record.update(lease_owner=lease_token(_worker_id()), lease_until=time.time() + _LEASE_SECONDS)
+            try:
+                get_outbox().enqueue(record)
+            except Exception as exc:
+                logger.error("[webhook] %s delivery %s to %s dropped: outbox write failed: %s",
+                             event, record["id"], record["url"], exc)
+                _write_log(record, None, False, f"not delivered: outbox write failed ({exc})",
+                           dead_lettered=True)
+                continue
+            if fast_path and not pool.submit(record):
+                owner = record["lease_owner"]
+                record.update(lease_owner=None, lease_until=None)
+                _outbox_call("update", record, owner)
     except Exception as exc:
         logger.error("[webhook] dispatcher error: %s", exc)
 
 
-def dispatch_webhook_event(tenant_id: str, event: str, payload: dict) -> None:
-    """
-    Fire webhooks for *event* in a background thread.
-    Returns immediately — does not block the caller.
-    """
-    t = threading.Thread(target=_fire, args=(tenant_id, event, payload), daemon=True)
-    t.start()
+def drain_webhook_outbox(limit: int = 100) -> dict:
+    """Claim and deliver due outbox rows inline (cron / WEBHOOK_WORKERS=0)."""
+    counts = {"delivered": 0, "retry": 0, "dead_letter": 0, "deferred": 0, "lost": 0}
+    for record in get_outbox().claim_due(_worker_id(), limit, _LEASE_SECONDS):
+        counts[process_delivery(record)] += 1
+    flush_webhook_logs()
+    return counts
+
+
+def list_dead_letters(tenant_id: str, limit: int = 50) -> list[dict]:
+    return get_outbox().list_dead_letters(tenant_id, limit)
+
+
+def requeue_dead_letter(tenant_id: str, delivery_id: str) -> bool:
+    """Move a dead-lettered delivery back to pending with a fresh attempt budget."""
+    outbox = get_outbox()
+    record = outbox.get(tenant_id, delivery_id)
+    if not record or record.get("status") != STATUS_DEAD_LETTER:
+        return False
+    record.update(status=STATUS_PENDING, attempts=0, next_attempt_at=time.time(),
+                  lease_owner=None, lease_until=None)
+    record.pop("dead_lettered_at", None)
+    return bool(outbox.update(record, None))
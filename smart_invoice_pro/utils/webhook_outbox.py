@@ -0,0 +1,308 @@
+"""
+webhook_outbox.py
+=================
+Durable outbox for outbound webhook deliveries.
+
+Every delivery is written here before any HTTP call is attempted, so events
+survive worker restarts and deploys. webhook_dispatcher claims due rows with a
+short lease (so several gunicorn workers or hosts never send the same row
+concurrently), renews it right before sending, then completes, reschedules or
+dead-letters them. Every lease has its own token, and renew / complete /
+update only succeed while the caller's lease is still current — a row
+reclaimed by another worker is left to that worker.
+
+Delivery document
+{
+    "id":              "<uuid>",
+    "tenant_id":       "<tenant>",
+    "webhook_id":      "<endpoint id from integrations_settings>",
+    "url":             "https://...",
+    "event":           "invoice.created",
+    "body":            "<exact JSON body to POST>",
+    "headers":         {...},           # includes the HMAC signature when configured
+    "status":          "pending" | "dead_letter",
+    "attempts":        0,
+    "next_attempt_at": 1718000000.0,    # epoch seconds
+    "lease_owner":     "<worker id>/<claim token>" | null,
+    "lease_until":     1718000030.0 | null,
+    "last_error":      null,
+    "created_at":      "..."
+}
+
+Delivered rows are deleted; webhook_logs keeps the delivery history.
+
+Backends
+--------
+  cosmos  – "webhook_outbox" container, partition /tenant_id (default)
+  sqlite  – local file, for single-host deployments and development
+
+Environment
+-----------
+  WEBHOOK_OUTBOX_BACKEND       – "cosmos" (default) or "sqlite"
+  WEBHOOK_OUTBOX_SQLITE_PATH   – database file for the sqlite backend
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+from azure.core import MatchConditions
+from azure.cosmos import exceptions
+
+from smart_invoice_pro.utils.cosmos_client import webhook_outbox_container
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = "pending"
+STATUS_DEAD_LETTER = "dead_letter"
+
+
+def _strip(doc: dict) -> dict:
+    return {k: v for k, v in doc.items() if not k.startswith("_") or k == "_etag"}
+
+
+def lease_token(owner: str) -> str:
+    """Unique per claim, so two claims by one process never share a lease."""
+    return f"{owner}/{uuid.uuid4().hex[:8]}"
+
+
+class CosmosOutbox:
+    """Outbox rows in the webhook_outbox container; leases use ETag replaces."""
+
+    name = "cosmos"
+
+    def __init__(self, container=None):
+        self._container = container
+
+    @property
+    def container(self):
+        return self._container if self._container is not None else webhook_outbox_container
+
+    def enqueue(self, record: dict) -> None:
+        saved = self.container.create_item(body=record)
+        record["_etag"] = saved.get("_etag") if isinstance(saved, dict) else None
+
+    def _conditional_replace(self, record: dict) -> bool:
+        body = dict(record)
+        etag = body.pop("_etag", None)
+        try:
+            saved = self.container.replace_item(
+                item=body["id"], body=body,
+                etag=etag, match_condition=MatchConditions.IfNotModified,
+            )
+        except (exceptions.CosmosAccessConditionFailedError, exceptions.CosmosResourceNotFoundError):
+            return False
+        record["_etag"] = saved.get("_etag") if isinstance(saved, dict) else None
+        return True
+
+    def claim_due(self, owner: str, limit: int, lease_seconds: float) -> list[dict]:
+        now = time.time()
+        candidates = self.container.query_items(
+            query=(
+                "SELECT TOP @limit * FROM c WHERE c.status = @pending "
+                "AND c.next_attempt_at <= @now "
+                "AND (NOT IS_DEFINED(c.lease_until) OR IS_NULL(c.lease_until) OR c.lease_until <= @now) "
+                "ORDER BY c.next_attempt_at ASC"
+            ),
+            parameters=[
+                {"name": "@limit", "value": int(limit)},
+                {"name": "@pending", "value": STATUS_PENDING},
+                {"name": "@now", "value": now},
+            ],
+            enable_cross_partition_query=True,
+        )
+        claimed = []
+        for doc in candidates:
+            record = _strip(doc)
+            record.update(lease_owner=lease_token(owner), lease_until=now + lease_seconds)
+            if self._conditional_replace(record):   # another worker may have claimed it first
+                claimed.append(record)
+        return claimed
+
+    def renew(self, record: dict, lease_seconds: float) -> bool:
+        renewed = dict(record, lease_until=time.time() + lease_seconds)
+        if not self._conditional_replace(renewed):
+            return False
+        record.update(renewed)
+        return True
+
+    def complete(self, record: dict) -> bool:
+        try:
+            self.container.delete_item(
+                item=record["id"], partition_key=record["tenant_id"],
+                etag=record.get("_etag"), match_condition=MatchConditions.IfNotModified,
+            )
+        except exceptions.CosmosAccessConditionFailedError:
+            return False
+        except exceptions.CosmosResourceNotFoundError:
+            pass
+        return True
+
+    def update(self, record: dict, owner: str | None) -> bool:
+        """Write *record* back, provided the lease ``owner`` held is still current.
+
+        The ETag from that claim (or its last renewal) pins the lease.
+        """
+        return self._conditional_replace(record)
+
+    def list_dead_letters(self, tenant_id: str, limit: int = 50) -> list[dict]:
+        return [_strip(d) for d in self.container.query_items(
+            query=(
+                "SELECT TOP @limit * FROM c WHERE c.tenant_id = @tenant_id "
+                "AND c.status = @dead ORDER BY c.next_attempt_at DESC"
+            ),
+            parameters=[
+                {"name": "@limit", "value": int(limit)},
+                {"name": "@tenant_id", "value": tenant_id},
+                {"name": "@dead", "value": STATUS_DEAD_LETTER},
+            ],
+            partition_key=tenant_id,
+        )]
+
+    def get(self, tenant_id: str, record_id: str) -> dict | None:
+        try:
+            doc = self.container.read_item(item=record_id, partition_key=tenant_id)
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+        return _strip(doc)
+
+
+class SQLiteOutbox:
+    """Single-host stand-in with the same semantics; claims are atomic UPDATEs."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS webhook_outbox ("
+            " id TEXT PRIMARY KEY, tenant_id TEXT NOT NULL, status TEXT NOT NULL,"
+            " next_attempt_at REAL NOT NULL, lease_owner TEXT, lease_until REAL,"
+            " doc TEXT NOT NULL)"
+        )
+        self._conn().execute(
+            "CREATE INDEX IF NOT EXISTS webhook_outbox_due "
+            "ON webhook_outbox (status, next_attempt_at)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, record: dict) -> None:
+        self._conn().execute(
+            "INSERT INTO webhook_outbox "
+            "(id, tenant_id, status, next_attempt_at, lease_owner, lease_until, doc) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (record["id"], record["tenant_id"], record["status"], record["next_attempt_at"],
+             record.get("lease_owner"), record.get("lease_until"), json.dumps(record)),
+        )
+
+    def claim_due(self, owner: str, limit: int, lease_seconds: float) -> list[dict]:
+        conn = self._conn()
+        now = time.time()
+        rows = conn.execute(
+            "SELECT id, doc FROM webhook_outbox WHERE status = ? AND next_attempt_at <= ? "
+            "AND (lease_until IS NULL OR lease_until <= ?) ORDER BY next_attempt_at LIMIT ?",
+            (STATUS_PENDING, now, now, int(limit)),
+        ).fetchall()
+        claimed = []
+        for record_id, doc in rows:
+            record = json.loads(doc)
+            record.update(lease_owner=lease_token(owner), lease_until=now + lease_seconds)
+            cur = conn.execute(
+                "UPDATE webhook_outbox SET lease_owner = ?, lease_until = ?, doc = ? "
+                "WHERE id = ? AND (lease_until IS NULL OR lease_until <= ?)",
+                (record["lease_owner"], record["lease_until"], json.dumps(record), record_id, now),
+            )
+            if cur.rowcount == 1:
+                claimed.append(record)
+        return claimed
+
+    def renew(self, record: dict, lease_seconds: float) -> bool:
+        renewed = dict(record, lease_until=time.time() + lease_seconds)
+        cur = self._conn().execute(
+            "UPDATE webhook_outbox SET lease_until = ?, doc = ? WHERE id = ? AND lease_owner = ?",
+            (renewed["lease_until"], json.dumps(renewed), record["id"], record.get("lease_owner")),
+        )
+        if cur.rowcount != 1:
+            return False
+        record.update(renewed)
+        return True
+
+    def complete(self, record: dict) -> bool:
+        cur = self._conn().execute(
+            "DELETE FROM webhook_outbox WHERE id = ? AND lease_owner IS ?",
+            (record["id"], record.get("lease_owner")),
+        )
+        return cur.rowcount == 1
+
+    def update(self, record: dict, owner: str | None) -> bool:
+        """Write *record* back, provided the lease ``owner`` held is still current."""
+        cur = self._conn().execute(
+            "UPDATE webhook_outbox SET tenant_id = ?, status = ?, next_attempt_at = ?, "
+            "lease_owner = ?, lease_until = ?, doc = ? WHERE id = ? AND lease_owner IS ?",
+            (record["tenant_id"], record["status"], record["next_attempt_at"],
+             record.get("lease_owner"), record.get("lease_until"), json.dumps(record),
+             record["id"], owner),
+        )
+        return cur.rowcount == 1
+
+    def list_dead_letters(self, tenant_id: str, limit: int = 50) -> list[dict]:
+        rows = self._conn().execute(
+            "SELECT doc FROM webhook_outbox WHERE tenant_id = ? AND status = ? "
+            "ORDER BY next_attempt_at DESC LIMIT ?",
+            (tenant_id, STATUS_DEAD_LETTER, int(limit)),
+        ).fetchall()
+        return [json.loads(doc) for (doc,) in rows]
+
+    def get(self, tenant_id: str, record_id: str) -> dict | None:
+        row = self._conn().execute(
+            "SELECT doc FROM webhook_outbox WHERE id = ? AND tenant_id = ?", (record_id, tenant_id)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def pending_count(self) -> int:
+        row = self._conn().execute(
+            "SELECT COUNT(*) FROM webhook_outbox WHERE status = ?", (STATUS_PENDING,)
+        ).fetchone()
+        return int(row[0]) if row else 0
+
+
+_outbox_lock = threading.Lock()
+_outbox = None
+
+
+def get_outbox():
+    """Return the process-wide outbox backend selected by WEBHOOK_OUTBOX_BACKEND."""
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            kind = (os.getenv("WEBHOOK_OUTBOX_BACKEND") or "cosmos").strip().lower()
+            if kind == "sqlite":
+                path = os.getenv("WEBHOOK_OUTBOX_SQLITE_PATH") or os.path.join(
+                    tempfile.gettempdir(), "smart_invoice_pro_webhook_outbox.sqlite3"
+                )
+                _outbox = SQLiteOutbox(path)
+            else:
+                _outbox = CosmosOutbox()
+        return _outbox
+
+
+def reset_outbox() -> None:
+    """Testing helper — rebuild the backend from env on next use."""
+    global _outbox
+    with _outbox_lock:
+        _outbox = None
@@ -19,6 +19,12 @@ import pytest
 # deterministic even when .env contains BANK_IMPORT_ASYNC=true.
 os.environ.setdefault("BANK_IMPORT_ASYNC", "false")
 os.environ.setdefault("CRON_SECRET", "test-cron-secret")
+# PDF render cache off by default; tests/test_pdf_cache.py enables it per test.
+os.environ.setdefault("PDF_CACHE_BACKEND", "off")
+# No background job-queue workers; tests drain the queue explicitly.
+os.environ.setdefault("JOB_WORKER_THREADS", "0")
+# Nor webhook delivery threads; tests drain the outbox explicitly.
+os.environ.setdefault("WEBHOOK_WORKERS", "0")
 
 CRON_SECRET = os.environ["CRON_SECRET"]
 
@@ -85,6 +91,21 @@ def _mock_container():
     return c
 
 
+def _missing_doc_container():
+    """Container mock whose point reads raise 404 (no document yet)."""
+    from azure.cosmos import exceptions
+    c = _mock_container()
+    c.read_item.side_effect = exceptions.CosmosResourceNotFoundError(message="Not found")
+    return c
+
+
+# Containers whose point reads must behave like an empty container.
+_MISSING_DOC_PATCHES = {
+    "smart_invoice_pro.utils.dashboard_rollups.dashboard_rollups_container",
+    "smart_invoice_pro.utils.stock_balances.stock_balances_container",
+}
+
+
 # ── The big list of container patches ───────────────────────────────────────
 # Each entry is the full dotted path to the container object that needs mocking
 # in a given API module.
@@ -112,6 +133,11 @@ _CONTAINER_PATCHES = [
     # Stock utils (shared helpers used by invoices, bills, stock_api)
     "smart_invoice_pro.utils.stock_utils.stock_container",
     "smart_invoice_pro.utils.stock_utils.products_container",
+    # Materialized stock balances
+    "smart_invoice_pro.utils.stock_balances.stock_balances_container",
+    "smart_invoice_pro.utils.stock_balances.stock_container",
+    # Report snapshots (invalidated by dashboard_rollups on financial writes)
+    "smart_invoice_pro.utils.report_snapshots.report_snapshots_container",
     # Payments
     "smart_invoice_pro.api.payments_api.get_container",
     # Dashboard
@@ -121,9 +147,22 @@ _CONTAINER_PATCHES = [
     "smart_invoice_pro.api.dashboard_api.bills_container",
     "smart_invoice_pro.api.dashboard_api.expenses_container",
     "smart_invoice_pro.api.dashboard_api.stock_container",
+    # Dashboard rollups (written by invoice/bill/expense/customer/product APIs)
+    "smart_invoice_pro.utils.dashboard_rollups.dashboard_rollups_container",
     # Webhook dispatcher (prevent real HTTP calls)
     "smart_invoice_pro.utils.webhook_dispatcher.settings_container",
     "smart_invoice_pro.utils.webhook_dispatcher.webhook_logs_container",
+    "smart_invoice_pro.utils.webhook_outbox.webhook_outbox_container",
+    "smart_invoice_pro.utils.job_queue.job_queue_container",
+    "smart_invoice_pro.utils.scheduler_leases.scheduler_leases_container",
+    "smart_invoice_pro.utils.scheduler_leases.scheduler_runs_container",
+    "smart_invoice_pro.services.recurring_engine.invoices_container",
+    "smart_invoice_pro.services.recurring_engine.recurring_profiles_container",
+    "smart_invoice_pro.services.recurring_engine.recurring_run_checkpoints_container",
+    "smart_invoice_pro.utils.reminder_schedule.reminder_due_container",
+    "smart_invoice_pro.utils.reminder_schedule.invoices_container",
+    "smart_invoice_pro.utils.reminder_schedule.settings_container",
+    "smart_invoice_pro.utils.reminder_schedule.tenants_container",
     # Integrations settings (webhook logs endpoint)
     "smart_invoice_pro.api.integrations_settings_api.webhook_logs_container",
     # Notifications
@@ -140,6 +179,8 @@ _CONTAINER_PATCHES = [
     "smart_invoice_pro.api.branding_api.settings_container",
     "smart_invoice_pro.api.automation_settings_api.settings_container",
     "smart_invoice_pro.api.integrations_settings_api.settings_container",
+    # Tenant settings snapshot (org profile / invoice prefs on the create path)
+    "smart_invoice_pro.utils.tenant_settings.settings_container",
     # Roles
     "smart_invoice_pro.api.roles_api.users_container",
     "smart_invoice_pro.api.roles_api.invoices_container",
@@ -179,6 +220,15 @@ _CONTAINER_PATCHES = [
     "smart_invoice_pro.services.bank_import.import_workflow_service.bank_import_jobs_container",
     "smart_invoice_pro.services.bank_import.import_workflow_service.bank_import_rows_container",
     "smart_invoice_pro.services.bank_import.import_workflow_service.bank_import_artifacts_container",
+    "smart_invoice_pro.services.bank_import.fingerprint_index.bank_txn_fingerprints_container",
+    # Bulk PDF export
+    "smart_invoice_pro.services.pdf_export.bulk_export_service.pdf_export_jobs_container",
+    "smart_invoice_pro.services.pdf_export.bulk_export_service.invoices_container",
+    # Batched AI reconciliation job
+    "smart_invoice_pro.services.ai_match_job.ai_match_jobs_container",
+    "smart_invoice_pro.services.ai_match_job.bank_transactions_container",
+    "smart_invoice_pro.services.ai_match_job.invoices_container",
+    "smart_invoice_pro.services.ai_match_job.expenses_container",
     # Roles (purchase orders for approval workflow)
     "smart_invoice_pro.api.roles_api.purchase_orders_container",
     # Roles permissions
@@ -205,6 +255,24 @@ _CONTAINER_PATCHES = [
 ]
 
 
+@pytest.fixture(autouse=True)
+def _reset_permission_cache():
+    """Process-level RBAC cache must not leak resolved users between tests."""
+    from smart_invoice_pro.utils.permission_cache import clear_permission_cache
+    clear_permission_cache()
+    yield
+    clear_permission_cache()
+
+
+@pytest.fixture(autouse=True)
+def _reset_tenant_settings_cache():
+    """Settings snapshots are cached per process; start every test cold."""
+    from smart_invoice_pro.utils.tenant_settings import reset_tenant_settings_cache
+    reset_tenant_settings_cache()
+    yield
+    reset_tenant_settings_cache()
+
+
 @pytest.fixture()
 def app():
     """Create Flask app with all container objects mocked."""
@@ -212,7 +280,8 @@ def app():
     mocks = {}
     for target in _CONTAINER_PATCHES:
         try:
-            p = patch(target, new_callable=_mock_container)
+            factory = _missing_doc_container if target in _MISSING_DOC_PATCHES else _mock_container
+            p = patch(target, new_callable=factory)
             mocks[target] = p.start()
             patchers.append(p)
         except Exception:
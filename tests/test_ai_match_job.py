@@ -0,0 +1,214 @@
+"""Tests for batched AI reconciliation (ai_match_batch + the background job)."""
+
+import copy
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from smart_invoice_pro.services import ai_match_job as job_svc
+from smart_invoice_pro.services import ai_reconciliation_service as ai
+from smart_invoice_pro.utils import job_queue as jq
+from smart_invoice_pro.utils.shared_cache import reset_caches
+from tests.conftest import TENANT_A, TENANT_B, USER_A, USER_B, auth_headers
+
+
+class FakeJobs:
+    """In-memory ai_match_jobs container."""
+
+    def __init__(self):
+        self.docs = {}
+
+    def create_item(self, body):
+        self.docs[body["id"]] = copy.deepcopy(body)
+        return body
+
+    def replace_item(self, item, body):
+        self.docs[item] = copy.deepcopy(body)
+        return body
+
+    def query_items(self, query, parameters=None, **kwargs):
+        values = {p["name"]: p["value"] for p in parameters or []}
+        doc = self.docs.get(values.get("@id"))
+        return [copy.deepcopy(doc)] if doc and doc["tenant_id"] == values.get("@tid") else []
+
+
+def _txn(n, amount, description="Payment"):
+    return {"id": f"txn-{n}", "user_id": USER_A, "tenant_id": TENANT_A, "amount": amount,
+            "date": "2026-03-10", "description": f"{description} {n}", "match_status": "unmatched"}
+
+
+def _inv(n, due):
+    return {"id": f"inv-{n}", "invoice_number": f"INV-{n}", "customer_name": f"Customer {n}",
+            "balance_due": due, "due_date": "2026-03-05"}
+
+
+@pytest.fixture(autouse=True)
+def _cold_cache():
+    reset_caches()
+    yield
+    reset_caches()
+
+
+@pytest.fixture
+def job_env(monkeypatch):
+    monkeypatch.setenv("AI_MATCH_RATE_PER_MINUTE", "0")
+    jobs = FakeJobs()
+    txns, invoices, expenses = MagicMock(), MagicMock(), MagicMock()
+    invoices.query_items.return_value = []
+    expenses.query_items.return_value = []
+
+    def _txn_query(query, **kwargs):
+        return [] if "match_status = 'matched'" in query else copy.deepcopy(txns.rows)
+
+    txns.rows = []
+    txns.query_items.side_effect = _txn_query
+    with patch.object(job_svc, "ai_match_jobs_container", jobs), \
+         patch.object(job_svc, "bank_transactions_container", txns), \
+         patch.object(job_svc, "invoices_container", invoices), \
+         patch.object(job_svc, "expenses_container", expenses):
+        yield jobs, txns, invoices, expenses
+
+
+class TestAiMatchBatch:
+    def test_answers_are_validated_against_each_transactions_own_shortlist(self):
+        reply = {"matches": [
+            {"transaction_id": "txn-1", "match_type": "invoice", "match_id": "inv-2", "confidence": 0.9},
+            {"transaction_id": "txn-2", "match_type": "invoice", "match_id": "inv-2", "confidence": 0.95},
+        ]}
+        client = MagicMock()
+        client.messages.create.return_value.content = [MagicMock(text=json.dumps(reply))]
+        items = [(_txn(1, 100.0), [_inv(1, 100.0)], []), (_txn(2, 200.0), [_inv(2, 200.0)], [])]
+
+        suggestions = ai.ai_match_batch(items, client=client, model="test-model")
+
+        assert client.messages.create.call_count == 1
+        assert suggestions["txn-1"]["match_id"] is None          # inv-2 was not offered to txn-1
+        assert suggestions["txn-2"]["match_id"] == "inv-2"
+
+    def test_cache_identity_ignores_candidate_order(self):
+        a, b = _inv(1, 100.0), _inv(2, 120.0)
+        assert ai.candidate_set_hash([a, b], []) == ai.candidate_set_hash([b, a], [])
+        assert ai.candidate_set_hash([a], []) != ai.candidate_set_hash([a, b], [])
+        assert ai.transaction_fingerprint(_txn(1, 10.0)) != ai.transaction_fingerprint(_txn(1, 11.0))
+
+
+class TestAiMatchJob:
+    def test_batches_prefilter_and_apply_each_candidate_once(self, job_env, monkeypatch):
+        monkeypatch.setenv("AI_MATCH_BATCH_SIZE", "10")
+        jobs, txns, invoices, _ = job_env
+        txns.rows = [_txn(n, 100.0 + n) for n in range(24)] + [_txn(99, 5000.0), _txn(98, 101.0)]
+        invoices.query_items.return_value = [_inv(n, 100.0 + n) for n in range(24)]
+        client = ai.LocalMatchClient()
+
+        job = job_svc.create_ai_match_job(tenant_id=TENANT_A, user_id=USER_A, client=client)
+
+        assert job["status"] == "completed" and job["progress"] == 100
+        assert job["total"] == 26 and job["processed"] == 26
+        assert job["skipped"] == 1                      # 5000.00 has no candidate in range
+        assert client.calls == job["ai_requests"] == 3  # 25 transactions, 10 per prompt
+        shortlist = json.loads(client.requests[0][0]["content"].split("<input>")[1].split("</input>")[0])
+        assert all(len(t["invoices"]) <= 5 for t in shortlist["transactions"])
+        written = [op[1][1] for call in txns.execute_item_batch.call_args_list
+                   for op in call.kwargs["batch_operations"]]
+        assert job["newly_matched"] == len(written) == 24
+        assert len({t["match_id"] for t in written}) == 24
+        assert jobs.docs[job["id"]]["status"] == "completed"
+
+    def test_second_run_is_served_from_cache(self, job_env):
+        _, txns, invoices, _ = job_env
+        txns.rows = [_txn(n, 100.0 + n) for n in range(5)]
+        invoices.query_items.return_value = [_inv(n, 100.0 + n) for n in range(5)]
+        client = ai.LocalMatchClient()
+
+        job_svc.create_ai_match_job(tenant_id=TENANT_A, user_id=USER_A, client=client)
+        again = job_svc.create_ai_match_job(tenant_id=TENANT_A, user_id=USER_A, client=client)
+
+        assert client.calls == 1
+        assert again["cache_hits"] == 5 and again["ai_requests"] == 0
+
+    def test_failed_batches_are_counted_not_cached(self, job_env):
+        _, txns, invoices, _ = job_env
+        txns.rows = [_txn(1, 100.0)]
+        invoices.query_items.return_value = [_inv(1, 100.0)]
+        client = MagicMock()
+        client.messages.create.side_effect = [RuntimeError("overloaded"), ai.LocalMatchClient().create(
+            model="m", max_tokens=1, system="",
+            messages=[{"role": "user", "content": ai._batch_message([(_txn(1, 100.0), [_inv(1, 100.0)], [])])}],
+        )]
+
+        first = job_svc.create_ai_match_job(tenant_id=TENANT_A, user_id=USER_A, client=client)
+        second = job_svc.create_ai_match_job(tenant_id=TENANT_A, user_id=USER_A, client=client)
+
+        assert first["status"] == "completed" and first["failed"] == 1 and first["newly_matched"] == 0
+        assert second["cache_hits"] == 0 and second["newly_matched"] == 1
+
+    def test_unmatched_query_binds_ids_as_parameters(self, job_env):
+        _, txns, _, _ = job_env
+        hostile = "t' OR '1'='1"
+
+        job_svc._load_unmatched(USER_A, hostile)
+
+        kwargs = txns.query_items.call_args.kwargs
+        assert hostile not in kwargs["query"] and USER_A not in kwargs["query"]
+        assert {"name": "@tenant_id", "value": hostile} in kwargs["parameters"]
+        assert {"name": "@user_id", "value": USER_A} in kwargs["parameters"]
+
+
+@pytest.fixture
+def queued(job_env, tmp_path, monkeypatch):
+    monkeypatch.setenv("AI_MATCH_ASYNC", "true")
+    monkeypatch.setenv("AI_RECONCILIATION_CLIENT", "local")
+    monkeypatch.setenv("JOB_QUEUE_BACKEND", "sqlite")
+    monkeypatch.setenv("JOB_QUEUE_SQLITE_PATH", str(tmp_path / "jobs.sqlite3"))
+    jq.reset_queue()
+    yield job_env
+    jq.reset_queue()
+
+
+class TestQueuedAiMatch:
+    def test_match_runs_on_the_durable_job_queue(self, queued):
+        jobs, txns, invoices, _ = queued
+        txns.rows = [_txn(1, 250.0)]
+        invoices.query_items.return_value = [_inv(1, 250.0)]
+
+        job = job_svc.create_ai_match_job(tenant_id=TENANT_A, user_id=USER_A)
+        assert job["status"] == "queued"
+
+        assert jq.drain_job_queue([job_svc.JOB_KIND])["completed"] == 1
+        done = jobs.docs[job["id"]]
+        assert done["status"] == "completed" and done["newly_matched"] == 1
+
+    def test_outage_is_retried_and_dead_letter_fails_the_job(self, queued):
+        jobs, txns, _, _ = queued
+        job = job_svc.create_ai_match_job(tenant_id=TENANT_A, user_id=USER_A)
+        txns.query_items.side_effect = ConnectionError("cosmos unreachable")
+
+        assert jq.drain_job_queue([job_svc.JOB_KIND])["retry"] == 1
+        assert jobs.docs[job["id"]]["stage"] == "retrying"
+
+        job_svc._match_dead_lettered({"job_id": job["id"]}, {"tenant_id": TENANT_A}, "gave up")
+        assert jobs.docs[job["id"]]["status"] == "failed" and jobs.docs[job["id"]]["error"] == "gave up"
+
+
+class TestAiMatchJobEndpoints:
+    def test_create_and_poll(self, client, headers_a, job_env, monkeypatch):
+        monkeypatch.setenv("AI_RECONCILIATION_CLIENT", "local")
+        _, txns, invoices, _ = job_env
+        txns.rows = [_txn(1, 250.0)]
+        invoices.query_items.return_value = [_inv(1, 250.0)]
+
+        resp = client.post("/api/reconciliation/ai-match-jobs", json={"confidence_threshold": 0.9},
+                           headers=headers_a)
+        assert resp.status_code == 202
+        job = resp.get_json()
+        assert job["status"] == "completed" and job["newly_matched"] == 1
+
+        assert client.get(f"/api/reconciliation/ai-match-jobs/{job['id']}", headers=headers_a).status_code == 200
+        other = auth_headers(user_id=USER_B, tenant_id=TENANT_B)
+        assert client.get(f"/api/reconciliation/ai-match-jobs/{job['id']}", headers=other).status_code == 404
+
+    def test_threshold_is_validated(self, client, headers_a):
+        resp = client.post("/api/reconciliation/ai-match-jobs", json={"confidence_threshold": 3},
+                           headers=headers_a)
+        assert resp.status_code == 400
@@ -397,22 +397,20 @@ class TestAuditExport:
 
     @patch("smart_invoice_pro.api.audit_logs_api.audit_logs_container")
     def test_activity_export_returns_csv(self, mock_ctr, client, headers_a):
-        mock_ctr.query_items.side_effect = [
-            [1],
-            [{
-                "id": "log-export",
-                "tenant_id": TENANT_A,
-                "action": "CREATE",
-                "entity": "invoice",
-                "entity_id": "inv-1",
-                "entity_label": "INV-EXPORT",
-                "summary": "INV-EXPORT created",
-                "user_name": "Test User",
-                "category": "financial",
-                "risk_level": "medium",
-                "created_at": "2026-01-01T10:00:00",
-            }],
-        ]
+        # Streamed export: a single paged query, no COUNT round trip.
+        mock_ctr.query_items.return_value = [{
+            "id": "log-export",
+            "tenant_id": TENANT_A,
+            "action": "CREATE",
+            "entity": "invoice",
+            "entity_id": "inv-1",
+            "entity_label": "INV-EXPORT",
+            "summary": "INV-EXPORT created",
+            "user_name": "Test User",
+            "category": "financial",
+            "risk_level": "medium",
+            "created_at": "2026-01-01T10:00:00",
+        }]
 
         resp = client.get("/api/activity/export?category=financial", headers=headers_a)
         assert resp.status_code == 200
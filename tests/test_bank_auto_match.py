@@ -0,0 +1,111 @@
+"""Tests for the batch bank auto-match engine."""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from smart_invoice_pro.services import bank_auto_match as engine
+from tests.conftest import TENANT_A, USER_A
+
+
+def _inv(id_, due, due_date=None):
+    return {"id": id_, "balance_due": due, "due_date": due_date}
+
+
+def _txn(id_, amount, date=None):
+    return {"id": id_, "amount": amount, "date": date}
+
+
+class TestMatchTransactions:
+    def test_tolerance_matches_legacy_rule(self):
+        invoices = [_inv("in-tol", 1010.0), _inv("out-of-tol", 1011.0)]
+        matches = engine.match_transactions([_txn("t1", -1000.0)], invoices, [])
+        assert matches["t1"].candidate_id == "in-tol"
+        assert engine.match_transactions([_txn("t2", 1000.0)], [_inv("far", 1011.0)], []) == {}
+
+    def test_an_invoice_is_claimed_only_once(self):
+        invoices = [_inv("inv-a", 500.0), _inv("inv-b", 500.0)]
+        txns = [_txn(f"t{i}", 500.0) for i in range(3)]
+        matches = engine.match_transactions(txns, invoices, [])
+        assert sorted(m.candidate_id for m in matches.values()) == ["inv-a", "inv-b"]
+        assert len(matches) == 2
+
+    def test_closer_date_wins_between_equal_amounts(self):
+        invoices = [_inv("march", 800.0, "2026-03-01"), _inv("june", 800.0, "2026-06-01")]
+        matches = engine.match_transactions(
+            [_txn("june-pay", 800.0, "2026-06-03"), _txn("march-pay", 800.0, "2026-03-02")],
+            invoices, [],
+        )
+        assert matches["june-pay"].candidate_id == "june"
+        assert matches["march-pay"].candidate_id == "march"
+
+    def test_losers_retry_against_remaining_candidates(self):
+        invoices = [_inv(f"inv-{i}", 100.0) for i in range(20)]
+        txns = [_txn(f"t{i}", 100.0) for i in range(20)]
+        matches = engine.match_transactions(txns, invoices, [], per_txn=2)
+        assert len({m.candidate_id for m in matches.values()}) == 20
+
+    def test_invoices_take_precedence_over_expenses(self):
+        matches = engine.match_transactions(
+            [_txn("t1", 250.0), _txn("t2", 250.0)],
+            [_inv("inv-1", 250.0)],
+            [{"id": "exp-1", "amount": 250.0}],
+        )
+        assert (matches["t1"].kind, matches["t1"].candidate_id) == ("invoice", "inv-1")
+        assert (matches["t2"].kind, matches["t2"].candidate_id) == ("expense", "exp-1")
+
+
+class TestPersistence:
+    def test_already_claimed_candidates_are_excluded(self):
+        invoices, expenses, txns = MagicMock(), MagicMock(), MagicMock()
+        invoices.query_items.return_value = [_inv("inv-1", 10.0), _inv("inv-2", 10.0)]
+        expenses.query_items.return_value = [{"id": "exp-1", "amount": 10.0}]
+        txns.query_items.return_value = [{"match_type": "invoice", "match_id": "inv-1"}]
+        inv_rows, exp_rows = engine.load_candidates(invoices, expenses, txns, user_id=USER_A, tenant_id=TENANT_A)
+        assert [r["id"] for r in inv_rows] == ["inv-2"]
+        assert [r["id"] for r in exp_rows] == ["exp-1"]
+
+    def test_candidate_queries_are_parameterized_and_tenant_scoped(self):
+        invoices, expenses, txns = MagicMock(), MagicMock(), MagicMock()
+        hostile = "x' OR 1=1 --"
+        engine.load_candidates(invoices, expenses, txns, user_id=hostile, tenant_id=TENANT_A)
+        for container in (invoices, expenses, txns):
+            call = container.query_items.call_args.kwargs
+            assert hostile not in call["query"] and "c.tenant_id = @tenant_id" in call["query"]
+            assert {"name": "@tenant_id", "value": TENANT_A} in call["parameters"]
+
+        with pytest.raises(ValueError):
+            engine.load_candidates(invoices, expenses, txns, user_id=USER_A, tenant_id=None)
+
+    def test_writes_are_batched_with_single_fallback(self):
+        container = MagicMock()
+        docs = [{"id": f"t{i}"} for i in range(150)]
+        assert engine.write_matches(container, docs, partition_key=USER_A) == 150
+        assert container.execute_item_batch.call_count == 2
+        container.replace_item.assert_not_called()
+
+        container.execute_item_batch.side_effect = RuntimeError("batch rejected")
+        assert engine.write_matches(container, docs[:3], partition_key=USER_A) == 3
+        assert container.replace_item.call_count == 3
+
+
+class TestAutoMatchEndpoint:
+    def test_candidates_load_once_for_many_transactions(self, client, headers_a):
+        unmatched = [
+            {"id": f"txn-{i}", "user_id": USER_A, "amount": 100.0 + i, "match_status": "unmatched"}
+            for i in range(25)
+        ]
+        with patch("smart_invoice_pro.api.bank_reconciliation_api.bank_txns_container") as txns, \
+             patch("smart_invoice_pro.api.bank_reconciliation_api.invoices_container") as invoices, \
+             patch("smart_invoice_pro.api.bank_reconciliation_api.expenses_container") as expenses:
+            txns.query_items.return_value = unmatched
+            invoices.query_items.return_value = [_inv(f"inv-{i}", 100.0 + i) for i in range(10)]
+            expenses.query_items.return_value = []
+            resp = client.post("/api/reconciliation/auto-match", headers=headers_a)
+
+        assert resp.status_code == 200
+        assert resp.get_json() == {"processed": 25, "newly_matched": 10}
+        assert invoices.query_items.call_count == 1
+        assert expenses.query_items.call_count == 1
+        batch_ops = txns.execute_item_batch.call_args.kwargs["batch_operations"]
+        assert len(batch_ops) == 10 and batch_ops[0][0] == "replace"
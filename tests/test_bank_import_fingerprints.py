@@ -0,0 +1,176 @@
+"""Tests for the per-bank-account duplicate fingerprint index."""
+
+from unittest.mock import patch
+
+import pytest
+from azure.cosmos.exceptions import CosmosResourceNotFoundError
+
+from smart_invoice_pro.services.bank_import import fingerprint_index as index
+from smart_invoice_pro.services.bank_import import import_workflow_service as svc
+from tests.conftest import TENANT_A, USER_A
+
+API = "smart_invoice_pro.api.bank_reconciliation_api"
+
+SVC = "smart_invoice_pro.services.bank_import.import_workflow_service"
+
+
+class FakeIndex:
+    """In-memory bank_txn_fingerprints container."""
+
+    def __init__(self):
+        self.docs = {}
+        self.queries = []
+
+    def query_items(self, query, parameters=None, **kwargs):
+        values = {p["name"]: p["value"] for p in parameters or []}
+        self.queries.append(values["@month"])
+        return [doc for doc in self.docs.values()
+                if doc["bank_account_id"] == values["@ba"] and doc["month"] == values["@month"]]
+
+    def execute_item_batch(self, batch_operations, partition_key):
+        for _, (doc,) in batch_operations:
+            self.docs[doc["id"]] = doc
+
+    def read_item(self, item, partition_key):
+        if item not in self.docs:
+            raise CosmosResourceNotFoundError(status_code=404, message="missing")
+        return dict(self.docs[item])
+
+    def delete_item(self, item, partition_key):
+        del self.docs[item]
+
+
+@pytest.fixture
+def fake_index():
+    fake = FakeIndex()
+    with patch.object(index, "bank_txn_fingerprints_container", fake):
+        yield fake
+
+
+def _csv(lines):
+    return ("date,description,debit,credit,reference\n" + "\n".join(lines) + "\n").encode()
+
+
+def _import(file_bytes):
+    batch_doc = {"id": "batch-1", "tenant_id": TENANT_A, "user_id": USER_A,
+                 "bank_account_id": "ba-1", "filename": "stmt.csv", "warnings": []}
+    with patch(f"{SVC}.bank_import_rows_container") as rows, \
+         patch(f"{SVC}._replace_job"), patch(f"{SVC}._replace_batch"), \
+         patch(f"{SVC}.log_audit_event"), patch(f"{SVC}.record_domain_event"):
+        batch_doc, _, _ = svc._run_import_job(batch_doc=batch_doc, job_doc={"id": "job-1"},
+                                              file_profile=svc.detect_file_profile("stmt.csv"),
+                                              file_bytes=file_bytes)
+    written = [op[1][0] for c in rows.execute_item_batch.call_args_list for op in c.kwargs["batch_operations"]]
+    return batch_doc, written
+
+
+def _approve(row_docs):
+    """What the approve endpoint does with the batch's rows."""
+    index.assign_fingerprints(row_docs)
+    approved = [r for r in row_docs if r["review_status"] not in ("rejected", "duplicate")]
+    txns = [{"id": f"txn-{r['row_index']}", "bank_account_id": r["bank_account_id"],
+             "date": r["normalized_date"], "fingerprint": r["fingerprint"]} for r in approved]
+    index.record_transactions(TENANT_A, txns)
+    return txns
+
+
+JANUARY = [
+    "2024-01-30,UPI/ACME STORES,250.00,,R1",
+    "2024-01-31,Coffee,4.50,,",
+    "2024-01-31,Coffee,4.50,,",
+]
+FEBRUARY = [
+    "2024-02-01,NEFT CR Customer 7,,1200.00,N77",
+    "2024-02-02,Rent,15000.00,,",
+]
+
+
+class TestFingerprintIndex:
+    def test_overlapping_statement_flags_only_already_approved_rows(self, fake_index):
+        _, rows = _import(_csv(JANUARY))
+        assert all(r["review_status"] != "duplicate" for r in rows)   # repeats in one file are kept
+        assert len({r["fingerprint"] for r in rows}) == 3
+        _approve(rows)
+
+        fake_index.queries.clear()
+        # Same January rows with spacing/case noise, plus new February rows.
+        overlap = ["2024-01-30,upi/acme  stores,250.00,,R1", *JANUARY[1:], *FEBRUARY]
+        batch_doc, rows = _import(_csv(overlap))
+
+        assert [r["review_status"] == "duplicate" for r in rows] == [True, True, True, False, False]
+        assert rows[0]["duplicate_of"] == "txn-1" and "possible_duplicate" in rows[0]["warnings"]
+        assert batch_doc["duplicate_count"] == 3
+        assert any(w["code"] == "DUPLICATE_TRANSACTIONS" for w in batch_doc["warnings"])
+        assert sorted(fake_index.queries) == ["2024-01", "2024-02"]   # one index read per month
+
+    def test_an_extra_repeat_is_new_and_a_different_reference_is_not_a_duplicate(self, fake_index):
+        _, rows = _import(_csv(JANUARY))
+        _approve(rows)
+
+        _, rows = _import(_csv([*JANUARY, "2024-01-31,Coffee,4.50,,", "2024-01-30,UPI/ACME STORES,250.00,,R2"]))
+
+        assert [r["review_status"] == "duplicate" for r in rows] == [True, True, True, False, False]
+
+    def test_reviewer_can_release_a_flagged_row(self, fake_index):
+        _, rows = _import(_csv(JANUARY[:1]))
+        _approve(rows)
+        _, rows = _import(_csv(JANUARY[:1]))
+        assert _approve(rows) == []
+
+        rows[0]["review_status"] = "reviewed"
+        assert len(_approve(rows)) == 1
+
+    def test_new_repeats_and_rejected_rows_keep_their_import_ordinals(self, fake_index):
+        coffee = JANUARY[1]
+        _, rows = _import(_csv([coffee, coffee]))
+        _approve(rows)
+
+        _, rows = _import(_csv([coffee, coffee, coffee]))
+        assert [r["review_status"] == "duplicate" for r in rows] == [True, True, False]
+        _approve(rows)                                  # only the third is new: it stays #3
+        assert len(fake_index.docs) == 3
+
+        _, rows = _import(_csv([coffee, coffee, coffee]))
+        assert all(r["review_status"] == "duplicate" for r in rows)
+
+        _, rows = _import(_csv([JANUARY[0], JANUARY[0]]))
+        rows[0]["review_status"] = "rejected"
+        _approve(rows)
+        _, rows = _import(_csv([JANUARY[0], JANUARY[0]]))
+        assert [r["review_status"] == "duplicate" for r in rows] == [False, True]
+
+    def test_edited_rows_are_fingerprinted_from_their_final_values(self, fake_index):
+        coffee = JANUARY[1]
+        _, rows = _import(_csv([coffee, "2024-01-31,Cofee,4.50,,"]))
+        with patch(f"{SVC}.bank_import_rows_container") as container:
+            container.query_items.return_value = [rows[1]]
+            edited = svc.update_row(tenant_id=TENANT_A, batch_id="batch-1", row_id=rows[1]["id"],
+                                    updates={"description": "Coffee", "review_status": "reviewed"})
+        assert edited["fingerprint_edited"]
+        rows[1] = edited
+        _approve(rows)
+
+        _, rows = _import(_csv([coffee, coffee]))
+        assert all(r["review_status"] == "duplicate" for r in rows)
+
+    def test_a_deleted_transaction_can_be_imported_again(self, client, headers_a, fake_index):
+        _, rows = _import(_csv(JANUARY[:2]))
+        txns = _approve(rows)
+        deleted = {**txns[0], "user_id": USER_A, "tenant_id": TENANT_A}
+
+        with patch(f"{API}.bank_txns_container") as container, patch(f"{API}._audit_banking"):
+            container.query_items.return_value = [deleted]
+            resp = client.delete(f"/api/reconciliation/{deleted['id']}", headers=headers_a)
+        assert resp.status_code == 200
+        assert deleted["fingerprint"] not in fake_index.docs
+
+        _, rows = _import(_csv(JANUARY[:2]))
+        assert [r["review_status"] == "duplicate" for r in rows] == [False, True]
+
+    def test_forgetting_leaves_an_entry_another_transaction_took_over(self, fake_index):
+        _, rows = _import(_csv(JANUARY[:1]))
+        txn = _approve(rows)[0]
+        fake_index.docs[txn["fingerprint"]]["transaction_id"] = "txn-released"
+
+        assert index.forget_transaction(TENANT_A, txn) is False
+        assert txn["fingerprint"] in fake_index.docs
@@ -0,0 +1,110 @@
+"""Tests for the streaming bank statement import pipeline."""
+
+import threading
+import time
+import types
+from unittest.mock import MagicMock, patch
+
+from smart_invoice_pro.services import ai_bank_parser_service as ai_parser
+from smart_invoice_pro.services.bank_import import import_workflow_service as svc
+from tests.conftest import TENANT_A, USER_A
+
+SVC = "smart_invoice_pro.services.bank_import.import_workflow_service"
+
+
+def _csv(rows):
+    lines = ["date,description,debit,credit,balance"]
+    lines += [f"2024-01-{1 + n % 28:02d},Payee {n},,{100 + n}.00,{5000 + n}.00" for n in range(rows)]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def _run(file_bytes, extension="csv"):
+    batch_doc = {"id": "batch-1", "tenant_id": TENANT_A, "user_id": USER_A,
+                 "bank_account_id": "ba-1", "filename": f"stmt.{extension}", "warnings": []}
+    job_doc = {"id": "job-1", "status": "queued"}
+    profile = svc.detect_file_profile(f"stmt.{extension}")
+    return svc._run_import_job(batch_doc=batch_doc, job_doc=job_doc,
+                               file_profile=profile, file_bytes=file_bytes)
+
+
+class TestStreamingImport:
+    def test_rows_are_written_in_batches_and_only_a_preview_is_kept(self, monkeypatch):
+        monkeypatch.setenv("BANK_IMPORT_PREVIEW_ROWS", "5")
+        with patch(f"{SVC}.bank_import_rows_container") as rows, \
+             patch(f"{SVC}._replace_job"), patch(f"{SVC}._replace_batch"), \
+             patch(f"{SVC}.log_audit_event"), patch(f"{SVC}.record_domain_event"):
+            batch_doc, job_doc, preview = _run(_csv(1050))
+
+        assert batch_doc["row_count"] == 1050 and batch_doc["status"] == "review_ready"
+        assert job_doc["status"] == "completed" and job_doc["rows_processed"] == 1050
+        assert len(preview) == 5
+        calls = rows.execute_item_batch.call_args_list
+        assert len(calls) == 11
+        assert all(c.kwargs["partition_key"] == TENANT_A for c in calls)
+        indexes = sorted(op[1][0]["row_index"] for c in calls for op in c.kwargs["batch_operations"])
+        assert indexes == list(range(1, 1051))
+        rows.create_item.assert_not_called()
+
+    def test_in_flight_batches_are_bounded(self, monkeypatch):
+        monkeypatch.setenv("BANK_IMPORT_WRITE_BATCH", "10")
+        monkeypatch.setenv("BANK_IMPORT_WRITE_CONCURRENCY", "2")
+        active, peak, lock = [0], [0], threading.Lock()
+
+        def slow_batch(**kwargs):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.01)
+            with lock:
+                active[0] -= 1
+
+        with patch(f"{SVC}.bank_import_rows_container") as rows, \
+             patch(f"{SVC}._replace_job"), patch(f"{SVC}._replace_batch"), \
+             patch(f"{SVC}.log_audit_event"), patch(f"{SVC}.record_domain_event"):
+            rows.execute_item_batch.side_effect = slow_batch
+            batch_doc, _, _ = _run(_csv(200))
+
+        assert batch_doc["row_count"] == 200
+        assert rows.execute_item_batch.call_count == 20
+        assert peak[0] <= 2
+
+    def test_rejected_batch_falls_back_to_single_creates(self):
+        with patch(f"{SVC}.bank_import_rows_container") as rows, \
+             patch(f"{SVC}._replace_job"), patch(f"{SVC}._replace_batch"), \
+             patch(f"{SVC}.log_audit_event"), patch(f"{SVC}.record_domain_event"):
+            rows.execute_item_batch.side_effect = RuntimeError("request too large")
+            batch_doc, _, _ = _run(b"!Type:Bank\nD01/15/2024\nT-250.00\nPRent\n^\nD01/16/2024\nT90.00\nPRefund\n^\n",
+                                   extension="qif")
+
+        assert batch_doc["row_count"] == 2
+        assert rows.create_item.call_count == 2
+
+    def test_csv_parser_is_lazy(self):
+        stream = iter(["date,description,amount\n", "2024-01-01,First,10\n", "2024-01-02,Second,20\n"])
+        rows = svc._iter_csv(stream)
+        assert isinstance(rows, types.GeneratorType)
+        assert next(rows)["description"] == "First"
+        assert next(stream) == "2024-01-02,Second,20\n"   # the second line has not been read yet
+
+
+class TestXlsxWindows:
+    def test_long_sheets_are_parsed_window_by_window(self, monkeypatch):
+        monkeypatch.setattr(ai_parser, "_MAX_ROWS_FOR_PROMPT", 100)
+        sheet = MagicMock()
+        sheet.iter_rows.return_value = [("Date", "Narration", "Amount")] + [
+            (f"2024-01-{1 + n % 28:02d}", f"UPI {n}", n + 1) for n in range(249)
+        ]
+        calls = []
+
+        def fake_claude(raw_content, context=""):
+            calls.append(context)
+            return [{"date": line.split("\t")[0], "description": line.split("\t")[1], "credit": 1}
+                    for line in raw_content.splitlines() if not line.startswith("Date")]
+
+        with patch.object(ai_parser, "_open_workbook", return_value=MagicMock(active=sheet)), \
+             patch.object(ai_parser, "_call_claude", side_effect=fake_claude):
+            rows = list(ai_parser.iter_xlsx(b"xlsx"))
+
+        assert len(calls) == 3
+        assert calls[0] == "" and all(c.startswith("Date\tNarration") for c in calls[1:])
+        assert [r["row_index"] for r in rows] == list(range(1, 250))
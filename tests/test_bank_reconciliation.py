@@ -446,7 +446,7 @@ class TestAiParseImport:
             ai_rows = [
                 {"row_index": 1, "date": "2026-01-15", "description": "NEFT ACME", "amount": 1180.0, "running_balance": 50000.0, "raw_row": {}, "parser": "ai_claude"},
             ]
-            with patch("smart_invoice_pro.services.ai_bank_parser_service.parse_xlsx", return_value=ai_rows):
+            with patch("smart_invoice_pro.services.ai_bank_parser_service.iter_xlsx", return_value=ai_rows):
                 resp = client.post(
                     "/api/reconciliation/import-batches",
                     data={
@@ -476,7 +476,7 @@ class TestAiParseImport:
                 {"row_index": 1, "date": "2026-02-01", "description": "ATM CASH", "amount": -3500.0, "running_balance": None, "raw_row": {}, "parser": "ai_claude"},
                 {"row_index": 2, "date": "2026-02-05", "description": "UPI ZEPTO", "amount": -299.0, "running_balance": None, "raw_row": {}, "parser": "ai_claude"},
             ]
-            with patch("smart_invoice_pro.services.ai_bank_parser_service.parse_pdf", return_value=ai_rows):
+            with patch("smart_invoice_pro.services.ai_bank_parser_service.iter_pdf", return_value=ai_rows):
                 resp = client.post(
                     "/api/reconciliation/import-batches",
                     data={
@@ -503,7 +503,7 @@ class TestAiParseImport:
             mock_artifacts.create_item.return_value = {}
 
             with patch(
-                "smart_invoice_pro.services.ai_bank_parser_service.parse_xlsx",
+                "smart_invoice_pro.services.ai_bank_parser_service.iter_xlsx",
                 side_effect=RuntimeError("ANTHROPIC_API_KEY is not set"),
             ):
                 resp = client.post(
@@ -549,6 +549,10 @@ class TestDeleteImportBatch:
         data = resp.get_json()
         assert data["deleted"] is True
         assert data["batch_id"] == "batch-del-1"
+        row_query = mock_rows.query_items.call_args.kwargs
+        assert "batch-del-1" not in row_query["query"] and row_query["partition_key"] == TENANT_A
+        assert {"name": "@batch_id", "value": "batch-del-1"} in row_query["parameters"]
+        assert mock_rows.delete_item.call_count == 2
 
     def test_delete_batch_not_found_returns_404(self, client, headers_a):
         """Batch not owned by tenant returns 404."""
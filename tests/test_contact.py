@@ -41,37 +41,40 @@ class TestSendMessage:
         resp = client.post("/api/contact", json=payload, headers=headers_a)
         assert resp.status_code == 400
 
-    @patch("smart_invoice_pro.api.contact_api.CONNECTION_STRING", "endpoint=https://x;accesskey=YOUR_KEY")
-    def test_invalid_connection_string_simulation(self, client, headers_a):
-        """When connection string contains YOUR_KEY, returns simulation message."""
+    @patch("smart_invoice_pro.api.contact_api.queue_email")
+    @patch("smart_invoice_pro.api.contact_api.email_configured", return_value=False)
+    def test_unconfigured_email_simulation(self, _configured, mock_queue, client, headers_a):
+        """Without an email transport the message is only logged."""
         resp = client.post("/api/contact", json=VALID_CONTACT, headers=headers_a)
         assert resp.status_code == 200
         assert "simulation" in resp.get_json()["message"].lower()
+        mock_queue.assert_not_called()
+
+    @patch("smart_invoice_pro.api.contact_api.queue_email")
+    @patch("smart_invoice_pro.api.contact_api.email_configured", return_value=True)
+    def test_queued_email_returns_202_with_outbox_id(self, _configured, mock_queue, client, headers_a):
+        mock_queue.return_value = {"id": "out-1", "status": "queued", "message_id": None, "error": None}
 
-    @patch("smart_invoice_pro.api.contact_api.CONNECTION_STRING", None)
-    def test_no_connection_string_simulation(self, client, headers_a):
         resp = client.post("/api/contact", json=VALID_CONTACT, headers=headers_a)
-        assert resp.status_code == 200
-        assert "simulation" in resp.get_json()["message"].lower()
+        assert resp.status_code == 202
+        body = resp.get_json()
+        assert body["outbox_id"] == "out-1" and body["email_status"] == "queued"
+        mock_queue.assert_called_once()
 
-    @patch("smart_invoice_pro.api.contact_api.EmailClient")
-    @patch("smart_invoice_pro.api.contact_api.CONNECTION_STRING", "endpoint=https://real.com;accesskey=REALKEY")
-    def test_email_sent_successfully(self, mock_email_cls, client, headers_a):
-        mock_client = MagicMock()
-        mock_poller = MagicMock()
-        mock_poller.result.return_value = {"id": "msg-1"}
-        mock_client.begin_send.return_value = mock_poller
-        mock_email_cls.from_connection_string.return_value = mock_client
+    @patch("smart_invoice_pro.api.contact_api.queue_email")
+    @patch("smart_invoice_pro.api.contact_api.email_configured", return_value=True)
+    def test_inline_send_returns_200(self, _configured, mock_queue, client, headers_a):
+        mock_queue.return_value = {"id": "out-2", "status": "sent", "message_id": "m-1", "error": None}
 
         resp = client.post("/api/contact", json=VALID_CONTACT, headers=headers_a)
         assert resp.status_code == 200
         assert "successfully" in resp.get_json()["message"].lower()
-        mock_client.begin_send.assert_called_once()
+        assert resp.get_json()["outbox_id"] == "out-2"
 
-    @patch("smart_invoice_pro.api.contact_api.EmailClient")
-    @patch("smart_invoice_pro.api.contact_api.CONNECTION_STRING", "endpoint=https://real.com;accesskey=REALKEY")
-    def test_email_send_failure(self, mock_email_cls, client, headers_a):
-        mock_email_cls.from_connection_string.side_effect = Exception("Connection refused")
+    @patch("smart_invoice_pro.api.contact_api.queue_email")
+    @patch("smart_invoice_pro.api.contact_api.email_configured", return_value=True)
+    def test_email_send_failure(self, _configured, mock_queue, client, headers_a):
+        mock_queue.side_effect = Exception("Connection refused")
         resp = client.post("/api/contact", json=VALID_CONTACT, headers=headers_a)
         assert resp.status_code == 500
         assert "Failed" in resp.get_json()["error"]
@@ -79,6 +82,6 @@ class TestSendMessage:
     def test_phone_defaults_to_na(self, client, headers_a):
         """When phone is omitted, the code defaults it to 'N/A' (no error)."""
         payload = {k: v for k, v in VALID_CONTACT.items() if k != "phone"}
-        with patch("smart_invoice_pro.api.contact_api.CONNECTION_STRING", "x=YOUR_KEY"):
+        with patch("smart_invoice_pro.api.contact_api.email_configured", return_value=False):
             resp = client.post("/api/contact", json=payload, headers=headers_a)
         assert resp.status_code == 200
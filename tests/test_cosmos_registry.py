@@ -0,0 +1,57 @@
+"""Tests for the lazy, memoized Cosmos container registry."""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from smart_invoice_pro.utils import cosmos_client
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    client = MagicMock()
+    monkeypatch.setattr(cosmos_client, "CosmosClient", MagicMock(return_value=client))
+    monkeypatch.setattr(cosmos_client, "_client", None)
+    monkeypatch.setattr(cosmos_client, "_database", None)
+    monkeypatch.setattr(cosmos_client, "_handles", dict(cosmos_client._handles))
+    monkeypatch.setattr(cosmos_client, "_registry", dict(cosmos_client._registry))
+    return client
+
+
+class TestContainerRegistry:
+    def test_handles_are_memoized_and_resolve_without_control_plane_calls(self, fake_client):
+        handle = cosmos_client.get_container("widgets", "/tenant_id")
+        assert cosmos_client.get_container("widgets", "/tenant_id") is handle
+        assert cosmos_client.CosmosClient.call_count == 0          # nothing happens until first use
+
+        handle.query_items(query="SELECT 1")
+        handle.read_item(item="x", partition_key="t")
+
+        database = fake_client.get_database_client.return_value
+        database.get_container_client.assert_called_once_with("widgets")
+        database.get_container_client.return_value.read_item.assert_called_once()
+        fake_client.create_database_if_not_exists.assert_not_called()
+        database.create_container_if_not_exists.assert_not_called()
+        assert cosmos_client.CosmosClient.call_count == 1
+
+    def test_conflicting_partition_key_is_rejected(self, fake_client):
+        cosmos_client.get_container("widgets", "/tenant_id")
+        with pytest.raises(ValueError, match="partition key"):
+            cosmos_client.get_container("widgets", "/id")
+
+    def test_init_db_provisions_every_registered_container(self, fake_client):
+        cosmos_client.get_container("widgets", "/tenant_id")
+        results = cosmos_client.provision_containers()
+
+        database = fake_client.create_database_if_not_exists.return_value
+        created = {c.kwargs["id"]: c.kwargs["partition_key"]["paths"][0]
+                   for c in database.create_container_if_not_exists.call_args_list}
+        assert created["widgets"] == "/tenant_id" and created["users"] == "/userid"
+        assert set(results) == set(cosmos_client.registered_containers())
+
+    def test_auto_provision_creates_on_first_use(self, fake_client, monkeypatch):
+        monkeypatch.setenv("COSMOS_AUTO_PROVISION", "true")
+        cosmos_client.get_container("widgets", "/tenant_id").upsert_item(body={})
+
+        database = fake_client.create_database_if_not_exists.return_value
+        assert database.create_container_if_not_exists.call_args.kwargs["id"] == "widgets"
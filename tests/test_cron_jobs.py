@@ -170,19 +170,15 @@ class TestCheckLowStock:
 class TestSendLowStockEmail:
     """Unit tests for send_low_stock_email()."""
 
-    @patch("smart_invoice_pro.api.cron_jobs.CONNECTION_STRING", None)
-    def test_no_connection_string(self):
+    @patch("smart_invoice_pro.api.cron_jobs.email_configured", return_value=False)
+    def test_no_connection_string(self, _):
         from smart_invoice_pro.api.cron_jobs import send_low_stock_email
         assert send_low_stock_email([PRODUCT_A]) is False
 
-    @patch("smart_invoice_pro.api.cron_jobs.CONNECTION_STRING", "endpoint=https://x.com;accesskey=KEY")
-    @patch("smart_invoice_pro.api.cron_jobs.EmailClient")
-    def test_email_sent_successfully(self, mock_cls):
-        mock_client = MagicMock()
-        mock_poller = MagicMock()
-        mock_poller.result.return_value = {"id": "msg-123"}
-        mock_client.begin_send.return_value = mock_poller
-        mock_cls.from_connection_string.return_value = mock_client
+    @patch("smart_invoice_pro.api.cron_jobs.email_configured", return_value=True)
+    @patch("smart_invoice_pro.api.cron_jobs.queue_email")
+    def test_email_sent_successfully(self, mock_queue, _):
+        mock_queue.return_value = {"id": "out-1", "status": "queued", "message_id": None, "error": None}
 
         low_stock = {
             "id": "prod-1", "name": "Widget", "current_stock": 5,
@@ -190,12 +186,12 @@ class TestSendLowStockEmail:
         }
         from smart_invoice_pro.api.cron_jobs import send_low_stock_email
         assert send_low_stock_email([low_stock]) is True
-        mock_client.begin_send.assert_called_once()
+        mock_queue.assert_called_once()
 
-    @patch("smart_invoice_pro.api.cron_jobs.CONNECTION_STRING", "endpoint=https://x.com;accesskey=KEY")
-    @patch("smart_invoice_pro.api.cron_jobs.EmailClient")
-    def test_email_send_failure(self, mock_cls):
-        mock_cls.from_connection_string.side_effect = Exception("Cannot connect")
+    @patch("smart_invoice_pro.api.cron_jobs.email_configured", return_value=True)
+    @patch("smart_invoice_pro.api.cron_jobs.queue_email")
+    def test_email_send_failure(self, mock_queue, _):
+        mock_queue.side_effect = Exception("Cannot connect")
 
         low_stock = {
             "id": "prod-1", "name": "Widget", "current_stock": 5,
@@ -254,10 +250,10 @@ SAMPLE_PROFILE = {
 class TestGenerateRecurringInvoices:
     """POST /cron/generate-recurring"""
 
-    @patch("smart_invoice_pro.api.cron_jobs.create_notification")
-    @patch("smart_invoice_pro.api.cron_jobs.log_audit")
-    @patch("smart_invoice_pro.api.cron_jobs.invoices_container")
-    @patch("smart_invoice_pro.api.cron_jobs.recurring_profiles_container")
+    @patch("smart_invoice_pro.services.recurring_engine.create_notification")
+    @patch("smart_invoice_pro.services.recurring_engine.log_audit")
+    @patch("smart_invoice_pro.services.recurring_engine.invoices_container")
+    @patch("smart_invoice_pro.services.recurring_engine.recurring_profiles_container")
     def test_generates_invoice_for_due_profile(
         self, mock_rp, mock_inv, mock_audit, mock_notif, client, cron_headers
     ):
@@ -265,7 +261,7 @@ class TestGenerateRecurringInvoices:
         mock_rp.query_items.return_value = [SAMPLE_PROFILE.copy()]
 
         with patch("smart_invoice_pro.api.recurring_profiles_api.calculate_next_run_date", return_value="2024-02-01"), \
-             patch("smart_invoice_pro.api.invoice_preferences_api.generate_invoice_number", return_value="INV-00042"):
+             patch("smart_invoice_pro.api.invoice_preferences_api.reserve_invoice_numbers", return_value=["INV-00042"]):
             resp = client.post("/api/cron/generate-recurring", headers=cron_headers)
 
         assert resp.status_code == 200
@@ -280,10 +276,10 @@ class TestGenerateRecurringInvoices:
         assert created_inv["customer_id"] == "cust-001"
         assert created_inv["total_amount"] == 590.0   # 500 + 45 + 45
 
-    @patch("smart_invoice_pro.api.cron_jobs.create_notification")
-    @patch("smart_invoice_pro.api.cron_jobs.log_audit")
-    @patch("smart_invoice_pro.api.cron_jobs.invoices_container")
-    @patch("smart_invoice_pro.api.cron_jobs.recurring_profiles_container")
+    @patch("smart_invoice_pro.services.recurring_engine.create_notification")
+    @patch("smart_invoice_pro.services.recurring_engine.log_audit")
+    @patch("smart_invoice_pro.services.recurring_engine.invoices_container")
+    @patch("smart_invoice_pro.services.recurring_engine.recurring_profiles_container")
     def test_auto_send_true_creates_issued_invoice(
         self, mock_rp, mock_inv, mock_audit, mock_notif, client, cron_headers
     ):
@@ -292,17 +288,17 @@ class TestGenerateRecurringInvoices:
         mock_rp.query_items.return_value = [profile]
 
         with patch("smart_invoice_pro.api.recurring_profiles_api.calculate_next_run_date", return_value="2024-02-01"), \
-             patch("smart_invoice_pro.api.invoice_preferences_api.generate_invoice_number", return_value="INV-00043"):
+             patch("smart_invoice_pro.api.invoice_preferences_api.reserve_invoice_numbers", return_value=["INV-00043"]):
             resp = client.post("/api/cron/generate-recurring", headers=cron_headers)
 
         assert resp.status_code == 200
         created_inv = mock_inv.create_item.call_args[1]["body"]
         assert created_inv["status"] == "Issued"
 
-    @patch("smart_invoice_pro.api.cron_jobs.create_notification")
-    @patch("smart_invoice_pro.api.cron_jobs.log_audit")
-    @patch("smart_invoice_pro.api.cron_jobs.invoices_container")
-    @patch("smart_invoice_pro.api.cron_jobs.recurring_profiles_container")
+    @patch("smart_invoice_pro.services.recurring_engine.create_notification")
+    @patch("smart_invoice_pro.services.recurring_engine.log_audit")
+    @patch("smart_invoice_pro.services.recurring_engine.invoices_container")
+    @patch("smart_invoice_pro.services.recurring_engine.recurring_profiles_container")
     def test_profile_next_run_date_advances(
         self, mock_rp, mock_inv, mock_audit, mock_notif, client, cron_headers
     ):
@@ -311,7 +307,7 @@ class TestGenerateRecurringInvoices:
         mock_rp.query_items.return_value = [profile]
 
         with patch("smart_invoice_pro.api.recurring_profiles_api.calculate_next_run_date", return_value="2024-02-15"), \
-             patch("smart_invoice_pro.api.invoice_preferences_api.generate_invoice_number", return_value="INV-00044"):
+             patch("smart_invoice_pro.api.invoice_preferences_api.reserve_invoice_numbers", return_value=["INV-00044"]):
             resp = client.post("/api/cron/generate-recurring", headers=cron_headers)
 
         assert resp.status_code == 200
@@ -319,10 +315,10 @@ class TestGenerateRecurringInvoices:
         assert updated_profile["next_run_date"] == "2024-02-15"
         assert updated_profile["occurrences_created"] == 1
 
-    @patch("smart_invoice_pro.api.cron_jobs.create_notification")
-    @patch("smart_invoice_pro.api.cron_jobs.log_audit")
-    @patch("smart_invoice_pro.api.cron_jobs.invoices_container")
-    @patch("smart_invoice_pro.api.cron_jobs.recurring_profiles_container")
+    @patch("smart_invoice_pro.services.recurring_engine.create_notification")
+    @patch("smart_invoice_pro.services.recurring_engine.log_audit")
+    @patch("smart_invoice_pro.services.recurring_engine.invoices_container")
+    @patch("smart_invoice_pro.services.recurring_engine.recurring_profiles_container")
     def test_marks_completed_when_occurrence_limit_reached(
         self, mock_rp, mock_inv, mock_audit, mock_notif, client, cron_headers
     ):
@@ -336,7 +332,7 @@ class TestGenerateRecurringInvoices:
         mock_rp.query_items.return_value = [profile]
 
         with patch("smart_invoice_pro.api.recurring_profiles_api.calculate_next_run_date", return_value="2024-02-01"), \
-             patch("smart_invoice_pro.api.invoice_preferences_api.generate_invoice_number", return_value="INV-00045"):
+             patch("smart_invoice_pro.api.invoice_preferences_api.reserve_invoice_numbers", return_value=["INV-00045"]):
             resp = client.post("/api/cron/generate-recurring", headers=cron_headers)
 
         assert resp.status_code == 200
@@ -345,8 +341,8 @@ class TestGenerateRecurringInvoices:
         assert updated_profile["status"] == "Completed"
         assert updated_profile["occurrences_created"] == 3
 
-    @patch("smart_invoice_pro.api.cron_jobs.invoices_container")
-    @patch("smart_invoice_pro.api.cron_jobs.recurring_profiles_container")
+    @patch("smart_invoice_pro.services.recurring_engine.invoices_container")
+    @patch("smart_invoice_pro.services.recurring_engine.recurring_profiles_container")
     def test_skips_profile_already_at_limit(self, mock_rp, mock_inv, client, cron_headers):
         """Profile already at occurrence_limit is marked Completed without creating invoice."""
         profile = {
@@ -365,8 +361,8 @@ class TestGenerateRecurringInvoices:
         updated_profile = mock_rp.replace_item.call_args[1]["body"]
         assert updated_profile["status"] == "Completed"
 
-    @patch("smart_invoice_pro.api.cron_jobs.invoices_container")
-    @patch("smart_invoice_pro.api.cron_jobs.recurring_profiles_container")
+    @patch("smart_invoice_pro.services.recurring_engine.invoices_container")
+    @patch("smart_invoice_pro.services.recurring_engine.recurring_profiles_container")
     def test_skips_profile_past_end_date(self, mock_rp, mock_inv, client, cron_headers):
         """Profile with ends_type=on_date and expired end_date is marked Completed, no invoice."""
         profile = {
@@ -384,7 +380,7 @@ class TestGenerateRecurringInvoices:
         updated_profile = mock_rp.replace_item.call_args[1]["body"]
         assert updated_profile["status"] == "Completed"
 
-    @patch("smart_invoice_pro.api.cron_jobs.recurring_profiles_container")
+    @patch("smart_invoice_pro.services.recurring_engine.recurring_profiles_container")
     def test_no_due_profiles_returns_zero(self, mock_rp, client, cron_headers):
         """When no profiles are due, generated_count is 0 with no errors."""
         mock_rp.query_items.return_value = []
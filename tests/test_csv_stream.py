@@ -0,0 +1,107 @@
+"""Tests for the streaming CSV export engine and the endpoints that use it."""
+
+import gzip
+from unittest.mock import patch
+
+from smart_invoice_pro.utils.csv_stream import (
+    CsvColumn,
+    gzip_chunks,
+    iter_csv_chunks,
+    iter_query_pages,
+)
+from tests.conftest import TENANT_A
+
+
+class PagedContainer:
+    """Yields ``rows`` in max_item_count pages and records how many were pulled."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.pages_served = 0
+        self.kwargs = None
+
+    def query_items(self, query, parameters=None, max_item_count=None, **kwargs):
+        self.kwargs = {"max_item_count": max_item_count, **kwargs}
+        container = self
+
+        class _Result:
+            def by_page(self, continuation_token=None):
+                for start in range(0, len(container.rows), max_item_count):
+                    container.pages_served += 1
+                    yield iter(container.rows[start:start + max_item_count])
+
+        return _Result()
+
+
+def _invoices(n):
+    return [{"id": f"inv-{i}", "tenant_id": TENANT_A, "invoice_number": f"INV-{i:05d}",
+             "customer_name": "Acme", "total_amount": i} for i in range(n)]
+
+
+class TestEngine:
+    def test_pages_are_pulled_lazily(self):
+        container = PagedContainer(_invoices(10))
+        pages = iter_query_pages(container, "SELECT * FROM c", [], page_size=3)
+        assert next(pages) == _invoices(3)
+        assert container.pages_served == 1
+        assert sum(len(p) for p in pages) == 7
+        assert container.kwargs["max_item_count"] == 3
+
+    def test_plain_iterables_are_chunked(self):
+        class ListContainer:
+            def query_items(self, **kwargs):
+                return _invoices(5)
+
+        pages = list(iter_query_pages(ListContainer(), "SELECT * FROM c", [], page_size=2))
+        assert [len(p) for p in pages] == [2, 2, 1]
+
+    def test_chunks_are_bounded(self):
+        columns = [CsvColumn("Invoice #", "invoice_number"), CsvColumn("Total", "total_amount", 0)]
+        chunks = list(iter_csv_chunks([_invoices(2000)], columns, chunk_bytes=1024))
+        assert len(chunks) > 10
+        assert max(len(c) for c in chunks) < 1024 + 100
+        lines = "".join(chunks).splitlines()
+        assert lines[0] == "Invoice #,Total" and len(lines) == 2001
+
+    def test_gzip_round_trip(self):
+        text = ["a,b\r\n", "1,2\r\n" * 1000]
+        assert gzip.decompress(b"".join(gzip_chunks(text))).decode() == "".join(text)
+
+
+class TestEndpoints:
+    def test_invoice_export_streams(self, client, headers_a):
+        container = PagedContainer(_invoices(5))
+        with patch("smart_invoice_pro.api.invoices.invoices_container", container):
+            resp = client.get("/api/invoices/export", headers=headers_a)
+            assert resp.is_streamed
+            body = resp.get_data(as_text=True)
+        assert resp.status_code == 200
+        assert body.splitlines()[0].startswith("Invoice #,Customer")
+        assert "INV-00004" in body
+
+    def test_gzip_export(self, client, headers_a):
+        container = PagedContainer(_invoices(3))
+        with patch("smart_invoice_pro.api.invoices.invoices_container", container):
+            resp = client.get("/api/invoices/export?gzip=1", headers=headers_a)
+            raw = resp.get_data()
+        assert resp.mimetype == "application/gzip"
+        assert "invoices-export.csv.gz" in resp.headers["Content-Disposition"]
+        assert "INV-00002" in gzip.decompress(raw).decode()
+
+    def test_query_failure_is_a_json_500(self, client, headers_a):
+        with patch("smart_invoice_pro.api.invoices.invoices_container") as container:
+            container.query_items.side_effect = RuntimeError("cosmos down")
+            resp = client.get("/api/invoices/export", headers=headers_a)
+        assert resp.status_code == 500
+        assert "Failed to export invoices" in resp.get_json()["error"]
+
+    def test_customer_and_bill_exports(self, client, headers_a):
+        customers = PagedContainer([{"id": "c1", "tenant_id": TENANT_A, "display_name": "Acme"}])
+        bills = PagedContainer([{"id": "b1", "tenant_id": TENANT_A, "bill_number": "BILL-1",
+                                 "payment_status": "Unpaid", "total_amount": 50}])
+        with patch("smart_invoice_pro.api.customers_api.customers_container", customers), \
+             patch("smart_invoice_pro.api.bills_api.bills_container", bills):
+            cust = client.get("/api/customers/export", headers=headers_a).get_data(as_text=True)
+            bill = client.get("/api/bills/export", headers=headers_a).get_data(as_text=True)
+        assert "Acme" in cust
+        assert "BILL-1" in bill and ",50," in bill
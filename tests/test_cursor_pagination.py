@@ -0,0 +1,186 @@
+"""Tests for signed continuation-token pagination on list endpoints."""
+
+import re
+from unittest.mock import patch
+
+import pytest
+
+from smart_invoice_pro.utils import cursor_pagination as cp
+from tests.conftest import TENANT_A, TENANT_B
+
+
+class FakeKeysetContainer:
+    """
+    Serves the query shapes fetch_cursor_page issues, the way a cross-partition
+    query behaves: rows come partition by partition, ORDER BY sorts on the one
+    field only (ties keep partition order), and there is no continuation token.
+    Filters other than the cursor's own are ignored.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    def query_items(self, query, parameters=None, **kwargs):
+        assert "by_page" not in kwargs and "max_item_count" not in kwargs
+        self.calls.append({"query": query, "parameters": parameters})
+        params = {p["name"]: p["value"] for p in parameters or []}
+        rows = sorted(self.rows, key=lambda r: r.get("pk", ""))          # partition order
+        order = re.search(r"ORDER BY c\.(\w+) (ASC|DESC)", query)
+        if "@cursor_value" in params:
+            field = re.search(r"\(c\.(\w+) ([<>]) @cursor_value", query)
+            name, op = field.group(1), field.group(2)
+            value, last_id = str(params["@cursor_value"]), params["@cursor_id"]
+
+            def after(a, b):
+                return a < b if op == "<" else a > b
+            rows = [r for r in rows if after(str(r.get(name, "")), value)
+                    or (str(r.get(name, "")) == value and after(r["id"], last_id))]
+        if "@cursor_boundary" in params:
+            name = re.search(r"AND c\.(\w+) = @cursor_boundary", query).group(1)
+            rows = [r for r in rows if r.get(name) == params["@cursor_boundary"]]
+        if order:
+            rows = sorted(rows, key=lambda r: str(r.get(order.group(1), "")),
+                          reverse=order.group(2) == "DESC")
+        top = re.search(r"SELECT TOP (\d+)", query)
+        return rows[:int(top.group(1))] if top else rows
+
+
+def _rows(n):
+    return [{"id": f"r{i}", "tenant_id": TENANT_A, "pk": f"p{i % 3}",
+             "created_at": f"2026-01-{20 - i:02d}"} for i in range(n)]
+
+
+class TestCursorCodec:
+    def test_round_trip(self):
+        token = cp.encode_cursor(TENANT_A, "scope", {"v": "2026-01-01", "id": "r1"})
+        assert cp.decode_cursor(token, TENANT_A, "scope") == {"v": "2026-01-01", "id": "r1"}
+
+    @pytest.mark.parametrize("tenant,scope", [(TENANT_B, "scope"), (TENANT_A, "other")])
+    def test_rejects_foreign_tenant_or_listing(self, tenant, scope):
+        token = cp.encode_cursor(TENANT_A, "scope", "ct-1")
+        with pytest.raises(cp.InvalidCursor):
+            cp.decode_cursor(token, tenant, scope)
+
+    def test_rejects_tampering(self):
+        body, sig = cp.encode_cursor(TENANT_A, "scope", "ct-1").split(".")
+        forged = cp._b64encode(cp._b64decode(body).replace(b"ct-1", b"ct-9"))
+        with pytest.raises(cp.InvalidCursor):
+            cp.decode_cursor(f"{forged}.{sig}", TENANT_A, "scope")
+        with pytest.raises(cp.InvalidCursor):
+            cp.decode_cursor("garbage", TENANT_A, "scope")
+
+    def test_rejects_expired(self, monkeypatch):
+        token = cp.encode_cursor(TENANT_A, "scope", "ct-1")
+        monkeypatch.setenv("CURSOR_MAX_AGE_SECONDS", "10")
+        monkeypatch.setattr(cp.time, "time", lambda: 10**10)
+        with pytest.raises(cp.InvalidCursor):
+            cp.decode_cursor(token, TENANT_A, "scope")
+
+    def test_scope_depends_on_parameters(self):
+        q = "SELECT * FROM c WHERE c.tenant_id = @tenant_id"
+        a = cp.query_scope("invoices", q, [{"name": "@tenant_id", "value": TENANT_A}])
+        b = cp.query_scope("invoices", q, [{"name": "@tenant_id", "value": TENANT_B}])
+        assert a != b
+
+
+class TestFetchCursorPage:
+    @staticmethod
+    def _walk(container, sort_order, limit="2", sort_field="due_date"):
+        seen, args = [], {"paginate": "cursor", "limit": limit}
+        while True:
+            page = cp.fetch_cursor_page(container, "SELECT * FROM c WHERE c.tenant_id = @t", [],
+                                        sort_field=sort_field, sort_order=sort_order,
+                                        tenant_id=TENANT_A, endpoint="x", args=args)
+            seen.extend(item["id"] for item in page.items)
+            if not page.next_cursor:
+                return seen
+            args = {"cursor": page.next_cursor, "limit": limit}
+
+    @pytest.mark.parametrize("sort_order", ["ASC", "DESC"])
+    def test_walks_every_row_once_across_partitions_and_ties(self, sort_order):
+        # Three partitions, runs of equal due dates whose ids interleave across them.
+        rows = [{"id": f"r{i:02d}", "pk": f"p{(i * 7) % 3}", "due_date": f"2026-02-0{i % 4}"}
+                for i in range(11)]
+        expected = [r["id"] for r in sorted(rows, key=lambda r: (r["due_date"], r["id"]),
+                                            reverse=sort_order == "DESC")]
+        for limit in ("1", "2", "3", "5"):
+            assert self._walk(FakeKeysetContainer(rows), sort_order, limit) == expected
+
+    def test_resumes_with_keyset_not_offset(self):
+        container = FakeKeysetContainer(_rows(5))
+        assert self._walk(container, "DESC", sort_field="created_at") == [f"r{i}" for i in range(5)]
+        assert all("OFFSET" not in c["query"] for c in container.calls)
+        resumed = [c for c in container.calls if c["query"].startswith("SELECT TOP 3")][1]
+        names = {p["name"] for p in resumed["parameters"]}
+        assert {"@cursor_value", "@cursor_id"} <= names
+
+    def test_rejects_queries_it_cannot_extend(self):
+        with pytest.raises(ValueError):
+            cp.fetch_cursor_page(FakeKeysetContainer([]), "SELECT * FROM c WHERE 1=1 ORDER BY c.x", [],
+                                 sort_field="x", tenant_id=TENANT_A, endpoint="x", args={})
+
+    def test_limit_is_clamped(self):
+        assert cp.page_limit({"limit": "5000"}) == cp.MAX_PAGE_LIMIT
+        assert cp.page_limit({"limit": "abc"}) == cp.DEFAULT_PAGE_LIMIT
+
+
+class TestListEndpoints:
+    def test_invoices_cursor_mode_skips_offset_and_summary(self, client, headers_a):
+        container = FakeKeysetContainer(_rows(3))
+        with patch("smart_invoice_pro.api.invoices.invoices_container", container):
+            first = client.get("/api/invoices?paginate=cursor&limit=2", headers=headers_a)
+            data = first.get_json()
+            second = client.get(f"/api/invoices?cursor={data['next_cursor']}&limit=2", headers=headers_a)
+
+        assert first.status_code == 200
+        assert [i["id"] for i in data["items"]] == ["r0", "r1"]
+        assert data["has_more"] is True
+        assert second.get_json()["next_cursor"] is None
+        assert all("OFFSET" not in c["query"] for c in container.calls)
+
+    def test_cursor_from_other_filters_is_rejected(self, client, headers_a):
+        container = FakeKeysetContainer(_rows(3))
+        with patch("smart_invoice_pro.api.bills_api.bills_container", container):
+            token = client.get("/api/bills?paginate=cursor&limit=1",
+                               headers=headers_a).get_json()["next_cursor"]
+            resp = client.get(f"/api/bills?cursor={token}&limit=1&vendor_id=v-9", headers=headers_a)
+        assert resp.status_code == 400
+
+    def test_customers_filter_lifecycle_in_sql_and_enrich_page_only(self, client, headers_a):
+        container = FakeKeysetContainer(_rows(2))
+        with patch("smart_invoice_pro.api.customers_api.customers_container", container), \
+             patch("smart_invoice_pro.api.customers_api.invoices_container") as invoices:
+            invoices.query_items.return_value = [
+                {"customer_id": "r0", "balance_due": 40, "status": "Issued", "due_date": "2999-01-01"},
+            ]
+            resp = client.get("/api/customers?paginate=cursor", headers=headers_a)
+        body = resp.get_json()
+        assert body["data"][0]["outstanding_amount"] == 40
+        assert "@archived_status" in container.calls[0]["query"]
+        params = invoices.query_items.call_args.kwargs["parameters"]
+        assert {"name": "@customer_ids", "value": ["r0", "r1"]} in params
+
+    def test_products_expenses_and_vendors(self, client, headers_a):
+        products, expenses, vendors = (FakeKeysetContainer(_rows(1)) for _ in range(3))
+        with patch("smart_invoice_pro.api.product_api.products_container", products), \
+             patch("smart_invoice_pro.api.product_api.load_stock_map", return_value={"r0": 7.0}), \
+             patch("smart_invoice_pro.api.expenses_api.expenses_container", expenses), \
+             patch("smart_invoice_pro.api.vendors_api.vendors_container", vendors), \
+             patch("smart_invoice_pro.api.vendors_api.bills_container") as bills:
+            bills.query_items.return_value = []
+            prod = client.get("/api/products?paginate=cursor", headers=headers_a).get_json()
+            exp = client.get("/api/expenses?paginate=cursor", headers=headers_a).get_json()
+            ven = client.get("/api/vendors?paginate=cursor", headers=headers_a).get_json()
+            derived = client.get("/api/vendors?paginate=cursor&sort_by=outstanding_amount",
+                                 headers=headers_a)
+        assert prod["data"][0]["stock"] == 7.0
+        assert exp["data"][0]["id"] == "r0" and exp["next_cursor"] is None
+        assert ven["data"][0]["outstanding_amount"] == 0.0
+        assert derived.status_code == 400
+
+    def test_legacy_response_unchanged(self, client, headers_a):
+        with patch("smart_invoice_pro.api.invoices.invoices_container") as container:
+            container.query_items.return_value = [{"id": "r0", "tenant_id": TENANT_A}]
+            resp = client.get("/api/invoices", headers=headers_a)
+        assert isinstance(resp.get_json(), list)
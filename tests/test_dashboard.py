@@ -206,6 +206,35 @@ class TestDashboardLowStock:
             assert resp.status_code == 200
             assert resp.get_json() == []
 
+    def test_cached_low_stock_is_cleared_by_stock_and_product_writes(self, app, client, headers_a):
+        from smart_invoice_pro.utils.shared_cache import reset_caches
+        from smart_invoice_pro.utils.stock_utils import record_stock_transaction
+
+        app.config["TESTING"] = False
+        reset_caches()
+        product = {"id": "p1", "tenant_id": TENANT_A, "name": "Widget", "reorder_level": 10}
+        with patch("smart_invoice_pro.api.dashboard_api.products_container") as mock_prod, \
+             patch("smart_invoice_pro.api.dashboard_api.stock_container") as mock_stock:
+            mock_prod.read_all_items.return_value = [product]
+            mock_stock.query_items.return_value = [{"type": "IN", "quantity": 3}]
+            assert client.get("/api/dashboard/low-stock", headers=headers_a).get_json()[0]["stock"] == 3
+
+            mock_stock.query_items.return_value = [{"type": "IN", "quantity": 8}]
+            assert client.get("/api/dashboard/low-stock", headers=headers_a).get_json()[0]["stock"] == 3
+
+            with patch("smart_invoice_pro.utils.stock_utils.apply_stock_transaction"):
+                record_stock_transaction({"tenant_id": TENANT_A, "product_id": "p1", "type": "IN",
+                                          "quantity": 5}, container=MagicMock())
+            assert client.get("/api/dashboard/low-stock", headers=headers_a).get_json()[0]["stock"] == 8
+
+            with patch("smart_invoice_pro.api.product_api.products_container") as mock_products, \
+                 patch("smart_invoice_pro.api.product_api.log_audit_event"):
+                mock_products.query_items.return_value = [dict(product)]
+                resp = client.put("/api/products/p1", json={"reorder_level": 5}, headers=headers_a)
+                assert resp.status_code == 200
+            product["reorder_level"] = 5
+            assert client.get("/api/dashboard/low-stock", headers=headers_a).get_json() == []
+
 
 class TestDashboardMonthlyRevenue:
     """GET /api/dashboard/monthly-revenue tests."""
@@ -0,0 +1,203 @@
+"""Tests for incrementally maintained dashboard rollups."""
+
+import copy
+import datetime
+from unittest.mock import MagicMock, patch
+
+from azure.cosmos import exceptions
+
+from smart_invoice_pro.utils import dashboard_rollups as rollups
+from tests.conftest import TENANT_A
+
+
+class FakeRollupContainer:
+    """In-memory stand-in supporting the calls dashboard_rollups makes."""
+
+    def __init__(self):
+        self.docs = {}
+
+    def read_item(self, item, partition_key):
+        if item not in self.docs:
+            raise exceptions.CosmosResourceNotFoundError(message="Not found")
+        return copy.deepcopy(self.docs[item])
+
+    def create_item(self, body):
+        if body["id"] in self.docs:
+            raise exceptions.CosmosResourceExistsError(message="Conflict")
+        self.docs[body["id"]] = copy.deepcopy(body)
+        return body
+
+    def upsert_item(self, body):
+        self.docs[body["id"]] = copy.deepcopy(body)
+        return body
+
+    def delete_item(self, item, partition_key):
+        self.docs.pop(item, None)
+
+    def patch_item(self, item, partition_key, patch_operations):
+        if item not in self.docs:
+            raise exceptions.CosmosResourceNotFoundError(message="Not found")
+        doc = self.docs[item]
+        for op in patch_operations:
+            parts = op["path"].strip("/").split("/")
+            target = doc
+            for part in parts[:-1]:
+                target = target[part]
+            target[parts[-1]] = target.get(parts[-1], 0) + op["value"]
+
+    def query_items(self, query, parameters=None, **kwargs):
+        params = {p["name"]: p["value"] for p in parameters or []}
+        rows = [d for d in self.docs.values() if d.get("doc_type") == "day"]
+        if "@start" in params:
+            rows = [d for d in rows if params["@start"] <= d["day"] <= params["@end"]]
+        return [copy.deepcopy(d) for d in rows]
+
+
+def _invoice(**overrides):
+    base = {
+        "id": "inv-1",
+        "tenant_id": TENANT_A,
+        "created_at": "2025-06-01T10:00:00",
+        "due_date": "2025-06-15",
+        "total_amount": 1000.0,
+        "balance_due": 1000.0,
+        "amount_paid": 0.0,
+        "status": "Issued",
+        "payment_history": [],
+    }
+    base.update(overrides)
+    return base
+
+
+class TestRecordRollupChange:
+    def test_create_then_payment_moves_receivables(self):
+        fake = FakeRollupContainer()
+        with patch.object(rollups, "dashboard_rollups_container", fake):
+            inv = _invoice()
+            rollups.record_rollup_change("invoice", None, inv)
+
+            day = fake.docs[f"{TENANT_A}:day:2025-06-01"]
+            assert day["invoices_created"] == 1
+            assert day["revenue"] == 1000.0
+            assert day["receivables"] == 1000.0
+            assert fake.docs[f"{TENANT_A}:totals"]["open_due"] == {"2025-06-15": 1}
+
+            paid = _invoice(
+                status="Paid", balance_due=0.0, amount_paid=1000.0,
+                payment_history=[{"date": "2025-06-10", "amount": 1000.0}],
+            )
+            rollups.record_rollup_change("invoice", inv, paid)
+
+        day = fake.docs[f"{TENANT_A}:day:2025-06-01"]
+        assert day["invoices_created"] == 1
+        assert day["receivables"] == 0
+        assert fake.docs[f"{TENANT_A}:day:2025-06-10"]["payments_received"] == 1000.0
+        assert fake.docs[f"{TENANT_A}:totals"]["open_due"] == {"2025-06-15": 0}
+
+    def test_hard_delete_reverses_contribution(self):
+        fake = FakeRollupContainer()
+        with patch.object(rollups, "dashboard_rollups_container", fake):
+            exp = {"id": "e1", "tenant_id": TENANT_A, "created_at": "2025-06-02", "amount": 250}
+            rollups.record_rollup_change("expense", None, exp)
+            rollups.record_rollup_change("expense", exp, None)
+        assert fake.docs[f"{TENANT_A}:day:2025-06-02"]["expenses_total"] == 0
+
+    def test_unknown_kind_and_missing_tenant_are_ignored(self):
+        fake = FakeRollupContainer()
+        with patch.object(rollups, "dashboard_rollups_container", fake):
+            rollups.record_rollup_change("vendor", None, {"tenant_id": TENANT_A})
+            rollups.record_rollup_change("invoice", None, _invoice(tenant_id=None))
+        assert fake.docs == {}
+
+    def test_container_errors_never_raise(self):
+        with patch.object(rollups, "dashboard_rollups_container") as broken:
+            broken.patch_item.side_effect = RuntimeError("cosmos down")
+            rollups.record_rollup_change("invoice", None, _invoice())
+
+    def test_archive_and_restore_move_the_rollups(self):
+        from smart_invoice_pro.utils.archive_service import archive_entity, restore_entity
+
+        fake = FakeRollupContainer()
+        with patch.object(rollups, "dashboard_rollups_container", fake), \
+             patch("smart_invoice_pro.utils.reminder_schedule.reminder_due_container"):
+            inv = _invoice()
+            rollups.record_rollup_change("invoice", None, inv)
+            archived = archive_entity(MagicMock(), copy.deepcopy(inv), "invoice", TENANT_A, user_id="u1")
+
+            assert fake.docs[f"{TENANT_A}:day:2025-06-01"]["receivables"] == 0
+            assert fake.docs[f"{TENANT_A}:totals"]["open_due"] == {"2025-06-15": 0}
+
+            restored = restore_entity(MagicMock(), archived, "invoice", TENANT_A, user_id="u1")
+            assert restored["status"] == "ACTIVE"
+        # Restored invoices come back as ACTIVE, which is not an open status.
+        assert fake.docs[f"{TENANT_A}:day:2025-06-01"]["invoices_created"] == 1
+
+    def test_rollup_changes_leave_the_reminder_schedule_alone(self):
+        fake = FakeRollupContainer()
+        with patch.object(rollups, "dashboard_rollups_container", fake), \
+             patch("smart_invoice_pro.utils.reminder_schedule.reminder_due_container") as due:
+            rollups.record_rollup_change("invoice", None, _invoice())
+        due.upsert_item.assert_not_called()
+        assert fake.docs[f"{TENANT_A}:day:2025-06-01"]["invoices_created"] == 1
+
+
+class TestRebuildAndRead:
+    def _rebuild(self, fake, invoices=(), customers=(), products=(), bills=(), expenses=()):
+        def _container(rows):
+            m = MagicMock()
+            m.query_items.return_value = list(rows)
+            return m
+
+        with patch.object(rollups, "dashboard_rollups_container", fake), \
+             patch.object(rollups, "invoices_container", _container(invoices)), \
+             patch.object(rollups, "customers_container", _container(customers)), \
+             patch.object(rollups, "products_container", _container(products)), \
+             patch.object(rollups, "bills_container", _container(bills)), \
+             patch.object(rollups, "expenses_container", _container(expenses)):
+            return rollups.rebuild_tenant_rollups(TENANT_A)
+
+    def test_load_requires_rebuild_marker(self):
+        fake = FakeRollupContainer()
+        with patch.object(rollups, "dashboard_rollups_container", fake):
+            rollups.record_rollup_change("invoice", None, _invoice())
+            assert rollups.load_rollups(
+                TENANT_A, datetime.date(2025, 1, 1), datetime.date(2025, 12, 31),
+            ) is None
+
+    def test_rebuild_removes_stale_days(self):
+        fake = FakeRollupContainer()
+        fake.docs[f"{TENANT_A}:day:2020-01-01"] = {
+            "id": f"{TENANT_A}:day:2020-01-01", "tenant_id": TENANT_A,
+            "doc_type": "day", "day": "2020-01-01", "revenue": 99,
+        }
+        result = self._rebuild(fake, invoices=[_invoice()])
+        assert result["stale_removed"] == 1
+        assert f"{TENANT_A}:day:2020-01-01" not in fake.docs
+        assert fake.docs[f"{TENANT_A}:totals"]["rebuilt_at"]
+
+    def test_summary_endpoint_reads_rollups(self, client, headers_a):
+        year = datetime.date.today().year
+        fake = FakeRollupContainer()
+        self._rebuild(
+            fake,
+            invoices=[_invoice(created_at=f"{year}-01-05", due_date="2020-01-01")],
+            customers=[{"id": "c1", "tenant_id": TENANT_A, "created_at": f"{year}-01-02"}],
+            products=[{"id": "p1", "tenant_id": TENANT_A}],
+            bills=[{"tenant_id": TENANT_A, "created_at": f"{year}-01-03",
+                    "total_amount": 300, "payment_status": "Unpaid"}],
+            expenses=[{"tenant_id": TENANT_A, "created_at": f"{year}-01-04", "amount": 50}],
+        )
+        with patch.object(rollups, "dashboard_rollups_container", fake), \
+             patch("smart_invoice_pro.api.dashboard_api.invoices_container") as mock_inv:
+            resp = client.get("/api/dashboard/summary?range=this_year", headers=headers_a)
+            mock_inv.read_all_items.assert_not_called()
+
+        assert resp.status_code == 200
+        data = resp.get_json()
+        assert data["total_customers"] == 1
+        assert data["total_products"] == 1
+        assert data["total_invoices"] == 1
+        assert data["total_revenue"] == 1000.0
+        assert data["total_receivables"] == 1000.0
+        assert data["total_payables"] == 350.0
+        assert data["overdue_count"] == 1
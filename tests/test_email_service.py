@@ -0,0 +1,121 @@
+"""Tests for the pooled email transport and the email outbox."""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+from azure.core.exceptions import HttpResponseError
+
+from smart_invoice_pro.utils import email_service as es
+from smart_invoice_pro.utils import job_queue as jq
+from tests.conftest import TENANT_A
+
+MESSAGE = {
+    "senderAddress": "noreply@example.com",
+    "recipients": {"to": [{"address": "customer@example.com"}]},
+    "content": {"subject": "Invoice INV-001", "html": "<p>hi</p>"},
+}
+TARGET = {"container": "invoices", "id": "inv-1", "partition_key": "cust-1"}
+
+
+@pytest.fixture
+def outbox(tmp_path, monkeypatch):
+    monkeypatch.setenv("EMAIL_TRANSPORT", "fake")
+    monkeypatch.setenv("EMAIL_ASYNC", "true")
+    monkeypatch.setenv("JOB_QUEUE_BACKEND", "sqlite")
+    monkeypatch.setenv("JOB_QUEUE_SQLITE_PATH", str(tmp_path / "jobs.sqlite3"))
+    jq.reset_queue()
+    es.reset_transport()
+    es.reset_rate_limiter()
+    with patch.object(es, "get_container") as get_container:
+        yield es.get_transport(), get_container.return_value
+    jq.reset_queue()
+    es.reset_transport()
+
+
+def _patched_fields(container):
+    fields = {}
+    for call in container.patch_item.call_args_list:
+        fields.update({op["path"].lstrip("/"): op["value"] for op in call.kwargs["patch_operations"]})
+    return fields
+
+
+class TestEmailOutbox:
+    def test_queued_email_is_sent_by_a_worker_and_status_written_back(self, outbox):
+        transport, container = outbox
+        result = es.queue_email(TENANT_A, MESSAGE, target=TARGET, outbox_id="out-1")
+
+        assert result["status"] == "queued" and transport.sent == []
+        assert jq.drain_job_queue([es.EMAIL_JOB_KIND])["completed"] == 1
+        assert transport.sent == [MESSAGE]
+        call = container.patch_item.call_args.kwargs
+        assert call["item"] == "inv-1" and call["partition_key"] == "cust-1"
+        assert call["filter_predicate"] == "FROM c WHERE c.email_outbox_id = 'out-1'"
+        assert _patched_fields(container)["email_status"] == "sent"
+        assert _patched_fields(container)["email_message_id"] == "fake-1"
+
+    def test_transient_failures_retry_and_rejections_fail_the_document(self, outbox):
+        transport, container = outbox
+        transport.failures.append(ConnectionError("reset"))
+        es.queue_email(TENANT_A, MESSAGE, target=TARGET, outbox_id="out-2")
+        assert jq.drain_job_queue([es.EMAIL_JOB_KIND])["retry"] == 1
+        container.patch_item.assert_not_called()
+
+        rejected = HttpResponseError(message="invalid recipient")
+        rejected.status_code = 400
+        transport.failures.append(rejected)
+        with patch.dict("os.environ", {"EMAIL_ASYNC": "false"}):
+            result = es.queue_email(TENANT_A, MESSAGE, target=TARGET, outbox_id="out-3")
+        assert result["status"] == "failed" and "invalid recipient" in result["error"]
+        assert _patched_fields(container)["email_status"] == "failed"
+
+        es._on_dead_letter({"target": TARGET}, {"id": "out-2"}, "ConnectionError: reset")
+        assert container.patch_item.call_args.kwargs["filter_predicate"].endswith("'out-2'")
+
+
+class TestTransport:
+    def test_acs_client_is_created_once_and_shared(self, monkeypatch):
+        monkeypatch.setenv("EMAIL_TRANSPORT", "acs")
+        monkeypatch.setenv("AZURE_EMAIL_CONNECTION_STRING", "endpoint=https://x;accesskey=k")
+        es.reset_transport()
+        try:
+            with patch.object(es, "EmailClient") as client_cls:
+                client = client_cls.from_connection_string.return_value
+                client.begin_send.return_value.result.return_value = {"id": "acs-1"}
+                assert es.send_email_now(MESSAGE) == "acs-1"
+                assert es.send_email_now(MESSAGE) == "acs-1"
+            client_cls.from_connection_string.assert_called_once()
+            assert client.begin_send.call_count == 2
+        finally:
+            es.reset_transport()
+
+    def test_token_bucket_waits_once_the_minute_quota_is_spent(self):
+        clock = MagicMock()
+        clock.now = 100.0
+        clock.monotonic.side_effect = lambda: clock.now
+        clock.sleep.side_effect = lambda seconds: setattr(clock, "now", clock.now + seconds)
+        with patch.object(es, "time", clock):
+            bucket = es._TokenBucket(2)
+            bucket.acquire()
+            bucket.acquire()
+            clock.sleep.assert_not_called()
+            bucket.acquire()
+        assert clock.sleep.call_args.args[0] == pytest.approx(30.0)
+
+
+class TestSendEndpoints:
+    def test_quote_send_returns_once_queued(self, outbox, client, headers_a):
+        transport, _ = outbox
+        quote = {"id": "q-1", "tenant_id": TENANT_A, "customer_id": "cust-1", "quote_number": "QT-001",
+                 "status": "Draft", "customer_email": "buyer@example.com", "items": [], "total_amount": 50}
+        with patch("smart_invoice_pro.api.quotes_api.quotes_container") as quotes, \
+             patch("smart_invoice_pro.api.quotes_api._get_tenant_branding", return_value={}):
+            quotes.query_items.return_value = [quote]
+            resp = client.post("/api/quotes/q-1/send-email", json={}, headers=headers_a)
+
+        assert resp.status_code == 202
+        body = resp.get_json()
+        saved = quotes.replace_item.call_args.kwargs["body"]
+        assert saved["email_status"] == "queued" and saved["email_outbox_id"] == body["outbox_id"]
+        assert saved["status"] == "Sent" and transport.sent == []
+        assert jq.drain_job_queue([es.EMAIL_JOB_KIND])["completed"] == 1
+        assert transport.sent[0]["recipients"]["to"][0]["address"] == "buyer@example.com"
@@ -0,0 +1,119 @@
+"""Tests for the invoice list summary counts and their meta cache."""
+
+from unittest.mock import patch
+
+from smart_invoice_pro.utils.shared_cache import get_cache, reset_caches
+from tests.conftest import TENANT_A
+
+INVOICES = (
+    [{"status": "Paid", "due_date": "2000-01-01"}] * 4
+    + [{"status": "Issued", "due_date": "2000-01-01"}] * 2
+    + [{"status": "Issued", "due_date": "2999-01-01"}] * 3
+    + [{"status": "Overdue", "due_date": "2000-01-01"}]
+    + [{"status": "Draft"}] * 5
+)
+
+
+def _query_router(page_items):
+    """
+    Answers only the query shapes the pinned Cosmos SDK accepts across
+    partitions: cross-partition GROUP BY is rejected, like the gateway does.
+    """
+    calls = []
+
+    def _query_items(query, parameters=None, **kwargs):
+        calls.append(query)
+        if "GROUP BY" in query:
+            raise AssertionError("cross-partition GROUP BY is not supported")
+        params = {p["name"]: p["value"] for p in parameters or []}
+        if "@summary_today" in params:
+            today = params["@summary_today"]
+            return [{"status": r["status"], "overdue": r["status"] == "Overdue" or (
+                r["status"] in ("Issued", "Partially Paid") and r.get("due_date", "9999") < today)}
+                for r in INVOICES]
+        if "COUNT(1)" not in query:
+            return list(page_items)
+        if "@q" in params:
+            return [7]
+        return [len(INVOICES)]
+
+    return _query_items, calls
+
+
+SUMMARY_QUERIES = 2            # one status projection + one total COUNT
+
+
+class TestInvoiceListSummary:
+    def test_summary_from_one_status_projection_and_a_total(self, client, headers_a):
+        router, calls = _query_router([{"id": "inv-1", "tenant_id": TENANT_A}])
+        with patch("smart_invoice_pro.api.invoices.invoices_container") as mock_inv:
+            mock_inv.query_items.side_effect = router
+            resp = client.get("/api/invoices?page=1&page_size=10", headers=headers_a)
+
+        assert resp.status_code == 200
+        data = resp.get_json()
+        assert data["summary"] == {
+            "Draft": 5, "Issued": 5, "Paid": 4, "Overdue": 1, "Cancelled": 0,
+            "Partially Paid": 0, "overdue_count": 3,
+        }
+        assert data["total"] == 15
+        # Page query + summary counts; no GROUP BY, no extra total COUNT.
+        assert len(calls) == 1 + SUMMARY_QUERIES
+        assert not any("GROUP BY" in q for q in calls)
+
+    def test_status_filter_total_comes_from_summary(self, client, headers_a):
+        router, calls = _query_router([])
+        with patch("smart_invoice_pro.api.invoices.invoices_container") as mock_inv:
+            mock_inv.query_items.side_effect = router
+            resp = client.get("/api/invoices?page=1&status=overdue", headers=headers_a)
+        assert resp.get_json()["total"] == 3
+        assert len(calls) == 1 + SUMMARY_QUERIES
+
+    def test_status_outside_the_enum_uses_count_query(self, client, headers_a):
+        router, calls = _query_router([])
+        with patch("smart_invoice_pro.api.invoices.invoices_container") as mock_inv:
+            mock_inv.query_items.side_effect = router
+            resp = client.get("/api/invoices?page=1&status=Void", headers=headers_a)
+        assert resp.status_code == 200
+        assert len(calls) == 2 + SUMMARY_QUERIES
+
+    def test_search_uses_count_query(self, client, headers_a):
+        router, calls = _query_router([])
+        with patch("smart_invoice_pro.api.invoices.invoices_container") as mock_inv:
+            mock_inv.query_items.side_effect = router
+            resp = client.get("/api/invoices?page=1&q=acme", headers=headers_a)
+        assert resp.get_json()["total"] == 7
+        assert len(calls) == 2 + SUMMARY_QUERIES
+
+    def test_meta_cached_between_page_loads(self, app, client, headers_a):
+        reset_caches()
+        app.config["TESTING"] = False
+        router, calls = _query_router([])
+        try:
+            with patch("smart_invoice_pro.api.invoices._list_meta_cache", get_cache("invoice_list_meta")), \
+                 patch("smart_invoice_pro.api.invoices.invoices_container") as mock_inv:
+                mock_inv.query_items.side_effect = router
+                client.get("/api/invoices?page=1&q=acme", headers=headers_a)
+                client.get("/api/invoices?page=2&q=acme", headers=headers_a)
+        finally:
+            reset_caches()
+        # First load: page + summary + count. Second load: page only.
+        assert len(calls) == 3 + SUMMARY_QUERIES
+
+    def test_invoice_write_clears_the_cached_meta(self, app, client, headers_a):
+        from smart_invoice_pro.utils.dashboard_rollups import record_rollup_change
+
+        reset_caches()
+        app.config["TESTING"] = False
+        router, calls = _query_router([])
+        try:
+            with patch("smart_invoice_pro.api.invoices._list_meta_cache", get_cache("invoice_list_meta")), \
+                 patch("smart_invoice_pro.api.invoices.invoices_container") as mock_inv:
+                mock_inv.query_items.side_effect = router
+                client.get("/api/invoices?page=1", headers=headers_a)
+                record_rollup_change("invoice", None, {"id": "inv-9", "tenant_id": TENANT_A, "status": "Draft"})
+                client.get("/api/invoices?page=1", headers=headers_a)
+        finally:
+            reset_caches()
+        # Both loads run page + summary queries: the write dropped the cached meta.
+        assert len(calls) == 2 * (1 + SUMMARY_QUERIES)
@@ -0,0 +1,196 @@
+"""Tests for the durable job queue and the queued bank import."""
+
+import threading
+import time
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from smart_invoice_pro.services.bank_import import import_workflow_service as svc
+from smart_invoice_pro.utils import job_queue as jq
+from tests.conftest import TENANT_A, USER_A
+
+SVC = "smart_invoice_pro.services.bank_import.import_workflow_service"
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setenv("JOB_QUEUE_BACKEND", "sqlite")
+    monkeypatch.setenv("JOB_QUEUE_SQLITE_PATH", str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setenv("JOB_WORKER_THREADS", "0")
+    monkeypatch.setenv("JOB_QUEUE_BACKOFF_BASE_SECONDS", "1")
+    jq.reset_queue()
+    saved = dict(jq._KINDS)
+    yield jq.get_queue()
+    jq.shutdown_job_workers(wait=False)
+    jq._KINDS.clear()
+    jq._KINDS.update(saved)
+    jq.reset_queue()
+
+
+def _expire(queue, message_id):
+    queue._conn().execute("UPDATE job_queue SET next_attempt_at = 0, rank = 0 WHERE id = ?", (message_id,))
+
+
+class TestJobQueue:
+    def test_priority_runs_first_and_claims_are_exclusive(self, queue):
+        ran = []
+        jq.register_job_kind("demo", lambda payload, message: ran.append(payload["n"]))
+        for n, priority in ((1, 0), (2, 0), (3, 2)):
+            jq.enqueue_job("demo", TENANT_A, {"n": n}, priority=priority)
+
+        claimed = queue.claim_due("w1", ["demo"], 1, 60)
+        assert claimed[0]["payload"]["n"] == 3 and claimed[0]["attempts"] == 1
+        assert [m["payload"]["n"] for m in queue.claim_due("w2", ["demo"], 5, 60)] == [1, 2]
+        assert queue.claim_due("w3", ["demo"], 5, 60) == []          # all leased
+
+        assert jq.process_message(claimed[0], queue) == "completed"
+        assert ran == [3] and queue.get(TENANT_A, claimed[0]["id"]) is None
+
+    def test_failures_retry_with_backoff_then_dead_letter(self, queue):
+        dead = []
+        jq.register_job_kind("flaky", lambda payload, message: 1 / 0,
+                             on_dead_letter=lambda payload, message, error: dead.append(error))
+        message = jq.enqueue_job("flaky", TENANT_A, {}, max_attempts=2)
+
+        assert jq.drain_job_queue(["flaky"]) == {"completed": 0, "retry": 1, "dead_letter": 0, "lost": 0}
+        stored = queue.get(TENANT_A, message["id"])
+        assert stored["next_attempt_at"] > time.time() and "ZeroDivisionError" in stored["last_error"]
+        assert jq.drain_job_queue(["flaky"])["retry"] == 0           # not due yet
+
+        _expire(queue, message["id"])
+        assert jq.drain_job_queue(["flaky"])["dead_letter"] == 1
+        assert dead and jq.get_queue().list_dead_letters(TENANT_A)[0]["attempts"] == 2
+
+    def test_crashed_worker_lease_is_reclaimed_and_heartbeats_keep_it(self, queue, monkeypatch):
+        jq.register_job_kind("demo", lambda payload, message: None)
+        message = jq.enqueue_job("demo", TENANT_A, {})
+        stale = queue.claim_due("dead-worker", ["demo"], 1, 0.05)[0]
+        assert queue.heartbeat(stale, 60)                            # alive: lease extended
+        assert queue.claim_due("w2", ["demo"], 1, 60) == []
+
+        queue._conn().execute("UPDATE job_queue SET lease_until = 0 WHERE id = ?", (message["id"],))
+        reclaimed = queue.claim_due("w2", ["demo"], 1, 60)[0]
+        assert reclaimed["attempts"] == 2
+        assert not queue.heartbeat(stale, 60)                        # the old owner lost its lease
+        assert jq.process_message(reclaimed, queue) == "completed"
+
+    def test_cosmos_backend_settles_with_the_same_update_interface(self, queue):
+        container = MagicMock()
+        container.replace_item.side_effect = lambda item, body, **kw: dict(body, _etag="etag-2")
+        cosmos = jq.CosmosJobQueue(container)
+        jq.register_job_kind("flaky", lambda payload, message: 1 / 0)
+        message = {"id": "m-1", "tenant_id": TENANT_A, "kind": "flaky", "payload": {}, "priority": 0,
+                   "attempts": 1, "max_attempts": 3, "lease_owner": "w1/abc", "_etag": "etag-1"}
+
+        assert jq.process_message(message, cosmos) == "retry"
+        call = container.replace_item.call_args.kwargs
+        assert call["etag"] == "etag-1" and call["body"]["lease_owner"] is None
+
+    def test_max_running_caps_a_kind_across_workers(self, queue):
+        release = threading.Event()
+        jq.register_job_kind("capped", lambda payload, message: release.wait(5), max_running=1)
+        for _ in range(3):
+            jq.enqueue_job("capped", TENANT_A, {})
+
+        worker = jq.JobWorker(3, ["capped"]).start()
+        time.sleep(0.3)
+        assert queue.active_count("capped") == 1
+        release.set()
+        worker.stop(wait=True, timeout=5)
+
+
+def test_every_module_registering_a_job_kind_is_loaded_by_workers():
+    root = Path(svc.__file__).resolve().parents[2]
+    registering = {
+        ".".join(path.relative_to(root.parent).with_suffix("").parts)
+        for path in root.rglob("*.py")
+        if path.name != "job_queue.py" and "register_job_kind(" in path.read_text(encoding="utf-8")
+    }
+    assert registering == set(jq.JOB_KIND_MODULES)
+    assert {"bank_import", "email_send", "reminder_schedule_rebuild", "scheduled_job"} <= set(jq.load_job_kinds())
+
+
+@pytest.fixture
+def import_store():
+    """In-memory batch/job/artifact documents behind the import service's containers."""
+    docs = {}
+
+    def store(container):
+        container.create_item.side_effect = lambda body: docs.__setitem__(body["id"], dict(body))
+        container.replace_item.side_effect = lambda item, body: docs.__setitem__(item, dict(body))
+        container.read_item.side_effect = lambda item, partition_key: dict(docs[item])
+        container.query_items.side_effect = lambda query, **kw: [
+            dict(d) for i, d in docs.items() if f"c.id = '{i}'" in query]
+
+    with patch(f"{SVC}.bank_import_batches_container") as batches, \
+         patch(f"{SVC}.bank_import_jobs_container") as jobs, \
+         patch(f"{SVC}.bank_import_artifacts_container") as artifacts, \
+         patch(f"{SVC}.bank_import_rows_container") as rows, \
+         patch(f"{SVC}.log_audit_event"), patch(f"{SVC}.record_domain_event"):
+        for container in (batches, jobs, artifacts):
+            store(container)
+        yield docs, rows
+
+
+def _create_batch(**kwargs):
+    return svc.create_import_batch(
+        tenant_id=TENANT_A, user_id=USER_A, bank_account_id="ba-1", filename="stmt.csv",
+        content_type="text/csv",
+        file_bytes=b"date,description,amount\n2024-01-15,Acme,100.00\n2024-01-16,Rent,-50.00\n",
+        **kwargs,
+    )
+
+
+class TestQueuedBankImport:
+    def test_async_import_is_queued_and_run_from_the_stored_artifact(self, queue, monkeypatch, import_store):
+        monkeypatch.setenv("BANK_IMPORT_ASYNC", "true")
+        docs, rows = import_store
+        batch_doc, job_doc, preview = _create_batch()
+        assert preview == [] and docs[job_doc["id"]]["status"] == "queued"
+        assert queue.get(TENANT_A, job_doc["id"])["kind"] == svc.JOB_KIND
+
+        assert jq.drain_job_queue([svc.JOB_KIND])["completed"] == 1
+
+        assert docs[job_doc["id"]]["status"] == "completed"
+        assert docs[batch_doc["id"]]["row_count"] == 2
+        assert rows.execute_item_batch.call_count == 1
+        assert queue.get(TENANT_A, job_doc["id"]) is None
+
+    def test_transient_failures_retry_and_only_dead_letter_fails_the_job(self, queue, monkeypatch, import_store):
+        monkeypatch.setenv("BANK_IMPORT_ASYNC", "true")
+        docs, _ = import_store
+        batch_doc, job_doc, _ = _create_batch()
+        with patch(f"{SVC}._candidate_stream", side_effect=ConnectionError("reset")):
+            assert jq.drain_job_queue([svc.JOB_KIND])["retry"] == 1
+            assert docs[job_doc["id"]]["status"] == "queued"
+            assert docs[batch_doc["id"]]["status"] == "processing"
+
+            for _ in range(2):
+                _expire(queue, job_doc["id"])
+                outcome = jq.drain_job_queue([svc.JOB_KIND])
+        assert outcome["dead_letter"] == 1
+        assert docs[job_doc["id"]]["status"] == "failed" and "reset" in docs[job_doc["id"]]["error"]
+        assert docs[batch_doc["id"]]["status"] == "failed"
+
+    def test_bad_input_fails_at_once_without_retrying(self, queue, monkeypatch, import_store):
+        monkeypatch.setenv("BANK_IMPORT_ASYNC", "true")
+        docs, _ = import_store
+        _, job_doc, _ = _create_batch()
+        with patch(f"{SVC}._candidate_stream", side_effect=ValueError("not a statement")):
+            assert jq.drain_job_queue([svc.JOB_KIND])["completed"] == 1
+        assert docs[job_doc["id"]]["status"] == "failed"
+
+    def test_file_password_is_encrypted_in_the_queue(self, queue, monkeypatch, import_store):
+        monkeypatch.setenv("BANK_IMPORT_ASYNC", "true")
+        _, job_doc, _ = _create_batch(pdf_password="s3cret-dob")
+        raw = queue._conn().execute("SELECT doc FROM job_queue WHERE id = ?", (job_doc["id"],)).fetchone()[0]
+        assert "s3cret-dob" not in raw
+
+        seen = []
+        real_stream = svc._candidate_stream
+        with patch(f"{SVC}._candidate_stream",
+                   side_effect=lambda profile, data, password="", tenant_id=None: seen.append(password) or real_stream(profile, data)):
+            assert jq.drain_job_queue([svc.JOB_KIND])["completed"] == 1
+        assert seen == ["s3cret-dob"]
@@ -0,0 +1,106 @@
+"""Tests for the content-addressed PDF render cache and pre-rendering."""
+
+import os
+from unittest.mock import patch
+
+import pytest
+
+from smart_invoice_pro.api import invoice_generation as ig
+from smart_invoice_pro.utils import pdf_cache
+from tests.conftest import TENANT_A
+
+INVOICE = {
+    "id": "inv-1", "tenant_id": TENANT_A, "invoice_number": "INV-00001",
+    "customer_name": "Acme", "status": "Issued", "total_amount": 1180.0,
+    "balance_due": 1180.0, "is_gst_applicable": True,
+    "items": [{"name": "Widget", "quantity": 2, "rate": 500, "tax": 18, "amount": 1000}],
+}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setenv("PDF_CACHE_BACKEND", "local")
+    monkeypatch.setenv("PDF_CACHE_DIR", str(tmp_path / "pdf"))
+    pdf_cache.reset_pdf_store()
+    yield pdf_cache.get_pdf_store()
+    pdf_cache.reset_pdf_store()
+
+
+class TestFingerprint:
+    def test_bookkeeping_fields_do_not_change_the_key(self):
+        base = ig.pdf_render_fingerprint(INVOICE)
+        touched = {**INVOICE, "email_status": "sent", "updated_at": "2026-01-01", "_etag": "x"}
+        assert ig.pdf_render_fingerprint(touched) == base
+
+    def test_rendered_inputs_change_the_key(self):
+        base = ig.pdf_render_fingerprint(INVOICE)
+        assert ig.pdf_render_fingerprint({**INVOICE, "balance_due": 0}) != base
+        assert ig.pdf_render_fingerprint(INVOICE, gst_mode="COMPOSITION") != base
+        assert ig.pdf_render_fingerprint(INVOICE, doc_type="quote") != base
+        assert ig.pdf_render_fingerprint(INVOICE, {**ig._DEFAULT_BRANDING, "accent_color": "#000"}) != base
+        with patch.object(ig, "PDF_TEMPLATE_VERSION", ig.PDF_TEMPLATE_VERSION + 1):
+            assert ig.pdf_render_fingerprint(INVOICE) != base
+
+
+class TestRenderCache:
+    def test_second_render_is_a_cache_read(self, store):
+        with patch.object(ig, "build_invoice_pdf", wraps=ig.build_invoice_pdf) as build:
+            first, key = ig.render_pdf_cached(INVOICE, tenant_id=TENANT_A)
+            second, key2 = ig.render_pdf_cached(INVOICE, tenant_id=TENANT_A)
+        assert build.call_count == 1
+        assert first == second and key == key2 and first.startswith(b"%PDF")
+
+    def test_local_store_prunes_oldest_first(self, tmp_path):
+        local = pdf_cache.LocalPdfStore(str(tmp_path), max_bytes=250)
+        for i in range(4):
+            local.put(TENANT_A, f"k{i}", b"x" * 100)
+            path = local._path(TENANT_A, f"k{i}")
+            os.utime(path, (1000 + i, 1000 + i))
+        assert local.prune() == 2
+        assert local.get(TENANT_A, "k0") is None
+        assert local.get(TENANT_A, "k3") == b"x" * 100
+
+    def test_prerender_fills_the_cache(self, store, monkeypatch):
+        class InlineExecutor:
+            def submit(self, fn, *args):
+                fn(*args)
+
+        monkeypatch.setattr(ig, "_prerender_executor", lambda: InlineExecutor())
+        monkeypatch.setattr(ig, "branding_for_document", lambda doc, tenant: dict(ig._DEFAULT_BRANDING))
+        assert ig.schedule_pdf_prerender(TENANT_A, INVOICE, gst_mode="FULL_GST") is True
+        key = ig.pdf_render_fingerprint(INVOICE, ig._DEFAULT_BRANDING)
+        assert store.get(TENANT_A, key).startswith(b"%PDF")
+
+    def test_prerender_is_skipped_when_cache_is_off(self, monkeypatch):
+        monkeypatch.setenv("PDF_CACHE_BACKEND", "off")
+        pdf_cache.reset_pdf_store()
+        assert ig.schedule_pdf_prerender(TENANT_A, INVOICE) is False
+        pdf_cache.reset_pdf_store()
+
+
+class TestPdfEndpoint:
+    def test_etag_and_not_modified(self, client, headers_a, store):
+        with patch("smart_invoice_pro.api.invoices.invoices_container") as invoices, \
+             patch.object(ig, "build_invoice_pdf", wraps=ig.build_invoice_pdf) as build:
+            invoices.query_items.return_value = [dict(INVOICE)]
+            first = client.get("/api/invoices/inv-1/pdf", headers=headers_a)
+            etag = first.headers["ETag"]
+            again = client.get("/api/invoices/inv-1/pdf", headers=headers_a)
+            cached = client.get("/api/invoices/inv-1/pdf",
+                                headers={**headers_a, "If-None-Match": etag})
+
+        assert first.status_code == 200 and first.mimetype == "application/pdf"
+        assert etag.startswith('W/"')
+        assert again.get_data() == first.get_data()
+        assert cached.status_code == 304 and cached.get_data() == b""
+        assert build.call_count == 1
+
+    def test_issuing_an_invoice_schedules_prerender(self, client, headers_a):
+        draft = {**INVOICE, "status": "Draft"}
+        with patch("smart_invoice_pro.api.invoices.invoices_container") as invoices, \
+             patch("smart_invoice_pro.api.invoices.schedule_pdf_prerender") as prerender:
+            invoices.query_items.return_value = [dict(draft)]
+            resp = client.patch("/api/invoices/inv-1", json={"status": "Issued"}, headers=headers_a)
+        assert resp.status_code == 200
+        prerender.assert_called_once()
+        assert prerender.call_args.args[1]["status"] == "Issued"
@@ -0,0 +1,235 @@
+"""Tests for the bulk invoice PDF export job."""
+
+import copy
+import io
+import os
+import zipfile
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from smart_invoice_pro.api import invoice_generation as ig
+from smart_invoice_pro.services.pdf_export import bulk_export_service as svc
+from smart_invoice_pro.utils import job_queue as jq
+from tests.conftest import TENANT_A, TENANT_B, auth_headers
+
+INVOICES = [
+    {
+        "id": f"inv-{n}", "tenant_id": TENANT_A, "invoice_number": f"INV/{n:05d}",
+        "customer_id": "cust-1", "customer_name": "Acme", "status": "Issued",
+        "issue_date": f"2026-03-0{n}", "total_amount": 1180.0, "balance_due": 1180.0,
+        "is_gst_applicable": True,
+        "items": [{"name": "Widget", "quantity": 2, "rate": 500, "tax": 18, "amount": 1000}],
+    }
+    for n in range(1, 4)
+]
+
+
+class FakeJobs:
+    """In-memory pdf_export_jobs container."""
+
+    def __init__(self):
+        self.docs = {}
+
+    def create_item(self, body):
+        self.docs[body["id"]] = copy.deepcopy(body)
+        return body
+
+    def replace_item(self, item, body):
+        self.docs[item] = copy.deepcopy(body)
+        return body
+
+    def query_items(self, query, parameters=None, **kwargs):
+        values = {p["name"]: p["value"] for p in parameters or []}
+        doc = self.docs.get(values.get("@id"))
+        return [copy.deepcopy(doc)] if doc and doc["tenant_id"] == values.get("@tid") else []
+
+
+class FakeInvoices:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def query_items(self, query, parameters=None, **kwargs):
+        self.queries.append((query, parameters))
+        if "COUNT(1)" in query:
+            return [len(self.rows)]
+        return [copy.deepcopy(r) for r in self.rows]
+
+
+@pytest.fixture
+def export_env(tmp_path, monkeypatch):
+    monkeypatch.setenv("PDF_EXPORT_DIR", str(tmp_path))
+    monkeypatch.setenv("PDF_EXPORT_PROCESSES", "0")
+    jobs = FakeJobs()
+    invoices = FakeInvoices(INVOICES)
+    with patch.object(svc, "pdf_export_jobs_container", jobs), \
+         patch.object(svc, "invoices_container", invoices), \
+         patch.object(svc, "_get_tenant_branding", return_value=dict(ig._DEFAULT_BRANDING)), \
+         patch.object(svc, "get_org_gst_mode", return_value="FULL_GST"):
+        yield jobs, invoices
+
+
+class TestFilters:
+    def test_filters_are_validated_and_normalized(self):
+        assert svc.normalize_filters({"status": "Issued, Paid", "customer_id": " c1 "}) == {
+            "status": ["Issued", "Paid"], "customer_id": "c1",
+        }
+        with pytest.raises(ValueError):
+            svc.normalize_filters({"date_from": "03/01/2026"})
+        with pytest.raises(ValueError):
+            svc.normalize_filters({"date_from": "2026-03-02", "date_to": "2026-03-01"})
+
+    def test_query_is_tenant_scoped_and_filtered(self):
+        query, params = svc._build_query(TENANT_A, {"date_from": "2026-03-01", "status": ["Paid"]})
+        assert "c.tenant_id = @tenant_id" in query and "ARRAY_CONTAINS(@statuses, c.status)" in query
+        assert {"name": "@date_from", "value": "2026-03-01"} in params
+
+
+class TestExportJob:
+    def test_job_renders_every_invoice_into_the_zip(self, export_env):
+        jobs, _ = export_env
+        job = svc.create_export_job(tenant_id=TENANT_A, user_id="u1", filters={})
+
+        assert job["status"] == "completed" and job["progress"] == 100
+        assert job["total"] == job["processed"] == job["document_count"] == 3
+        with zipfile.ZipFile(job["archive_path"]) as archive:
+            names = archive.namelist()
+            assert names == ["INV-00001.pdf", "INV-00002.pdf", "INV-00003.pdf"]
+            assert all(archive.read(n).startswith(b"%PDF") for n in names)
+        assert jobs.docs[job["id"]]["status"] == "completed"
+
+    def test_render_failure_is_recorded_not_fatal(self, export_env):
+        real = svc.render_pdf_task
+
+        def flaky(task):
+            if task[1]["id"] == "inv-2":
+                raise RuntimeError("boom")
+            return real(task)
+
+        with patch.object(svc, "render_pdf_task", flaky):
+            job = svc.create_export_job(tenant_id=TENANT_A, user_id="u1", filters={})
+        assert job["status"] == "completed" and job["document_count"] == 2
+        assert job["failed_documents"] == [{"invoice_id": "inv-2", "error": "boom"}]
+
+    def test_process_pool_renders_in_worker_processes(self, export_env, monkeypatch):
+        monkeypatch.setenv("PDF_EXPORT_PROCESSES", "2")
+        job = svc.create_export_job(tenant_id=TENANT_A, user_id="u1", filters={})
+        assert job["status"] == "completed" and job["document_count"] == 3
+
+
+@pytest.fixture
+def queued(export_env, tmp_path, monkeypatch):
+    monkeypatch.setenv("PDF_EXPORT_ASYNC", "true")
+    monkeypatch.setenv("JOB_QUEUE_BACKEND", "sqlite")
+    monkeypatch.setenv("JOB_QUEUE_SQLITE_PATH", str(tmp_path / "jobs.sqlite3"))
+    jq.reset_queue()
+    yield export_env
+    jq.reset_queue()
+
+
+class TestRenderPool:
+    def test_pool_children_build_the_app_without_background_work(self):
+        import smart_invoice_pro.app as app_module
+
+        child = SimpleNamespace(name="SpawnProcess-1")   # parent_process() is still None here
+        with patch.object(app_module.multiprocessing, "current_process", return_value=child), \
+             patch.object(app_module, "start_job_workers") as job_workers, \
+             patch.object(app_module, "start_webhook_workers") as webhook_workers, \
+             patch.object(app_module, "start_scheduler") as scheduler, \
+             patch.object(app_module, "_should_start_scheduler", return_value=True):
+            assert app_module.create_app() is not None
+        job_workers.assert_not_called()
+        webhook_workers.assert_not_called()
+        scheduler.assert_not_called()
+
+
+class TestQueuedExport:
+    def test_export_runs_on_the_durable_job_queue(self, queued):
+        jobs, _ = queued
+        job = svc.create_export_job(tenant_id=TENANT_A, user_id="u1", filters={})
+        assert job["status"] == "queued"
+
+        assert jq.drain_job_queue([svc.JOB_KIND])["completed"] == 1
+        done = jobs.docs[job["id"]]
+        assert done["status"] == "completed" and done["document_count"] == 3
+
+    def test_outage_is_retried_and_dead_letter_fails_the_job(self, queued):
+        jobs, invoices = queued
+        job = svc.create_export_job(tenant_id=TENANT_A, user_id="u1", filters={})
+        with patch.object(invoices, "query_items", side_effect=ConnectionError("cosmos unreachable")):
+            assert jq.drain_job_queue([svc.JOB_KIND])["retry"] == 1
+        assert jobs.docs[job["id"]]["stage"] == "retrying"
+
+        svc._export_dead_lettered({"job_id": job["id"]}, {"tenant_id": TENANT_A}, "gave up")
+        assert jobs.docs[job["id"]]["status"] == "failed" and jobs.docs[job["id"]]["error"] == "gave up"
+
+    def test_blob_storage_can_be_required(self, export_env, monkeypatch):
+        monkeypatch.setenv("PDF_EXPORT_STORAGE", "blob")
+        monkeypatch.delenv("PDF_EXPORT_BLOB_CONNECTION_STRING", raising=False)
+        monkeypatch.delenv("AZURE_STORAGE_CONNECTION_STRING", raising=False)
+        job = svc.create_export_job(tenant_id=TENANT_A, user_id="u1", filters={})
+        assert job["status"] == "failed" and "PDF_EXPORT_STORAGE=blob" in job["error"]
+
+
+class TestExportEndpoints:
+    def test_create_poll_and_download(self, client, headers_a, export_env):
+        resp = client.post("/api/invoices/pdf-exports", json={"status": "Issued"}, headers=headers_a)
+        assert resp.status_code == 202
+        job = resp.get_json()
+        assert "archive_path" not in job
+
+        status = client.get(f"/api/invoices/pdf-exports/{job['id']}", headers=headers_a).get_json()
+        assert status["status"] == "completed"
+        download = client.get(status["download_url"], headers=headers_a)
+        assert download.status_code == 200 and download.mimetype == "application/zip"
+        assert len(zipfile.ZipFile(io.BytesIO(download.get_data())).namelist()) == 3
+
+    def test_other_tenant_cannot_see_the_job(self, client, headers_a, export_env):
+        job = client.post("/api/invoices/pdf-exports", json={}, headers=headers_a).get_json()
+        resp = client.get(f"/api/invoices/pdf-exports/{job['id']}",
+                          headers=auth_headers(user_id="user-b", tenant_id=TENANT_B))
+        assert resp.status_code == 404
+
+    def test_bad_filters_and_unfinished_download(self, client, headers_a, export_env):
+        jobs, _ = export_env
+        assert client.post("/api/invoices/pdf-exports", json={"date_to": "nope"},
+                           headers=headers_a).status_code == 400
+        queued = svc._create_job_doc(tenant_id=TENANT_A, user_id="u1", filters={})
+        resp = client.get(f"/api/invoices/pdf-exports/{queued['id']}/download", headers=headers_a)
+        assert resp.status_code == 409
+
+    def test_local_archive_from_another_host_is_reported(self, client, headers_a, export_env):
+        jobs, _ = export_env
+        job = client.post("/api/invoices/pdf-exports", json={}, headers=headers_a).get_json()
+        jobs.docs[job["id"]]["archive_host"] = "worker-elsewhere"
+        resp = client.get(f"/api/invoices/pdf-exports/{job['id']}/download", headers=headers_a)
+        assert resp.status_code == 410 and "worker-elsewhere" in resp.get_json()["error"]
+
+    def test_expired_archive_is_refused(self, client, headers_a, export_env):
+        jobs, _ = export_env
+        job = client.post("/api/invoices/pdf-exports", json={}, headers=headers_a).get_json()
+        jobs.docs[job["id"]]["expires_at"] = "2000-01-01T00:00:00"
+        status = client.get(f"/api/invoices/pdf-exports/{job['id']}", headers=headers_a).get_json()
+        assert "download_url" not in status
+        resp = client.get(f"/api/invoices/pdf-exports/{job['id']}/download", headers=headers_a)
+        assert resp.status_code == 410
+
+
+class TestPruning:
+    def test_expired_blobs_and_files_are_deleted(self, export_env, tmp_path):
+        now = datetime.now(timezone.utc)
+        blobs = MagicMock()
+        blobs.list_blobs.return_value = [
+            SimpleNamespace(name="t/old.zip", last_modified=now - timedelta(days=2)),
+            SimpleNamespace(name="t/new.zip", last_modified=now),
+        ]
+        old_file = tmp_path / "old.zip"
+        old_file.write_bytes(b"zip")
+        os.utime(old_file, (0, 0))
+        with patch.object(svc, "_get_blob_container_client", return_value=blobs):
+            assert svc.prune_expired_exports() == {"local": 1, "blob": 1}
+        blobs.delete_blob.assert_called_once_with("t/old.zip")
+        assert not old_file.exists()
@@ -0,0 +1,156 @@
+"""Tests for chunked PDF bank statement extraction (ai_bank_parser_service.iter_pdf)."""
+
+import io
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import time
+from unittest.mock import patch
+
+import pytest
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Table
+
+from smart_invoice_pro.services import ai_bank_parser_service as parser
+from smart_invoice_pro.utils.shared_cache import get_cache, reset_caches
+from tests.conftest import TENANT_A, TENANT_B
+
+
+def _statement(pages, rows_per_page=4, encrypt=None):
+    buf = io.BytesIO()
+    story = []
+    n = 0
+    for page in range(pages):
+        data = [["Txn Date", "Narration", "Withdrawal Amt", "Deposit Amt", "Closing Balance"]]
+        for _ in range(rows_per_page):
+            n += 1
+            data.append([f"{n:02d}/03/2024", f"UPI PAYEE {n}", f"{n}.00" if n % 2 else "",
+                         "" if n % 2 else f"{n}.50", f"{10000 + n}.00"])
+        story += [Paragraph(f"Statement page {page + 1}", getSampleStyleSheet()["Normal"]),
+                  Table(data), PageBreak()]
+    SimpleDocTemplate(buf, encrypt=encrypt).build(story)
+    return buf.getvalue()
+
+
+def _fake_claude(raw_content, context=""):
+    return [{"date": "2024-03-01", "description": line, "debit": 0, "credit": 1}
+            for line in raw_content.splitlines() if "UPI PAYEE" in line]
+
+
+@pytest.fixture(autouse=True)
+def _inline_extraction(monkeypatch):
+    monkeypatch.setenv("PDF_STATEMENT_PROCESSES", "0")
+    reset_caches()
+    yield
+    reset_caches()
+
+
+class TestChunkedPdf:
+    def test_pages_are_sent_in_chunks_and_reused_from_cache(self, monkeypatch):
+        monkeypatch.setenv("PDF_STATEMENT_PAGES_PER_CHUNK", "2")
+        pdf = _statement(pages=5)
+
+        with patch.object(parser, "_call_claude", side_effect=_fake_claude) as claude:
+            rows = parser.parse_pdf(pdf, tenant_id=TENANT_A)
+        assert claude.call_count == 3
+        contexts = [call.kwargs["context"] for call in claude.call_args_list]
+        assert contexts[0] == "" and all("Statement page 1" in c for c in contexts[1:])
+        assert [r["row_index"] for r in rows] == list(range(1, 21))
+        assert "UPI PAYEE 20" in rows[-1]["description"]
+
+        with patch.object(parser, "_call_claude", side_effect=_fake_claude) as claude:
+            again = parser.parse_pdf(pdf, tenant_id=TENANT_A)
+        claude.assert_not_called()
+        assert again == rows
+
+        with patch.object(parser, "_call_claude", side_effect=_fake_claude) as claude:
+            parser.parse_pdf(pdf, tenant_id=TENANT_B)
+        assert claude.call_count == 3
+
+    def test_failed_chunks_fall_back_to_table_extraction(self):
+        pdf = _statement(pages=1)
+        with patch.object(parser, "_call_claude", side_effect=ValueError("truncated JSON")):
+            rows = parser.parse_pdf(pdf, tenant_id=TENANT_A)
+
+        assert [r["parser"] for r in rows] == ["pdf_table"] * 4
+        assert rows[0]["date"] == "2024-03-01" and rows[0]["amount"] == -1.0
+        assert rows[1]["amount"] == 2.5 and rows[1]["running_balance"] == 10002.0
+        assert rows[0]["description"] == "UPI PAYEE 1"
+
+        # Fallback rows are not cached: a later retry goes back to Claude.
+        with patch.object(parser, "_call_claude", side_effect=_fake_claude) as claude:
+            parser.parse_pdf(pdf, tenant_id=TENANT_A)
+        assert claude.call_count == 1
+
+    def test_llm_error_surfaces_when_no_table_is_found(self):
+        buf = io.BytesIO()
+        SimpleDocTemplate(buf).build([Paragraph("UPI PAYEE 1 paid 100.00 on 01/03/2024",
+                                                getSampleStyleSheet()["Normal"])])
+        with patch.object(parser, "_call_claude", side_effect=RuntimeError("ANTHROPIC_API_KEY is not set")):
+            with pytest.raises(RuntimeError):
+                parser.parse_pdf(buf.getvalue())
+
+    def test_encrypted_pdf_requires_password(self):
+        pdf = _statement(pages=1, encrypt="s3cret")
+        with pytest.raises(ValueError, match="PDF_PASSWORD_REQUIRED"):
+            parser.parse_pdf(pdf)
+        with patch.object(parser, "_call_claude", side_effect=_fake_claude):
+            assert len(parser.parse_pdf(pdf, password="s3cret")) == 4
+
+    def test_decrypted_text_is_never_cached_and_rows_only_briefly(self, monkeypatch):
+        monkeypatch.setenv("PDF_STATEMENT_ENCRYPTED_CACHE_TTL", "60")
+        pdf = _statement(pages=1, encrypt="s3cret")
+        with patch.object(parser, "_call_claude", side_effect=_fake_claude):
+            parser.parse_pdf(pdf, password="s3cret", tenant_id=TENANT_A)
+
+        entries = get_cache(parser._PDF_CACHE_NAMESPACE).backend._entries
+        assert entries and all(key.startswith(f"{parser._PDF_CACHE_NAMESPACE}:{TENANT_A}:") for key in entries)
+        assert all(isinstance(value, list) for _, value in entries.values())   # rows, no page text
+        assert all(expires - time.time() <= 60 for expires, _ in entries.values())
+
+    def test_nothing_is_cached_without_a_tenant(self):
+        with patch.object(parser, "_call_claude", side_effect=_fake_claude):
+            parser.parse_pdf(_statement(pages=1))
+        assert get_cache(parser._PDF_CACHE_NAMESPACE).backend.size() == 0
+
+
+_BOOTING_MAIN = textwrap.dedent("""
+    import json, multiprocessing, os, sys
+    from unittest.mock import MagicMock, patch
+
+    patch("azure.cosmos.CosmosClient", return_value=MagicMock()).start()
+    from smart_invoice_pro.app import create_app
+    from smart_invoice_pro.utils import job_queue
+
+    app = create_app()   # like main.py: the app is built at import
+    with open(os.environ["BOOT_LOG"], "a") as log:
+        log.write(json.dumps({"child": multiprocessing.current_process().name != "MainProcess",
+                              "workers": job_queue._worker is not None}) + "\\n")
+
+    if __name__ == "__main__":
+        from smart_invoice_pro.services import ai_bank_parser_service as parser
+        with open(sys.argv[1], "rb") as fh:
+            pdf = fh.read()
+        with patch.object(parser, "_call_claude", return_value=[]):
+            list(parser.iter_pdf(pdf))
+        job_queue.shutdown_job_workers(wait=False)
+""")
+
+
+def test_extraction_pool_children_do_not_start_background_work(tmp_path):
+    script, pdf, boot_log = tmp_path / "main.py", tmp_path / "statement.pdf", tmp_path / "boot.log"
+    script.write_text(_BOOTING_MAIN)
+    pdf.write_bytes(_statement(pages=2))   # one page per chunk, two pool processes
+    env = {**os.environ, "BOOT_LOG": str(boot_log), "PDF_STATEMENT_PROCESSES": "2",
+           "PDF_STATEMENT_PAGES_PER_CHUNK": "1",
+           "JOB_WORKER_THREADS": "1", "JOB_QUEUE_BACKEND": "sqlite",
+           "JOB_QUEUE_SQLITE_PATH": str(tmp_path / "jobs.sqlite3"), "WEBHOOK_WORKERS": "0",
+           "ENABLE_BACKGROUND_SCHEDULER": "false", "PYTHONPATH": os.getcwd()}
+    env.pop("PYTEST_CURRENT_TEST", None)
+    subprocess.run([sys.executable, str(script), str(pdf)], env=env, check=True, timeout=300)
+
+    boots = [json.loads(line) for line in boot_log.read_text().splitlines()]
+    assert {"child": False, "workers": True} in boots
+    assert {"child": True, "workers": False} in boots
@@ -0,0 +1,70 @@
+"""Tests for compiled ReportLab templates used by build_invoice_pdf."""
+
+import io
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pdfplumber
+import pytest
+from PIL import Image as PILImage
+from reportlab import rl_config
+
+from smart_invoice_pro.api import invoice_generation as ig
+from smart_invoice_pro.utils import pdf_templates
+
+INVOICE = {
+    "invoice_number": "INV-00001", "customer_name": "Acme", "status": "Issued",
+    "total_amount": 1180.0, "balance_due": 1180.0, "is_gst_applicable": True,
+    "items": [{"name": "Widget", "quantity": 2, "rate": 500, "tax": 18, "amount": 1000}],
+}
+
+
+@pytest.fixture(autouse=True)
+def _cold_templates():
+    pdf_templates.reset_template_cache()
+    yield
+    pdf_templates.reset_template_cache()
+
+
+@pytest.fixture
+def logo_branding(tmp_path):
+    path = tmp_path / "logo.png"
+    PILImage.new("RGBA", (120, 40), (37, 99, 235, 128)).save(path)
+    branding = {**ig._DEFAULT_BRANDING, "logo_url": "/uploads/org_logos/logo.png"}
+    with patch.object(ig, "_resolve_logo_path", lambda url: str(path) if url else None):
+        yield branding
+
+
+class TestCompiledTemplate:
+    def test_branding_hash_selects_the_template(self):
+        base = pdf_templates.get_compiled_template(ig._DEFAULT_BRANDING, None, ig._DOC_LABELS)
+        again = pdf_templates.get_compiled_template(dict(ig._DEFAULT_BRANDING), None, ig._DOC_LABELS)
+        recoloured = pdf_templates.get_compiled_template(
+            {**ig._DEFAULT_BRANDING, "accent_color": "#000000"}, None, ig._DOC_LABELS)
+        assert again is base
+        assert recoloured is not base
+
+    def test_logo_is_decoded_once_across_renders(self, logo_branding):
+        with patch.object(pdf_templates, "ImageReader", wraps=pdf_templates.ImageReader) as decode:
+            pdfs = [ig.build_invoice_pdf(INVOICE, logo_branding) for _ in range(3)]
+        assert decode.call_count == 1
+        assert all(b"/Subtype /Image" in pdf and b"/SMask" in pdf for pdf in pdfs)
+
+    def test_logo_alpha_channel_is_drawn_as_a_soft_mask(self, logo_branding):
+        with pdfplumber.open(io.BytesIO(ig.build_invoice_pdf(INVOICE, logo_branding))) as pdf:
+            images = pdf.pages[0].images
+            assert len(images) == 1
+            logo = images[0]["stream"]
+            assert logo["Width"] == 120 and logo["Height"] == 40
+            mask = logo["SMask"].resolve()
+            assert mask["ColorSpace"].name == "DeviceGray"
+            assert set(mask.get_data()) == {128}
+
+    def test_concurrent_renders_match_serial_output(self, logo_branding):
+        branded = {**logo_branding, "invoice_template_settings": {"show_logo": True, "show_signature": True}}
+        with patch.object(rl_config, "invariant", 1):
+            expected = ig.build_invoice_pdf(INVOICE, branded, gst_mode="COMPOSITION")
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                results = list(pool.map(
+                    lambda _: ig.build_invoice_pdf(INVOICE, branded, gst_mode="COMPOSITION"), range(8)))
+        assert all(pdf == expected for pdf in results)
@@ -0,0 +1,124 @@
+"""
+Tests for permission_cache — request memo + process LRU in front of rbac_resolver.
+"""
+from unittest.mock import MagicMock, patch
+
+from flask import Flask, request
+
+from smart_invoice_pro.utils.permission_cache import (
+    get_or_resolve,
+    invalidate_tenant_permissions,
+    invalidate_user_permissions,
+    permission_cache_stats,
+)
+from smart_invoice_pro.utils.permission_checker import check_permission
+
+TENANT = "tenant-abc"
+USER_ID = "user-123"
+
+
+def _resolver(result=(False, {"invoices": {"view": True}})):
+    return MagicMock(return_value=result)
+
+
+class TestProcessCache:
+    def test_second_lookup_is_served_from_cache(self):
+        resolver = _resolver()
+        get_or_resolve(USER_ID, TENANT, resolver)
+        result = get_or_resolve(USER_ID, TENANT, resolver)
+        assert result == (False, {"invoices": {"view": True}})
+        assert resolver.call_count == 1
+        assert permission_cache_stats()["hits"] == 1
+
+    def test_cache_is_tenant_aware(self):
+        resolver = _resolver()
+        get_or_resolve(USER_ID, TENANT, resolver)
+        get_or_resolve(USER_ID, "other-tenant", resolver)
+        assert resolver.call_count == 2
+
+    def test_invalidate_user(self):
+        resolver = _resolver()
+        get_or_resolve(USER_ID, TENANT, resolver)
+        invalidate_user_permissions(USER_ID, TENANT)
+        get_or_resolve(USER_ID, TENANT, resolver)
+        assert resolver.call_count == 2
+
+    def test_invalidate_tenant_keeps_other_tenants(self):
+        resolver = _resolver()
+        get_or_resolve(USER_ID, TENANT, resolver)
+        get_or_resolve(USER_ID, "other-tenant", resolver)
+        invalidate_tenant_permissions(TENANT)
+        get_or_resolve(USER_ID, TENANT, resolver)
+        get_or_resolve(USER_ID, "other-tenant", resolver)
+        assert resolver.call_count == 3
+
+    def test_ttl_zero_disables_process_cache(self, monkeypatch):
+        monkeypatch.setenv("RBAC_CACHE_TTL_SECONDS", "0")
+        resolver = _resolver()
+        get_or_resolve(USER_ID, TENANT, resolver)
+        get_or_resolve(USER_ID, TENANT, resolver)
+        assert resolver.call_count == 2
+
+    def test_lru_bound(self, monkeypatch):
+        monkeypatch.setenv("RBAC_CACHE_MAX_ENTRIES", "2")
+        resolver = _resolver()
+        for uid in ("u1", "u2", "u3"):
+            get_or_resolve(uid, TENANT, resolver)
+        assert permission_cache_stats()["size"] == 2
+        get_or_resolve("u1", TENANT, resolver)
+        assert resolver.call_count == 4
+
+
+class TestRequestMemo:
+    def test_repeated_check_permission_resolves_once(self, monkeypatch):
+        monkeypatch.setenv("RBAC_CACHE_TTL_SECONDS", "0")
+        resolver = _resolver()
+        monkeypatch.setattr(
+            "smart_invoice_pro.utils.permission_checker.resolve_user_permissions",
+            resolver,
+        )
+        app = Flask(__name__)
+        with app.test_request_context('/api/search'):
+            request.user_id = USER_ID
+            request.tenant_id = TENANT
+            assert check_permission('invoices', 'view') is True
+            assert check_permission('customers', 'view') is False
+            assert check_permission('products', 'view') is False
+        assert resolver.call_count == 1
+
+
+class TestInvalidationHooks:
+    def test_admin_status_update_invalidates_user(self, client):
+        from smart_invoice_pro.api import admin_api
+        from tests.conftest import auth_headers
+
+        resolver = _resolver()
+        get_or_resolve(USER_ID, TENANT, resolver)
+
+        admin_api.users_container.query_items.return_value = [
+            {"id": USER_ID, "tenant_id": TENANT, "status": "active"},
+        ]
+        resp = client.patch(
+            f"/api/admin/users/{USER_ID}/status",
+            json={"status": "suspended"},
+            headers=auth_headers(is_super_admin=True),
+        )
+        assert resp.status_code == 200
+        get_or_resolve(USER_ID, TENANT, resolver)
+        assert resolver.call_count == 2
+
+    def test_account_deletion_invalidates_the_tenant(self, client):
+        from smart_invoice_pro.api import routes
+        from tests.conftest import TENANT_A, USER_A, auth_headers
+
+        resolver = _resolver()
+        get_or_resolve(USER_A, TENANT_A, resolver)
+        get_or_resolve("teammate", TENANT_A, resolver)
+
+        with patch.object(routes, "users_container") as users:
+            users.query_items.return_value = [{"id": USER_A, "tenant_id": TENANT_A}]
+            resp = client.delete("/api/auth/delete-account", headers=auth_headers())
+        assert resp.status_code == 200
+        get_or_resolve(USER_A, TENANT_A, resolver)
+        get_or_resolve("teammate", TENANT_A, resolver)
+        assert resolver.call_count == 4
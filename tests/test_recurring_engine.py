@@ -0,0 +1,131 @@
+"""Tests for the tenant-sharded recurring invoice run engine."""
+
+from unittest.mock import patch
+
+import pytest
+from azure.cosmos import exceptions
+
+from smart_invoice_pro.services import recurring_engine as engine
+from tests.conftest import TENANT_A, TENANT_B
+
+ENGINE = "smart_invoice_pro.services.recurring_engine"
+
+
+def _profile(profile_id, tenant_id, **extra):
+    return {
+        "id": profile_id, "tenant_id": tenant_id, "customer_id": f"cust-{profile_id}",
+        "customer_name": "ACME", "frequency": "Monthly", "next_run_date": "2026-10-01",
+        "status": "Active", "occurrences_created": 0, "ends_type": "never",
+        "items": [{"quantity": 2, "unit_price": 100.0}], **extra,
+    }
+
+
+@pytest.fixture
+def stores():
+    with patch(f"{ENGINE}.recurring_profiles_container") as profiles, \
+         patch(f"{ENGINE}.invoices_container") as invoices, \
+         patch(f"{ENGINE}.recurring_run_checkpoints_container") as checkpoints, \
+         patch(f"{ENGINE}.record_rollup_change"), patch(f"{ENGINE}.log_audit") as audit, \
+         patch(f"{ENGINE}.create_notification"), \
+         patch("smart_invoice_pro.api.recurring_profiles_api.calculate_next_run_date", return_value="2026-11-01"):
+        saved = {}
+
+        def read_checkpoint(item, partition_key):
+            if (partition_key, item) not in saved:
+                raise exceptions.CosmosResourceNotFoundError()
+            return dict(saved[(partition_key, item)])
+
+        checkpoints.read_item.side_effect = read_checkpoint
+        checkpoints.upsert_item.side_effect = lambda body: saved.__setitem__((body["tenant_id"], body["id"]), dict(body))
+        yield profiles, invoices, saved, audit
+
+
+def _counter():
+    state = {"calls": []}
+
+    def reserve(tenant_id, count, prefs=None):
+        state["calls"].append((tenant_id, count))
+        start = state.setdefault(tenant_id, 1)
+        state[tenant_id] = start + count
+        return [f"{tenant_id}-{n}" for n in range(start, start + count)]
+    return state, reserve
+
+
+class TestRecurringEngine:
+    def test_tenants_run_in_parallel_with_batched_numbers(self, stores, monkeypatch):
+        profiles, invoices, saved, _ = stores
+        monkeypatch.setenv("RECURRING_NUMBER_BATCH", "2")
+        profiles.query_items.return_value = [
+            _profile("a1", TENANT_A), _profile("b1", TENANT_B), _profile("a2", TENANT_A),
+            _profile("a3", TENANT_A), _profile("a4", TENANT_A, ends_type="after_occurrences",
+                                               occurrence_limit=1, occurrences_created=1),
+        ]
+        state, reserve = _counter()
+        with patch("smart_invoice_pro.api.invoice_preferences_api.reserve_invoice_numbers", side_effect=reserve):
+            summary = engine.run_recurring_generation("2026-10-17", workers=4)
+
+        numbers = sorted(g["invoice_number"] for g in summary["generated"])
+        assert numbers == sorted([f"{TENANT_A}-1", f"{TENANT_A}-2", f"{TENANT_A}-3", f"{TENANT_B}-1"])
+        assert sorted(state["calls"]) == sorted([(TENANT_A, 2), (TENANT_A, 1), (TENANT_B, 1)])
+        assert invoices.create_item.call_count == 4 and summary["errors"] == []
+        expired = [c.kwargs["body"] for c in profiles.replace_item.call_args_list if c.kwargs["body"]["id"] == "a4"]
+        assert expired[0]["status"] == "Completed"
+        checkpoint = saved[(TENANT_A, "recurring_run:2026-10-17")]
+        assert checkpoint["status"] == "completed" and checkpoint["generated_count"] == 3
+
+    def test_rerun_resumes_tenants_and_reuses_crash_window_invoices(self, stores):
+        profiles, invoices, saved, audit = stores
+        saved[(TENANT_B, "recurring_run:2026-10-17")] = {
+            "status": "completed", "error_count": 0, "generated_count": 4, "started_at": "2026-10-17T00:05:00",
+        }
+        # b1 became due after TENANT_B's first pass finished; a1's invoice was written before a crash.
+        profiles.query_items.return_value = [_profile("a1", TENANT_A), _profile("b1", TENANT_B)]
+        invoices.create_item.side_effect = [exceptions.CosmosResourceExistsError(), None]
+        invoices.read_item.return_value = {"id": "existing", "invoice_number": "INV-7"}
+        _, reserve = _counter()
+        with patch("smart_invoice_pro.api.invoice_preferences_api.reserve_invoice_numbers", side_effect=reserve):
+            summary = engine.run_recurring_generation("2026-10-17", workers=1)
+
+        assert summary["resumed_tenants"] == [TENANT_B]
+        assert {"profile_id": "a1", "invoice_id": "existing", "invoice_number": "INV-7"} in summary["generated"]
+        assert any(g["profile_id"] == "b1" for g in summary["generated"])
+        created = invoices.create_item.call_args_list[0].kwargs["body"]
+        assert created["id"] == engine.recurring_invoice_id("a1", "2026-10-01")
+        assert [c.args[2] for c in audit.call_args_list] == [summary["generated"][1]["invoice_id"]]
+        assert profiles.replace_item.call_args.kwargs["body"]["next_run_date"] == "2026-11-01"
+        resumed = saved[(TENANT_B, "recurring_run:2026-10-17")]
+        assert resumed["generated_count"] == 5 and resumed["resumes"] == 1
+        assert resumed["started_at"] == "2026-10-17T00:05:00"
+
+    def test_profiles_advance_only_if_unchanged_and_default_to_the_utc_date(self, stores):
+        profiles, _, _, _ = stores
+        profiles.query_items.return_value = [_profile("a1", TENANT_A, _etag='"v1"')]
+        profiles.replace_item.side_effect = exceptions.CosmosAccessConditionFailedError()
+        _, reserve = _counter()
+
+        class _Clock(engine.datetime):
+            @classmethod
+            def utcnow(cls):
+                return engine.datetime(2026, 10, 17, 23, 30)
+
+        with patch("smart_invoice_pro.api.invoice_preferences_api.reserve_invoice_numbers", side_effect=reserve), \
+             patch(f"{ENGINE}.datetime", _Clock):
+            summary = engine.run_recurring_generation()
+
+        assert summary["run_date"] == "2026-10-17"
+        kwargs = profiles.replace_item.call_args.kwargs
+        assert kwargs["etag"] == '"v1"' and kwargs["match_condition"] == engine.MatchConditions.IfNotModified
+        assert summary["generated"] == [] and summary["errors"][0]["profile_id"] == "a1"
+
+
+class TestReserveInvoiceNumbers:
+    @patch("smart_invoice_pro.api.invoice_preferences_api.settings_container")
+    def test_claims_a_block_in_one_update(self, mock_ctr):
+        from smart_invoice_pro.api.invoice_preferences_api import reserve_invoice_numbers
+        mock_ctr.query_items.return_value = [{
+            "id": f"{TENANT_A}:invoice_preferences", "tenant_id": TENANT_A, "invoice_prefix": "INV-",
+            "invoice_suffix": "", "number_padding": 3, "next_invoice_number": 41, "_etag": "e1",
+        }]
+        assert reserve_invoice_numbers(TENANT_A, 3) == ["INV-041", "INV-042", "INV-043"]
+        mock_ctr.replace_item.assert_called_once()
+        assert mock_ctr.replace_item.call_args.kwargs["body"]["next_invoice_number"] == 44
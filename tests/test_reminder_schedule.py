@@ -0,0 +1,114 @@
+"""Tests for the precomputed reminder schedule and the indexed reminder job."""
+
+from datetime import date, timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from smart_invoice_pro.services import reminder_job
+from smart_invoice_pro.utils import reminder_schedule as rs
+from smart_invoice_pro.utils.archive_service import archive_entity
+from smart_invoice_pro.utils.lifecycle_service import hard_delete_entity
+from tests.conftest import TENANT_A
+
+RS = "smart_invoice_pro.utils.reminder_schedule"
+CFG = {"reminders_enabled": True, "before_due_days": [3], "after_due_days": [1, 7], "on_due_enabled": True}
+
+
+def _invoice(**extra):
+    return {
+        "id": "inv-1", "tenant_id": TENANT_A, "customer_id": "cust-1", "invoice_number": "INV-001",
+        "status": "Issued", "balance_due": 100.0, "customer_email": "a@example.com",
+        "due_date": (date.today() + timedelta(days=5)).isoformat(), **extra,
+    }
+
+
+@pytest.fixture
+def due_container():
+    with patch(f"{RS}.reminder_due_container") as container, \
+         patch(f"{RS}.reminder_config", return_value=dict(CFG)):
+        yield container
+
+
+class TestSyncReminderSchedule:
+    def test_issuing_plans_each_rule_and_payment_clears_them(self, due_container):
+        draft, issued = _invoice(status="Draft"), _invoice()
+        rs.sync_reminder_schedule(draft, issued)
+
+        planned = {c.kwargs["body"]["id"]: c.kwargs["body"]["fire_date"] for c in due_container.upsert_item.call_args_list}
+        due = date.today() + timedelta(days=5)
+        assert planned == {
+            "inv-1:before_due:3": (due - timedelta(days=3)).isoformat(),
+            "inv-1:on_due:0": due.isoformat(),
+            "inv-1:after_due:1": (due + timedelta(days=1)).isoformat(),
+            "inv-1:after_due:7": (due + timedelta(days=7)).isoformat(),
+        }
+
+        due_container.reset_mock()
+        rs.sync_reminder_schedule(issued, dict(issued, notes="edited"))   # nothing schedule-relevant
+        due_container.upsert_item.assert_not_called()
+        due_container.delete_item.assert_not_called()
+
+        rs.sync_reminder_schedule(issued, dict(issued, status="Paid", balance_due=0))
+        assert due_container.delete_item.call_count == 4
+
+    def test_moving_the_due_date_replans_only_what_changed(self, due_container):
+        before = _invoice()
+        after = _invoice(due_date=(date.today() + timedelta(days=6)).isoformat())
+        rs.sync_reminder_schedule(before, after)
+        assert due_container.delete_item.call_count == 4 and due_container.upsert_item.call_count == 4
+        assert {c.kwargs["partition_key"] for c in due_container.delete_item.call_args_list} == {
+            e["fire_date"] for e in rs.plan_reminders(before, CFG)}
+
+
+class TestRecordInvoiceWrite:
+    def test_hook_plans_reminders_and_never_raises(self, due_container):
+        rs.record_invoice_write(None, _invoice())
+        assert due_container.upsert_item.call_count == 4
+
+        due_container.upsert_item.side_effect = RuntimeError("cosmos down")
+        rs.record_invoice_write(None, _invoice(id="inv-2"))
+        rs.record_invoice_write(None, _invoice(balance_due="n/a"))
+
+    def test_archiving_and_deleting_an_invoice_clear_its_reminders(self, due_container):
+        with patch("smart_invoice_pro.utils.archive_service.record_rollup_change"), \
+             patch("smart_invoice_pro.utils.lifecycle_service.record_rollup_change"), \
+             patch("smart_invoice_pro.utils.archive_service.log_audit_event"), \
+             patch("smart_invoice_pro.utils.lifecycle_service.log_audit_event"):
+            archive_entity(MagicMock(), _invoice(), "invoice", TENANT_A, user_id="u1")
+            assert due_container.delete_item.call_count == 4
+
+            due_container.reset_mock()
+            hard_delete_entity(MagicMock(), _invoice(), "invoice", TENANT_A, user_id="u1")
+            assert due_container.delete_item.call_count == 4
+
+
+class TestIndexedReminderJob:
+    def test_job_reads_todays_partition_and_revalidates_each_invoice(self, due_container):
+        today = date.today().isoformat()
+        fresh = {"id": "inv-1:on_due:0", "fire_date": today, "tenant_id": TENANT_A, "invoice_id": "inv-1",
+                 "customer_id": "cust-1", "due_date": today, "reminder_type": "on_due", "days_offset": 0}
+        moved = dict(fresh, id="inv-2:on_due:0", invoice_id="inv-2")
+        due_container.query_items.return_value = [fresh, moved]
+        invoices = {"inv-1": _invoice(due_date=today), "inv-2": _invoice(id="inv-2", due_date="2030-01-01")}
+
+        with patch("smart_invoice_pro.utils.cosmos_client.invoices_container") as inv_ctr, \
+             patch.object(reminder_job, "reminder_config", return_value=dict(CFG)), \
+             patch.object(reminder_job, "_send_reminder_email", return_value=True) as send, \
+             patch.object(reminder_job, "create_notification"):
+            inv_ctr.read_item.side_effect = lambda item, partition_key: dict(invoices[item])
+            reminder_job.process_payment_reminders()
+
+        assert due_container.query_items.call_args.kwargs["partition_key"] == today
+        send.assert_called_once()
+        saved = inv_ctr.replace_item.call_args.kwargs["body"]
+        assert saved["id"] == "inv-1" and saved["reminder_log"][0]["reminder_type"] == "on_due"
+        assert due_container.delete_item.call_count == 2              # both entries consumed
+
+    def test_rebuild_replaces_a_tenants_pending_entries(self, due_container):
+        due_container.query_items.return_value = [{"id": "old:on_due:0", "fire_date": "2099-01-01"}]
+        with patch(f"{RS}.invoices_container") as inv_ctr:
+            inv_ctr.query_items.return_value = [_invoice(), _invoice(id="inv-2", status="Draft")]
+            result = rs.rebuild_tenant_schedule(TENANT_A)
+        assert result == {"tenant_id": TENANT_A, "removed": 1, "planned": 4}
+        due_container.delete_item.assert_called_once_with(item="old:on_due:0", partition_key="2099-01-01")
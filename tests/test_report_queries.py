@@ -0,0 +1,140 @@
+"""Tests for the parallel report query executor and the reports that use it."""
+
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from smart_invoice_pro.utils.report_queries import ReportQuery, run_report_queries
+from tests.conftest import TENANT_A
+
+
+class SlowContainer:
+    def __init__(self, rows, delay=0.05):
+        self.rows = rows
+        self.delay = delay
+        self.calls = []
+        self.threads = set()
+
+    def query_items(self, query, parameters=None, **kwargs):
+        self.calls.append((query, parameters))
+        self.threads.add(threading.get_ident())
+        time.sleep(self.delay)
+        return list(self.rows)
+
+
+class TestReportQuery:
+    def test_projection_and_parameters(self):
+        q = ReportQuery(MagicMock(), ("status", "amount_paid"), "c.tenant_id = @tenant_id",
+                        {"@tenant_id": TENANT_A})
+        assert q.sql() == "SELECT c.status, c.amount_paid FROM c WHERE c.tenant_id = @tenant_id"
+        assert q.cosmos_parameters() == [{"name": "@tenant_id", "value": TENANT_A}]
+
+    def test_queries_run_concurrently(self):
+        containers = [SlowContainer([{"n": i}]) for i in range(4)]
+        queries = {f"q{i}": ReportQuery(c, ("n",), "true") for i, c in enumerate(containers)}
+        started = time.perf_counter()
+        rows = run_report_queries(queries)
+        elapsed = time.perf_counter() - started
+        assert rows == {f"q{i}": [{"n": i}] for i in range(4)}
+        assert elapsed < 0.15  # four 50 ms queries, not 200 ms
+
+    def test_failure_is_reraised(self):
+        broken = MagicMock()
+        broken.query_items.side_effect = RuntimeError("cosmos down")
+        with pytest.raises(RuntimeError):
+            run_report_queries({
+                "ok": ReportQuery(SlowContainer([]), (), "true"),
+                "bad": ReportQuery(broken, (), "true"),
+            })
+
+
+class TestReportEndpoints:
+    def _patch(self, **rows):
+        containers = {name: SlowContainer(r, delay=0) for name, r in rows.items()}
+        patchers = [
+            patch(f"smart_invoice_pro.api.reports_api.{name}_container", c)
+            for name, c in containers.items()
+        ]
+        return containers, patchers
+
+    def test_balance_sheet_splits_open_items_in_python(self, client, headers_a):
+        containers, patchers = self._patch(
+            bank_accounts=[{"balance": 500}],
+            invoices=[
+                {"status": "Paid", "amount_paid": 300, "balance_due": 0},
+                {"status": "Pending", "amount_paid": 0, "balance_due": 200},
+            ],
+            products=[{"availableQty": 2, "price": 10}],
+            bills=[{"status": "Partially Paid", "amount_paid": 50, "balance_due": 70}],
+            expenses=[{"amount": 20}],
+        )
+        for p in patchers:
+            p.start()
+        try:
+            resp = client.get("/api/reports/balance-sheet?as_of_date=2025-06-30", headers=headers_a)
+        finally:
+            for p in patchers:
+                p.stop()
+
+        assert resp.status_code == 200
+        data = resp.get_json()
+        assert data["assets"]["current_assets"] == {
+            "cash": 500, "accounts_receivable": 200, "inventory": 20, "total": 720,
+        }
+        assert data["liabilities"]["total"] == 70
+        assert data["equity"]["retained_earnings"] == 230
+        # One round trip per container, tenant passed as a parameter.
+        assert len(containers["invoices"].calls) == 1
+        query, params = containers["invoices"].calls[0]
+        assert TENANT_A not in query and "SELECT *" not in query
+        assert {"name": "@tenant_id", "value": TENANT_A} in params
+
+    def test_profit_loss(self, client, headers_a):
+        _, patchers = self._patch(
+            invoices=[{"status": "Paid", "amount_paid": 1000, "issue_date": "2025-02-10"}],
+            bills=[{"status": "Paid", "amount_paid": 400, "bill_date": "2025-03-01"}],
+            expenses=[{"amount": 100, "category": "Rent", "expense_date": "2025-03-05"}],
+        )
+        for p in patchers:
+            p.start()
+        try:
+            resp = client.get(
+                "/api/reports/profit-loss?start_date=2025-01-01&end_date=2025-12-31",
+                headers=headers_a,
+            )
+        finally:
+            for p in patchers:
+                p.stop()
+
+        assert resp.status_code == 200
+        data = resp.get_json()
+        assert data["gross_profit"] == 600
+        assert data["net_profit"] == 500
+        assert data["expenses"]["by_category"] == {"Rent": 100}
+
+    def test_sales_gst_and_cash_flow_reports(self, client, headers_a):
+        invoice = {
+            "id": "inv-1", "status": "Paid", "customer_id": "c1", "customer_name": "Acme",
+            "issue_date": "2025-02-10", "total_amount": 1180, "amount_paid": 1180, "igst_amount": 0,
+            "items": [{"tax": 18, "quantity": 1, "rate": 1000, "discount": 0}],
+        }
+        _, patchers = self._patch(invoices=[invoice], bills=[], expenses=[])
+        for p in patchers:
+            p.start()
+        try:
+            qs = "?start_date=2025-01-01&end_date=2025-03-31"
+            sales = client.get(f"/api/reports/sales-summary{qs}", headers=headers_a).get_json()
+            gst = client.get(f"/api/reports/gst-tax-summary{qs}", headers=headers_a).get_json()
+            cash = client.get(f"/api/reports/cash-flow{qs}", headers=headers_a).get_json()
+        finally:
+            for p in patchers:
+                p.stop()
+
+        assert sales["invoice_count"] == 1
+        assert sales["customer_summary"][0]["customer_name"] == "Acme"
+        assert sales["monthly_breakdown"] == [{"month": "2025-02", "total": 1180}]
+        assert gst["totals"]["total_tax"] == 180
+        assert gst["tax_breakdown"][0]["tax_rate"] == "18%"
+        assert cash["operating_activities"]["cash_received_from_customers"] == 1180
@@ -0,0 +1,172 @@
+"""Tests for frozen per-month report snapshots."""
+
+import copy
+from datetime import date
+from unittest.mock import patch
+
+from azure.cosmos import exceptions
+
+from smart_invoice_pro.utils import report_snapshots as snapshots
+from smart_invoice_pro.utils.report_snapshots import (
+    SnapshotSource,
+    compute_period_report,
+    document_months,
+    merge_partials,
+)
+from tests.conftest import TENANT_A
+
+TODAY = date(2025, 7, 15)
+
+
+class FakeSnapshotContainer:
+    def __init__(self):
+        self.docs = {}
+
+    def upsert_item(self, body):
+        self.docs[body["id"]] = copy.deepcopy(body)
+
+    def create_item(self, body):
+        if body["id"] in self.docs:
+            raise exceptions.CosmosResourceExistsError()
+        self.docs[body["id"]] = copy.deepcopy(body)
+
+    def patch_item(self, item, partition_key, patch_operations):
+        if item not in self.docs:
+            raise exceptions.CosmosResourceNotFoundError()
+        for op in patch_operations:
+            field_name = op["path"].lstrip("/")
+            self.docs[item][field_name] = self.docs[item].get(field_name, 0) + op["value"]
+
+    def delete_item(self, item, partition_key):
+        self.docs.pop(item, None)
+
+    def query_items(self, query, parameters=None, **kwargs):
+        params = {p["name"]: p["value"] for p in parameters or []}
+        rows = [d for d in self.docs.values() if d["tenant_id"] == params["@tenant_id"]
+                and d["month"] in params["@months"]]
+        if "@report" in params:
+            rows = [d for d in rows if d.get("report") == params["@report"] or d.get("doc_type") == "generation"]
+        elif "IS_DEFINED(c.report)" in query:
+            rows = [d for d in rows if "report" in d]
+        return [copy.deepcopy(d) for d in rows]
+
+    def snapshots(self):
+        return [d for d in self.docs.values() if "report" in d]
+
+
+class FakeLedger:
+    """Returns rows whose issue_date falls within the queried range."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.ranges = []
+
+    def query_items(self, query, parameters=None, **kwargs):
+        params = {p["name"]: p["value"] for p in parameters or []}
+        self.ranges.append((params["@start"], params["@end"]))
+        return [r for r in self.rows if params["@start"] <= r["issue_date"] <= params["@end"]]
+
+
+def _partial(rows):
+    return {"total": sum(r["amount"] for r in rows["invoices"]), "count": len(rows["invoices"])}
+
+
+def _run(store, ledger, start, end):
+    with patch.object(snapshots, "report_snapshots_container", store):
+        return compute_period_report(
+            TENANT_A, "demo", {"invoices": SnapshotSource(ledger, ("amount",), "issue_date")},
+            start, end, _partial, today=TODAY,
+        )
+
+
+ROWS = [
+    {"issue_date": "2025-01-10", "amount": 100},
+    {"issue_date": "2025-03-31", "amount": 50},
+    {"issue_date": "2025-07-02", "amount": 7},
+]
+
+
+def test_closed_months_are_frozen_and_reused():
+    store, ledger = FakeSnapshotContainer(), FakeLedger(ROWS)
+    first = _run(store, ledger, date(2025, 1, 1), date(2025, 7, 31))
+    assert first == {"total": 157, "count": 3}
+    assert sorted(d["month"] for d in store.snapshots()) == [
+        "2025-01", "2025-02", "2025-03", "2025-04", "2025-05", "2025-06",
+    ]
+
+    ledger.ranges.clear()
+    second = _run(store, ledger, date(2025, 1, 1), date(2025, 7, 31))
+    assert second == first
+    # Only the open current month is read live.
+    assert ledger.ranges == [("2025-07-01", "2025-07-31")]
+
+
+def test_partial_edge_months_are_live_and_not_frozen():
+    store, ledger = FakeSnapshotContainer(), FakeLedger(ROWS)
+    result = _run(store, ledger, date(2025, 1, 15), date(2025, 3, 31))
+    assert result == {"total": 50, "count": 1}
+    assert "2025-01" not in {d["month"] for d in store.snapshots()}
+
+
+def test_backdated_write_unfreezes_month():
+    store, ledger = FakeSnapshotContainer(), FakeLedger(list(ROWS))
+    _run(store, ledger, date(2025, 1, 1), date(2025, 6, 30))
+    ledger.rows.append({"issue_date": "2025-03-05", "amount": 25})
+
+    months = document_months("invoice", None, {"issue_date": "2025-03-05"})
+    with patch.object(snapshots, "report_snapshots_container", store), \
+         patch.object(snapshots, "_utc_month", return_value="2025-07"):
+        assert snapshots.invalidate_report_snapshots(TENANT_A, months) == 1
+
+    assert _run(store, ledger, date(2025, 1, 1), date(2025, 6, 30)) == {"total": 175, "count": 3}
+
+
+def test_invalidation_during_compute_does_not_freeze_the_stale_month():
+    store = FakeSnapshotContainer()
+    backdated = {"issue_date": "2025-03-05", "amount": 25}
+
+    class RacingLedger(FakeLedger):
+        def query_items(self, query, parameters=None, **kwargs):
+            rows = super().query_items(query, parameters, **kwargs)
+            if backdated not in self.rows:          # the write lands after the read
+                self.rows.append(backdated)
+                with patch.object(snapshots, "_utc_month", return_value="2025-07"):
+                    snapshots.invalidate_report_snapshots(TENANT_A, {"2025-03"})
+            return rows
+
+    ledger = RacingLedger(list(ROWS))
+    assert _run(store, ledger, date(2025, 1, 1), date(2025, 6, 30)) == {"total": 150, "count": 2}
+    assert store.docs[f"{TENANT_A}:demo:2025-03"]["generation"] == 0      # saved, but already behind
+
+    ledger.ranges.clear()
+    assert _run(store, ledger, date(2025, 1, 1), date(2025, 6, 30)) == {"total": 175, "count": 3}
+    assert ledger.ranges == [("2025-03-01", "2025-03-31")]
+    assert store.docs[f"{TENANT_A}:demo:2025-03"]["generation"] == 1
+
+
+def test_disabled_computes_live_without_storing(monkeypatch):
+    monkeypatch.setenv("REPORT_SNAPSHOTS_ENABLED", "false")
+    store, ledger = FakeSnapshotContainer(), FakeLedger(ROWS)
+    assert _run(store, ledger, date(2025, 1, 1), date(2025, 7, 31))["total"] == 157
+    assert store.docs == {}
+
+
+def test_default_today_is_the_utc_date():
+    store, ledger = FakeSnapshotContainer(), FakeLedger(ROWS)
+
+    class _Clock(snapshots.datetime):
+        @classmethod
+        def utcnow(cls):
+            return snapshots.datetime(2025, 8, 1, 0, 30)
+
+    with patch.object(snapshots, "report_snapshots_container", store), \
+         patch.object(snapshots, "datetime", _Clock):
+        compute_period_report(TENANT_A, "demo", {"invoices": SnapshotSource(ledger, ("amount",), "issue_date")},
+                              date(2025, 7, 1), date(2025, 7, 31), _partial)
+    assert [d["month"] for d in store.snapshots()] == ["2025-07"]     # July is closed in UTC
+
+
+def test_merge_partials_adds_nested_numbers():
+    merged = merge_partials({"a": 1, "by": {"x": 1.5}, "name": "old"},
+                            {"a": 2, "by": {"x": 1, "y": 2}, "name": "new"})
+    assert merged == {"a": 3, "by": {"x": 2.5, "y": 2}, "name": "new"}
@@ -0,0 +1,114 @@
+"""Tests for scheduler leader election and exactly-once run records."""
+
+import time
+from unittest.mock import MagicMock
+
+import pytest
+from azure.cosmos import exceptions
+
+from smart_invoice_pro.services import scheduler
+from smart_invoice_pro.utils import job_queue as jq
+from smart_invoice_pro.utils import scheduler_leases as sl
+
+
+class _FakeLeaseContainer:
+    """Single-document store with ETag semantics."""
+
+    def __init__(self):
+        self.docs = {}
+        self._version = 0
+
+    def _stamp(self, body):
+        self._version += 1
+        self.docs[body["id"]] = dict(body, _etag=str(self._version))
+
+    def read_item(self, item, partition_key):
+        if item not in self.docs:
+            raise exceptions.CosmosResourceNotFoundError(message="missing")
+        return dict(self.docs[item])
+
+    def create_item(self, body):
+        if body["id"] in self.docs:
+            raise exceptions.CosmosResourceExistsError(message="exists")
+        self._stamp(body)
+
+    def replace_item(self, item, body, etag=None, match_condition=None):
+        if etag is not None and self.docs[item]["_etag"] != etag:
+            raise exceptions.CosmosAccessConditionFailedError(message="etag")
+        self._stamp(body)
+
+    def upsert_item(self, body):
+        self._stamp(body)
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return sl.SQLiteRunLedger(str(tmp_path / "runs.sqlite3"))
+
+
+class TestLeaderLease:
+    def test_only_one_process_leads_until_the_lease_expires(self):
+        container = _FakeLeaseContainer()
+        a = sl.CosmosLeaderLease(owner="a", ttl_seconds=60, container=container)
+        b = sl.CosmosLeaderLease(owner="b", ttl_seconds=60, container=container)
+
+        assert a.try_acquire() and not b.try_acquire()
+        assert a.try_acquire()                                   # renewal
+        container.docs["scheduler"]["expires_at"] = time.time() - 1   # a crashed
+        assert b.try_acquire() and container.docs["scheduler"]["owner"] == "b"
+        assert not a.try_acquire() and not a.is_leader()
+
+        b.release()
+        assert a.try_acquire()
+
+    def test_file_lease_is_exclusive_per_host(self, tmp_path):
+        path = str(tmp_path / "scheduler.lock")
+        a, b = sl.FileLeaderLease(path, owner="a"), sl.FileLeaderLease(path, owner="b")
+        assert a.try_acquire() and not b.try_acquire()
+        a.release()
+        assert b.try_acquire()
+        b.release()
+
+
+class TestRunScheduledJob:
+    def test_job_runs_once_per_key_and_only_on_the_leader(self, ledger, monkeypatch):
+        func = MagicMock()
+        monkeypatch.setitem(scheduler.SCHEDULED_JOBS["recurring_invoice_job"], "func", func)
+        follower = MagicMock(try_acquire=MagicMock(return_value=False))
+
+        assert scheduler.run_scheduled_job("recurring_invoice_job", "2026-10-17", follower, ledger) == "not_leader"
+        assert scheduler.run_scheduled_job("recurring_invoice_job", "2026-10-17", ledger=ledger) == "completed"
+        assert scheduler.run_scheduled_job("recurring_invoice_job", "2026-10-17", ledger=ledger) == "already_ran"
+        assert func.call_count == 1
+        assert ledger.get("recurring_invoice_job", "2026-10-17")["status"] == "completed"
+
+    def test_failed_or_abandoned_runs_can_be_taken_over(self, ledger, monkeypatch):
+        func = MagicMock(side_effect=[RuntimeError("boom"), None])
+        monkeypatch.setitem(scheduler.SCHEDULED_JOBS["payment_reminder_job"], "func", func)
+
+        assert scheduler.run_scheduled_job("payment_reminder_job", "2026-10-17", ledger=ledger) == "failed"
+        assert scheduler.run_scheduled_job("payment_reminder_job", "2026-10-17", ledger=ledger) == "completed"
+        assert ledger.get("payment_reminder_job", "2026-10-17")["attempts"] == 2
+
+        assert ledger.claim("other_job", "k", "dead-owner") is not None
+        assert ledger.claim("other_job", "k", "me") is None       # still running
+        ledger._conn().execute("UPDATE scheduler_runs SET started_at = 0, doc = json_set(doc, '$.started_at', 0)")
+        assert ledger.claim("other_job", "k", "me")["owner"] == "me"
+
+    def test_sharded_run_enqueues_one_message_per_tenant(self, ledger, tmp_path, monkeypatch):
+        monkeypatch.setenv("SCHEDULER_SHARD_BY_TENANT", "true")
+        monkeypatch.setenv("JOB_QUEUE_BACKEND", "sqlite")
+        monkeypatch.setenv("JOB_QUEUE_SQLITE_PATH", str(tmp_path / "jobs.sqlite3"))
+        monkeypatch.setenv("JOB_WORKER_THREADS", "0")
+        jq.reset_queue()
+        func = MagicMock()
+        spec = scheduler.SCHEDULED_JOBS["recurring_invoice_job"]
+        monkeypatch.setitem(spec, "func", func)
+        monkeypatch.setitem(spec, "tenants", lambda run_key: ["t-1", "t-2", None])
+        try:
+            assert scheduler.run_scheduled_job("recurring_invoice_job", "2026-10-17", ledger=ledger) == "dispatched"
+            assert ledger.get("recurring_invoice_job", "2026-10-17")["result"] == {"shards": 2}
+            assert jq.drain_job_queue([scheduler.SHARD_JOB_KIND])["completed"] == 2
+        finally:
+            jq.reset_queue()
+        assert sorted(c.kwargs["tenant_id"] for c in func.call_args_list) == ["t-1", "t-2"]
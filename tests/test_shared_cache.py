@@ -0,0 +1,177 @@
+"""Tests for the pluggable shared response cache."""
+
+import threading
+import time
+
+import pytest
+
+from smart_invoice_pro.utils import shared_cache
+from smart_invoice_pro.utils.shared_cache import (
+    MemoryBackend,
+    SharedCache,
+    SQLiteBackend,
+    cached_json_response,
+    get_cache,
+    invalidate_tenant,
+    reset_caches,
+)
+from tests.conftest import TENANT_A, TENANT_B
+
+
+@pytest.fixture(autouse=True)
+def _fresh_registry(monkeypatch):
+    monkeypatch.delenv("CACHE_BACKEND", raising=False)
+    reset_caches()
+    yield
+    reset_caches()
+
+
+class TestMemoryBackend:
+    def test_hit_after_compute(self):
+        cache = SharedCache("t", MemoryBackend(), default_ttl=60)
+        calls = []
+        for _ in range(3):
+            value = cache.get_or_compute(TENANT_A, ("k",), lambda: calls.append(1) or {"n": 1})
+        assert value == {"n": 1}
+        assert len(calls) == 1
+        assert cache.snapshot()["hits"] == 2
+
+    def test_ttl_expiry(self):
+        cache = SharedCache("t", MemoryBackend(), default_ttl=60)
+        calls = []
+        cache.get_or_compute(TENANT_A, ("k",), lambda: calls.append(1), ttl=0.01)
+        time.sleep(0.02)
+        cache.get_or_compute(TENANT_A, ("k",), lambda: calls.append(1), ttl=0.01)
+        assert len(calls) == 2
+
+    def test_lru_bound(self):
+        backend = MemoryBackend(max_entries=2)
+        cache = SharedCache("t", backend, default_ttl=60)
+        for i in range(3):
+            cache.get_or_compute(TENANT_A, (i,), lambda: i)
+        assert backend.size() == 2
+
+    def test_single_flight(self):
+        cache = SharedCache("t", MemoryBackend(), default_ttl=60)
+        calls = []
+        gate = threading.Event()
+
+        def slow():
+            calls.append(1)
+            gate.wait(1)
+            return "done"
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get_or_compute(TENANT_A, ("k",), slow)))
+            for _ in range(5)
+        ]
+        for t in threads:
+            t.start()
+        time.sleep(0.05)
+        gate.set()
+        for t in threads:
+            t.join()
+        assert results == ["done"] * 5
+        assert len(calls) == 1
+        assert cache._key_locks == {}
+
+    def test_invalidate_tenant_only_drops_that_tenant(self):
+        cache = get_cache("reports")
+        cache.get_or_compute(TENANT_A, ("k",), lambda: "a")
+        cache.get_or_compute(TENANT_B, ("k",), lambda: "b")
+        invalidate_tenant(TENANT_A)
+        assert cache.get_or_compute(TENANT_A, ("k",), lambda: "a2") == "a2"
+        assert cache.get_or_compute(TENANT_B, ("k",), lambda: "b2") == "b"
+
+    def test_invalidate_tenant_keeps_non_financial_namespaces(self):
+        for namespace in ("ai_match", "webhook_config", "invoice_list_meta"):
+            get_cache(namespace).set(TENANT_A, ("k",), "kept")
+        invalidate_tenant(TENANT_A)
+        for namespace in ("ai_match", "webhook_config"):
+            assert get_cache(namespace).get(TENANT_A, ("k",)) == "kept"
+        # Invoice list counts and totals change with every invoice write.
+        assert get_cache("invoice_list_meta").get(TENANT_A, ("k",)) is None
+
+
+class TestSQLiteBackend:
+    def test_entries_shared_between_backend_instances(self, tmp_path):
+        path = str(tmp_path / "cache.sqlite3")
+        worker_1 = SharedCache("t", SQLiteBackend(path), default_ttl=60)
+        worker_2 = SharedCache("t", SQLiteBackend(path), default_ttl=60)
+        worker_1.get_or_compute(TENANT_A, ("k",), lambda: {"total": 5})
+        assert worker_2.get_or_compute(TENANT_A, ("k",), lambda: {"total": 0}) == {"total": 5}
+
+    def test_waits_for_lease_holder(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("CACHE_LOCK_TIMEOUT", "2")
+        path = str(tmp_path / "cache.sqlite3")
+        backend_1, backend_2 = SQLiteBackend(path), SQLiteBackend(path)
+        cache_2 = SharedCache("t", backend_2, default_ttl=60)
+        key = cache_2.make_key(TENANT_A, ("k",))
+        assert backend_1.acquire_lease(key, 2)
+
+        def _finish():
+            time.sleep(0.1)
+            backend_1.set(key, "from-worker-1", 60)
+            backend_1.release_lease(key)
+
+        threading.Thread(target=_finish).start()
+        assert cache_2.get_or_compute(TENANT_A, ("k",), lambda: "from-worker-2") == "from-worker-1"
+
+    def test_expired_rows_are_purged(self, tmp_path):
+        backend = SQLiteBackend(str(tmp_path / "cache.sqlite3"))
+        backend.set("t:a:1", "old", 0.01)
+        backend.set("t:a:2", "live", 60)
+        time.sleep(0.02)
+        assert backend.purge_expired() == 1
+        assert backend._conn().execute("SELECT key FROM cache_entries").fetchall() == [("t:a:2",)]
+
+    def test_env_selects_sqlite(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("CACHE_BACKEND", "sqlite")
+        monkeypatch.setenv("CACHE_SQLITE_PATH", str(tmp_path / "c.sqlite3"))
+        reset_caches()
+        assert shared_cache.cache_stats()["backend"] == "sqlite"
+
+
+class TestDashboardSummaryCache:
+    def test_summary_served_from_cache_when_not_testing(self, app, client, headers_a):
+        from unittest.mock import patch
+
+        app.config["TESTING"] = False
+        with patch("smart_invoice_pro.api.dashboard_api._summary_cache", get_cache("dashboard_summary")), \
+             patch("smart_invoice_pro.api.dashboard_api.invoices_container") as mock_inv:
+            mock_inv.read_all_items.return_value = []
+            first = client.get("/api/dashboard/summary", headers=headers_a)
+            second = client.get("/api/dashboard/summary", headers=headers_a)
+        assert first.status_code == second.status_code == 200
+        assert first.get_json() == second.get_json()
+        assert mock_inv.read_all_items.call_count == 1
+
+
+class TestCachedJsonResponse:
+    def test_invalidation_reaches_entries_another_worker_cached(self, tmp_path, monkeypatch):
+        from flask import Flask, jsonify, request
+
+        monkeypatch.setenv("CACHE_BACKEND", "sqlite")
+        monkeypatch.setenv("CACHE_SQLITE_PATH", str(tmp_path / "c.sqlite3"))
+        reset_caches()
+        app = Flask(__name__)
+        calls = []
+
+        @app.before_request
+        def _tenant():
+            request.tenant_id = TENANT_A
+
+        @app.route("/report")
+        @cached_json_response("reports", ttl=60)
+        def report():
+            calls.append(1)
+            return jsonify({"n": len(calls)})
+
+        client = app.test_client()
+        assert client.get("/report").get_json() == {"n": 1}
+        assert client.get("/report").get_json() == {"n": 1}
+
+        reset_caches()      # a worker that never served a report
+        invalidate_tenant(TENANT_A)
+        assert client.get("/report").get_json() == {"n": 2}
@@ -0,0 +1,225 @@
+"""Tests for materialized per-product stock balances."""
+
+import copy
+import uuid
+from unittest.mock import patch
+
+from azure.cosmos import exceptions
+
+from smart_invoice_pro.utils import stock_balances as balances
+from smart_invoice_pro.utils import stock_utils
+from tests.conftest import TENANT_A
+
+
+class FakeBalanceContainer:
+    """In-memory container with ETag semantics for replace_item."""
+
+    def __init__(self):
+        self.docs = {}
+        self.conflicts_to_inject = 0
+        self.replace_error = None
+
+    def _store(self, body):
+        doc = copy.deepcopy(body)
+        doc["_etag"] = uuid.uuid4().hex
+        self.docs[body["id"]] = doc
+        return copy.deepcopy(doc)
+
+    def read_item(self, item, partition_key):
+        if item not in self.docs:
+            raise exceptions.CosmosResourceNotFoundError(message="Not found")
+        return copy.deepcopy(self.docs[item])
+
+    def create_item(self, body):
+        if body["id"] in self.docs:
+            raise exceptions.CosmosResourceExistsError(message="Conflict")
+        return self._store(body)
+
+    def replace_item(self, item, body, etag=None, match_condition=None):
+        if self.replace_error:
+            raise self.replace_error
+        if self.conflicts_to_inject:
+            self.conflicts_to_inject -= 1
+            # Simulate another writer landing first.
+            self.docs[item]["_etag"] = uuid.uuid4().hex
+            raise exceptions.CosmosAccessConditionFailedError(message="Precondition failed")
+        if etag and self.docs[item]["_etag"] != etag:
+            raise exceptions.CosmosAccessConditionFailedError(message="Precondition failed")
+        return self._store(body)
+
+    def upsert_item(self, body):
+        return self._store(body)
+
+    def patch_item(self, item, partition_key, patch_operations):
+        if item not in self.docs:
+            raise exceptions.CosmosResourceNotFoundError(message="Not found")
+        doc = copy.deepcopy(self.docs[item])
+        for op in patch_operations:
+            doc[op["path"].lstrip("/")] = op["value"]
+        return self._store(doc)
+
+    def delete_item(self, item, partition_key):
+        self.docs.pop(item, None)
+
+    def query_items(self, query, parameters=None, **kwargs):
+        return [copy.deepcopy(d) for d in self.docs.values() if d.get("doc_type") == "balance"]
+
+
+class FakeLedger:
+    def __init__(self):
+        self.rows = []
+
+    def create_item(self, body):
+        self.rows.append(copy.deepcopy(body))
+        return body
+
+    def query_items(self, query, parameters=None, **kwargs):
+        params = {p["name"]: p["value"] for p in parameters or []}
+        rows = [r for r in self.rows if r["tenant_id"] == params["@tenant_id"]]
+        if "@product_id" in params:
+            rows = [r for r in rows if r["product_id"] == params["@product_id"]]
+        if "@after" in params:
+            rows = [r for r in rows if r["timestamp"] > params["@after"]]
+        return [copy.deepcopy(r) for r in rows]
+
+
+def _txn(qty, kind="IN", product_id="p-1", ts="2025-06-01T10:00:00"):
+    return {
+        "id": str(uuid.uuid4()), "tenant_id": TENANT_A, "product_id": product_id,
+        "quantity": qty, "type": kind, "timestamp": ts,
+    }
+
+
+def _patched(fake, ledger):
+    return patch.multiple(balances, stock_balances_container=fake, stock_container=ledger)
+
+
+def _record(ledger, txn):
+    stock_utils.record_stock_transaction(txn, container=ledger)
+
+
+class TestIncrementalBalance:
+    def test_first_write_seeds_from_existing_ledger(self):
+        fake, ledger = FakeBalanceContainer(), FakeLedger()
+        ledger.rows.append(_txn(40, ts="2025-01-01T00:00:00"))  # pre-existing history
+        with _patched(fake, ledger):
+            _record(ledger, _txn(5, "OUT", ts="2025-06-01T00:00:00"))
+            _record(ledger, _txn(10, ts="2025-06-02T00:00:00"))
+            assert balances.get_product_balance(TENANT_A, "p-1") == 45.0
+        doc = fake.docs[f"{TENANT_A}:stock:p-1"]
+        assert doc["txn_count"] == 3
+        assert doc["stock_in"] == 50.0 and doc["stock_out"] == 5.0
+
+    def test_replayed_transaction_is_not_double_counted(self):
+        fake, ledger = FakeBalanceContainer(), FakeLedger()
+        txn = _txn(7)
+        with _patched(fake, ledger):
+            _record(ledger, txn)
+            balances.apply_stock_transaction(txn)
+            assert balances.get_product_balance(TENANT_A, "p-1") == 7.0
+
+    def test_etag_conflict_is_retried(self):
+        fake, ledger = FakeBalanceContainer(), FakeLedger()
+        with _patched(fake, ledger):
+            _record(ledger, _txn(10))
+            fake.conflicts_to_inject = 2
+            _record(ledger, _txn(3, "OUT"))
+            assert balances.get_product_balance(TENANT_A, "p-1") == 7.0
+
+    def test_checkpoint_stamped_periodically(self, monkeypatch):
+        monkeypatch.setenv("STOCK_CHECKPOINT_EVERY", "2")
+        fake, ledger = FakeBalanceContainer(), FakeLedger()
+        with _patched(fake, ledger):
+            for i in range(4):
+                _record(ledger, _txn(1, ts=f"2025-06-0{i + 1}T00:00:00"))
+        checkpoint = fake.docs[f"{TENANT_A}:stock:p-1"]["checkpoint"]
+        assert checkpoint["txn_count"] >= 3
+        assert checkpoint["as_of"].startswith("2025-06-0")
+
+    def test_failed_update_marks_the_balance_stale_until_the_next_write(self):
+        fake, ledger = FakeBalanceContainer(), FakeLedger()
+        with _patched(fake, ledger), patch.object(stock_utils, "stock_container", ledger):
+            _record(ledger, _txn(10))
+            fake.replace_error = RuntimeError("cosmos throttled")
+            _record(ledger, _txn(4, "OUT"))
+            assert fake.docs[f"{TENANT_A}:stock:p-1"]["stale"] is True
+            assert balances.get_product_balance(TENANT_A, "p-1") is None
+            assert stock_utils.compute_current_stock("p-1", TENANT_A) == 6.0
+
+            fake.replace_error = None
+            _record(ledger, _txn(1))
+            assert "stale" not in fake.docs[f"{TENANT_A}:stock:p-1"]
+            assert balances.get_product_balance(TENANT_A, "p-1") == 7.0
+
+    def test_failures_never_raise(self):
+        with patch.object(balances, "stock_balances_container") as broken:
+            broken.read_item.side_effect = RuntimeError("cosmos down")
+            balances.apply_stock_transaction(_txn(1))
+
+
+class TestReadsAndRebuild:
+    def test_compute_current_stock_prefers_balance(self):
+        fake, ledger = FakeBalanceContainer(), FakeLedger()
+        with _patched(fake, ledger):
+            _record(ledger, _txn(12))
+            with patch.object(stock_utils, "stock_container") as su_ledger:
+                assert stock_utils.compute_current_stock("p-1", TENANT_A) == 12.0
+                su_ledger.query_items.assert_not_called()
+
+    def test_load_stock_map_requires_rebuild(self):
+        fake, ledger = FakeBalanceContainer(), FakeLedger()
+        with _patched(fake, ledger):
+            _record(ledger, _txn(3))
+            assert balances.load_stock_map(TENANT_A) is None
+            result = balances.rebuild_tenant_balances(TENANT_A)
+            assert result["products"] == 1
+            assert balances.load_stock_map(TENANT_A) == {"p-1": 3.0}
+
+            fake.replace_error = RuntimeError("cosmos throttled")
+            _record(ledger, _txn(1))
+            assert balances.load_stock_map(TENANT_A) is None
+            assert balances.reconcile_product(TENANT_A, "p-1")["repaired"] is True
+            assert balances.load_stock_map(TENANT_A) == {"p-1": 4.0}
+
+    def test_rebuild_removes_stale_balances(self):
+        fake, ledger = FakeBalanceContainer(), FakeLedger()
+        fake.upsert_item(balances._empty_balance(TENANT_A, "gone"))
+        with _patched(fake, ledger):
+            result = balances.rebuild_tenant_balances(TENANT_A)
+        assert result["stale_removed"] == 1
+        assert f"{TENANT_A}:stock:gone" not in fake.docs
+
+    def test_reconcile_repairs_drift(self):
+        fake, ledger = FakeBalanceContainer(), FakeLedger()
+        with _patched(fake, ledger):
+            _record(ledger, _txn(10))
+            balances.reconcile_product(TENANT_A, "p-1")  # stamps checkpoint
+            fake.docs[f"{TENANT_A}:stock:p-1"]["on_hand"] = 99.0
+            result = balances.reconcile_product(TENANT_A, "p-1")
+        assert result["drift"] == -89.0
+        assert result["repaired"] is True
+        assert fake.docs[f"{TENANT_A}:stock:p-1"]["on_hand"] == 10.0
+
+
+class TestProductEndpoints:
+    def test_stock_summary_uses_materialized_balances(self, client, headers_a):
+        with patch("smart_invoice_pro.api.product_api.load_stock_map", return_value={"p-1": 4.0}), \
+             patch("smart_invoice_pro.api.product_api.products_container") as mock_products, \
+             patch("smart_invoice_pro.api.product_api.get_container") as mock_gc:
+            mock_products.query_items.return_value = [
+                {"id": "p-1", "name": "Widget", "sku": "W1", "tenant_id": TENANT_A},
+            ]
+            resp = client.get("/api/products/stock-summary", headers=headers_a)
+            mock_gc.return_value.query_items.assert_not_called()
+        assert resp.status_code == 200
+        assert resp.get_json()[0]["stock"] == 4.0
+
+    def test_rebuild_cron_endpoint(self, client, cron_headers):
+        with patch("smart_invoice_pro.api.cron_jobs.rebuild_tenant_balances",
+                   return_value={"tenant_id": TENANT_A, "products": 2}) as rebuild:
+            resp = client.post(
+                f"/api/cron/rebuild-stock-balances?tenant_id={TENANT_A}",
+                headers=cron_headers,
+            )
+        assert resp.status_code == 200
+        rebuild.assert_called_once_with(TENANT_A)
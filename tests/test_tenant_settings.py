@@ -0,0 +1,113 @@
+"""Tests for the tenant settings snapshot used on the document-creation hot path."""
+
+import copy
+from unittest.mock import MagicMock, patch
+
+from smart_invoice_pro.utils import tenant_settings as ts
+from smart_invoice_pro.utils.org_tax_mode import COMPOSITION, FULL_GST, get_org_gst_mode
+from tests.conftest import TENANT_A
+
+PROFILE = {
+    "id": f"{TENANT_A}:organization_profile", "tenant_id": TENANT_A, "_etag": "p1",
+    "gst_registration_type": "regular", "gstin": "29ABCDE1234F1Z5",
+    "address": {"state": "Kerala"},
+}
+PREFS = {
+    "id": f"{TENANT_A}:invoice_preferences", "tenant_id": TENANT_A, "_etag": "i1",
+    "invoice_prefix": "SI-", "invoice_suffix": "", "next_invoice_number": 7,
+    "number_padding": 3, "auto_generate_invoice_number": True,
+}
+
+
+class FakeSettings:
+    """Settings container answering the snapshot's full and ETag-only queries."""
+
+    def __init__(self, *docs):
+        self.docs = {d["id"]: copy.deepcopy(d) for d in docs}
+        self.full_reads = 0
+        self.etag_reads = 0
+
+    def query_items(self, query, parameters=None, **kwargs):
+        ids = next(p["value"] for p in parameters if p["name"] == "@ids")
+        rows = [d for i, d in self.docs.items() if i in ids]
+        if query.startswith("SELECT *"):
+            self.full_reads += 1
+            return [copy.deepcopy(d) for d in rows]
+        self.etag_reads += 1
+        return [{"id": d["id"], "_etag": d.get("_etag")} for d in rows]
+
+
+class TestSnapshot:
+    def test_one_query_loads_every_settings_doc(self):
+        fake = FakeSettings(PROFILE, PREFS)
+        with patch.object(ts, "settings_container", fake):
+            snap = ts.get_tenant_settings(TENANT_A)
+        assert fake.full_reads == 1
+        assert snap.gst_mode == FULL_GST and not snap.suppress_sales_tax
+        assert snap.seller_state == "Karnataka"
+        assert snap.invoice_prefs["invoice_prefix"] == "SI-"
+        assert snap.automation == {}
+
+    def test_unchanged_etags_reuse_the_cached_snapshot(self):
+        fake = FakeSettings(PROFILE)
+        with patch.object(ts, "settings_container", fake):
+            ts.get_tenant_settings(TENANT_A)
+            ts.get_tenant_settings(TENANT_A)
+            assert (fake.full_reads, fake.etag_reads) == (1, 1)
+
+            fake.docs[PROFILE["id"]].update(gst_mode=COMPOSITION, _etag="p2")
+            assert get_org_gst_mode(TENANT_A) == COMPOSITION
+            assert fake.full_reads == 2
+
+    def test_request_memo_shares_one_read(self, app):
+        fake = FakeSettings(PROFILE)
+        with patch.object(ts, "settings_container", fake), app.test_request_context():
+            for _ in range(5):
+                get_org_gst_mode(TENANT_A)
+            ts.get_tenant_settings(TENANT_A).seller_state
+        assert fake.full_reads + fake.etag_reads == 1
+
+    def test_write_through_keeps_snapshot_valid(self):
+        fake = FakeSettings(PREFS)
+        with patch.object(ts, "settings_container", fake):
+            ts.get_tenant_settings(TENANT_A)
+            saved = {**PREFS, "next_invoice_number": 8, "_etag": "i2"}
+            fake.docs[PREFS["id"]] = saved
+            ts.remember_settings_doc(TENANT_A, saved)
+            snap = ts.get_tenant_settings(TENANT_A)
+        assert snap.invoice_prefs["next_invoice_number"] == 8
+        assert fake.full_reads == 1
+
+
+class TestHotPath:
+    @patch("smart_invoice_pro.api.invoices.customers_container")
+    @patch("smart_invoice_pro.api.invoices.get_container")
+    @patch("smart_invoice_pro.api.invoices.invoices_container")
+    def test_invoice_create_reads_settings_once(self, mock_inv, mock_gc, mock_cust,
+                                                client, headers_a, sample_invoice):
+        mock_gc.return_value = MagicMock()
+        mock_cust.query_items.return_value = [{"id": "cust-001"}]
+        fake = FakeSettings(PROFILE, PREFS)
+        sample_invoice.update(is_gst_applicable=True, items=[
+            {"name": "Implementation Service", "quantity": 2, "rate": 500, "discount": 0, "tax": 18},
+        ])
+        with patch.object(ts, "settings_container", fake), \
+             patch("smart_invoice_pro.api.invoice_preferences_api.settings_container") as prefs_ctr:
+            prefs_ctr.replace_item.return_value = {**PREFS, "next_invoice_number": 8, "_etag": "i2"}
+            resp = client.post("/api/invoices", json=sample_invoice, headers=headers_a)
+
+        assert resp.status_code == 201
+        assert resp.get_json()["invoice_number"] == "SI-007"
+        assert fake.full_reads + fake.etag_reads == 1
+        prefs_ctr.query_items.assert_not_called()
+        assert prefs_ctr.replace_item.call_args.kwargs["etag"] == "i1"
+
+    def test_settings_put_invalidates_snapshot(self, client, headers_a):
+        fake = FakeSettings(PROFILE)
+        with patch.object(ts, "settings_container", fake):
+            ts.get_tenant_settings(TENANT_A)
+            resp = client.put("/api/settings/automation", json={"email_enabled": False},
+                              headers=headers_a)
+            assert resp.status_code == 200
+            ts.get_tenant_settings(TENANT_A)
+        assert fake.full_reads == 2 and fake.etag_reads == 0
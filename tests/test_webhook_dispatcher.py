@@ -0,0 +1,203 @@
+"""Tests for the outbox-backed webhook dispatcher."""
+
+import json
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+from smart_invoice_pro.utils import webhook_dispatcher as wd
+from smart_invoice_pro.utils import webhook_outbox
+from tests.conftest import TENANT_A
+
+WEBHOOK = {
+    "id": "wh-1", "url": "https://hooks.example.com/in", "active": True,
+    "events": ["invoice.created"], "secret": "s3cret",
+}
+
+
+class FakeSession:
+    """Records posts; ``responses`` is a list of status codes or exceptions."""
+
+    def __init__(self, responses=None, delay=0.0):
+        self.responses = list(responses or [200])
+        self.delay = delay
+        self.posts = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def post(self, url, data=None, headers=None, timeout=None):
+        with self._lock:
+            self.posts.append({"url": url, "data": data, "headers": headers})
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            outcome = self.responses.pop(0) if len(self.responses) > 1 else self.responses[0]
+        try:
+            time.sleep(self.delay)
+            if isinstance(outcome, Exception):
+                raise outcome
+            resp = MagicMock(status_code=outcome)
+            resp.ok = 200 <= outcome < 300
+            return resp
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+@pytest.fixture
+def outbox(tmp_path, monkeypatch):
+    monkeypatch.setenv("WEBHOOK_OUTBOX_BACKEND", "sqlite")
+    monkeypatch.setenv("WEBHOOK_OUTBOX_SQLITE_PATH", str(tmp_path / "outbox.sqlite3"))
+    monkeypatch.setenv("WEBHOOK_WORKERS", "0")
+    monkeypatch.setattr(wd, "_get_webhooks_for_tenant", lambda tenant_id: [WEBHOOK])
+    webhook_outbox.reset_outbox()
+    yield webhook_outbox.get_outbox()
+    wd.shutdown_webhook_workers(wait=False)
+    webhook_outbox.reset_outbox()
+
+
+def _with_session(session):
+    return patch.object(wd, "_session", lambda: session)
+
+
+class TestOutboxDelivery:
+    def test_event_is_persisted_before_delivery(self, outbox):
+        wd.dispatch_webhook_event(TENANT_A, "invoice.created", {"invoice_id": "inv-1"})
+        assert outbox.pending_count() == 1
+
+        session = FakeSession([200])
+        with _with_session(session):
+            assert wd.drain_webhook_outbox() == {
+                "delivered": 1, "retry": 0, "dead_letter": 0, "deferred": 0, "lost": 0,
+            }
+        assert outbox.pending_count() == 0
+
+        post = session.posts[0]
+        envelope = json.loads(post["data"])
+        assert envelope["data"] == {"invoice_id": "inv-1"}
+        assert post["headers"]["X-SmartInvoice-Signature"] == wd._sign_payload("s3cret", post["data"])
+        assert post["headers"]["X-SmartInvoice-Delivery"] == envelope["id"]
+
+    def test_unsubscribed_event_is_not_queued(self, outbox):
+        wd.dispatch_webhook_event(TENANT_A, "quote.created", {})
+        assert outbox.pending_count() == 0
+
+    def test_server_error_backs_off_then_succeeds(self, outbox, monkeypatch):
+        monkeypatch.setenv("WEBHOOK_BACKOFF_BASE_SECONDS", "60")
+        wd.dispatch_webhook_event(TENANT_A, "invoice.created", {})
+        session = FakeSession([503, 200])
+        with _with_session(session):
+            assert wd.drain_webhook_outbox()["retry"] == 1
+            # Not due yet: backoff pushed next_attempt_at at least 30 s out.
+            assert wd.drain_webhook_outbox()["delivered"] == 0
+            row = outbox._conn().execute("SELECT next_attempt_at FROM webhook_outbox").fetchone()
+            assert row[0] >= time.time() + 29
+            outbox._conn().execute("UPDATE webhook_outbox SET next_attempt_at = 0")
+            assert wd.drain_webhook_outbox()["delivered"] == 1
+
+    def test_client_error_is_dead_lettered_and_can_be_requeued(self, outbox):
+        wd.dispatch_webhook_event(TENANT_A, "invoice.created", {})
+        with _with_session(FakeSession([404])):
+            assert wd.drain_webhook_outbox()["dead_letter"] == 1
+        dead = wd.list_dead_letters(TENANT_A)
+        assert len(dead) == 1 and dead[0]["last_error"] == "HTTP 404"
+
+        assert wd.requeue_dead_letter(TENANT_A, dead[0]["id"]) is True
+        with _with_session(FakeSession([200])):
+            assert wd.drain_webhook_outbox()["delivered"] == 1
+        assert wd.list_dead_letters(TENANT_A) == []
+
+    def test_attempts_exhausted_dead_letters(self, outbox, monkeypatch):
+        monkeypatch.setenv("WEBHOOK_MAX_ATTEMPTS", "2")
+        wd.dispatch_webhook_event(TENANT_A, "invoice.created", {})
+        with _with_session(FakeSession([requests.ConnectionError("refused")])):
+            wd.drain_webhook_outbox()
+            outbox._conn().execute("UPDATE webhook_outbox SET next_attempt_at = 0")
+            assert wd.drain_webhook_outbox()["dead_letter"] == 1
+
+    def test_leased_rows_are_not_claimed_twice(self, outbox):
+        wd.dispatch_webhook_event(TENANT_A, "invoice.created", {})
+        first = outbox.claim_due("worker-a", 10, 60)
+        assert len(first) == 1
+        assert outbox.claim_due("worker-b", 10, 60) == []
+
+    def test_row_whose_lease_expired_in_the_local_queue_is_not_sent_twice(self, outbox):
+        wd.dispatch_webhook_event(TENANT_A, "invoice.created", {})
+        stale = outbox.claim_due("host:1", 10, 60)[0]
+        outbox._conn().execute("UPDATE webhook_outbox SET lease_until = 0")
+        fresh = outbox.claim_due("host:1", 10, 60)[0]    # same process, new claim
+
+        session = FakeSession([200])
+        with _with_session(session):
+            assert wd.process_delivery(stale) == "lost"
+            assert wd.process_delivery(fresh) == "delivered"
+        assert len(session.posts) == 1 and outbox.pending_count() == 0
+
+    def test_failed_outbox_write_is_reported_as_lost(self, outbox):
+        logged = []
+        with patch.object(outbox, "enqueue", side_effect=RuntimeError("cosmos down")), \
+             patch.object(wd, "_write_log", lambda record, *args, **kw: logged.append((args, kw))):
+            wd.dispatch_webhook_event(TENANT_A, "invoice.created", {})
+        (status_code, success, error), kwargs = logged[0]
+        assert success is False and "outbox write failed" in error and kwargs["dead_lettered"]
+        assert outbox.pending_count() == 0
+
+
+class TestWorkerPool:
+    def test_pool_delivers_with_bounded_endpoint_concurrency(self, outbox, monkeypatch):
+        monkeypatch.setenv("WEBHOOK_WORKERS", "6")
+        monkeypatch.setenv("WEBHOOK_ENDPOINT_CONCURRENCY", "2")
+        monkeypatch.setattr(wd, "_endpoint_slots", {})
+        session = FakeSession([200], delay=0.05)
+        monkeypatch.setattr(wd, "_session", lambda: session)
+
+        before = threading.active_count()
+        wd.start_webhook_workers()
+        for i in range(12):
+            wd.dispatch_webhook_event(TENANT_A, "invoice.created", {"n": i})
+        wd.shutdown_webhook_workers(wait=True)
+
+        assert len(session.posts) == 12
+        assert session.max_active <= 2
+        assert outbox.pending_count() == 0
+        # Fixed pool (6 workers + poller + log flusher), not a thread per event.
+        assert threading.active_count() - before <= 8
+
+
+class TestLogsAndConfig:
+    def test_logs_are_written_in_tenant_batches(self):
+        container = MagicMock()
+        batcher = wd._LogBatcher()
+        with patch.object(wd, "webhook_logs_container", container):
+            for i in range(3):
+                batcher._queue.put_nowait({"id": str(i), "tenant_id": TENANT_A})
+            assert batcher.flush() == 3
+        container.execute_item_batch.assert_called_once()
+        assert len(container.execute_item_batch.call_args.kwargs["batch_operations"]) == 3
+        container.create_item.assert_not_called()
+
+    def test_config_is_cached_until_settings_saved(self, client, headers_a):
+        wd.invalidate_webhook_config(TENANT_A)
+        with patch.object(wd, "settings_container") as settings:
+            settings.query_items.return_value = [{"webhooks": [WEBHOOK]}]
+            wd._get_webhooks_for_tenant(TENANT_A)
+            wd._get_webhooks_for_tenant(TENANT_A)
+            assert settings.query_items.call_count == 1
+
+            with patch("smart_invoice_pro.api.integrations_settings_api.settings_container") as api_settings:
+                api_settings.query_items.return_value = []
+                resp = client.put("/api/settings/integrations", json={"webhooks": []}, headers=headers_a)
+            assert resp.status_code == 200
+            wd._get_webhooks_for_tenant(TENANT_A)
+            assert settings.query_items.call_count == 2
+        wd.invalidate_webhook_config(TENANT_A)
+
+    def test_drain_cron_endpoint(self, client, cron_headers):
+        with patch("smart_invoice_pro.api.cron_jobs.drain_webhook_outbox",
+                   return_value={"delivered": 2}) as drain:
+            resp = client.post("/api/cron/drain-webhook-outbox?limit=50", headers=cron_headers)
+        assert resp.status_code == 200
+        drain.assert_called_once_with(50)